@@ -13,6 +13,7 @@ __all__ = [
     'PostVerificationClient',
     'S3Client',
     'SecretsManagerClient',
+    'SQSClient',
 ]
 from .apple import AppleClient
 from .appstore import AppStoreClient
@@ -28,3 +29,4 @@ from .pinpoint import PinpointClient
 from .post_verification import PostVerificationClient
 from .s3 import S3Client
 from .secretsmanager import SecretsManagerClient
+from .sqs import SQSClient
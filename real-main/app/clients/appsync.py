@@ -1,38 +1,106 @@
+import collections
+import functools
 import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
-import gql.transport.requests
+import gql
+import requests
 import requests_aws4auth
+from graphql.language.printer import print_ast
 
 APPSYNC_GRAPHQL_URL = os.environ.get('APPSYNC_GRAPHQL_URL')
 
 logger = logging.getLogger()
 
 
+@functools.lru_cache(maxsize=None)
+def notification_mutation(extra_keys):
+    "The parsed TriggerNotification mutation selecting the given extra keys"
+    return gql.gql(
+        f'''
+        mutation TriggerNotification ($input: NotificationInput!) {{
+            triggerNotification (input: $input) {{
+                userId
+                type
+                {' '.join(extra_keys)}
+            }}
+        }}
+    '''
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def print_query(document):
+    return print_ast(document)
+
+
 class AppSyncClient:
+    """
+    Sends mutations to appsync over keep-alive http sessions, one per thread.
+
+    In `async_mode`, calls to `send` return immediately and the request is sent from a thread pool.
+    Requests for different users go out concurrently, those for the same user go out one at a time
+    in the order they were sent, so that subscribers see notifications in order.
+    Call `flush` to wait for all such requests to complete.
+    """
 
     service_name = 'appsync'
     headers = {
         'Accept': 'application/json',
         'Content-Type': 'application/json',
     }
+    timeout = 10
+    async_max_workers = 10
 
-    def __init__(self, appsync_graphql_url=APPSYNC_GRAPHQL_URL):
+    def __init__(self, appsync_graphql_url=APPSYNC_GRAPHQL_URL, async_mode=False):
         self.appsync_graphql_url = appsync_graphql_url
+        self.async_mode = async_mode
+        self.futures = []
+        self._executor = None
+        self._local = threading.local()
+        self._queues = {}  # user_id -> deque of requests waiting to be sent
+        self._queues_lock = threading.Lock()
+        self._aws_session = None
+        self._auth = None
+        self._auth_credentials = None
+        self._auth_lock = threading.Lock()
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.async_max_workers)
+        return self._executor
+
+    @property
+    def session(self):
+        "The http session of the current thread, as requests sessions are not thread-safe"
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+            self._local.session.headers.update(self.headers)
+        return self._local.session
+
+    def get_auth(self):
+        "The request signer, rebuilt only when the underlying credentials have been refreshed"
+        with self._auth_lock:
+            if self._aws_session is None:
+                self._aws_session = boto3.session.Session()
+            creds = self._aws_session.get_credentials().get_frozen_credentials()
+            if creds != self._auth_credentials:
+                self._auth = requests_aws4auth.AWS4Auth(
+                    creds.access_key,
+                    creds.secret_key,
+                    self._aws_session.region_name,
+                    self.service_name,
+                    session_token=creds.token,
+                )
+                self._auth_credentials = creds
+            return self._auth
 
     def fire_notification(self, user_id, notification_type, **extra):
-        mutation = gql.gql(
-            f'''
-            mutation TriggerNotification ($input: NotificationInput!) {{
-                triggerNotification (input: $input) {{
-                    userId
-                    type
-                    {' '.join(extra.keys())}
-                }}
-            }}
-        '''
-        )
+        mutation = notification_mutation(tuple(sorted(extra.keys())))
         input_obj = {
             'userId': user_id,
             'type': notification_type,
@@ -41,18 +109,47 @@ class AppSyncClient:
         self.send(mutation, {'input': input_obj})
 
     def send(self, query, variables):
-        aws_session = boto3.session.Session()
-        creds = aws_session.get_credentials().get_frozen_credentials()
-        auth = requests_aws4auth.AWS4Auth(
-            creds.access_key,
-            creds.secret_key,
-            aws_session.region_name,
-            self.service_name,
-            session_token=creds.token,
-        )
-        transport = gql.transport.requests.RequestsHTTPTransport(
-            url=self.appsync_graphql_url, use_json=True, headers=self.headers, auth=auth,
+        if not self.async_mode:
+            self.execute(query, variables)
+            return
+        user_id = variables.get('input', {}).get('userId')
+        with self._queues_lock:
+            if user_id in self._queues:
+                # there's already a worker sending this user's requests, it will send this one after them
+                self._queues[user_id].append((query, variables))
+                return
+            self._queues[user_id] = collections.deque([(query, variables)])
+        self.futures.append(self.executor.submit(self.send_queued, user_id))
+
+    def send_queued(self, user_id):
+        "Send the user's queued requests in order, until there are none left. Failures are logged."
+        while True:
+            with self._queues_lock:
+                queue = self._queues[user_id]
+                if not queue:
+                    del self._queues[user_id]
+                    return
+                query, variables = queue.popleft()
+            try:
+                self.execute(query, variables)
+            except Exception as err:
+                logger.warning(f'Failed to send appsync notification: {err}')
+
+    def execute(self, query, variables):
+        payload = {'query': print_query(query), 'variables': variables}
+        resp = self.session.post(
+            self.appsync_graphql_url, json=payload, auth=self.get_auth(), timeout=self.timeout
         )
-        resp = transport.execute(query, variables)
-        if resp.errors:
-            raise Exception(f'Appsync resp error: `{resp.errors}` from query `{query}`, variables `{variables}`')
+        resp.raise_for_status()
+        errors = resp.json().get('errors')
+        if errors:
+            raise Exception(f'Appsync resp error: `{errors}` from query `{query}`, variables `{variables}`')
+
+    def flush(self):
+        "Wait for all requests sent in async mode to complete. Failures are logged rather than raised."
+        futures, self.futures = self.futures, []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as err:
+                logger.warning(f'Failed to send appsync notification: {err}')
@@ -1,8 +1,13 @@
 import base64
+import collections
+import contextlib
 import json
 import logging
 import os
 import re
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import boto3
 
@@ -10,6 +15,10 @@ DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE')
 logger = logging.getLogger()
 
 
+class _ThreadLease:
+    "Lives as long as the thread that holds it in thread-local storage"
+
+
 class DynamoClient:
     def __init__(self, table_name=DYNAMO_TABLE, create_table_schema=None):
         """
@@ -19,15 +28,44 @@ class DynamoClient:
         assert table_name, "Table name is required"
         self.table_name = table_name
 
-        boto3_resource = boto3.resource('dynamodb')
+        # boto3 resources are not thread-safe, so each thread gets its own, see `boto3_resource`
+        self._boto3_session = boto3.session.Session()
+        self._boto3_session_lock = threading.Lock()
+        self._idle_resources = collections.deque()
+        self._local = threading.local()
 
         if create_table_schema:
             create_table_schema['TableName'] = table_name
-            boto3_resource.create_table(**create_table_schema)
+            self.boto3_resource.create_table(**create_table_schema)
 
-        self.table = boto3_resource.Table(table_name)
-        self.boto3_client = boto3.client('dynamodb')
+        # low-level clients are thread-safe. From the same session as the resources, so exceptions match
+        self.boto3_client = self._boto3_session.client('dynamodb')
         self.exceptions = self.boto3_client.exceptions
+        self._count_deltas = None
+        self._count_deltas_lock = threading.Lock()
+
+    @property
+    def boto3_resource(self):
+        """
+        The dynamo resource of the current thread. Once a thread exits its resource is handed back,
+        to be reused by the next thread that needs one, so thread pools don't pay to build new ones.
+        """
+        if not hasattr(self._local, 'boto3_resource'):
+            try:
+                self._local.boto3_resource = self._idle_resources.pop()
+            except IndexError:
+                with self._boto3_session_lock:
+                    self._local.boto3_resource = self._boto3_session.resource('dynamodb')
+            self._local.lease = _ThreadLease()
+            weakref.finalize(self._local.lease, self._idle_resources.append, self._local.boto3_resource)
+        return self._local.boto3_resource
+
+    @property
+    def table(self):
+        "The table resource of the current thread"
+        if not hasattr(self._local, 'table'):
+            self._local.table = self.boto3_resource.Table(self.table_name)
+        return self._local.table
 
     def add_item(self, query_kwargs):
         "Put an item and return what was putted"
@@ -60,9 +98,27 @@ class DynamoClient:
             kwargs['RequestItems'][self.table_name]['ProjectionExpression'] = projection_expression
         return self.boto3_client.batch_get_item(**kwargs)['Responses'][self.table_name]
 
+    def generate_all_batch_get(self, keys, projection_expression=None):
+        """
+        Return a generator that iterates over the items for the given `keys`, both in
+        non-verbose format (without types). Keys are fetched in batches of 100, and any
+        unprocessed keys are retried. Order *not* maintained, keys with no item are skipped.
+        """
+        keys = list(keys)
+        for start in range(0, len(keys), 100):
+            request = {'Keys': keys[start : start + 100]}
+            if projection_expression:
+                request['ProjectionExpression'] = projection_expression
+            request_items = {self.table_name: request}
+            while request_items:
+                resp = self.boto3_resource.batch_get_item(RequestItems=request_items)
+                for item in resp['Responses'].get(self.table_name, []):
+                    yield item
+                request_items = resp.get('UnprocessedKeys')
+
     def update_item(self, query_kwargs, failure_warning=None):
         """
-        Update an item and return the new item.
+        Update an item and return the new item, or the attributes named by `ReturnValues` if set.
         Set `failure_warning` fail softly with a logged warning rather than raise an exception.
         """
         # ensure query fails if the item does not exist
@@ -70,7 +126,7 @@ class DynamoClient:
         if 'ConditionExpression' in query_kwargs:
             cond_exp += ' and (' + query_kwargs['ConditionExpression'] + ')'
         query_kwargs['ConditionExpression'] = cond_exp
-        query_kwargs['ReturnValues'] = 'ALL_NEW'
+        query_kwargs.setdefault('ReturnValues', 'ALL_NEW')
         try:
             return self.table.update_item(**query_kwargs).get('Attributes')
         except self.exceptions.ConditionalCheckFailedException:
@@ -92,30 +148,83 @@ class DynamoClient:
         }
         return self.table.update_item(**kwargs).get('Attributes')
 
-    def increment_count(self, key, attribute_name):
-        "Best-effort attempt to increment a counter. Logs a WARNING upon failure."
+    def increment_count(self, key, attribute_name, by=1):
+        "Best-effort attempt to increment a counter, by `by`. Logs a WARNING upon failure."
         query_kwargs = {
             'Key': key,
-            'UpdateExpression': 'ADD #attrName :one',
+            'UpdateExpression': 'ADD #attrName :by',
             'ExpressionAttributeNames': {'#attrName': attribute_name},
-            'ExpressionAttributeValues': {':one': 1},
+            'ExpressionAttributeValues': {':by': by},
             'ConditionExpression': 'attribute_exists(partitionKey)',
         }
         failure_warning = f'Failed to increment {attribute_name} for key `{key}`'
         return self.update_item(query_kwargs, failure_warning=failure_warning)
 
-    def decrement_count(self, key, attribute_name):
-        "Best-effort attempt to decrement a counter. Logs a WARNING upon failure."
+    def decrement_count(self, key, attribute_name, by=1):
+        """
+        Best-effort attempt to decrement a counter, by `by`. A counter that is short of `by` is taken to zero.
+        Logs a WARNING upon failure.
+        """
         query_kwargs = {
             'Key': key,
-            'UpdateExpression': 'ADD #attrName :neg_one',
+            'UpdateExpression': 'ADD #attrName :neg_by',
             'ExpressionAttributeNames': {'#attrName': attribute_name},
-            'ExpressionAttributeValues': {':neg_one': -1, ':zero': 0},
-            'ConditionExpression': 'attribute_exists(partitionKey) AND #attrName > :zero',
+            'ExpressionAttributeValues': {':neg_by': -by, ':by': by},
+            'ConditionExpression': 'attribute_exists(partitionKey) AND #attrName >= :by',
         }
         failure_warning = f'Failed to decrement {attribute_name} for key `{key}`'
+        if by == 1:
+            return self.update_item(query_kwargs, failure_warning=failure_warning)
+        try:
+            return self.update_item(query_kwargs)
+        except self.exceptions.ConditionalCheckFailedException:
+            pass
+        # an aggregated decrement can overshoot a counter that has drifted low, rather than lose it all, clamp
+        query_kwargs = {
+            'Key': key,
+            'UpdateExpression': 'SET #attrName = :zero',
+            'ExpressionAttributeNames': {'#attrName': attribute_name},
+            'ExpressionAttributeValues': {':zero': 0, ':by': by},
+            'ConditionExpression': 'attribute_exists(partitionKey) AND #attrName > :zero AND #attrName < :by',
+        }
         return self.update_item(query_kwargs, failure_warning=failure_warning)
 
+    @contextlib.contextmanager
+    def count_deltas_buffered(self):
+        """
+        Within this context, changes to counters made with `add_count_delta` are summed per item and attribute,
+        and written with one ADD each on exit. Counters of popular items take one write rather than many.
+        Each write on exit is best-effort: a failure is logged as a WARNING and the rest are still written,
+        as raising part way would have the deltas already written applied again when the context is re-run.
+        """
+        self._count_deltas = collections.Counter()
+        try:
+            yield self
+            with self._count_deltas_lock:
+                count_deltas, self._count_deltas = self._count_deltas, None
+            for (key, attribute_name), delta in count_deltas.items():
+                try:
+                    self.add_count_delta(dict(key), attribute_name, delta)
+                except Exception as err:
+                    logger.warning(f'Failed to add `{delta}` to {attribute_name} for key `{dict(key)}`: {err}')
+        finally:
+            self._count_deltas = None
+
+    def add_count_delta(self, key, attribute_name, delta):
+        """
+        Best-effort attempt to add `delta` to a counter, which is kept from going negative.
+        Within a `count_deltas_buffered` context the change is buffered, otherwise it's written immediately.
+        """
+        with self._count_deltas_lock:
+            if self._count_deltas is not None:
+                self._count_deltas[tuple(sorted(key.items())), attribute_name] += delta
+                return None
+        if delta > 0:
+            return self.increment_count(key, attribute_name, by=delta)
+        if delta < 0:
+            return self.decrement_count(key, attribute_name, by=-delta)
+        return None
+
     def batch_put_items(self, generator):
         "Batch put the items yielded by `generator`. Returns count of how many puts requested."
         cnt = 0
@@ -196,6 +305,22 @@ class DynamoClient:
                 yield item
             last_key = resp.get('LastEvaluatedKey')
 
+    def generate_all_scan_parallel(self, scan_kwargs, total_segments):
+        """
+        Return a generator that iterates over all results of the scan, with the table split into
+        `total_segments` segments that are scanned concurrently. Order *not* maintained.
+        """
+
+        def scan_segment(segment):
+            return list(
+                self.generate_all_scan({**scan_kwargs, 'Segment': segment, 'TotalSegments': total_segments})
+            )
+
+        with ThreadPoolExecutor(max_workers=total_segments) as executor:
+            futures = [executor.submit(scan_segment, segment) for segment in range(total_segments)]
+            for future in as_completed(futures):
+                yield from future.result()
+
     def transact_write_items(self, transact_items, transact_exceptions=None):
         """
         Apply the given write operations in a transaction.
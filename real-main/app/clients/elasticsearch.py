@@ -15,10 +15,19 @@ class ElasticSearchClient:
 
     service = 'es'
     headers = {'Content-Type': 'application/json'}
+    bulk_headers = {'Content-Type': 'application/x-ndjson'}
+    bulk_batch_size = 500
 
-    def __init__(self, domain=ELASTICSEARCH_DOMAIN):
+    def __init__(self, domain=ELASTICSEARCH_DOMAIN, buffered=False):
+        """
+        Set `buffered` to collect puts and deletes of users in memory, to be written in bulk when
+        `flush` is called or once `bulk_batch_size` of them have built up.
+        """
         assert domain, '`domain` is required'
         self.domain = domain
+        self.buffered = buffered
+        self.buffer = {}  # user_id -> bulk action, only the last action for each user matters
+        self.session = requests.Session()
 
     @property
     def awsauth(self):
@@ -37,7 +46,7 @@ class ElasticSearchClient:
     def query_users(self, query):
         "`query` should be dict-like structure that can be serialized to json"
         url = f'https://{self.domain}/users/_search'
-        resp = requests.get(url, auth=self.awsauth, json={'query': query}, headers=self.headers)
+        resp = self.session.get(url, auth=self.awsauth, json={'query': query}, headers=self.headers)
         if resp.status_code != 200:
             logging.warning(f'ElasticSearch: Recieved non-200 response of {resp.status_code} when querying users')
         return resp.json()
@@ -51,15 +60,67 @@ class ElasticSearchClient:
 
     def put_user(self, user_id, username, full_name):
         doc = self.build_user_doc(user_id, username, full_name)
+        if self.buffered:
+            self.buffer_action(user_id, {'index': {'_index': 'users', '_id': user_id}}, doc)
+            return
         url = self.build_user_url(user_id)
         logging.info(f'ElasticSearch: Putting user to index at `{url}` ' + json.dumps(doc))
-        resp = requests.put(url, auth=self.awsauth, json=doc, headers=self.headers)
+        resp = self.session.put(url, auth=self.awsauth, json=doc, headers=self.headers)
         if resp.status_code // 100 != 2:
             logging.warning(f'ElasticSearch: Recieved non-2XX response of {resp.status_code} when adding user')
 
     def delete_user(self, user_id):
+        if self.buffered:
+            self.buffer_action(user_id, {'delete': {'_index': 'users', '_id': user_id}})
+            return
         url = self.build_user_url(user_id)
         logging.info(f'ElasticSearch: Deleting user from index at `{url}`')
-        resp = requests.delete(url, auth=self.awsauth)
+        resp = self.session.delete(url, auth=self.awsauth)
         if resp.status_code != 200:
             logging.warning(f'ElasticSearch: Recieved non-200 response of {resp.status_code} when deleting user')
+
+    def buffer_action(self, user_id, action, doc=None):
+        # re-insert so the buffer stays in order of most recent action
+        self.buffer.pop(user_id, None)
+        self.buffer[user_id] = (action, doc)
+        if len(self.buffer) >= self.bulk_batch_size:
+            self.flush()
+
+    def flush(self):
+        "Write all buffered actions to the index. Failures are logged rather than raised."
+        actions, self.buffer = list(self.buffer.values()), {}
+        for start in range(0, len(actions), self.bulk_batch_size):
+            batch = actions[start : start + self.bulk_batch_size]
+            try:
+                self.bulk(batch)
+            except Exception as err:
+                logger.warning(f'ElasticSearch: Failed to apply `{len(batch)}` actions in bulk: {err}')
+
+    def bulk(self, actions):
+        """
+        Apply a list of (action, doc) pairs in one request to the `_bulk` api, doc being None for deletes.
+        https://www.elastic.co/guide/en/elasticsearch/reference/current/docs-bulk.html
+        """
+        if not actions:
+            return
+        lines = []
+        for action, doc in actions:
+            lines.append(json.dumps(action))
+            if doc is not None:
+                lines.append(json.dumps(doc))
+        url = f'https://{self.domain}/_bulk'
+        logging.info(f'ElasticSearch: Applying `{len(actions)}` actions in bulk')
+        resp = self.session.post(url, auth=self.awsauth, data='\n'.join(lines) + '\n', headers=self.bulk_headers)
+        if resp.status_code != 200:
+            logging.warning(f'ElasticSearch: Recieved non-200 response of {resp.status_code} when applying bulk')
+            return
+        body = resp.json()
+        if not body.get('errors'):
+            return
+        for item in body['items']:
+            for op, result in item.items():
+                # deleting a user that was never indexed is not a problem
+                if result.get('status', 200) // 100 != 2 and not (op == 'delete' and result['status'] == 404):
+                    logging.warning(
+                        f'ElasticSearch: Failed to {op} user `{result.get("_id")}` in bulk: {result.get("error")}'
+                    )
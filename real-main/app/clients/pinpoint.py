@@ -1,6 +1,9 @@
+import contextlib
 import logging
 import os
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partialmethod
 
 import boto3
 
@@ -10,9 +13,14 @@ logger = logging.getLogger()
 
 
 class PinpointClient:
+
+    endpoints_batch_size = 100  # max number of endpoints pinpoint accepts in one batch update
+    fetch_max_workers = 10
+
     def __init__(self, app_id=PINPOINT_APPLICATION_ID):
         self.app_id = app_id
         self.client = boto3.client('pinpoint')
+        self._endpoints_cache = None
 
     def send_user_apns(self, user_id, url, title, body=None):
         "Returns a bool representing if the APNS was successfully sent"
@@ -29,6 +37,43 @@ class PinpointClient:
         result = self.client.send_users_messages(**kwargs)['SendUsersMessageResponse']['Result'][user_id]
         return 'SUCCESSFUL' in (v['DeliveryStatus'] for k, v in result.items())
 
+    def send_users_apns(self, url, user_messages):
+        """
+        Send one APNS to each of up to 100 users in a single request, all pointing to the same `url`.
+        `user_messages` should be a dict of {user_id: {'title': ..., 'body': ...}}, with body optional.
+        Returns a dict of {user_id: bool} representing if the APNS was successfully sent to each user.
+        """
+        assert len(user_messages) <= 100, 'Pinpoint accepts at most 100 users per request'
+        users = {}
+        for user_id, message in user_messages.items():
+            users[user_id] = {'TitleOverride': message['title']}
+            if message.get('body'):
+                users[user_id]['BodyOverride'] = message['body']
+        kwargs = {
+            'ApplicationId': self.app_id,
+            'SendUsersMessageRequest': {
+                'MessageConfiguration': {'APNSMessage': {'Action': 'URL', 'Url': url}},
+                'Users': users,
+            },
+        }
+        results = self.client.send_users_messages(**kwargs)['SendUsersMessageResponse']['Result']
+        return {
+            user_id: 'SUCCESSFUL' in (v['DeliveryStatus'] for v in results.get(user_id, {}).values())
+            for user_id in user_messages
+        }
+
+    @contextlib.contextmanager
+    def endpoints_cache(self):
+        """
+        Within this context, each user's endpoints are fetched from pinpoint at most once.
+        Changes made through this client are written through to the cache.
+        """
+        self._endpoints_cache = {}
+        try:
+            yield self
+        finally:
+            self._endpoints_cache = None
+
     def update_user_endpoint(self, user_id, channel_type, address):
         """
         Set the user's endpoint of type `channel_type` to `address`.
@@ -48,24 +93,57 @@ class PinpointClient:
 
         # delete extras
         while len(endpoint_ids) > 1:
-            self.delete_endpoint(endpoint_ids.pop())
+            self.delete_endpoint(endpoint_ids.pop(), user_id=user_id)
 
         endpoint_id = endpoint_ids[0] if endpoint_ids else str(uuid.uuid4())
-        if endpoints.get(endpoint_id) != address:
+        if endpoints.get(endpoint_id, {}).get('Address') != address:
+            endpoint = {'Address': address, 'ChannelType': channel_type, 'User': {'UserId': user_id}}
             kwargs = {
                 'ApplicationId': self.app_id,
                 'EndpointId': endpoint_id,
-                'EndpointRequest': {'Address': address, 'ChannelType': channel_type, 'User': {'UserId': user_id}},
+                'EndpointRequest': endpoint,
             }
             self.client.update_endpoint(**kwargs)
+            self.cache_endpoint(user_id, endpoint_id, {**endpoints.get(endpoint_id, {}), **endpoint})
         return endpoint_id
 
+    def update_endpoints_batch(self, items):
+        """
+        Create or update endpoints in bulk. `items` should be an iterable of EndpointBatchItem dicts
+        https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/pinpoint.html#Pinpoint.Client.update_endpoints_batch
+        """
+        items = list(items)
+        for start in range(0, len(items), self.endpoints_batch_size):
+            kwargs = {
+                'ApplicationId': self.app_id,
+                'EndpointBatchRequest': {'Item': items[start : start + self.endpoints_batch_size]},
+            }
+            self.client.update_endpoints_batch(**kwargs)
+        for item in items:
+            if (user_id := item.get('User', {}).get('UserId')) :
+                endpoint = {k: v for k, v in item.items() if k != 'Id'}
+                self.cache_endpoint(
+                    user_id, item['Id'], {**self.get_cached_endpoint(user_id, item['Id']), **endpoint}
+                )
+
     def get_user_endpoints(self, user_id, channel_type=None):
         """
         A dict of {endpoint_id: endpoint_details} where endpoint_details is
         a EndpointsResponse.Item as returned by the boto lib
         https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/pinpoint.html#Pinpoint.Client.get_user_endpoints
         """
+        endpoints = self._endpoints_cache.get(user_id) if self._endpoints_cache is not None else None
+        if endpoints is None:
+            endpoints = self.fetch_user_endpoints(user_id)
+            if self._endpoints_cache is not None:
+                self._endpoints_cache[user_id] = endpoints
+        return {
+            endpoint_id: endpoint
+            for endpoint_id, endpoint in endpoints.items()
+            if not channel_type or endpoint['ChannelType'] == channel_type
+        }
+
+    def fetch_user_endpoints(self, user_id):
         kwargs = {
             'ApplicationId': self.app_id,
             'UserId': user_id,
@@ -74,48 +152,57 @@ class PinpointClient:
             resp = self.client.get_user_endpoints(**kwargs)
         except self.client.exceptions.NotFoundException:
             return {}
+        return {item['Id']: item for item in resp['EndpointsResponse']['Item']}
 
-        return {
-            item['Id']: item
-            for item in resp['EndpointsResponse']['Item']
-            if not channel_type or item['ChannelType'] == channel_type
-        }
+    def get_cached_endpoint(self, user_id, endpoint_id):
+        if self._endpoints_cache is None or user_id not in self._endpoints_cache:
+            return {}
+        return self._endpoints_cache[user_id].get(endpoint_id, {})
 
-    def enable_user_endpoints(self, user_id):
-        "Disable all of a user's endpoints"
-        endpoints = self.get_user_endpoints(user_id)
-        for endpoint_id in endpoints.keys():
-            kwargs = {
-                'ApplicationId': self.app_id,
-                'EndpointId': endpoint_id,
-                'EndpointRequest': {'EndpointStatus': 'ACTIVE'},
-            }
-            self.client.update_endpoint(**kwargs)
+    def cache_endpoint(self, user_id, endpoint_id, endpoint):
+        "Write through a change to an endpoint to the cache, if it's active. Use None for a deleted endpoint"
+        if self._endpoints_cache is None or user_id not in self._endpoints_cache:
+            return
+        if endpoint is None:
+            self._endpoints_cache[user_id].pop(endpoint_id, None)
+        else:
+            self._endpoints_cache[user_id][endpoint_id] = {**endpoint, 'Id': endpoint_id}
 
-    def disable_user_endpoints(self, user_id):
-        "Disable all of a user's endpoints"
+    def set_user_endpoints_status(self, user_id, status):
+        "Set the status of all of a user's endpoints, in one request"
         endpoints = self.get_user_endpoints(user_id)
-        for endpoint_id in endpoints.keys():
-            kwargs = {
-                'ApplicationId': self.app_id,
-                'EndpointId': endpoint_id,
-                'EndpointRequest': {'EndpointStatus': 'INACTIVE'},
-            }
-            self.client.update_endpoint(**kwargs)
+        self.update_endpoints_batch(
+            {**self.endpoint_batch_item(endpoint_id, endpoint), 'EndpointStatus': status}
+            for endpoint_id, endpoint in endpoints.items()
+            if endpoint.get('EndpointStatus') != status
+        )
+
+    enable_user_endpoints = partialmethod(set_user_endpoints_status, status='ACTIVE')
+    disable_user_endpoints = partialmethod(set_user_endpoints_status, status='INACTIVE')
+
+    def endpoint_batch_item(self, endpoint_id, endpoint):
+        "Build an EndpointBatchItem from an EndpointsResponse.Item, carrying over the identifying fields"
+        item = {'Id': endpoint_id}
+        item.update({k: endpoint[k] for k in ('Address', 'ChannelType') if k in endpoint})
+        if (user_id := endpoint.get('User', {}).get('UserId')) :
+            item['User'] = {'UserId': user_id}
+        return item
 
-    def delete_endpoint(self, endpoint_id):
+    def delete_endpoint(self, endpoint_id, user_id=None):
         "Delete a specific endpoint"
         kwargs = {
             'ApplicationId': self.app_id,
             'EndpointId': endpoint_id,
         }
         self.client.delete_endpoint(**kwargs)
+        if user_id:
+            self.cache_endpoint(user_id, endpoint_id, None)
 
     def delete_user_endpoint(self, user_id, channel_type):
         "Delete a user's endpoint of a specific `channel_type`"
         endpoints = self.get_user_endpoints(user_id, channel_type=channel_type)
         for endpoint_id in endpoints.keys():
-            self.delete_endpoint(endpoint_id)
+            self.delete_endpoint(endpoint_id, user_id=user_id)
 
     def delete_user_endpoints(self, user_id):
         "Delete all of a user's endpoints"
@@ -124,3 +211,59 @@ class PinpointClient:
             'UserId': user_id,
         }
         self.client.delete_user_endpoints(**kwargs)
+        if self._endpoints_cache is not None:
+            self._endpoints_cache[user_id] = {}
+
+    def resync_users_endpoints(self, users_addresses, inactive_user_ids=()):
+        """
+        Reconcile the endpoints of many users at once.
+
+        `users_addresses` should be a dict of {user_id: {channel_type: address}}, with an address of
+        None meaning the user should have no endpoint of that channel type. Channel types not included
+        are left as is. Users in `inactive_user_ids` have all their endpoints set INACTIVE, all other
+        users have all their endpoints set ACTIVE.
+
+        Users' current endpoints are fetched concurrently, all creates and updates are written
+        with batch requests. Returns the number of endpoints created, updated or deleted.
+        """
+        inactive_user_ids = set(inactive_user_ids)
+        with ThreadPoolExecutor(max_workers=self.fetch_max_workers) as executor:
+            users_endpoints = dict(
+                zip(users_addresses.keys(), executor.map(self.fetch_user_endpoints, users_addresses.keys()))
+            )
+
+        items, delete_endpoint_ids = [], []
+        for user_id, addresses in users_addresses.items():
+            status = 'INACTIVE' if user_id in inactive_user_ids else 'ACTIVE'
+            endpoints = users_endpoints[user_id]
+            for channel_type, address in addresses.items():
+                endpoint_ids = sorted(
+                    (eid for eid, e in endpoints.items() if e['ChannelType'] == channel_type),
+                    key=lambda eid: endpoints[eid].get('Address') != address,
+                )
+                keep_endpoint_id = endpoint_ids.pop(0) if endpoint_ids and address is not None else None
+                delete_endpoint_ids.extend(endpoint_ids)
+                if address is not None and not keep_endpoint_id:
+                    items.append(
+                        {
+                            'Id': str(uuid.uuid4()),
+                            'Address': address,
+                            'ChannelType': channel_type,
+                            'User': {'UserId': user_id},
+                            'EndpointStatus': status,
+                        }
+                    )
+                elif keep_endpoint_id and endpoints[keep_endpoint_id].get('Address') != address:
+                    item = self.endpoint_batch_item(keep_endpoint_id, endpoints[keep_endpoint_id])
+                    items.append({**item, 'Address': address, 'EndpointStatus': status})
+            handled_endpoint_ids = set(delete_endpoint_ids) | set(item['Id'] for item in items)
+            items.extend(
+                {**self.endpoint_batch_item(endpoint_id, endpoint), 'EndpointStatus': status}
+                for endpoint_id, endpoint in endpoints.items()
+                if endpoint_id not in handled_endpoint_ids and endpoint.get('EndpointStatus') != status
+            )
+
+        self.update_endpoints_batch(items)
+        for endpoint_id in delete_endpoint_ids:
+            self.delete_endpoint(endpoint_id)
+        return len(items) + len(delete_endpoint_ids)
@@ -2,8 +2,14 @@ import requests
 
 
 class PostVerificationClient:
+
+    # the service fetches and analyzes the image before responding
+    timeout = 30
+
     def __init__(self, api_creds_getter):
         self.api_creds_getter = api_creds_getter
+        # re-used across calls, to keep the connection alive
+        self.session = requests.Session()
 
     @property
     def api_creds(self):
@@ -26,8 +32,7 @@ class PostVerificationClient:
         if taken_in_real:
             data['metadata']['takenInReal'] = taken_in_real
 
-        # synchronous for now. Note this generally runs in an async env already: an s3-object-created handler
-        resp = requests.post(api_url, headers=headers, json=data)
+        resp = self.session.post(api_url, headers=headers, json=data, timeout=self.timeout)
         if resp.status_code != 200:
             raise Exception(f'Post verification service error `{resp.status_code}` with body `{resp.text}`')
         try:
@@ -1,7 +1,71 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import boto3
 import botocore
 
 
+class S3Uploader:
+    """
+    Writes objects to S3 from a thread pool, so that the caller can continue with other work
+    (ex: encoding the next image) while earlier writes are in flight.
+
+    At most `max_pending` writes may be queued or in flight at once. Beyond that, submitting a
+    write blocks until one completes, which bounds the memory held by pending request bodies.
+
+    Exiting the context manager waits for all writes to complete, and raises the first error, if any.
+    """
+
+    max_workers = 4
+
+    def __init__(self, s3_client, max_workers=max_workers, max_pending=None):
+        self.s3_client = s3_client
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.slots = threading.BoundedSemaphore(max_pending or 2 * max_workers)
+        self.futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def submit(self, func):
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(func)
+        except Exception:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        self.futures.append(future)
+        return future
+
+    def put_object(self, path, body, content_type):
+        # boto3 resources are not thread safe, so the threaded writes go through the low-level client
+        client = self.s3_client.boto_client
+        kwargs = {'Bucket': self.s3_client.bucket_name, 'Key': path, 'Body': body, 'ContentType': content_type}
+        return self.submit(lambda: client.put_object(**kwargs))
+
+    def copy_object(self, old_path, new_path):
+        client = self.s3_client.boto_client
+        bucket_name = self.s3_client.bucket_name
+        kwargs = {'Bucket': bucket_name, 'Key': new_path, 'CopySource': {'Bucket': bucket_name, 'Key': old_path}}
+        return self.submit(lambda: client.copy_object(**kwargs))
+
+    def wait(self):
+        "Wait for all submitted writes to complete. Raises the first error encountered, if any."
+        futures, self.futures = self.futures, []
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error:
+                raise error
+
+
 class S3Client:
     def __init__(self, bucket_name, create_bucket=False):
         """
@@ -17,18 +81,13 @@ class S3Client:
         if create_bucket:
             self.s3.create_bucket(Bucket=bucket_name)
 
+    def uploader(self, max_workers=S3Uploader.max_workers):
+        "An S3Uploader for this bucket. Use as a context manager."
+        return S3Uploader(self, max_workers=max_workers)
+
     def get_object_data_stream(self, path):
-        return self.bucket.Object(path).get()['Body']
-
-    def get_object_checksum(self, path):
-        resp = self.boto_client.head_object(Bucket=self.bucket_name, Key=path)
-        # etags start and end with '"', as required by RFC
-        checksum = resp['ResponseMetadata']['HTTPHeaders']['etag'][1:-1]
-        # Not all S3 etags are md5 checksums
-        # https://docs.aws.amazon.com/AmazonS3/latest/API/RESTCommonResponseHeaders.html
-        if '-' in checksum:
-            raise ValueError(f'S3 object at `{path}` does not have md5 etag')
-        return checksum
+        # through the low-level client, as that's safe to use from multiple threads
+        return self.boto_client.get_object(Bucket=self.bucket_name, Key=path)['Body']
 
     def list_common_prefixes(self, path_prefix):
         resp = self.boto_client.list_objects_v2(Bucket=self.bucket_name, Delimiter='/', Prefix=path_prefix)
@@ -0,0 +1,15 @@
+import json
+
+import boto3
+
+
+class SQSClient:
+    def __init__(self, queue_url):
+        assert queue_url, "SQS queue url is required"
+        self.queue_url = queue_url
+        self.client = boto3.client('sqs')
+
+    def send_message(self, body):
+        "Send `body`, which must be json-serializable, to the queue. Returns the id of the message"
+        resp = self.client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps(body))
+        return resp['MessageId']
@@ -31,6 +31,7 @@ from .exceptions import ClientException
 
 S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
 S3_PLACEHOLDER_PHOTOS_BUCKET = os.environ.get('S3_PLACEHOLDER_PHOTOS_BUCKET')
+SQS_DELETE_CASCADE_QUEUE_URL = os.environ.get('SQS_DELETE_CASCADE_QUEUE_URL')
 
 logger = logging.getLogger()
 xray.patch_all()
@@ -49,6 +50,7 @@ clients = {
     'post_verification': clients.PostVerificationClient(secrets_manager_client.get_post_verification_api_creds),
     's3_uploads': clients.S3Client(S3_UPLOADS_BUCKET),
     's3_placeholder_photos': clients.S3Client(S3_PLACEHOLDER_PHOTOS_BUCKET),
+    'sqs_delete_cascade': clients.SQSClient(SQS_DELETE_CASCADE_QUEUE_URL),
 }
 
 # shared hash table of all managers, enables inter-manager communication
@@ -298,7 +300,8 @@ def reset_user(caller_user_id, arguments, source, context):
     # resetUser may be called when user exists in cognito but not in dynamo
     user = user_manager.get_user(caller_user_id)
     if user:
-        user.delete(skip_cognito=True)
+        # done in the foreground, as the user may be re-created just below
+        user.delete_cascade(release_username=True)
 
     if new_username:
         # equivalent to calling Mutation.createCognitoOnlyUser()
@@ -364,9 +367,26 @@ def user_photo(caller_user_id, arguments, source, context):
         'url480p': user.get_photo_url(image_size.P480),
         'url1080p': user.get_photo_url(image_size.P1080),
         'url4k': user.get_photo_url(image_size.K4),
+        **image_size.variant_urls(user.get_photo_url, user.item.get('photoVariantFormats', [])),
     }
 
 
+@routes.register('User.chats')
+def user_chats(caller_user_id, arguments, source, context):
+    user_id = source['userId']
+    # private to user themselves
+    if caller_user_id != user_id:
+        return None
+
+    limit = arguments.get('limit') or 20
+    if limit < 1 or limit > 100:
+        raise ClientException('Limit cannot be less than 1 or greater than 100')
+    try:
+        return chat_manager.get_inbox_page(user_id, limit=limit, next_token=arguments.get('nextToken'))
+    except ChatException as err:
+        raise ClientException(str(err)) from err
+
+
 @routes.register('Mutation.followUser')
 @validate_caller
 def follow_user(caller_user, arguments, source, context):
@@ -565,6 +585,7 @@ def post_image(caller_user_id, arguments, source, context):
             'url480p': post.get_image_readonly_url(image_size.P480),
             'url1080p': post.get_image_readonly_url(image_size.P1080),
             'url4k': post.get_image_readonly_url(image_size.K4),
+            **image_size.variant_urls(post.get_image_readonly_url, image_item.get('variantFormats', [])),
         }
     )
     return image_item
@@ -1013,6 +1034,7 @@ def album_art(caller_user_id, arguments, source, context):
         'url480p': album.get_art_image_url(image_size.P480),
         'url1080p': album.get_art_image_url(image_size.P1080),
         'url4k': album.get_art_image_url(image_size.K4),
+        **image_size.variant_urls(album.get_art_image_url, album.item.get('artVariantFormats', [])),
     }
 
 
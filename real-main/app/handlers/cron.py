@@ -9,6 +9,7 @@ from app.logging import LogLevelContext, handler_logging
 from . import xray
 
 S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
+SQS_DELETE_CASCADE_QUEUE_URL = os.environ.get('SQS_DELETE_CASCADE_QUEUE_URL')
 USER_NOTIFICATIONS_ENABLED = os.environ.get('USER_NOTIFICATIONS_ENABLED')
 USER_NOTIFICATIONS_ONLY_USERNAMES = os.environ.get('USER_NOTIFICATIONS_ONLY_USERNAMES')
 
@@ -21,6 +22,7 @@ clients = {
     'cognito': clients.CognitoClient(),
     'pinpoint': clients.PinpointClient(),
     's3_uploads': clients.S3Client(S3_UPLOADS_BUCKET),
+    'sqs_delete_cascade': clients.SQSClient(SQS_DELETE_CASCADE_QUEUE_URL),
 }
 
 managers = {}
@@ -66,8 +68,10 @@ def delete_recently_expired_posts(event, context):
 
 @handler_logging
 def delete_older_expired_posts(event, context):
+    # invoke manually with {"backfill": true} to also catch posts that expired before the sweep window
     now = pendulum.now('utc')
-    post_manager.delete_older_expired_posts(now=now)
+    backfill = bool(event.get('backfill')) if isinstance(event, dict) else False
+    post_manager.delete_older_expired_posts(now=now, backfill=backfill)
 
 
 @handler_logging
@@ -80,7 +84,9 @@ def send_user_notifications(event, context):
     with LogLevelContext(logger, logging.INFO):
         logger.info(f'Preparing to send notifications as needed to users: {only_usernames or "all"}')
     now = pendulum.now('utc')
-    total_cnt, success_cnt = card_manager.notify_users(now=now, only_usernames=only_usernames)
+    # leave ourselves some headroom to finish the in-flight page before the lambda times out
+    deadline = now + pendulum.duration(milliseconds=context.get_remaining_time_in_millis(), seconds=-60)
+    total_cnt, success_cnt = card_manager.notify_users(now=now, only_usernames=only_usernames, deadline=deadline)
     with LogLevelContext(logger, logging.INFO):
         logger.info(f'User notifications sent successfully: {success_cnt} out of {total_cnt}')
 
@@ -19,10 +19,10 @@ xray.patch_all()
 
 clients = {
     'appstore': clients.AppStoreClient(),
-    'appsync': clients.AppSyncClient(),
+    'appsync': clients.AppSyncClient(async_mode=True),
     'dynamo': clients.DynamoClient(),
     'dynamo_feed': clients.DynamoClient(table_name=DYNAMO_FEED_TABLE),
-    'elasticsearch': clients.ElasticSearchClient(),
+    'elasticsearch': clients.ElasticSearchClient(buffered=True),
     'pinpoint': clients.PinpointClient(),
     's3_uploads': clients.S3Client(S3_UPLOADS_BUCKET),
 }
@@ -70,14 +70,9 @@ register('chat', '-', ['REMOVE'], chat_manager.on_item_delete_delete_views)
 register('chat', '-', ['REMOVE'], chat_message_manager.on_chat_delete_delete_messages)
 register('chat', 'flag', ['INSERT'], chat_manager.on_flag_add)
 register('chat', 'flag', ['REMOVE'], chat_manager.on_flag_delete)
+register('chat', 'member', ['INSERT'], chat_manager.on_chat_member_add_update_inbox)
 register('chat', 'member', ['INSERT'], user_manager.on_chat_member_add_update_chat_count)
-register(
-    'chat',
-    'member',
-    ['INSERT', 'MODIFY', 'REMOVE'],
-    user_manager.sync_chats_with_unviewed_messages_count,
-    {'messagesUnviewedCount': 0},
-)
+register('chat', 'member', ['REMOVE'], chat_manager.on_chat_member_delete_update_inbox)
 register('chat', 'member', ['REMOVE'], user_manager.on_chat_member_delete_update_chat_count)
 register('chat', 'view', ['INSERT', 'MODIFY'], chat_manager.sync_member_messages_unviewed_count, {'viewCount': 0})
 register('chatMessage', '-', ['INSERT'], chat_manager.on_chat_message_add)
@@ -159,6 +154,7 @@ register('post', 'flag', ['INSERT'], post_manager.on_flag_add)
 register('post', 'flag', ['REMOVE'], post_manager.on_flag_delete)
 register('post', 'like', ['INSERT'], post_manager.on_like_add)
 register('post', 'like', ['REMOVE'], post_manager.on_like_delete)
+register('post', 'view', ['INSERT'], post_manager.on_post_view_add_update_viewed_by_counts)
 register(
     'post', 'view', ['INSERT', 'MODIFY'], card_manager.on_post_view_count_change_update_cards, {'viewCount': 0},
 )
@@ -167,18 +163,32 @@ register(
 )
 register(
     'user',
-    'follower',
-    ['INSERT', 'MODIFY', 'REMOVE'],
-    follower_manager.on_first_story_post_id_change_fire_gql_notifications,
-    {'postId': None},
+    'chatInbox',
+    ['INSERT', 'MODIFY'],
+    card_manager.on_user_chats_with_unviewed_messages_count_change_sync_card,
+    {'chatsWithUnviewedMessagesCount': 0},
 )
 register(
     'user',
-    'profile',
+    'chatInbox',
     ['INSERT', 'MODIFY'],
-    card_manager.on_user_chats_with_unviewed_messages_count_change_sync_card,
+    user_manager.fire_gql_subscription_chats_with_unviewed_messages_count,
     {'chatsWithUnviewedMessagesCount': 0},
 )
+register(
+    'user',
+    'chatInbox',
+    ['INSERT', 'MODIFY'],
+    user_manager.sync_chats_with_unviewed_messages_count,
+    {'chatsWithUnviewedMessagesCount': 0},
+)
+register(
+    'user',
+    'follower',
+    ['INSERT', 'MODIFY', 'REMOVE'],
+    follower_manager.on_first_story_post_id_change_fire_gql_notifications,
+    {'postId': None},
+)
 register(
     'user',
     'profile',
@@ -207,13 +217,6 @@ register(
     user_manager.sync_user_status_due_to_posts,
     {'postForcedArchivingCount': 0},
 )
-register(
-    'user',
-    'profile',
-    ['INSERT', 'MODIFY'],
-    user_manager.fire_gql_subscription_chats_with_unviewed_messages_count,
-    {'chatsWithUnviewedMessagesCount': 0},
-)
 register('user', 'profile', ['INSERT', 'MODIFY'], user_manager.sync_pinpoint_email, {'email': None})
 register('user', 'profile', ['INSERT', 'MODIFY'], user_manager.sync_pinpoint_phone, {'phoneNumber': None})
 register(
@@ -260,31 +263,41 @@ register(
 )
 register('user', 'profile', ['REMOVE'], appstore_manager.on_user_delete_delete_receipts)
 register('user', 'profile', ['REMOVE'], card_manager.on_user_delete_delete_cards)
+register('user', 'profile', ['REMOVE'], chat_manager.on_user_delete_delete_inbox)
 register('user', 'profile', ['REMOVE'], user_manager.on_user_delete)
 
 
 @handler_logging
 def process_records(event, context):
-    for record in event['Records']:
+    # the pinpoint listeners for a user often fire together, share endpoint lookups between them.
+    # Counters of popular items (ex: like & view counts of viral posts) change many times in one batch of
+    # records, so changes to them are summed and written once per batch.
+    with clients['pinpoint'].endpoints_cache(), clients['dynamo'].count_deltas_buffered():
+        for record in event['Records']:
+
+            name = record['eventName']
+            pk = deserialize(record['dynamodb']['Keys']['partitionKey'])
+            sk = deserialize(record['dynamodb']['Keys']['sortKey'])
+            old_item = {k: deserialize(v) for k, v in record['dynamodb'].get('OldImage', {}).items()}
+            new_item = {k: deserialize(v) for k, v in record['dynamodb'].get('NewImage', {}).items()}
 
-        name = record['eventName']
-        pk = deserialize(record['dynamodb']['Keys']['partitionKey'])
-        sk = deserialize(record['dynamodb']['Keys']['sortKey'])
-        old_item = {k: deserialize(v) for k, v in record['dynamodb'].get('OldImage', {}).items()}
-        new_item = {k: deserialize(v) for k, v in record['dynamodb'].get('NewImage', {}).items()}
+            with LogLevelContext(logger, logging.INFO):
+                logger.info(f'{name}: `{pk}` / `{sk}` starting processing')
 
-        with LogLevelContext(logger, logging.INFO):
-            logger.info(f'{name}: `{pk}` / `{sk}` starting processing')
+            # we still have some pks in an old (& deprecated) format with more than one item_id in the pk
+            pk_prefix, item_id = pk.split('/')[:2]
+            sk_prefix = sk.split('/')[0]
 
-        # we still have some pks in an old (& deprecated) format with more than one item_id in the pk
-        pk_prefix, item_id = pk.split('/')[:2]
-        sk_prefix = sk.split('/')[0]
+            item_kwargs = {k: v for k, v in {'new_item': new_item, 'old_item': old_item}.items() if v}
+            for func in dispatch.search(pk_prefix, sk_prefix, name, old_item, new_item):
+                with LogLevelContext(logger, logging.INFO):
+                    logger.info(f'{name}: `{pk}` / `{sk}` running: {func}')
+                try:
+                    func(item_id, **item_kwargs)
+                except Exception as err:
+                    logger.exception(str(err))
 
-        item_kwargs = {k: v for k, v in {'new_item': new_item, 'old_item': old_item}.items() if v}
-        for func in dispatch.search(pk_prefix, sk_prefix, name, old_item, new_item):
-            with LogLevelContext(logger, logging.INFO):
-                logger.info(f'{name}: `{pk}` / `{sk}` running: {func}')
-            try:
-                func(item_id, **item_kwargs)
-            except Exception as err:
-                logger.exception(str(err))
+    # notifications to appsync are sent concurrently in the background, wait for them to go out
+    clients['appsync'].flush()
+    # changes to the search index are buffered, write them out in bulk
+    clients['elasticsearch'].flush()
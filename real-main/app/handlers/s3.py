@@ -73,6 +73,10 @@ def image_post_uploaded(event, context):
             raise err
         logger.warning(str(err))
 
+    if metrics := getattr(post, 'image_metrics', None):
+        with LogLevelContext(logger, logging.INFO):
+            logger.info(f'Processed image of post `{post_id}`', extra={'image_metrics': metrics.stages})
+
 
 @handler_logging
 def video_post_uploaded(event, context):
@@ -0,0 +1,44 @@
+import json
+import logging
+import os
+
+from app import clients, models
+from app.logging import LogLevelContext, handler_logging
+
+from . import xray
+
+DYNAMO_FEED_TABLE = os.environ.get('DYNAMO_FEED_TABLE')
+S3_UPLOADS_BUCKET = os.environ.get('S3_UPLOADS_BUCKET')
+SQS_DELETE_CASCADE_QUEUE_URL = os.environ.get('SQS_DELETE_CASCADE_QUEUE_URL')
+
+logger = logging.getLogger()
+xray.patch_all()
+
+clients = {
+    'appsync': clients.AppSyncClient(),
+    'dynamo': clients.DynamoClient(),
+    'dynamo_feed': clients.DynamoClient(table_name=DYNAMO_FEED_TABLE),
+    's3_uploads': clients.S3Client(S3_UPLOADS_BUCKET),
+    'sqs_delete_cascade': clients.SQSClient(SQS_DELETE_CASCADE_QUEUE_URL),
+}
+
+managers = {}
+post_manager = managers.get('post') or models.PostManager(clients, managers=managers)
+user_manager = managers.get('user') or models.UserManager(clients, managers=managers)
+
+delete_cascade_managers = {
+    'post': post_manager,
+    'user': user_manager,
+}
+
+
+@handler_logging
+def delete_cascade(event, context):
+    # Errors are raised, rather than logged, so the message is retried. The cascades are checkpointed, so
+    # a retry picks up where the last attempt left off.
+    for record in event['Records']:
+        body = json.loads(record['body'])
+        item_type, item_id = body['itemType'], body['itemId']
+        with LogLevelContext(logger, logging.INFO):
+            logger.info(f'Running delete cascade of {item_type} `{item_id}`')
+        delete_cascade_managers[item_type].run_delete_cascade(item_id)
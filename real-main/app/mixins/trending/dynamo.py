@@ -25,6 +25,10 @@ class TrendingDynamo:
     def get(self, item_id, strongly_consistent=False):
         return self.client.get_item(self.pk(item_id), ConsistentRead=strongly_consistent)
 
+    def generate_by_item_ids(self, item_ids):
+        "Generate the trending items of those of the items `item_ids` that have one. Order not maintained."
+        return self.client.generate_all_batch_get(self.pk(item_id) for item_id in item_ids)
+
     def add(self, item_id, initial_score, now=None):
         assert isinstance(initial_score, Decimal), 'Boto uses decimals for numbers'
         assert initial_score >= 0, 'Score cannot be negative'
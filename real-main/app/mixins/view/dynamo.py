@@ -21,6 +21,12 @@ class ViewDynamo:
     def get_view(self, item_id, user_id, strongly_consistent=False):
         return self.client.get_item(self.pk(item_id, user_id), ConsistentRead=strongly_consistent)
 
+    def generate_viewed_item_ids(self, item_ids, user_id):
+        "Of the items `item_ids`, generate the ids of those the user has viewed. Order not maintained."
+        keys = (self.pk(item_id, user_id) for item_id in item_ids)
+        for item in self.client.generate_all_batch_get(keys, projection_expression='partitionKey'):
+            yield item['partitionKey'].split('/')[1]
+
     def generate_views(self, item_id, pks_only=False):
         # no ordering guarantees
         pk = self.pk(item_id, None)
@@ -40,7 +46,8 @@ class ViewDynamo:
     def delete_views(self, view_pk_generator):
         self.client.batch_delete_items(view_pk_generator)
 
-    def add_view(self, item_id, user_id, view_count, viewed_at):
+    def add_view(self, item_id, user_id, view_count, viewed_at, extra_attributes=None):
+        "Add a view, with `extra_attributes` of the viewed item copied on for the stream handlers to use"
         pk = self.pk(item_id, user_id)
         viewed_at_str = viewed_at.to_iso8601_string()
         query_kwargs = {
@@ -53,6 +60,7 @@ class ViewDynamo:
                 'viewCount': view_count,
                 'firstViewedAt': viewed_at_str,
                 'lastViewedAt': viewed_at_str,
+                **(extra_attributes or {}),
             },
         }
         try:
@@ -1,11 +1,18 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pendulum
 
 from .dynamo import ViewDynamo
+from .exceptions import ViewAlreadyExists
 
 logger = logging.getLogger()
 
 
 class ViewManagerMixin:
+
+    record_views_max_workers = 8
+
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
         if 'dynamo' in clients:
@@ -14,6 +21,35 @@ class ViewManagerMixin:
     def record_views(self, item_ids, user_id, viewed_at=None):
         raise NotImplementedError  # subclasses must implement
 
+    def record_view_counts(self, view_counts, user_id, viewed_at=None, view_attributes=None):
+        """
+        Record views by the user, `view_counts` being a dict of item id to view count, and `view_attributes`
+        an optional dict of item id to the extra attributes to set on the item's view when it is added.
+        Which items the user has already viewed is batch fetched, then the views are added or
+        incremented concurrently. Returns the set of ids of the items the user is viewing for the first time.
+        """
+        view_attributes = view_attributes or {}
+        viewed_at = viewed_at or pendulum.now('utc')
+        viewed_item_ids = set(self.view_dynamo.generate_viewed_item_ids(view_counts, user_id))
+
+        def record(item_id):
+            view_count = view_counts[item_id]
+            if item_id not in viewed_item_ids:
+                try:
+                    self.view_dynamo.add_view(
+                        item_id, user_id, view_count, viewed_at, extra_attributes=view_attributes.get(item_id)
+                    )
+                except ViewAlreadyExists:
+                    pass  # we lost a race condition to add the view, so still need to record our data
+                else:
+                    return True
+            self.view_dynamo.increment_view_count(item_id, user_id, view_count, viewed_at)
+            return False
+
+        with ThreadPoolExecutor(max_workers=self.record_views_max_workers) as executor:
+            first_views = executor.map(record, view_counts)
+            return {item_id for item_id, first_view in zip(view_counts, first_views) if first_view}
+
     def on_item_delete_delete_views(self, item_id, old_item):
         pk_generator = self.view_dynamo.generate_views(item_id, pks_only=True)
         self.view_dynamo.delete_views(pk_generator)
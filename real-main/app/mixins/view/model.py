@@ -9,6 +9,10 @@ logger = logging.getLogger()
 
 
 class ViewModelMixin:
+
+    # extra attributes of this item to set on views of it when they are added
+    view_attributes = None
+
     def __init__(self, view_dynamo=None, **kwargs):
         super().__init__(**kwargs)
         if view_dynamo:
@@ -40,7 +44,9 @@ class ViewModelMixin:
             self.view_dynamo.increment_view_count(self.id, user_id, view_count, viewed_at)
         else:
             try:
-                self.view_dynamo.add_view(self.id, user_id, view_count, viewed_at)
+                self.view_dynamo.add_view(
+                    self.id, user_id, view_count, viewed_at, extra_attributes=self.view_attributes
+                )
             except ViewAlreadyExists:
                 # we lost a race condition to add the view, so still need to record our data
                 self.view_dynamo.increment_view_count(self.id, user_id, view_count, viewed_at)
@@ -1,3 +1,4 @@
+import collections
 import math
 
 import PIL.Image
@@ -39,42 +40,92 @@ def generate_zoomed_grid(pil_images):
     Zoom in or out and crop each image as needed so that it fills its cell perfectly.
     """
     assert len(pil_images) in (4, 9, 16), f'Unexpected number of inputs: `{len(pil_images)}`'
+    cell_dimensions = get_cell_dimensions(len(pil_images))
+    return composite_grid([zoom_to_fill(image, cell_dimensions) for image in pil_images])
 
-    output_width, output_height = 3840, 2160
-    stride = int(math.sqrt(len(pil_images)))
-    cell_width, cell_height = output_width // stride, output_height // stride
 
-    # collect and resize (zoom in or out as needed so each image fills its cell)
-    images = []
-    for image in pil_images:
-        image_width, image_height = image.size
-
-        # comparing aspect ratios without rounding errors
-        if image_width * cell_height > image_height * cell_width:
-            # image is wider than cell
-            new_image_width = image_height * cell_width / cell_height
-            margin = (image_width - new_image_width) / 2
-            box = (margin, 0, image_width - margin, image_height)
-        elif image_width * cell_height < image_height * cell_width:
-            # image is taller than cell
-            new_image_height = image_width * cell_height / cell_width
-            margin = (image_height - new_image_height) / 2
-            box = (0, margin, image_width, image_height - margin)
-        else:
-            # aspect ratios equal
-            box = None
-
-        if image_width != cell_width or image_height != cell_height:
-            image = image.resize((cell_width, cell_height), box=box, resample=PIL.Image.LANCZOS)
-
-        images.append(image)
+def get_cell_dimensions(image_cnt, output_dimensions=(3840, 2160)):
+    "The dimensions of each cell of a zoomed grid of `image_cnt` images"
+    stride = int(math.sqrt(image_cnt))
+    return output_dimensions[0] // stride, output_dimensions[1] // stride
 
-    # paste those thumbs together as a grid
-    # Min size will be 4k since max_width and max_height come from 1080p thumbs
-    target_image = PIL.Image.new('RGB', (output_width, output_height))
+
+def cover_dimensions(dimensions, cell_dimensions):
+    """
+    The smallest dimensions an image of `dimensions` can be scaled to while still covering a cell
+    of `cell_dimensions`. Decoding an image at anything larger is wasted work.
+    """
+    width, height = dimensions
+    scale = max(cell_dimensions[0] / width, cell_dimensions[1] / height)
+    return math.ceil(width * scale), math.ceil(height * scale)
+
+
+def zoom_to_fill(image, cell_dimensions):
+    "Zoom in or out and crop the image as needed so that it fills a cell of `cell_dimensions` perfectly"
+    cell_width, cell_height = cell_dimensions
+    image_width, image_height = image.size
+
+    # comparing aspect ratios without rounding errors
+    if image_width * cell_height > image_height * cell_width:
+        # image is wider than cell
+        new_image_width = image_height * cell_width / cell_height
+        margin = (image_width - new_image_width) / 2
+        box = (margin, 0, image_width - margin, image_height)
+    elif image_width * cell_height < image_height * cell_width:
+        # image is taller than cell
+        new_image_height = image_width * cell_height / cell_width
+        margin = (image_height - new_image_height) / 2
+        box = (0, margin, image_width, image_height - margin)
+    else:
+        # aspect ratios equal
+        box = None
+
+    if image_width != cell_width or image_height != cell_height:
+        image = image.resize((cell_width, cell_height), box=box, resample=PIL.Image.LANCZOS)
+    return image
+
+
+def composite_grid(tiles):
+    "Paste a square number of equally-sized tiles together as a grid"
+    stride = int(math.sqrt(len(tiles)))
+    cell_width, cell_height = tiles[0].size
+    target_image = PIL.Image.new('RGB', (cell_width * stride, cell_height * stride))
     for row in range(0, stride):
         for column in range(0, stride):
-            image = images[row * stride + column]
             loc = (column * cell_width, row * cell_height)
-            target_image.paste(image, loc)
+            target_image.paste(tiles[row * stride + column], loc)
     return target_image
+
+
+class TileCache:
+    """
+    The most recently used grid tiles, bounded by the memory they hold. Tiles only depend on the post and the
+    size of the cell, so when an album is re-ordered or has a post added, only the changed cells need decoding.
+    """
+
+    def __init__(self, max_mb=64):
+        self.max_mb = max_mb
+        self.tiles = collections.OrderedDict()
+
+    @staticmethod
+    def tile_mb(tile):
+        return tile.width * tile.height * len(tile.getbands()) / 2 ** 20
+
+    def get(self, key):
+        if key not in self.tiles:
+            return None
+        self.tiles.move_to_end(key)
+        return self.tiles[key]
+
+    def put(self, key, tile):
+        self.tiles[key] = tile
+        self.tiles.move_to_end(key)
+        while sum(self.tile_mb(t) for t in self.tiles.values()) > self.max_mb and len(self.tiles) > 1:
+            self.tiles.popitem(last=False)
+
+    def clear(self):
+        self.tiles.clear()
+
+
+# kept for the lifetime of the process, so shared between invocations of a warm lambda
+tile_cache = TileCache()
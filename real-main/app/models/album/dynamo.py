@@ -75,7 +75,8 @@ class AlbumDynamo:
             update_query_kwargs['ExpressionAttributeValues'] = exp_values
         return self.client.update_item(update_query_kwargs)
 
-    def set_album_art_hash(self, album_id, art_hash):
+    def set_album_art_hash(self, album_id, art_hash, variant_formats=None):
+        "`variant_formats` are the formats, other than jpeg, in which the art thumbnails are available"
         update_query_kwargs = {
             'Key': self.pk(album_id),
         }
@@ -83,8 +84,13 @@ class AlbumDynamo:
         if art_hash:
             update_query_kwargs['UpdateExpression'] = 'SET artHash = :ah'
             update_query_kwargs['ExpressionAttributeValues'] = {':ah': art_hash}
+            if variant_formats:
+                update_query_kwargs['UpdateExpression'] += ', artVariantFormats = :avf'
+                update_query_kwargs['ExpressionAttributeValues'][':avf'] = variant_formats
+            else:
+                update_query_kwargs['UpdateExpression'] += ' REMOVE artVariantFormats'
         else:
-            update_query_kwargs['UpdateExpression'] = 'REMOVE artHash'
+            update_query_kwargs['UpdateExpression'] = 'REMOVE artHash, artVariantFormats'
 
         return self.client.update_item(update_query_kwargs)
 
@@ -151,9 +157,6 @@ class AlbumDynamo:
             query_kwargs, failure_warning=f'Failed to update postsLastUpdatedAt for album `{album_id}`'
         )
 
-    def increment_rank_count(self, album_id):
-        return self.client.increment_count(self.pk(album_id), 'rankCount')
-
     def generate_by_user(self, user_id):
         query_kwargs = {
             'KeyConditionExpression': Key('gsiA1PartitionKey').eq(f'album/{user_id}'),
@@ -1,12 +1,22 @@
 #!/usr/bin/env python
 
 import argparse
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import PIL.Image
 
 # relative imports don't work from scripts, so depending on 'art' to be globally unique
 # https://stackoverflow.com/a/16985066
-from art import generate_basic_grid, generate_zoomed_grid
+from art import (
+    composite_grid,
+    cover_dimensions,
+    generate_basic_grid,
+    generate_zoomed_grid,
+    get_cell_dimensions,
+    zoom_to_fill,
+)
 
 algorithims = {
     'basic': generate_basic_grid,
@@ -24,9 +34,16 @@ def parse_args():
         dest='output_file',
         metavar='outputfile',
         type=argparse.FileType('wb'),
-        required=True,
         help='file to write output image to',
     )
+    parser.add_argument(
+        '-b',
+        dest='benchmark',
+        type=int,
+        metavar='runs',
+        help='instead of writing output, time the zoomed grid built from fully-decoded images, from '
+        'drafted tiles decoded concurrently, and from cached tiles in reversed order, best of `runs`',
+    )
     parser.add_argument(
         'input_files',
         metavar='inputfile',
@@ -35,11 +52,52 @@ def parse_args():
         help='file to read input image from',
     )
     args = parser.parse_args()
-    return args.output_file, args.input_files, args.algorithim
+    if not args.output_file and not args.benchmark:
+        parser.error('one of -o or -b is required')
+    return args.output_file, args.input_files, args.algorithim, args.benchmark
+
+
+def full_decode_grid(input_datas):
+    images = [PIL.Image.open(io.BytesIO(data)) for data in input_datas]
+    return generate_zoomed_grid(images), None
+
+
+def get_tile(data, cell_dimensions):
+    image = PIL.Image.open(io.BytesIO(data))
+    image.draft('RGB', cover_dimensions(image.size, cell_dimensions))
+    return zoom_to_fill(image, cell_dimensions)
+
+
+def drafted_tiles_grid(input_datas):
+    cell_dimensions = get_cell_dimensions(len(input_datas))
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        tiles = list(executor.map(lambda data: get_tile(data, cell_dimensions), input_datas))
+    return composite_grid(tiles), tiles
+
+
+def benchmark(input_datas, runs):
+    def best_of(func, *args):
+        seconds = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            result = func(*args)
+            seconds.append(time.perf_counter() - start)
+        return result, min(seconds)
+
+    (_, tiles), tiles_seconds = best_of(drafted_tiles_grid, input_datas)
+    _, full_seconds = best_of(full_decode_grid, input_datas)
+    _, cached_seconds = best_of(composite_grid, tiles[::-1])
+    print(f'{"full decode":<16}{full_seconds:>9.3f}s')
+    print(f'{"drafted tiles":<16}{tiles_seconds:>9.3f}s{full_seconds / tiles_seconds:>8.1f}x')
+    print(f'{"cached tiles":<16}{cached_seconds:>9.3f}s{full_seconds / cached_seconds:>8.1f}x')
 
 
 def main():
-    output_file, input_files, algorithim_id = parse_args()
+    output_file, input_files, algorithim_id, benchmark_runs = parse_args()
+    if benchmark_runs:
+        assert algorithim_id == 'zoomed', 'Only the zoomed algorithim can be benchmarked'
+        benchmark([fh.read() for fh in input_files], benchmark_runs)
+        return
     algo = algorithims[algorithim_id]
     output_image = algo([PIL.Image.open(fh) for fh in input_files])
     output_image.save(output_file, format='JPEG', quality=100)
@@ -45,8 +45,7 @@ class AlbumManager:
         return self.init_album(album_item)
 
     def delete_all_by_user(self, user_id):
-        for album_item in self.dynamo.generate_by_user(user_id):
-            self.init_album(album_item).delete()
+        return self.dynamo.client.batch_delete_items(self.dynamo.generate_by_user(user_id))
 
     def garbage_collect(self, now=None):
         now = now or pendulum.now('utc')
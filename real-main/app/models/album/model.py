@@ -1,12 +1,12 @@
 import hashlib
-import io
 import itertools
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-import PIL.Image
-
+from app.models.post.enums import PostType
 from app.utils import image_size
+from app.utils.image import derive_image_set, with_variants
 
 from . import art
 from .exceptions import AlbumException
@@ -19,6 +19,7 @@ CLOUDFRONT_FRONTEND_RESOURCES_DOMAIN = os.environ.get('CLOUDFRONT_FRONTEND_RESOU
 class Album:
 
     jpeg_content_type = 'image/jpeg'
+    art_tile_max_workers = 4
 
     def __init__(
         self,
@@ -63,20 +64,6 @@ class Album:
         self.dynamo.delete_album(self.id)
         return self
 
-    def get_first_rank(self):
-        "Return the rank to be used for a post to appear as first in the album"
-        if self.item is None or self.item.get('rankCount', 0) == 0:
-            return None
-        rank_spaces = self.item['rankCount'] + 1
-        return 2 / rank_spaces - 1
-
-    def get_last_rank(self):
-        "Return the rank to be used for a post to appear as last in the album"
-        if self.item is None or self.item.get('rankCount', 0) == 0:
-            return None
-        rank_spaces = self.item['rankCount'] + 1
-        return 1 - 2 / rank_spaces
-
     def get_art_image_url(self, size):
         art_image_path = self.get_art_image_path(size)
         if art_image_path:
@@ -104,11 +91,6 @@ class Album:
             post_ids = post_ids[:1]
         return post_ids
 
-    def increment_rank_count(self):
-        "Upon failure, log a WARNING and return None"
-        self.item = self.dynamo.increment_rank_count(self.id)
-        return self if self.item else None
-
     def update_art_if_needed(self):
         post_ids = self.get_post_ids_for_art()
         if post_ids:
@@ -120,47 +102,70 @@ class Album:
         if new_art_hash == old_art_hash:
             return self  # no changes
 
-        posts = [self.post_manager.get_post(post_id) for post_id in post_ids]
+        posts = self.post_manager.get_posts(post_ids)
         if len(posts) == 0:
             new_native_image = None
         elif len(posts) == 1:
             new_native_image = posts[0].k4_jpeg_cache.readonly_image
         else:
-            images = [post.p1080_jpeg_cache.readonly_image for post in posts]
-            new_native_image = art.generate_zoomed_grid(images)
+            new_native_image = self.generate_art_grid(posts)
 
         if new_native_image:
-            # convert to jpeg
-            buf_out = io.BytesIO()
-            new_native_image.save(buf_out, format='JPEG', quality=100)
-            buf_out.seek(0)
-            self.save_art_images(new_art_hash, buf_out)
+            variant_formats = self.save_art_images(new_art_hash, new_native_image)
+        else:
+            variant_formats = None
 
-        self.item = self.dynamo.set_album_art_hash(self.id, new_art_hash)
+        self.item = self.dynamo.set_album_art_hash(self.id, new_art_hash, variant_formats=variant_formats)
 
         if old_art_hash:
             self.delete_art_images(old_art_hash)
 
         return self
 
+    def generate_art_grid(self, posts):
+        "Composite a zoomed grid of the posts' images, re-using cached tiles and decoding the rest concurrently"
+        cell_dimensions = art.get_cell_dimensions(len(posts))
+        keys = {post.id: self.get_art_tile_key(post, cell_dimensions) for post in posts}
+        tiles = {post.id: art.tile_cache.get(keys[post.id]) for post in posts}
+        missing_posts = [post for post in posts if tiles[post.id] is None]
+        if missing_posts:
+            with ThreadPoolExecutor(max_workers=self.art_tile_max_workers) as executor:
+                new_tiles = executor.map(lambda post: self.get_art_tile(post, cell_dimensions), missing_posts)
+                for post, tile in zip(missing_posts, new_tiles):
+                    art.tile_cache.put(keys[post.id], tile)
+                    tiles[post.id] = tile
+        return art.composite_grid([tiles[post.id] for post in posts])
+
+    def get_art_tile_key(self, post, cell_dimensions):
+        # the text of text-only posts can be edited, which changes their image
+        text = post.item.get('text') if post.type == PostType.TEXT_ONLY else None
+        return (post.id, text, cell_dimensions)
+
+    def get_art_tile(self, post, cell_dimensions):
+        """
+        The post's image zoomed and cropped to fill a grid cell. The 1080p thumbnail is the smallest that
+        covers any grid cell of 4k art, and it's decoded at the smallest scale that still covers the cell.
+        """
+        cache = post.p1080_jpeg_cache
+        image = cache.get_thumbnail_source(art.cover_dimensions(cache.size, cell_dimensions))
+        cache.release()
+        return art.zoom_to_fill(image, cell_dimensions)
+
     def delete_art_images(self, art_hash):
         # remove the images from s3
-        for size in image_size.JPEGS:
+        for size in itertools.chain(image_size.JPEGS, *image_size.VARIANT_FORMATS.values()):
             path = self.get_art_image_path(size, art_hash=art_hash)
             self.s3_uploads_client.delete_object(path)
 
-    def save_art_images(self, art_hash, native_image_buf):
-        # save the native size to S3
-        path = self.get_art_image_path(image_size.NATIVE, art_hash=art_hash)
-        self.s3_uploads_client.put_object(path, native_image_buf.read(), self.jpeg_content_type)
-
-        # generate and save thumbnails
-        native_image_buf.seek(0)
-        image = PIL.Image.open(native_image_buf)
-        for size in image_size.THUMBNAILS:  # ordered by decreasing size
-            image.thumbnail(size.max_dimensions, resample=PIL.Image.LANCZOS)
-            in_mem_file = io.BytesIO()
-            image.save(in_mem_file, format='JPEG', quality=100, icc_profile=image.info.get('icc_profile'))
-            in_mem_file.seek(0)
-            path = self.get_art_image_path(size, art_hash=art_hash)
-            self.s3_uploads_client.put_object(path, in_mem_file.read(), self.jpeg_content_type)
+    def save_art_images(self, art_hash, native_image):
+        "Returns a list of the formats, other than jpeg, that the art thumbnails were also saved in"
+        sizes = (image_size.NATIVE, *with_variants(image_size.THUMBNAILS))
+        variant_formats = set()
+        with self.s3_uploads_client.uploader() as uploader:
+            # each size is uploaded while the smaller ones are still being thumbnailed and encoded
+            for size, fh in derive_image_set(native_image, sizes):
+                path = self.get_art_image_path(size, art_hash=art_hash)
+                uploader.put_object(path, fh, size.content_type)
+                if size.image_format != 'JPEG':
+                    variant_formats.add(size.image_format)
+        return sorted(variant_formats)
@@ -111,7 +111,7 @@ class CardDynamo:
         }
         return self.client.generate_all_query(query_kwargs)
 
-    def generate_card_ids_by_notify_user_at(self, cutoff_at, only_user_ids=None):
+    def generate_card_keys_by_notify_user_at(self, cutoff_at, only_user_ids=None):
         query_kwargs = {
             'KeyConditionExpression': 'gsiK1PartitionKey = :c AND gsiK1SortKey < :at_trailing',
             'ExpressionAttributeValues': {':c': 'card', ':at_trailing': cutoff_at.to_iso8601_string() + '/~'},
@@ -122,5 +122,25 @@ class CardDynamo:
         # 'Filter Expression can only contain non-primary key attributes'
         if only_user_ids:
             gen = (item for item in gen if item['gsiK1SortKey'].split('/')[-1] in only_user_ids)
-        gen = (item['partitionKey'].split('/')[1] for item in gen)
+        gen = ({'partitionKey': item['partitionKey'], 'sortKey': item['sortKey']} for item in gen)
         return gen
+
+    def generate_card_ids_by_notify_user_at(self, cutoff_at, only_user_ids=None):
+        gen = self.generate_card_keys_by_notify_user_at(cutoff_at, only_user_ids=only_user_ids)
+        gen = (key['partitionKey'].split('/')[1] for key in gen)
+        return gen
+
+    def generate_cards_by_notify_user_at(self, cutoff_at, only_user_ids=None, page_size=100):
+        """
+        Generate pages (lists) of full card items, rather than just their ids.
+        Each page is fetched with one batch get. Order *not* maintained within a page.
+        """
+        gen = self.generate_card_keys_by_notify_user_at(cutoff_at, only_user_ids=only_user_ids)
+        keys = []
+        for key in gen:
+            keys.append(key)
+            if len(keys) == page_size:
+                yield list(self.client.generate_all_batch_get(keys))
+                keys = []
+        if keys:
+            yield list(self.client.generate_all_batch_get(keys))
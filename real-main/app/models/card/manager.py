@@ -1,4 +1,6 @@
+import collections
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from functools import partialmethod
 
 import pendulum
@@ -16,6 +18,10 @@ logger = logging.getLogger()
 
 
 class CardManager:
+
+    notify_users_batch_size = 100  # max number of users pinpoint accepts in one request
+    notify_users_max_workers = 10
+
     def __init__(self, clients, managers=None):
         managers = managers or {}
         managers['card'] = self
@@ -79,10 +85,11 @@ class CardManager:
         key_generator = self.dynamo.generate_card_keys_by_comment(comment_id)
         self.dynamo.client.batch_delete_items(key_generator)
 
-    def notify_users(self, now=None, only_usernames=None):
+    def notify_users(self, now=None, only_usernames=None, deadline=None):
         """
         Send out push notifications to all users for cards as needed.
         Use `only_usernames` if you don't want to send notifcations to all users.
+        Use `deadline` to stop sending before a time limit, remaining cards will be picked up by the next run.
         """
         # determine which users we should be sending notifcations to, if we're only doing some
         if only_usernames is None:
@@ -93,16 +100,68 @@ class CardManager:
             only_users = [self.user_manager.get_user_by_username(username) for username in only_usernames]
             only_user_ids = [user.id for user in only_users if user]
 
-        # send on notifcations for cards for those users
-        now = pendulum.now('utc')
+        # send on notifcations for cards for those users, a page of cards at a time
+        now = now or pendulum.now('utc')
         total_count, success_count = 0, 0
-        for card_id in self.dynamo.generate_card_ids_by_notify_user_at(now, only_user_ids=only_user_ids):
-            card = self.get_card(card_id)
-            success_count += card.notify_user()
-            total_count += 1
-            card.clear_notify_user_at()
+        gen = self.dynamo.generate_cards_by_notify_user_at(
+            now, only_user_ids=only_user_ids, page_size=self.notify_users_batch_size
+        )
+        with ThreadPoolExecutor(max_workers=self.notify_users_max_workers) as executor:
+            for card_items in gen:
+                if deadline and pendulum.now('utc') > deadline:
+                    logger.warning('Deadline reached, leaving remaining card notifications for next run')
+                    break
+                cards = [self.init_card(item) for item in card_items]
+                batches = self.group_cards_for_notification(cards)
+                sent_card_ids = []
+                for batch, results in zip(batches, executor.map(self.send_notification_batch, batches)):
+                    if results is None:
+                        continue
+                    for card in batch:
+                        sent_card_ids.append(card.id)
+                        total_count += 1
+                        success_count += results[card.user_id]
+                list(executor.map(self.dynamo.clear_notify_user_at, sent_card_ids))
         return total_count, success_count
 
+    def group_cards_for_notification(self, cards):
+        """
+        Group cards into batches that can each be sent out in one request to pinpoint.
+        All cards in a batch share the same action, and no user appears twice in a batch.
+        """
+        batches_by_action = collections.defaultdict(list)
+        for card in cards:
+            batches = batches_by_action[card.action]
+            batch = next(
+                (
+                    b
+                    for b in batches
+                    if len(b) < self.notify_users_batch_size and all(c.user_id != card.user_id for c in b)
+                ),
+                None,
+            )
+            if batch is None:
+                batch = []
+                batches.append(batch)
+            batch.append(card)
+        return [batch for batches in batches_by_action.values() for batch in batches]
+
+    def send_notification_batch(self, cards):
+        """
+        Send out push notifications for a batch of cards as grouped by `group_cards_for_notification`.
+        Returns a dict of {user_id: bool} indicating successful delivery, or None if the batch failed to send.
+        """
+        user_messages = {card.user_id: {'title': card.title, 'body': card.sub_title} for card in cards}
+        try:
+            results = self.pinpoint_client.send_users_apns(cards[0].action, user_messages)
+        except Exception as err:
+            logger.warning(f'Failed to send batch of `{len(cards)}` card notifications: {err}')
+            return None
+        for card in cards:
+            if not results[card.user_id]:
+                logger.info(f'Failed to deliver notification for card `{card.id}` to user `{card.user_id}`')
+        return results
+
     def on_card_add(self, card_id, new_item):
         self.init_card(new_item).trigger_notification(CardNotificationType.ADDED)
 
@@ -116,7 +175,9 @@ class CardManager:
         self.delete_by_post(post_id)
 
     def on_comment_delete_delete_cards(self, comment_id, old_item):
-        self.delete_by_comment(comment_id)
+        # the only cards of a comment are for the users it mentions
+        if old_item.get('textTags'):
+            self.delete_by_comment(comment_id)
 
     def on_user_delete_delete_cards(self, user_id, old_item):
         generator = self.dynamo.generate_cards_by_user(user_id, pks_only=True)
@@ -1,4 +1,5 @@
-__all__ = ['ChatDynamo', 'ChatMemberDynamo']
+__all__ = ['ChatDynamo', 'ChatInboxDynamo', 'ChatMemberDynamo']
 
 from .base import ChatDynamo
+from .inbox import ChatInboxDynamo
 from .member import ChatMemberDynamo
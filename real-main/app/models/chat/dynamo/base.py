@@ -27,6 +27,10 @@ class ChatDynamo:
     def get(self, chat_id, strongly_consistent=False):
         return self.client.get_item(self.pk(chat_id), ConsistentRead=strongly_consistent)
 
+    def generate_chats(self, chat_ids):
+        "Generate the chats that exist of `chat_ids`. Order not maintained."
+        return self.client.generate_all_batch_get(self.pk(chat_id) for chat_id in chat_ids)
+
     def get_direct_chat(self, user_id_1, user_id_2):
         user_ids = sorted([user_id_1, user_id_2])
         query_kwargs = {
@@ -0,0 +1,264 @@
+import logging
+import zlib
+
+from boto3.dynamodb.conditions import Key
+
+logger = logging.getLogger()
+
+
+class ChatInboxDynamo:
+    """
+    A compact, per-user index of chat memberships: the last message activity of each of the user's chats
+    along with the count of unviewed messages in each.
+
+    Chats are spread over a fixed number of shard items by a hash of their chatId, so no one item grows
+    without bound. Within a shard, chats are held in a map keyed by chatId, so a change to a chat is one
+    update with no read beforehand. A summary item holds the count of chats with unviewed messages, which
+    is adjusted only as a chat's count of unviewed messages moves to or from zero.
+    """
+
+    shard_count = 8
+
+    def __init__(self, dynamo_client):
+        self.client = dynamo_client
+
+    def pk(self, user_id):
+        return {
+            'partitionKey': f'user/{user_id}',
+            'sortKey': 'chatInbox',
+        }
+
+    def shard_pk(self, user_id, chat_id):
+        shard = zlib.crc32(chat_id.encode()) % self.shard_count
+        return {
+            'partitionKey': f'user/{user_id}',
+            'sortKey': f'chatInbox/{shard}',
+        }
+
+    def get(self, user_id, strongly_consistent=False):
+        "Get the summary item of the user's inbox"
+        return self.client.get_item(self.pk(user_id), ConsistentRead=strongly_consistent)
+
+    def get_chat(self, user_id, chat_id, strongly_consistent=False):
+        "Get a chat in the user's inbox, or None if the chat is not present"
+        kwargs = {
+            'ConsistentRead': strongly_consistent,
+            'ProjectionExpression': 'chats.#chatId',
+            'ExpressionAttributeNames': {'#chatId': chat_id},
+        }
+        item = self.client.get_item(self.shard_pk(user_id, chat_id), **kwargs)
+        chat = (item or {}).get('chats', {}).get(chat_id)
+        return {'chatId': chat_id, **chat} if chat else None
+
+    def generate_chats(self, user_id):
+        "Generate all the chats in the user's inbox, in no particular order"
+        query_kwargs = {
+            'KeyConditionExpression': (
+                Key('partitionKey').eq(f'user/{user_id}') & Key('sortKey').begins_with('chatInbox/')
+            ),
+        }
+        for item in self.client.generate_all_query(query_kwargs):
+            for chat_id, chat in item['chats'].items():
+                yield {'chatId': chat_id, **chat}
+
+    def delete(self, user_id):
+        "Delete the user's inbox, both summary and shards. Returns count of how many deletes requested."
+        query_kwargs = {
+            'KeyConditionExpression': (
+                Key('partitionKey').eq(f'user/{user_id}') & Key('sortKey').begins_with('chatInbox')
+            ),
+            'ProjectionExpression': 'partitionKey, sortKey',
+        }
+        return self.client.batch_delete_items(self.client.generate_all_query(query_kwargs))
+
+    def add_chat(self, user_id, chat_id, last_message_activity_at, messages_unviewed_count=0):
+        "Add a chat to the user's inbox. If the chat is already present, a no-op."
+        self.insert_chat(user_id, chat_id, last_message_activity_at, messages_unviewed_count)
+
+    def update_chat(self, user_id, chat_id, last_message_activity_at, increment_messages_unviewed_count=False):
+        """
+        Record message activity in a chat in the user's inbox, optionally also incrementing the chat's count
+        of unviewed messages. Last message activity is only ever moved forward in time.
+        Returns False, having written nothing, if the chat is not present in the inbox. Chats are only added
+        from the membership, so a late write for a member that has since left can't bring the chat back.
+        """
+        update_exps = ['chats.#chatId.lastMessageActivityAt = :at']
+        values = {':at': last_message_activity_at.to_iso8601_string()}
+        if increment_messages_unviewed_count:
+            update_exps.append('chats.#chatId.messagesUnviewedCount = chats.#chatId.messagesUnviewedCount + :one')
+            values[':one'] = 1
+        query_kwargs = self.chat_query_kwargs(
+            user_id,
+            chat_id,
+            'SET ' + ', '.join(update_exps),
+            'attribute_exists(chats.#chatId) AND NOT :at < chats.#chatId.lastMessageActivityAt',
+            values,
+        )
+        try:
+            chat = self.update_chat_item(chat_id, query_kwargs)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            pass
+        else:
+            if increment_messages_unviewed_count and chat.get('messagesUnviewedCount') == 1:
+                self.increment_chats_with_unviewed_messages_count(user_id)
+            return True
+
+        # either the chat isn't in the inbox, or this message activity has arrived out of order
+        if not increment_messages_unviewed_count:
+            return self.get_chat(user_id, chat_id, strongly_consistent=True) is not None
+        query_kwargs = self.chat_query_kwargs(
+            user_id,
+            chat_id,
+            'SET chats.#chatId.messagesUnviewedCount = chats.#chatId.messagesUnviewedCount + :one',
+            'attribute_exists(chats.#chatId)',
+            {':one': 1},
+        )
+        try:
+            chat = self.update_chat_item(chat_id, query_kwargs)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return False
+        if chat.get('messagesUnviewedCount') == 1:
+            self.increment_chats_with_unviewed_messages_count(user_id)
+        return True
+
+    def insert_chat(self, user_id, chat_id, last_message_activity_at, messages_unviewed_count=0):
+        "Insert a chat into the user's inbox. Returns True if inserted, False if the chat was already present."
+        chat = {
+            'lastMessageActivityAt': last_message_activity_at.to_iso8601_string(),
+            'messagesUnviewedCount': messages_unviewed_count,
+        }
+        query_kwargs = self.chat_query_kwargs(
+            user_id,
+            chat_id,
+            'SET chats.#chatId = :chat',
+            'attribute_not_exists(chats.#chatId)',
+            {':chat': chat},
+            return_values='NONE',
+        )
+        try:
+            self.update_chat_item(chat_id, query_kwargs)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            try:
+                self.add_shard(user_id, chat_id, chat)
+            except self.client.exceptions.ConditionalCheckFailedException:
+                # the shard exists, so either the chat is already present or the shard
+                # was created by a concurrent write since our first attempt
+                try:
+                    self.update_chat_item(chat_id, query_kwargs)
+                except self.client.exceptions.ConditionalCheckFailedException:
+                    return False
+        if messages_unviewed_count:
+            self.increment_chats_with_unviewed_messages_count(user_id)
+        return True
+
+    def add_shard(self, user_id, chat_id, chat):
+        query_kwargs = {
+            'Item': {
+                **self.shard_pk(user_id, chat_id),
+                'schemaVersion': 0,
+                'userId': user_id,
+                'chats': {chat_id: chat},
+            },
+        }
+        return self.client.add_item(query_kwargs)
+
+    def remove_chat(self, user_id, chat_id):
+        "Remove a chat from the user's inbox. If the chat is not present, a no-op."
+        query_kwargs = self.chat_query_kwargs(
+            user_id,
+            chat_id,
+            'REMOVE chats.#chatId',
+            'attribute_exists(chats.#chatId)',
+            return_values='UPDATED_OLD',
+        )
+        try:
+            chat = self.update_chat_item(chat_id, query_kwargs)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return
+        if chat.get('messagesUnviewedCount', 0) > 0:
+            self.decrement_chats_with_unviewed_messages_count(user_id)
+
+    def increment_messages_unviewed_count(self, user_id, chat_id):
+        "Best-effort attempt to increment the count of unviewed messages in a chat. Logs a WARNING upon failure."
+        query_kwargs = self.chat_query_kwargs(
+            user_id,
+            chat_id,
+            'SET chats.#chatId.messagesUnviewedCount = chats.#chatId.messagesUnviewedCount + :one',
+            'attribute_exists(chats.#chatId)',
+            {':one': 1},
+        )
+        failure_warning = f'Failed to increment messagesUnviewedCount of chat `{chat_id}` for user `{user_id}`'
+        chat = self.update_chat_item(chat_id, query_kwargs, failure_warning=failure_warning)
+        if chat and chat.get('messagesUnviewedCount') == 1:
+            self.increment_chats_with_unviewed_messages_count(user_id)
+
+    def decrement_messages_unviewed_count(self, user_id, chat_id):
+        "Best-effort attempt to decrement the count of unviewed messages in a chat. Logs a WARNING upon failure."
+        query_kwargs = self.chat_query_kwargs(
+            user_id,
+            chat_id,
+            'SET chats.#chatId.messagesUnviewedCount = chats.#chatId.messagesUnviewedCount - :one',
+            'chats.#chatId.messagesUnviewedCount > :zero',
+            {':one': 1, ':zero': 0},
+        )
+        failure_warning = f'Failed to decrement messagesUnviewedCount of chat `{chat_id}` for user `{user_id}`'
+        chat = self.update_chat_item(chat_id, query_kwargs, failure_warning=failure_warning)
+        if chat and chat.get('messagesUnviewedCount') == 0:
+            self.decrement_chats_with_unviewed_messages_count(user_id)
+
+    def clear_messages_unviewed_count(self, user_id, chat_id):
+        "Reset the count of unviewed messages in a chat to zero. If the chat has none or is not present, a no-op."
+        query_kwargs = self.chat_query_kwargs(
+            user_id,
+            chat_id,
+            'SET chats.#chatId.messagesUnviewedCount = :zero',
+            'chats.#chatId.messagesUnviewedCount > :zero',
+            {':zero': 0},
+        )
+        try:
+            self.update_chat_item(chat_id, query_kwargs)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            return
+        self.decrement_chats_with_unviewed_messages_count(user_id)
+
+    def chat_query_kwargs(
+        self, user_id, chat_id, update_exp, condition_exp, values=None, return_values='UPDATED_NEW'
+    ):
+        query_kwargs = {
+            'Key': self.shard_pk(user_id, chat_id),
+            'UpdateExpression': update_exp,
+            'ConditionExpression': condition_exp,
+            'ExpressionAttributeNames': {'#chatId': chat_id},
+            'ReturnValues': return_values,
+        }
+        if values:
+            query_kwargs['ExpressionAttributeValues'] = values
+        return query_kwargs
+
+    def update_chat_item(self, chat_id, query_kwargs, failure_warning=None):
+        "Apply an update to a chat in the inbox, return the attributes of the chat named by `ReturnValues`"
+        attributes = self.client.update_item(query_kwargs, failure_warning=failure_warning)
+        if attributes is None:
+            return None
+        return attributes.get('chats', {}).get(chat_id, {})
+
+    def increment_chats_with_unviewed_messages_count(self, user_id):
+        "Increment the count of chats with unviewed messages, adding the summary item if it does not exist"
+        query_kwargs = {
+            'Key': self.pk(user_id),
+            'UpdateExpression': 'ADD chatsWithUnviewedMessagesCount :one',
+            'ExpressionAttributeValues': {':one': 1},
+        }
+        try:
+            return self.client.update_item(query_kwargs)
+        except self.client.exceptions.ConditionalCheckFailedException:
+            pass
+        item = {**self.pk(user_id), 'schemaVersion': 0, 'userId': user_id, 'chatsWithUnviewedMessagesCount': 1}
+        try:
+            return self.client.add_item({'Item': item})
+        except self.client.exceptions.ConditionalCheckFailedException:
+            # the summary item was added by a concurrent write since our first attempt
+            return self.client.update_item(query_kwargs)
+
+    def decrement_chats_with_unviewed_messages_count(self, user_id):
+        return self.client.decrement_count(self.pk(user_id), 'chatsWithUnviewedMessagesCount')
@@ -25,6 +25,12 @@ class ChatMemberDynamo:
     def get(self, chat_id, user_id, strongly_consistent=False):
         return self.client.get_item(self.pk(chat_id, user_id), ConsistentRead=strongly_consistent)
 
+    def generate_member_chat_ids(self, chat_ids, user_id):
+        "Of the chats `chat_ids`, generate the ids of those the user is a member of. Order not maintained."
+        keys = (self.pk(chat_id, user_id) for chat_id in chat_ids)
+        for item in self.client.generate_all_batch_get(keys, projection_expression='partitionKey'):
+            yield item['partitionKey'].split('/')[1]
+
     def transact_add(self, chat_id, user_id, now=None):
         now = now or pendulum.now('utc')
         joined_at_str = now.to_iso8601_string()
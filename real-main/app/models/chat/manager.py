@@ -1,4 +1,5 @@
 import collections
+import heapq
 import logging
 
 import pendulum
@@ -8,7 +9,7 @@ from app.mixins.base import ManagerBase
 from app.mixins.flag.manager import FlagManagerMixin
 from app.mixins.view.manager import ViewManagerMixin
 
-from .dynamo import ChatDynamo, ChatMemberDynamo
+from .dynamo import ChatDynamo, ChatInboxDynamo, ChatMemberDynamo
 from .enums import ChatType
 from .exceptions import ChatException
 from .model import Chat
@@ -33,6 +34,7 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
         self.clients = clients
         if 'dynamo' in clients:
             self.dynamo = ChatDynamo(clients['dynamo'])
+            self.inbox_dynamo = ChatInboxDynamo(clients['dynamo'])
             self.member_dynamo = ChatMemberDynamo(clients['dynamo'])
 
     def get_model(self, item_id, strongly_consistent=False):
@@ -124,14 +126,53 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
                 chat.leave(user)
 
     def record_views(self, chat_ids, user_id, viewed_at=None):
-        for chat_id, view_count in dict(collections.Counter(chat_ids)).items():
-            chat = self.get_chat(chat_id)
-            if not chat:
+        grouped_chat_ids = dict(collections.Counter(chat_ids))
+        if not grouped_chat_ids:
+            return
+
+        chat_ids = {item['chatId'] for item in self.dynamo.generate_chats(grouped_chat_ids)}
+        member_chat_ids = set(self.member_dynamo.generate_member_chat_ids(chat_ids, user_id))
+        view_counts = {}
+        for chat_id, view_count in grouped_chat_ids.items():
+            if chat_id not in chat_ids:
                 logger.warning(f'Cannot record view(s) by user `{user_id}` on DNE chat `{chat_id}`')
-            elif not chat.is_member(user_id):
+            elif chat_id not in member_chat_ids:
                 logger.warning(f'Cannot record view(s) by non-member user `{user_id}` on chat `{chat_id}`')
             else:
-                chat.record_view_count(user_id, view_count, viewed_at=viewed_at)
+                view_counts[chat_id] = view_count
+        self.record_view_counts(view_counts, user_id, viewed_at=viewed_at)
+
+    def get_inbox_page(self, user_id, limit=20, next_token=None):
+        """
+        Get a page of the ids of the user's chats, most recent message activity first.
+        The `nextToken` returned is a cursor of the lastMessageActivityAt and chatId of the last chat
+        in the page, so chats that see message activity between pages don't shift later pages.
+        """
+        chats = self.inbox_dynamo.generate_chats(user_id)
+        cursor = self.parse_inbox_next_token(next_token) if next_token else None
+        if cursor:
+            chats = (chat for chat in chats if (chat['lastMessageActivityAt'], chat['chatId']) < cursor)
+        chats = heapq.nlargest(limit + 1, chats, key=lambda chat: (chat['lastMessageActivityAt'], chat['chatId']))
+        next_token = None
+        if len(chats) > limit:
+            chats = chats[:limit]
+            next_token = f'{chats[-1]["lastMessageActivityAt"]}/{chats[-1]["chatId"]}'
+        return {
+            'items': [chat['chatId'] for chat in chats],
+            'nextToken': next_token,
+        }
+
+    def parse_inbox_next_token(self, next_token):
+        """
+        Parse the cursor out of a nextToken. Returns None if the nextToken isn't a cursor, as with those handed
+        out before cursors were, so that clients holding one start again from the first page.
+        """
+        at_str, _, chat_id = next_token.partition('/')
+        try:
+            pendulum.parse(at_str)
+        except ValueError:
+            return None
+        return (at_str, chat_id) if chat_id else None
 
     def on_chat_message_add(self, message_id, new_item):
         message = self.chat_message_manager.init_chat_message(new_item)
@@ -141,6 +182,8 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
         # for each memeber of the chat
         #   - update the last message activity timestamp (controls chat ordering)
         #   - for everyone except the author, increment their 'messagesUnviewedCount'
+        #   - apply both of the above to their member item, which backs Chat.messagesCount and the
+        #     GSI-K2 listing of their chats, and then to their chat inbox, which backs User.chats
         for user_id in self.member_dynamo.generate_user_ids_by_chat(message.chat_id):
             self.member_dynamo.update_last_message_activity_at(message.chat_id, user_id, message.created_at)
             if user_id != message.user_id:
@@ -149,6 +192,14 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
                 # TODO
                 # we can be in a state where the user manually dismissed a card, and this view does not
                 # change the user's overall count of chats with unread messages, but should still create a card
+            in_inbox = self.inbox_dynamo.update_chat(
+                user_id,
+                message.chat_id,
+                message.created_at,
+                increment_messages_unviewed_count=user_id != message.user_id,
+            )
+            if not in_inbox:
+                self.add_chat_to_inbox_from_member(message.chat_id, user_id)
 
     def on_chat_message_delete(self, message_id, old_item):
         message = self.chat_message_manager.init_chat_message(old_item)
@@ -164,11 +215,37 @@ class ChatManager(FlagManagerMixin, ViewManagerMixin, ManagerBase):
                 if not (chat_last_viewed_at and chat_last_viewed_at > message.created_at):
                     # Note that dynamo has no support for batch updates.
                     self.member_dynamo.decrement_messages_unviewed_count(message.chat_id, user_id)
+                    self.inbox_dynamo.decrement_messages_unviewed_count(user_id, message.chat_id)
 
     def sync_member_messages_unviewed_count(self, chat_id, new_item, old_item=None):
         if new_item.get('viewCount', 0) > (old_item or {}).get('viewCount', 0):
             user_id = new_item['sortKey'].split('/')[1]
             self.member_dynamo.clear_messages_unviewed_count(chat_id, user_id)
+            self.inbox_dynamo.clear_messages_unviewed_count(user_id, chat_id)
+
+    def on_chat_member_add_update_inbox(self, chat_id, new_item):
+        user_id = new_item['sortKey'].split('/')[1]
+        last_message_activity_at = pendulum.parse(new_item['gsiK2SortKey'][len('chat/') :])
+        self.inbox_dynamo.add_chat(user_id, chat_id, last_message_activity_at)
+
+    def add_chat_to_inbox_from_member(self, chat_id, user_id):
+        """
+        The message got here before the membership reached the inbox. The member item has already taken the
+        message, so add the chat from it. If the user is no longer a member, the chat is left out.
+        """
+        member_item = self.member_dynamo.get(chat_id, user_id, strongly_consistent=True)
+        if not member_item:
+            return
+        last_message_activity_at = pendulum.parse(member_item['gsiK2SortKey'][len('chat/') :])
+        messages_unviewed_count = member_item.get('messagesUnviewedCount', 0)
+        self.inbox_dynamo.add_chat(user_id, chat_id, last_message_activity_at, messages_unviewed_count)
+
+    def on_chat_member_delete_update_inbox(self, chat_id, old_item):
+        user_id = old_item['sortKey'].split('/')[1]
+        self.inbox_dynamo.remove_chat(user_id, chat_id)
+
+    def on_user_delete_delete_inbox(self, user_id, old_item):
+        self.inbox_dynamo.delete(user_id)
 
     def on_flag_add(self, chat_id, new_item):
         chat_item = self.dynamo.increment_flag_count(chat_id)
@@ -6,43 +6,45 @@ logger = logging.getLogger()
 
 
 class ChatMessageAppSync:
-    def __init__(self, appsync_client):
-        self.client = appsync_client
 
-    def trigger_notification(self, notification_type, user_id, message):
-        mutation = gql.gql(
-            '''
-            mutation TriggerChatMessageNotification ($input: ChatMessageNotificationInput!) {
-                triggerChatMessageNotification (input: $input) {
-                    userId
-                    type
-                    message {
-                        messageId
-                        chat {
-                            chatId
+    trigger_notification_mutation = gql.gql(
+        '''
+        mutation TriggerChatMessageNotification ($input: ChatMessageNotificationInput!) {
+            triggerChatMessageNotification (input: $input) {
+                userId
+                type
+                message {
+                    messageId
+                    chat {
+                        chatId
+                    }
+                    authorUserId
+                    author {
+                        userId
+                        username
+                        photo {
+                            url64p
                         }
-                        authorUserId
-                        author {
+                    }
+                    text
+                    textTaggedUsers {
+                        tag
+                        user {
                             userId
-                            username
-                            photo {
-                                url64p
-                            }
-                        }
-                        text
-                        textTaggedUsers {
-                            tag
-                            user {
-                                userId
-                            }
                         }
-                        createdAt
-                        lastEditedAt
                     }
+                    createdAt
+                    lastEditedAt
                 }
             }
-        '''
-        )
+        }
+    '''
+    )
+
+    def __init__(self, appsync_client):
+        self.client = appsync_client
+
+    def trigger_notification(self, notification_type, user_id, message):
         input_obj = {
             'userId': user_id,
             'messageId': message.id,
@@ -55,4 +57,4 @@ class ChatMessageAppSync:
             'createdAt': message.item['createdAt'],
             'lastEditedAt': message.item.get('lastEditedAt'),
         }
-        self.client.send(mutation, {'input': input_obj})
+        self.client.send(self.trigger_notification_mutation, {'input': input_obj})
@@ -48,6 +48,10 @@ class CommentDynamo:
     def delete_comment(self, comment_id):
         return self.client.delete_item(self.pk(comment_id))
 
+    def batch_delete_comments(self, comment_items):
+        "Delete the comments `comment_items` (or their keys). Returns count of deletes."
+        return self.client.batch_delete_items(comment_items)
+
     def increment_flag_count(self, comment_id):
         return self.client.increment_count(self.pk(comment_id), 'flagCount')
 
@@ -1,4 +1,6 @@
+import itertools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import pendulum
 
@@ -18,6 +20,8 @@ logger = logging.getLogger()
 class CommentManager(FlagManagerMixin, ManagerBase):
 
     item_type = 'comment'
+    delete_batch_size = 100
+    delete_max_workers = 4
 
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
@@ -79,13 +83,21 @@ class CommentManager(FlagManagerMixin, ManagerBase):
         comment_item = self.dynamo.add_comment(comment_id, post_id, user_id, text, text_tags, commented_at=now)
         return self.init_comment(comment_item)
 
+    def delete_all(self, comment_items):
+        """
+        Delete the comments `comment_items`, in concurrent batches. Their flags and cards, and the comment
+        counts of their posts and users, are left to the stream handlers.
+        """
+        comment_items = iter(comment_items)
+        batches = iter(lambda: list(itertools.islice(comment_items, self.delete_batch_size)), [])
+        with ThreadPoolExecutor(max_workers=self.delete_max_workers) as executor:
+            return sum(executor.map(self.dynamo.batch_delete_comments, batches))
+
     def delete_all_by_user(self, user_id):
-        for comment_item in self.dynamo.generate_by_user(user_id):
-            self.init_comment(comment_item).delete()
+        return self.delete_all(self.dynamo.generate_by_user(user_id))
 
     def delete_all_on_post(self, post_id):
-        for comment_item in self.dynamo.generate_by_post(post_id):
-            self.init_comment(comment_item).delete()
+        return self.delete_all(self.dynamo.generate_by_post(post_id))
 
     def on_flag_add(self, comment_id, new_item):
         comment_item = self.dynamo.increment_flag_count(comment_id)
@@ -103,22 +103,22 @@ class FollowerManager:
             self.dynamo.delete_following(item)
 
     def reset_follower_items(self, followed_user_id):
-        for item in self.dynamo.generate_follower_items(followed_user_id):
-            # they were following us, then do an unfollow() to keep their counts correct
-            if item['followStatus'] == FollowStatus.FOLLOWING:
-                self.init_follow(item).unfollow()
-            else:
-                # TODO: do as batch write
-                self.dynamo.delete_following(item)
+        self.reset_follow_items(self.dynamo.generate_follower_items(followed_user_id))
 
     def reset_followed_items(self, follower_user_id):
-        for item in self.dynamo.generate_followed_items(follower_user_id):
-            # if we were following them, then do an unfollow() to keep their counts correct
-            if item['followStatus'] == FollowStatus.FOLLOWING:
-                self.init_follow(item).unfollow()
-            else:
-                # TODO: do as batch write
-                self.dynamo.delete_following(item)
+        self.reset_follow_items(self.dynamo.generate_followed_items(follower_user_id))
+
+    def reset_follow_items(self, follow_items):
+        "Unfollow the follows `follow_items` that are FOLLOWING, so counts remain correct, and batch delete the rest"
+
+        def generate_unfollowed_items():
+            for item in follow_items:
+                if item['followStatus'] == FollowStatus.FOLLOWING:
+                    self.init_follow(item).unfollow()
+                else:
+                    yield item
+
+        self.dynamo.client.batch_delete_items(generate_unfollowed_items())
 
     def refresh_first_story(self, story_prev=None, story_now=None):
         "Refresh the firstStory items, if needed, after the a story has changed."
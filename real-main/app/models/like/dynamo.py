@@ -64,6 +64,10 @@ class LikeDynamo:
         except self.client.exceptions.ConditionalCheckFailedException as err:
             raise NotLikedWithStatus(liked_by_user_id, post_id, like_status) from err
 
+    def batch_delete_likes(self, like_items):
+        "Delete the likes `like_items` (or their keys), regardless of their status. Returns count of deletes."
+        return self.client.batch_delete_items(like_items)
+
     def generate_of_post(self, post_id):
         query_kwargs = {
             'KeyConditionExpression': Key('gsiA2PartitionKey').eq(f'like/{post_id}'),
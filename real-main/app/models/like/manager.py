@@ -1,4 +1,6 @@
+import itertools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from app import models
 from app.models.follower.enums import FollowStatus
@@ -14,6 +16,10 @@ logger = logging.getLogger()
 
 
 class LikeManager:
+
+    dislike_batch_size = 100
+    dislike_max_workers = 4
+
     def __init__(self, clients, managers=None):
         managers = managers or {}
         managers['like'] = self
@@ -67,18 +73,26 @@ class LikeManager:
         attr = 'onymousLikeCount' if like_status == LikeStatus.ONYMOUSLY_LIKED else 'anonymousLikeCount'
         post.item[attr] = post.item.get(attr, 0) + 1
 
+    def dislike_all(self, like_items):
+        """
+        Dislike the likes `like_items` (or their keys), deleting them in concurrent batches.
+        The like counts of the posts are left to be decremented by the stream handlers.
+        """
+        like_items = iter(like_items)
+        batches = iter(lambda: list(itertools.islice(like_items, self.dislike_batch_size)), [])
+        with ThreadPoolExecutor(max_workers=self.dislike_max_workers) as executor:
+            return sum(executor.map(self.dynamo.batch_delete_likes, batches))
+
     def dislike_all_of_post(self, post_id):
         "Dislike all likes of a post"
-        for like_item in self.dynamo.generate_of_post(post_id):
-            self.init_like(like_item).dislike()
+        return self.dislike_all(self.dynamo.generate_of_post(post_id))
 
     def dislike_all_by_user(self, liked_by_user_id):
         "Dislike all likes by a user"
-        for like_item in self.dynamo.generate_by_liked_by(liked_by_user_id):
-            self.init_like(like_item).dislike()
+        return self.dislike_all(self.dynamo.generate_by_liked_by(liked_by_user_id))
 
     def dislike_all_by_user_from_user(self, liked_by_user_id, posted_by_user_id):
         "Dislike all likes by one user on posts from another user"
-        for like_pk in self.dynamo.generate_pks_by_liked_by_for_posted_by(liked_by_user_id, posted_by_user_id):
-            liked_by_user_id, post_id = self.dynamo.parse_pk(like_pk)
-            self.get_like(liked_by_user_id, post_id).dislike()
+        return self.dislike_all(
+            self.dynamo.generate_pks_by_liked_by_for_posted_by(liked_by_user_id, posted_by_user_id)
+        )
@@ -1,14 +1,31 @@
+import hashlib
 import io
+import tempfile
 
 import PIL.Image
-import PIL.ImageOps
 import pyheif
 
+from app.utils.image import EXIF_ORIENTATION_TAG, TRANSPOSED_ORIENTATIONS, ImageMetrics, encode_jpeg, open_image
+
 from .exceptions import PostException
 
 
 class CachedImage:
-    def __init__(self, post_id, image_size=None, s3_client=None, s3_path=None, source=None, content_type=None):
+
+    read_chunk_size = 1024 * 1024
+    # encoded data bigger than this is spilled from memory to disk
+    spool_max_size = 8 * 1024 * 1024
+
+    def __init__(
+        self,
+        post_id,
+        image_size=None,
+        s3_client=None,
+        s3_path=None,
+        source=None,
+        content_type=None,
+        metrics=None,
+    ):
         assert (s3_client and s3_path) or source, 'Either s3 kwargs or source kwargs required'
 
         self.post_id = post_id
@@ -17,18 +34,27 @@ class CachedImage:
         self.s3_path = s3_path
         self.source = source
         self.content_type = content_type or (image_size.content_type if image_size else None)
+        self.metrics = metrics or ImageMetrics()
 
         # if self._image is set, that's the latest data
-        # if self._image is not set, then self._data will contain the latest data
+        # if self._image is not set, then self._data will be a file containing the latest data (encoded)
+        # once the encoded data is decoded, it's dropped if it's known to be safely stored in the source
         self._data = None
         self._image = None
 
+        # md5 hex digest of the encoded bytes of the latest data, if known
+        self._checksum = None
+
         # Possible values and meanings:
         #   - True: what's in the cache is known to match the source
         #   - False: what's in the cache is thought to be different than the source
         #   - None: cache has never been filled
         self.is_synced = None
 
+    @property
+    def name(self):
+        return self.image_size.filename if self.image_size else 'image'
+
     @property
     def readonly_image(self):
         """
@@ -39,60 +65,144 @@ class CachedImage:
             self.refresh()
         if not self._image and self._data:
             self._fill_image_from_data()
+            if self.is_synced:
+                self._drop_data()
         return self._image
 
-    def _fill_image_from_data(self):
-        fh = io.BytesIO(self._data)
-        if self.content_type == 'image/heic':
-            try:
-                heif_file = pyheif.read(fh)
-            except (ValueError, pyheif.error.HeifError) as err:
-                raise PostException(f'Unable to read HEIC file for post `{self.post_id}`: {err}') from err
-            self._image = PIL.Image.frombytes(
-                heif_file.mode, heif_file.size, heif_file.data, 'raw', heif_file.mode, heif_file.stride
-            )
-        elif self.content_type == 'image/jpeg':
+    @property
+    def size(self):
+        "The (width, height) of the image, as displayed. Where possible, read from the header without decoding."
+        if not self._image and not self._data:
+            self.refresh()
+        if not self._image and self.content_type == 'image/jpeg':
             try:
-                self._image = PIL.ImageOps.exif_transpose(PIL.Image.open(fh))
-            except PostException:
-                raise
-            except Exception as err:
-                raise PostException(
-                    f'Unable to decode native jpeg data for post `{self.post_id}`: {err}'
-                ) from err
-        else:
-            raise PostException(f'Unrecognized content-type `{self.content_type}`')
+                image = PIL.Image.open(self._rewound_data())
+                size = image.size
+                if image.getexif().get(EXIF_ORIENTATION_TAG) in TRANSPOSED_ORIENTATIONS:
+                    size = size[::-1]
+                return size
+            except Exception:
+                pass  # let the full decode below raise an appropriate error
+        return self.readonly_image.size
+
+    @property
+    def checksum(self):
+        """
+        The md5 hex digest of the encoded image, as stored (or to be stored) in S3. Computed as the
+        bytes are read from S3 or encoded, so this matches the etag of a single-part upload of them.
+        """
+        if self._checksum is None and self._image is None:
+            self.refresh()
+        if self._checksum is None:
+            self._encode_image()  # sets the checksum
+        return self._checksum
+
+    def _rewound_data(self):
+        self._data.seek(0)
+        return self._data
 
-    def set_image(self, image):
+    def _spool(self, fh):
+        "Copy the contents of `fh` into a spooled temp file, as the latest data, computing its checksum on the way"
+        spooled, md5 = tempfile.SpooledTemporaryFile(max_size=self.spool_max_size), hashlib.md5()
+        for chunk in iter(lambda: fh.read(self.read_chunk_size), b''):
+            md5.update(chunk)
+            spooled.write(chunk)
+        self._drop_data()
+        self._data = spooled
+        self._checksum = md5.hexdigest()
+
+    def _drop_data(self):
+        if self._data:
+            self._data.close()
         self._data = None
-        self._image = image.copy()
+
+    def _fill_image_from_data(self):
+        with self.metrics.stage(f'decode {self.name}'):
+            if self.content_type == 'image/heic':
+                self._image = self._decode_heic()
+            elif self.content_type == 'image/jpeg':
+                try:
+                    self._image = open_image(self._rewound_data())
+                except Exception as err:
+                    raise PostException(
+                        f'Unable to decode native jpeg data for post `{self.post_id}`: {err}'
+                    ) from err
+            else:
+                raise PostException(f'Unrecognized content-type `{self.content_type}`')
+
+    def _decode_heic(self):
+        try:
+            heif_file = pyheif.open(self._rewound_data()).load()
+        except (ValueError, pyheif.error.HeifError) as err:
+            raise PostException(f'Unable to read HEIC file for post `{self.post_id}`: {err}') from err
+        if heif_file.mode == 'RGBA':
+            # pillow can use the decoded RGBA pixels in place, rather than holding a second copy of them
+            return PIL.Image.frombuffer(
+                heif_file.mode, heif_file.size, heif_file.data, 'raw', heif_file.mode, heif_file.stride, 1
+            )
+        return PIL.Image.frombytes(
+            heif_file.mode, heif_file.size, heif_file.data, 'raw', heif_file.mode, heif_file.stride
+        )
+
+    def get_thumbnail_source(self, max_dimensions):
+        """
+        A decoded image that the caller is free to mutate, big enough to be thumbnailed to `max_dimensions`.
+        If this cache holds undecoded jpeg data, it's decoded at reduced scale where possible and the
+        result is not kept in this cache.
+        """
+        if self._image or self.content_type != 'image/jpeg':
+            return self.readonly_image.copy()
+        if not self._data:
+            self.refresh()
+        try:
+            return open_image(self._rewound_data(), max_dimensions=max_dimensions)
+        except Exception as err:
+            raise PostException(f'Unable to decode native jpeg data for post `{self.post_id}`: {err}') from err
+
+    def set_image(self, image, copy=True):
+        "Set `copy` to False to hand ownership of `image` over to this cache"
+        self._drop_data()
+        self._image = image.copy() if copy else image
+        self._checksum = None
         self.is_synced = False
         return self
 
     def set_data(self, fh):
         fh.seek(0)
-        self._data = fh.read()
+        self._spool(fh)
         self._image = None
         self.is_synced = False
         return self
 
     def clear(self):
         if not (self.is_synced and self._image is None and self._data is None):
-            self._data = None
+            self._drop_data()
             self._image = None
+            self._checksum = None
             self.is_synced = False
         return self
 
+    def release(self):
+        "Free the memory held by this cache, if its contents are known to be safely stored in the source"
+        if self.is_synced:
+            self._drop_data()
+            self._image = None
+            self.is_synced = None
+        return self
+
     def refresh(self):
         if self.source:
-            self._data = None
+            self._drop_data()
             self._image = self.source()
+            self._checksum = None
         else:
-            try:
-                fh = self.s3_client.get_object_data_stream(self.s3_path)
-            except self.s3_client.exceptions.NoSuchKey as err:
-                raise PostException(f'{self.s3_path} image data not found for post `{self.post_id}`') from err
-            self._data = fh.read()
+            with self.metrics.stage(f'read {self.name}'):
+                try:
+                    fh = self.s3_client.get_object_data_stream(self.s3_path)
+                except self.s3_client.exceptions.NoSuchKey as err:
+                    raise PostException(f'{self.s3_path} image data not found for post `{self.post_id}`') from err
+                # stream to a spooled file, hashing on the way, rather than making a second pass over the data
+                self._spool(fh)
             self._image = None
         self.is_synced = True
         return self
@@ -115,11 +225,22 @@ class CachedImage:
         except Exception as err:
             raise PostException(f'Unable to crop image for post `{self.id}`: {err}') from err
 
-        self._data = None
+        self._drop_data()
+        self._checksum = None
         self.is_synced = False
         return self
 
-    def flush(self, include_deletes=False):
+    def _encode_image(self):
+        assert self.content_type == 'image/jpeg', 'Non-jpeg images can only be flushed back empty'
+        try:
+            fh = encode_jpeg(self._image)
+        except Exception as err:
+            raise PostException(f'Unable to save pil image for post `{self.post_id}`: {err}') from err
+        self._checksum = hashlib.md5(fh.getbuffer()).hexdigest()
+        return fh
+
+    def flush(self, include_deletes=False, uploader=None):
+        "If an S3Uploader is passed as `uploader`, the write to S3 completes in the background"
         assert self.s3_path, 'Can only flush cached images backed by S3'
         if self.is_synced is None:
             raise Exception('Nothing to flush back')
@@ -129,26 +250,13 @@ class CachedImage:
                     raise Exception('Refusing to flush back empty cache without `include_deletes` kwarg')
                 self.s3_client.delete_object(self.s3_path)
             else:
-                if self._data:
-                    fh = io.BytesIO(self._data)
+                if self._data and uploader:
+                    # the background write gets its own copy, as our file may be read or dropped in the meantime
+                    fh = io.BytesIO(self._rewound_data().read())
+                elif self._data:
+                    fh = self._rewound_data()
                 elif self._image:
-                    assert self.content_type == 'image/jpeg', 'Non-jpeg images can only be flushed back empty'
-                    fh = io.BytesIO()
-                    kwargs = {  # Note: Pillow's Image.save treats None differently than not present for some kwargs
-                        k: v
-                        for k, v in {
-                            'format': 'JPEG',
-                            'quality': 100,  # per spec
-                            'icc_profile': self._image.info.get('icc_profile'),
-                            'exif': self._image.info.get('exif'),
-                        }.items()
-                        if v is not None
-                    }
-                    try:
-                        self._image.save(fh, **kwargs)
-                    except Exception as err:
-                        raise PostException(f'Unable to save pil image for post `{self.post_id}`: {err}') from err
-                    fh.seek(0)
-                self.s3_client.put_object(self.s3_path, fh, self.content_type)
+                    fh = self._encode_image()
+                (uploader or self.s3_client).put_object(self.s3_path, fh, self.content_type)
             self.is_synced = True
         return self
@@ -25,6 +25,10 @@ class PostDynamo:
     def get_post(self, post_id, strongly_consistent=False):
         return self.client.get_item(self.pk(post_id), ConsistentRead=strongly_consistent)
 
+    def generate_posts(self, post_ids):
+        "Fetch multiple posts with batch gets. Order *not* maintained, posts not found are skipped."
+        return self.client.generate_all_batch_get(self.pk(post_id) for post_id in post_ids)
+
     def delete_post(self, post_id):
         return self.client.delete_item(self.pk(post_id))
 
@@ -62,14 +66,19 @@ class PostDynamo:
         }
         return self.client.generate_all_query(query_kwargs)
 
-    def generate_expired_post_pks_with_scan(self, cut_off_date):
-        "Do a table **scan** to generate pks of expired posts. Does *not* include cut_off_date."
+    def generate_expired_post_pks_with_scan(self, cut_off_date, total_segments=1):
+        """
+        Do a table **scan** to generate pks of expired posts. Does *not* include cut_off_date.
+        The scan reads the whole table, so is only intended for backfills.
+        """
         query_kwargs = {
             'FilterExpression': (
                 Attr('partitionKey').begins_with('post/') & Attr('expiresAt').lt(str(cut_off_date))
             ),
             'ProjectionExpression': 'partitionKey, sortKey',
         }
+        if total_segments > 1:
+            return self.client.generate_all_scan_parallel(query_kwargs, total_segments)
         return self.client.generate_all_scan(query_kwargs)
 
     def add_pending_post(
@@ -145,9 +154,24 @@ class PostDynamo:
         return self.client.decrement_count(self.pk(post_id), 'flagCount')
 
     def increment_viewed_by_count(self, post_id):
-        return self.client.increment_count(self.pk(post_id), 'viewedByCount')
+        return self.client.add_count_delta(self.pk(post_id), 'viewedByCount', 1)
 
-    def set_post_status(self, post_item, status, status_reason=None, original_post_id=None, album_rank=None):
+    def set_post_status(
+        self,
+        post_item,
+        status,
+        status_reason=None,
+        original_post_id=None,
+        album_rank=None,
+        now=None,
+        checksum=None,
+        perceptual_hash=None,
+        is_verified=None,
+    ):
+        """
+        The checksum and verification of a post can be set along with its status, as they are when it's
+        completed, so that it's all done in one write.
+        """
         album_id = post_item.get('albumId')
 
         assert (album_rank is not None) is bool(
@@ -170,6 +194,23 @@ class PostDynamo:
             exp_sets.append('gsiK3SortKey = :ar')
             exp_values[':ar'] = album_rank
 
+        if checksum:
+            exp_sets.extend(['checksum = :checksum', 'gsiK2PartitionKey = :gsik2pk', 'gsiK2SortKey = :gsik2sk'])
+            exp_values[':checksum'] = checksum
+            exp_values[':gsik2pk'] = f'postChecksum/{checksum}'
+            exp_values[':gsik2sk'] = post_item['postedAt']
+            if perceptual_hash:
+                exp_sets.append('perceptualHash = :ph')
+                exp_values[':ph'] = perceptual_hash
+
+        if is_verified is not None:
+            verified_sets, verified_removes, verified_values = self.get_is_verified_exps(
+                is_verified, hidden=post_item.get('verificationHidden', False)
+            )
+            exp_sets.extend(verified_sets)
+            exp_removes.extend(verified_removes)
+            exp_values.update(verified_values)
+
         if status_reason:
             exp_sets.append('postStatusReason = :psr')
             exp_values[':psr'] = status_reason
@@ -180,6 +221,11 @@ class PostDynamo:
             exp_sets.append('gsiA1SortKey = :gsiA1SortKey')
             exp_values[':gsiA1SortKey'] = f'{status}/{post_item["expiresAt"]}'
 
+        # record when deletion of the post was last requested
+        if status == PostStatus.DELETING:
+            exp_sets.append('deletingAt = :deletingAt')
+            exp_values[':deletingAt'] = (now or pendulum.now('utc')).to_iso8601_string()
+
         # the setAsUserPhoto attr is not needed after reaching COMPLETED, so delete it if it exists
         if status == PostStatus.COMPLETED:
             exp_removes.append('setAsUserPhoto')
@@ -256,7 +302,7 @@ class PostDynamo:
 
         return self.client.update_item(update_query_kwargs)
 
-    def set_checksum(self, post_id, posted_at_str, checksum):
+    def set_checksum(self, post_id, posted_at_str, checksum, perceptual_hash=None):
         assert checksum  # no deletes
         query_kwargs = {
             'Key': self.pk(post_id),
@@ -267,21 +313,39 @@ class PostDynamo:
                 ':sk': posted_at_str,
             },
         }
+        if perceptual_hash:
+            query_kwargs['UpdateExpression'] += ', perceptualHash = :ph'
+            query_kwargs['ExpressionAttributeValues'][':ph'] = perceptual_hash
         return self.client.update_item(query_kwargs)
 
-    def set_is_verified(self, post_id, is_verified, hidden=False):
+    def add_delete_cascade_step(self, post_id, step):
+        "Record that `step` of the deletion cascade of the post is done"
         query_kwargs = {
             'Key': self.pk(post_id),
-            'UpdateExpression': 'SET isVerified = :visibleValue',
-            'ExpressionAttributeValues': {},
+            'UpdateExpression': 'ADD deleteCascadeSteps :step',
+            'ExpressionAttributeValues': {':step': {step}},
         }
+        return self.client.update_item(query_kwargs)
+
+    def get_is_verified_exps(self, is_verified, hidden=False):
+        "Returns (sets, removes, values) for an update expression that sets the verification of a post"
         if hidden:
-            query_kwargs['UpdateExpression'] += ', isVerifiedHiddenValue = :hiddenValue'
-            query_kwargs['ExpressionAttributeValues'][':visibleValue'] = True
-            query_kwargs['ExpressionAttributeValues'][':hiddenValue'] = is_verified
-        else:
-            query_kwargs['UpdateExpression'] += ' REMOVE isVerifiedHiddenValue'
-            query_kwargs['ExpressionAttributeValues'][':visibleValue'] = is_verified
+            return (
+                ['isVerified = :visibleValue', 'isVerifiedHiddenValue = :hiddenValue'],
+                [],
+                {':visibleValue': True, ':hiddenValue': is_verified},
+            )
+        return ['isVerified = :visibleValue'], ['isVerifiedHiddenValue'], {':visibleValue': is_verified}
+
+    def set_is_verified(self, post_id, is_verified, hidden=False):
+        exp_sets, exp_removes, exp_values = self.get_is_verified_exps(is_verified, hidden=hidden)
+        query_kwargs = {
+            'Key': self.pk(post_id),
+            'UpdateExpression': (
+                'SET ' + ', '.join(exp_sets) + (' REMOVE ' + ', '.join(exp_removes) if exp_removes else '')
+            ),
+            'ExpressionAttributeValues': exp_values,
+        }
         return self.client.update_item(query_kwargs)
 
     def get_first_with_checksum(self, checksum):
@@ -347,13 +411,13 @@ class PostDynamo:
         return self.client.increment_count(self.pk(post_id), 'onymousLikeCount')
 
     def decrement_onymous_like_count(self, post_id):
-        return self.client.decrement_count(self.pk(post_id), 'onymousLikeCount')
+        return self.client.add_count_delta(self.pk(post_id), 'onymousLikeCount', -1)
 
     def increment_anonymous_like_count(self, post_id):
         return self.client.increment_count(self.pk(post_id), 'anonymousLikeCount')
 
     def decrement_anonymous_like_count(self, post_id):
-        return self.client.decrement_count(self.pk(post_id), 'anonymousLikeCount')
+        return self.client.add_count_delta(self.pk(post_id), 'anonymousLikeCount', -1)
 
     def increment_comment_count(self, post_id, viewed=False):
         query_kwargs = {
@@ -370,7 +434,7 @@ class PostDynamo:
         return self.client.update_item(query_kwargs, failure_warning=msg)
 
     def decrement_comment_count(self, post_id):
-        return self.client.decrement_count(self.pk(post_id), 'commentCount')
+        return self.client.add_count_delta(self.pk(post_id), 'commentCount', -1)
 
     def decrement_comments_unviewed_count(self, post_id):
         return self.client.decrement_count(self.pk(post_id), 'commentsUnviewedCount')
@@ -407,13 +471,40 @@ class PostDynamo:
             query_kwargs['UpdateExpression'] = 'REMOVE albumId, gsiK3PartitionKey, gsiK3SortKey'
         return self.client.update_item(query_kwargs)
 
-    def set_album_rank(self, post_id, album_rank):
+    def set_album_rank(self, post_id, album_rank, failure_warning=None):
         query_kwargs = {
             'Key': self.pk(post_id),
             'UpdateExpression': 'SET gsiK3SortKey = :ar',
             'ExpressionAttributeValues': {':ar': album_rank},
         }
-        return self.client.update_item(query_kwargs)
+        return self.client.update_item(query_kwargs, failure_warning=failure_warning)
+
+    def get_last_album_rank(self, album_id):
+        "The rank of the last completed post in the album, or None if there are no completed posts in it"
+        query_kwargs = {
+            'KeyConditionExpression': (
+                Key('gsiK3PartitionKey').eq(f'post/{album_id}') & Key('gsiK3SortKey').gt(-1)
+            ),
+            'IndexName': 'GSI-K3',
+            'ScanIndexForward': False,
+        }
+        keys = self.client.query_head(query_kwargs)
+        return keys['gsiK3SortKey'] if keys else None
+
+    def get_next_in_album(self, album_id, after_rank=None):
+        """
+        The (post_id, rank) of the first completed post in the album ranked after `after_rank`,
+        or of the first completed post in the album if `after_rank` is None. (None, None) if there is none.
+        """
+        after_rank = after_rank if after_rank is not None else -1
+        query_kwargs = {
+            'KeyConditionExpression': (
+                Key('gsiK3PartitionKey').eq(f'post/{album_id}') & Key('gsiK3SortKey').gt(after_rank)
+            ),
+            'IndexName': 'GSI-K3',
+        }
+        keys = self.client.query_head(query_kwargs)
+        return (keys['partitionKey'].split('/')[1], keys['gsiK3SortKey']) if keys else (None, None)
 
     def generate_post_ids_in_album(self, album_id, completed=None, after_rank=None):
         assert completed is None or after_rank is None, 'Cant specify both completed and after_rank kwargs'
@@ -42,3 +42,18 @@ class PostImageDynamo:
         assert color_tuples, 'No support for deleting colors, yet'
         color_maps = [{'r': ct[0], 'g': ct[1], 'b': ct[2]} for ct in color_tuples]
         return self.client.set_attributes(self.pk(post_id), schemaVersion=self.schema_version, colors=color_maps)
+
+    def set_variant_formats(self, post_id, image_formats):
+        "The formats, other than jpeg, in which thumbnails of the image are available"
+        return self.client.set_attributes(
+            self.pk(post_id), schemaVersion=self.schema_version, variantFormats=image_formats
+        )
+
+    def set_processed_attributes(self, post_id, height, width, colors=None, variant_formats=None):
+        "Set all the attributes derived from processing the image, in one write"
+        attributes = {'height': height, 'width': width}
+        if colors:
+            attributes['colors'] = [{'r': ct[0], 'g': ct[1], 'b': ct[2]} for ct in colors]
+        if variant_formats:
+            attributes['variantFormats'] = variant_formats
+        return self.client.set_attributes(self.pk(post_id), schemaVersion=self.schema_version, **attributes)
@@ -30,8 +30,8 @@ def main():
     dimensions_480p = (854, 480)
     if debug:
         logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
-    output_buf = text_image.generate_text_image(text, dimensions_480p)
-    output_file.write(output_buf.read())
+    image = text_image.generate_text_image(text, dimensions_480p)
+    image.save(output_file, format='JPEG')
 
 
 if __name__ == '__main__':
@@ -1,6 +1,7 @@
 import collections
 import itertools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 import pendulum
 
@@ -24,6 +25,10 @@ logger = logging.getLogger()
 class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, ManagerBase):
 
     item_type = 'post'
+    delete_expired_posts_max_workers = 8
+    expired_posts_scan_segments = 4
+    expired_posts_sweep_days = 30
+    rebalance_album_ranks_max_workers = 8
 
     def __init__(self, clients, managers=None):
         super().__init__(clients, managers=managers)
@@ -51,6 +56,11 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         post_item = self.dynamo.get_post(post_id, strongly_consistent=strongly_consistent)
         return self.init_post(post_item) if post_item else None
 
+    def get_posts(self, post_ids):
+        "Fetch multiple posts with batch gets. Returned in the order of `post_ids`, posts not found are skipped."
+        post_items = {item['postId']: item for item in self.dynamo.generate_posts(post_ids)}
+        return [self.init_post(post_items[post_id]) for post_id in post_ids if post_id in post_items]
+
     def init_post(self, post_item):
         kwargs = {
             'post_appsync': getattr(self, 'appsync', None),
@@ -64,6 +74,7 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             'mediaconvert_client': self.clients.get('mediaconvert'),
             'post_verification_client': self.clients.get('post_verification'),
             's3_uploads_client': self.clients.get('s3_uploads'),
+            'sqs_delete_cascade_client': self.clients.get('sqs_delete_cascade'),
             'album_manager': self.album_manager,
             'block_manager': self.block_manager,
             'comment_manager': self.comment_manager,
@@ -194,20 +205,89 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
         return post
 
     def record_views(self, post_ids, user_id, viewed_at=None):
+        """
+        Record views by the user of the posts `post_ids`, which may repeat.
+
+        Posts and the user's existing views of them are batch fetched. The per-post and per-author trending
+        increments are coalesced, and the writes that remain are made concurrently. The viewedBy counts are
+        left to the stream handlers, which sum them over each batch of new views.
+        """
         grouped_post_ids = dict(collections.Counter(post_ids))
         if not grouped_post_ids:
             return
+        viewed_at = viewed_at or pendulum.now('utc')
+
+        posts = {post.id: post for post in self.get_posts(grouped_post_ids)}
+        for post_id in grouped_post_ids.keys() - posts.keys():
+            logger.warning(f'Cannot record view(s) by user `{user_id}` on DNE post `{post_id}`')
 
-        results = []
+        # views of a non-original post count as views of the original too, except the post owner's
+        view_counts, original_view_counts = collections.Counter(), collections.Counter()
+        trending_hits = collections.Counter()
         for post_id, view_count in grouped_post_ids.items():
-            post = self.get_post(post_id)
-            if not post:
-                logger.warning(f'Cannot record view(s) by user `{user_id}` on DNE post `{post_id}`')
-                continue
-            results.append(post.record_view_count(user_id, view_count, viewed_at=viewed_at))
+            post = posts.get(post_id)
+            if post and self.is_view_recordable(post, user_id):
+                view_counts[post_id] += view_count
+                if post.user_id != user_id:
+                    trending_hits[post_id] += 1
+                    if post.original_post_id != post.id:
+                        original_view_counts[post.original_post_id] += view_count
+        if original_view_counts:
+            posts.update((post.id, post) for post in self.get_posts(original_view_counts.keys() - posts.keys()))
+            for post_id, view_count in original_view_counts.items():
+                post = posts.get(post_id)
+                if post and self.is_view_recordable(post, user_id):
+                    view_counts[post_id] += view_count
+                    if post.user_id != user_id:
+                        trending_hits[post_id] += 1
+        if not view_counts:
+            return
 
-        if any(results):
-            self.user_manager.dynamo.update_last_post_view_at(user_id, now=viewed_at)
+        view_attributes = {post_id: posts[post_id].view_attributes for post_id in view_counts}
+        self.record_view_counts(view_counts, user_id, viewed_at=viewed_at, view_attributes=view_attributes)
+        self.user_manager.dynamo.update_last_post_view_at(user_id, now=viewed_at)
+        if trending_hits:
+            self.record_views_trending([posts[post_id] for post_id in trending_hits], trending_hits, viewed_at)
+
+    def is_view_recordable(self, post, user_id):
+        if post.status != PostStatus.COMPLETED:
+            logger.warning(f'Cannot record views by user `{user_id}` on non-COMPLETED post `{post.id}`')
+            return False
+        return True
+
+    def record_views_trending(self, posts, trending_hits, viewed_at):
+        """
+        Increment the trending scores of posts viewed by users other than their owners, and of their authors.
+        The posts' trending items are batch fetched, and each post's score is incremented once for all its hits.
+        Increments to authors are summed per author.
+        """
+        trending_items = {
+            item['partitionKey'].split('/')[1]: item
+            for item in self.trending_dynamo.generate_by_item_ids(post.id for post in posts)
+        }
+        with ThreadPoolExecutor(max_workers=self.record_views_max_workers) as executor:
+            users = dict(
+                executor.map(lambda uid: (uid, self.user_manager.get_user(uid)), {p.user_id for p in posts})
+            )
+            for post in posts:
+                post._user = users[post.user_id]
+                post._trending_item = trending_items.get(post.id)
+
+            def increment_trending(post):
+                multiplier = post.get_trending_multiplier() * trending_hits[post.id]
+                recorded = post.trending_increment_score(now=viewed_at, multiplier=multiplier)
+                return post.user_id, multiplier if recorded else 0
+
+            user_multipliers = collections.Counter()
+            for user_id, multiplier in executor.map(increment_trending, posts):
+                user_multipliers[user_id] += multiplier
+            futures = [
+                executor.submit(users[user_id].trending_increment_score, now=viewed_at, multiplier=multiplier)
+                for user_id, multiplier in user_multipliers.items()
+                if multiplier
+            ]
+            for future in futures:
+                future.result()
 
     def delete_recently_expired_posts(self, now=None):
         "Delete posts that expired yesterday or today"
@@ -235,21 +315,43 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             )
             self.init_post(post_item).delete()
 
-    def delete_older_expired_posts(self, now=None):
-        "Delete posts that expired yesterday or earlier, via full table scan"
+    def delete_older_expired_posts(self, now=None, backfill=False):
+        """
+        Delete posts that expired yesterday or earlier, found by day on the expiry index going back
+        `expired_posts_sweep_days` days. Set `backfill` to instead find them with a parallel full table
+        scan, which also catches any that expired before that.
+        """
         now = now or pendulum.now('utc')
         today = now.date()
 
-        # scan for expired posts
-        for post_pk in self.dynamo.generate_expired_post_pks_with_scan(today):  # excludes today
-            logger.warning(f'Deleting expired post with pk ({post_pk["partitionKey"]}, {post_pk["sortKey"]})')
-            post_item = self.dynamo.client.get_item(post_pk)
-            self.init_post(post_item).delete()
+        if backfill:
+            post_pks = self.dynamo.generate_expired_post_pks_with_scan(  # excludes today
+                today, total_segments=self.expired_posts_scan_segments
+            )
+        else:
+            days = [today - pendulum.duration(days=i) for i in range(1, self.expired_posts_sweep_days + 1)]
+            post_pks = itertools.chain.from_iterable(map(self.dynamo.generate_expired_post_pks_by_day, days))
+
+        with ThreadPoolExecutor(max_workers=self.delete_expired_posts_max_workers) as executor:
+            list(executor.map(self.delete_expired_post, post_pks))
+
+    def delete_expired_post(self, post_pk):
+        post_item = self.dynamo.client.get_item(post_pk)
+        if not post_item:
+            return  # already deleted
+        logger.warning(f'Deleting expired post with pk ({post_pk["partitionKey"]}, {post_pk["sortKey"]})')
+        self.init_post(post_item).delete()
 
     def delete_all_by_user(self, user_id):
         for post_item in self.dynamo.generate_posts_by_user(user_id):
             self.init_post(post_item).delete()
 
+    def run_delete_cascade(self, post_id):
+        "Run the delete cascade of a post, if it is still marked as deleting"
+        post = self.get_post(post_id, strongly_consistent=True)
+        if post and post.status == PostStatus.DELETING:
+            post.delete_cascade()
+
     def on_flag_add(self, post_id, new_item):
         post_item = self.dynamo.increment_flag_count(post_id)
         post = self.init_post(post_item)
@@ -271,9 +373,12 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
 
     def on_comment_delete(self, comment_id, old_item):
         comment = self.comment_manager.init_comment(old_item)
+        # when the post is being deleted its comments go with it, and there are no counts left to maintain
+        if not comment.post or comment.post.status == PostStatus.DELETING:
+            return
         self.dynamo.decrement_comment_count(comment.post_id)
 
-        if comment.post and comment.user_id != comment.post.user_id:
+        if comment.user_id != comment.post.user_id:
             # has the post owner 'viewed' that comment via reporting a view on the post?
             post_view_item = self.view_dynamo.get_view(comment.post_id, comment.post.user_id)
             post_last_viewed_at = pendulum.parse(post_view_item['lastViewedAt']) if post_view_item else None
@@ -303,6 +408,20 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             raise Exception(f'Unrecognized like status `{like_status}`')
         decrementor(post_id)
 
+    def on_post_view_add_update_viewed_by_counts(self, post_id, new_item):
+        _, viewed_by_user_id = new_item['sortKey'].split('/')
+        posted_by_user_id = new_item.get('postedByUserId')
+        if posted_by_user_id is None:
+            # a view added before views carried their post's author
+            post = self.get_post(post_id)
+            if not post:
+                return
+            posted_by_user_id = post.user_id
+        if posted_by_user_id == viewed_by_user_id:
+            return  # post owner's views don't count
+        self.dynamo.increment_viewed_by_count(post_id)
+        self.user_manager.dynamo.increment_post_viewed_by_count(posted_by_user_id)
+
     def on_post_view_count_change_update_counts(self, post_id, new_item, old_item=None):
         if new_item.get('viewCount', 0) <= (old_item or {}).get('viewCount', 0):
             return  # view count did not increase
@@ -321,6 +440,22 @@ class PostManager(FlagManagerMixin, TrendingManagerMixin, ViewManagerMixin, Mana
             if post.refresh_item().item:
                 raise
 
+    def rebalance_album_ranks(self, album_id):
+        """
+        Respace the ranks of the completed posts in the album to 0, 1, 2... keeping their order,
+        so that there's room between each pair of neighbors again. Returns a dict of post_id -> new rank.
+        """
+        post_ids = self.dynamo.generate_post_ids_in_album(album_id, completed=True)
+        album_ranks = {post_id: album_rank for album_rank, post_id in enumerate(post_ids)}
+
+        def set_album_rank(post_id):
+            msg = f'Failed to set rank of post `{post_id}` while rebalancing album `{album_id}`'
+            self.dynamo.set_album_rank(post_id, album_ranks[post_id], failure_warning=msg)
+
+        with ThreadPoolExecutor(max_workers=self.rebalance_album_ranks_max_workers) as executor:
+            list(executor.map(set_album_rank, album_ranks))
+        return album_ranks
+
     def on_album_delete_remove_posts(self, album_id, old_item):
         for post_id in self.dynamo.generate_post_ids_in_album(album_id):
             if post := self.get_post(post_id):
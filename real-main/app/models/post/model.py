@@ -1,10 +1,10 @@
 import base64
 import io
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from decimal import Decimal
 
-import colorthief
 import pendulum
-import PIL.Image
 
 from app.mixins.flag.model import FlagModelMixin
 from app.mixins.trending.model import TrendingModelMixin
@@ -13,6 +13,7 @@ from app.models.follower.enums import FollowStatus
 from app.models.user.enums import UserPrivacyStatus, UserSubscriptionLevel
 from app.models.user.exceptions import UserException
 from app.utils import image_size
+from app.utils.image import ImageMetrics, derive_image_set, dhash, get_palette, with_variants
 
 from .cached_image import CachedImage
 from .enums import PostNotificationType, PostStatus, PostType
@@ -27,15 +28,27 @@ VIDEO_HLS_PREFIX = 'video-hls/video'
 VIDEO_POSTER_PREFIX = 'video-poster/poster'
 IMAGE_DIR = 'image'
 
+# finest spacing between the ranks of posts in an album, before the album needs rebalancing
+ALBUM_RANK_PRECISION = Decimal(10) ** -9
 
-class ColorThiefFromImage(colorthief.ColorThief):
-    def __init__(self, image):
-        self.image = image
+
+def album_rank_between(before_rank, after_rank):
+    """
+    A rank that sorts strictly between `before_rank` and `after_rank`, either of which may be None
+    to mean the front and back of the album respectively. None if there's no room left between them.
+    Appended posts get the next whole number, so only reorders use up the space between ranks.
+    """
+    before_rank = before_rank if before_rank is not None else -1  # all non-completed posts have a rank of -1
+    if after_rank is None:
+        return before_rank + 1
+    album_rank = (Decimal(before_rank + after_rank) / 2).quantize(ALBUM_RANK_PRECISION)
+    return album_rank if before_rank < album_rank < after_rank else None
 
 
 class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
     item_type = 'post'
+    delete_cascade_max_workers = 4
 
     def __init__(
         self,
@@ -48,6 +61,7 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         mediaconvert_client=None,
         post_verification_client=None,
         s3_uploads_client=None,
+        sqs_delete_cascade_client=None,
         album_manager=None,
         block_manager=None,
         comment_manager=None,
@@ -76,6 +90,8 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
             self.post_verification_client = post_verification_client
         if s3_uploads_client is not None:
             self.s3_uploads_client = s3_uploads_client
+        if sqs_delete_cascade_client is not None:
+            self.sqs_delete_cascade_client = sqs_delete_cascade_client
 
         if album_manager is not None:
             self.album_manager = album_manager
@@ -99,13 +115,17 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         self.user_id = item['postedByUserId']
 
         # lazy caches
+        self.image_metrics = ImageMetrics()
         if self.type == PostType.TEXT_ONLY:
             text = self.item['text']
             self.k4_jpeg_cache = CachedImage(
                 self.id, source=lambda: generate_text_image(text, image_size.K4.max_dimensions)
             )
             self.p1080_jpeg_cache = CachedImage(
-                self.id, source=lambda: generate_text_image(text, image_size.P1080.max_dimensions)
+                self.id,
+                source=lambda: generate_text_image(
+                    text, image_size.P1080.max_dimensions, render_dimensions=image_size.K4.max_dimensions
+                ),
             )
         elif s3_uploads_client:
             self.native_heic_cache = CachedImage(
@@ -113,36 +133,42 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
                 image_size=image_size.NATIVE_HEIC,
                 s3_client=s3_uploads_client,
                 s3_path=self.get_image_path(image_size.NATIVE_HEIC),
+                metrics=self.image_metrics,
             )
             self.native_jpeg_cache = CachedImage(
                 self.id,
                 image_size=image_size.NATIVE,
                 s3_client=s3_uploads_client,
                 s3_path=self.get_image_path(image_size.NATIVE),
+                metrics=self.image_metrics,
             )
             self.k4_jpeg_cache = CachedImage(
                 self.id,
                 image_size=image_size.K4,
                 s3_client=s3_uploads_client,
                 s3_path=self.get_image_path(image_size.K4),
+                metrics=self.image_metrics,
             )
             self.p1080_jpeg_cache = CachedImage(
                 self.id,
                 image_size=image_size.P1080,
                 s3_client=s3_uploads_client,
                 s3_path=self.get_image_path(image_size.P1080),
+                metrics=self.image_metrics,
             )
             self.p480_jpeg_cache = CachedImage(
                 self.id,
                 image_size=image_size.P480,
                 s3_client=s3_uploads_client,
                 s3_path=self.get_image_path(image_size.P480),
+                metrics=self.image_metrics,
             )
             self.p64_jpeg_cache = CachedImage(
                 self.id,
                 image_size=image_size.P64,
                 s3_client=s3_uploads_client,
                 s3_path=self.get_image_path(image_size.P64),
+                metrics=self.image_metrics,
             )
 
     @property
@@ -180,6 +206,11 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
     def viewed_by_count(self):
         return self.item.get('viewedByCount', 0)
 
+    @property
+    def view_attributes(self):
+        # the stream handlers count views by others toward the author without fetching the post
+        return {'postedByUserId': self.user_id}
+
     def refresh_item(self, strongly_consistent=False):
         self.item = self.dynamo.get_post(self.id, strongly_consistent=strongly_consistent)
         return self
@@ -245,15 +276,37 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         return resp
 
     def build_image_thumbnails(self):
-        image = self.native_jpeg_cache.readonly_image.copy()
-        # ordered by decreasing size
-        for cache in (self.k4_jpeg_cache, self.p1080_jpeg_cache, self.p480_jpeg_cache, self.p64_jpeg_cache):
-            try:
-                image.thumbnail(cache.image_size.max_dimensions, resample=PIL.Image.LANCZOS)
-            except Exception as err:
-                raise PostException(f'Unable to thumbnail image as jpeg for post `{self.id}`: {err}') from err
-            cache.set_image(image)
-            cache.flush()
+        variant_formats = self._build_image_thumbnails()
+        if variant_formats:
+            self._image_item = self.image_dynamo.set_variant_formats(self.id, variant_formats)
+        return self
+
+    def _build_image_thumbnails(self):
+        "Returns a list of the formats, other than jpeg, that the thumbnails were also saved in"
+        caches = {
+            cache.image_size: cache
+            for cache in (self.k4_jpeg_cache, self.p1080_jpeg_cache, self.p480_jpeg_cache, self.p64_jpeg_cache)
+        }
+        with self.image_metrics.stage('decode'):
+            image = self.native_jpeg_cache.get_thumbnail_source(image_size.THUMBNAILS[0].max_dimensions)
+        sizes = with_variants(image_size.THUMBNAILS)
+        variant_formats = set()
+        try:
+            # encoding of each size overlaps with the uploads of the sizes before it
+            with self.s3_uploads_client.uploader() as uploader:
+                for size, fh in derive_image_set(image, sizes, metrics=self.image_metrics):
+                    if size in caches:
+                        caches[size].set_data(fh).flush(uploader=uploader)
+                    else:
+                        uploader.put_object(self.get_image_path(size), fh, size.content_type)
+                        variant_formats.add(size.image_format)
+                with self.image_metrics.stage('upload'):
+                    uploader.wait()
+        except PostException:
+            raise
+        except Exception as err:
+            raise PostException(f'Unable to thumbnail image as jpeg for post `{self.id}`: {err}') from err
+        return sorted(variant_formats)
 
     def process_image_upload(self, image_data=None, now=None):
         assert self.type == PostType.IMAGE, 'Can only process_image_upload() for IMAGE posts'
@@ -277,7 +330,9 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
             source_cached_image.crop(crop)
 
         if source_cached_image != self.native_jpeg_cache:
-            self.native_jpeg_cache.set_image(source_cached_image.readonly_image)  # set_image makes a copy
+            # hand the decoded image over, rather than holding two copies of it
+            self.native_jpeg_cache.set_image(source_cached_image.readonly_image, copy=False)
+            source_cached_image.release()
 
         if self.native_jpeg_cache.is_synced is False:
             self.native_jpeg_cache.flush()
@@ -287,12 +342,28 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
             self.native_heic_cache.clear()
             self.native_heic_cache.flush(include_deletes=True)
 
-        self.build_image_thumbnails()
-        self.set_height_and_width()
-        self.set_colors()
-        self.set_is_verified()
-        self.set_checksum()
-        self.complete(now=now)
+        # The verification service fetches the native image itself, so it's started as soon as that's in S3
+        # and the network round trip overlaps with the rest of the processing. Everything else is cpu-bound.
+        # What it needs from the image item is read here, as the worker must not touch dynamo or our state.
+        verify_kwargs = {
+            'image_format': self.image_item.get('imageFormat'),
+            'original_format': self.image_item.get('originalFormat'),
+            'taken_in_real': self.image_item.get('takenInReal'),
+        }
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            is_verified = executor.submit(self.get_is_verified, **verify_kwargs)
+            width, height = self.native_jpeg_cache.size
+            variant_formats = self._build_image_thumbnails()
+            colors = self.get_colors()
+            self._image_item = self.image_dynamo.set_processed_attributes(
+                self.id, height, width, colors=colors, variant_formats=variant_formats
+            )
+            checksum, perceptual_hash = self.native_jpeg_cache.checksum, self.get_perceptual_hash()
+            with self.image_metrics.stage('verify'):
+                is_verified = is_verified.result()
+
+        # the checksum and verification are written along with the completion
+        self.complete(now=now, checksum=checksum, perceptual_hash=perceptual_hash, is_verified=is_verified)
 
     def start_processing_video_upload(self):
         assert self.type == PostType.VIDEO, 'Can only process_video_upload() for VIDEO posts'
@@ -326,8 +397,11 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         self.item = self.dynamo.set_post_status(self.item, PostStatus.ERROR, status_reason=reason)
         return self
 
-    def complete(self, now=None):
-        "Transition the post to COMPLETED status"
+    def complete(self, now=None, checksum=None, perceptual_hash=None, is_verified=None):
+        """
+        Transition the post to COMPLETED status.
+        The `checksum` and `is_verified` of an image post, if just computed, are set in the same write.
+        """
         now = now or pendulum.now('utc')
 
         if self.status in (PostStatus.COMPLETED, PostStatus.ARCHIVED, PostStatus.DELETING):
@@ -336,9 +410,7 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
         # Determine the original_post_id, if this post isn't original
         original_post_id = None
-        if self.type == PostType.IMAGE:
-            # need strongly consistent because checksum may have been just set
-            checksum = self.refresh_item(strongly_consistent=True).item['checksum']
+        if self.type == PostType.IMAGE and (checksum := checksum or self.item.get('checksum')):
             post_id = self.dynamo.get_first_with_checksum(checksum)
             if post_id and post_id != self.id:
                 original_post_id = post_id
@@ -346,15 +418,20 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
         album_id = self.item.get('albumId')
         album = self.album_manager.get_album(album_id) if album_id else None
-        album = album.increment_rank_count() if album else None
         if album_id and not album:
             # album has disappeared, so remove the post from the album
             self.item = self.dynamo.set_album_id(self.item, None)
-        album_rank = album.get_last_rank() if album else None
+        album_rank = album_rank_between(self.dynamo.get_last_album_rank(album_id), None) if album else None
 
         # complete the post
         self.item = self.dynamo.set_post_status(
-            self.item, PostStatus.COMPLETED, original_post_id=original_post_id, album_rank=album_rank,
+            self.item,
+            PostStatus.COMPLETED,
+            original_post_id=original_post_id,
+            album_rank=album_rank,
+            checksum=checksum,
+            perceptual_hash=perceptual_hash,
+            is_verified=is_verified,
         )
 
         # update the user's profile photo, if needed
@@ -407,11 +484,10 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
         album_id = self.item.get('albumId')
         album = self.album_manager.get_album(album_id) if album_id else None
-        album = album.increment_rank_count() if album else None
         if album_id and not album:
             # album has disappeared, so remove the post from the album
             self.item = self.dynamo.set_album_id(self.item, None)
-        album_rank = album.get_last_rank() if album else None
+        album_rank = album_rank_between(self.dynamo.get_last_album_rank(album_id), None) if album else None
 
         # restore the post
         self.item = self.dynamo.set_post_status(self.item, PostStatus.COMPLETED, album_rank=album_rank)
@@ -422,31 +498,53 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
         return self
 
-    def delete(self):
-        "Delete the post and all its media"
-        # mark the post and the media as in the deleting process
-        self.item = self.dynamo.set_post_status(self.item, PostStatus.DELETING)
-
-        # dislike all likes of the post
-        self.like_manager.dislike_all_of_post(self.id)
-
-        # delete all comments on the post
-        self.comment_manager.delete_all_on_post(self.id)
-
-        # if it was the first followed story, refresh that
-        if self.item.get('expiresAt'):
-            self.follower_manager.refresh_first_story(story_prev=self.item)
-
-        # delete the trending index, if it exists
+    def delete(self, now=None):
+        """
+        Mark the post as deleting, which hides it, and take it out of trending.
+        The rest of the deletion, the cost of which grows with the likes and comments on the post, is queued to
+        be done by `delete_cascade` in the background. Deleting a post that is already deleting queues its
+        cascade again.
+        """
+        self.item = self.dynamo.set_post_status(self.item, PostStatus.DELETING, now=now)
         self.trending_delete()
+        self.sqs_delete_cascade_client.send_message({'itemType': 'post', 'itemId': self.id})
+        return self
+
+    def delete_cascade(self):
+        """
+        Delete all that hangs off a post that's marked as deleting, and then the post itself.
+        Each step is idempotent and is checkpointed on the post item once done, so an interrupted
+        cascade that is run again picks up where it left off.
+        """
+        assert self.status == PostStatus.DELETING, 'Only posts marked as deleting may have their deletes cascaded'
+        steps = {
+            'likes': lambda: self.like_manager.dislike_all_of_post(self.id),
+            'comments': lambda: self.comment_manager.delete_all_on_post(self.id),
+            'firstStory': lambda: self.follower_manager.refresh_first_story(story_prev=self.item),
+            'media': lambda: self.s3_uploads_client.delete_objects_with_prefix(self.s3_prefix),
+        }
+        if not self.item.get('expiresAt'):
+            del steps['firstStory']
+
+        # the steps are independent of one another, so they run concurrently. Checkpoints all go to the
+        # same post item, so they're written from this thread as steps finish. A failed step doesn't cancel
+        # the others, so as much as possible is checkpointed before it raises
+        done = self.item.get('deleteCascadeSteps', set())
+        error = None
+        with ThreadPoolExecutor(max_workers=self.delete_cascade_max_workers) as executor:
+            futures = {executor.submit(func): step for step, func in steps.items() if step not in done}
+            for future in as_completed(futures):
+                if future.exception():
+                    error = error or future.exception()
+                else:
+                    self.dynamo.add_delete_cascade_step(self.id, futures[future])
+        if error:
+            raise error
 
-        # do the deletes for real
-        self.s3_uploads_client.delete_objects_with_prefix(self.s3_prefix)
         if self.image_item:
             self.image_dynamo.delete(self.id)
         self.original_metadata_dynamo.delete(self.id)
         self.dynamo.delete_post(self.id)
-
         return self
 
     def set(
@@ -476,38 +574,29 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         )
         return self
 
-    def set_height_and_width(self):
-        width, height = self.native_jpeg_cache.readonly_image.size
-        self._image_item = self.image_dynamo.set_height_and_width(self.id, height, width)
-        return self
-
-    def set_colors(self):
+    def get_colors(self):
+        "Upon failure, log a WARNING and return None"
         try:
-            colors = ColorThiefFromImage(self.native_jpeg_cache.readonly_image).get_palette(color_count=5)
+            # the 480p thumbnail gives nearly the same palette as the native image, at a fraction of the cost
+            return get_palette(self.p480_jpeg_cache.readonly_image, color_count=5)
         except Exception as err:
             logger.warning(f'ColorTheif failed to get palette with error `{err}` for post `{self.id}`')
-        else:
-            self._image_item = self.image_dynamo.set_colors(self.id, colors)
-        return self
+            return None
 
-    def set_checksum(self):
-        path = self.get_image_path(image_size.NATIVE)
-        checksum = self.s3_uploads_client.get_object_checksum(path)
-        self.item = self.dynamo.set_checksum(self.id, self.item['postedAt'], checksum)
-        return self
+    def get_perceptual_hash(self):
+        try:
+            return dhash(self.p64_jpeg_cache.readonly_image)
+        except Exception as err:
+            logger.warning(f'Unable to compute perceptual hash for post `{self.id}`: {err}')
+            return None
 
-    def set_is_verified(self):
+    def get_is_verified(self, image_format=None, original_format=None, taken_in_real=None):
+        "Ask the post verification service. Safe to call from a worker thread, as it reads no dynamo state."
         path = self.get_image_path(image_size.NATIVE)
         image_url = self.cloudfront_client.generate_presigned_url(path, ['GET', 'HEAD'])
-        is_verified = self.post_verification_client.verify_image(
-            image_url,
-            image_format=self.image_item.get('imageFormat'),
-            original_format=self.image_item.get('originalFormat'),
-            taken_in_real=self.image_item.get('takenInReal'),
+        return self.post_verification_client.verify_image(
+            image_url, image_format=image_format, original_format=original_format, taken_in_real=taken_in_real
         )
-        hidden = self.item.get('verificationHidden', False)
-        self.item = self.dynamo.set_is_verified(self.id, is_verified, hidden=hidden)
-        return self
 
     def set_expires_at(self, expires_at):
         prev_item = self.item.copy() if 'expiresAt' in self.item else None
@@ -534,8 +623,7 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
             if album.user_id != self.user_id:
                 raise PostException(f'Album `{album_id}` and post `{self.id}` belong to different users')
             if self.status == PostStatus.COMPLETED:
-                album = album.increment_rank_count()
-                album_rank = album.get_last_rank() if album else None
+                album_rank = album_rank_between(self.dynamo.get_last_album_rank(album_id), None)
         if album_id and not album:
             raise PostException(f'Album `{album_id}` does not exist')
 
@@ -558,32 +646,26 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
                 raise PostException(f'Preceding post `{preceding_post_id}` is not in album post is in')
 
         before_rank = preceding_post.item['gsiK3SortKey'] if preceding_post else None
-        after_post_id = next(self.dynamo.generate_post_ids_in_album(album_id, after_rank=before_rank), None)
+        after_post_id, after_rank = self.dynamo.get_next_in_album(album_id, after_rank=before_rank)
         if after_post_id == self.id:
             # we're already in that position. No-op
             return
 
         album = self.album_manager.get_album(album_id)
-        album = album.increment_rank_count() if album else None
         if not album:
             # album has disappeared, so remove the post from the album
             self.item = self.dynamo.set_album_id(self.item, None)
             # fail with server error - api client did nothing wrong
             raise Exception(f'Album `{album_id}` that post `{self.id}` was in does not exist')
 
-        # determine the post's new rank
-        if before_rank is not None:
-            if after_post_id:
-                # putting the post in between two posts
-                after_post = self.post_manager.get_post(after_post_id)
-                after_rank = after_post.item['gsiK3SortKey']
-                album_rank = (before_rank + after_rank) / 2
-            else:
-                # putting the post at the back
-                album_rank = album.get_last_rank()
-        else:
-            # putting the post at the front
-            album_rank = album.get_first_rank()
+        # the new rank goes between the neighbors' ranks. If they've run out of room between them
+        # (ex: after many reorders in the same spot, or tied by concurrent appends), respace the album first
+        album_rank = album_rank_between(before_rank, after_rank)
+        if album_rank is None:
+            album_ranks = self.post_manager.rebalance_album_ranks(album_id)
+            before_rank = album_ranks.get(preceding_post_id) if preceding_post else None
+            after_rank = album_ranks.get(after_post_id)
+            album_rank = album_rank_between(before_rank, after_rank)
 
         self.item = self.dynamo.set_album_rank(self.id, album_rank)
         return self
@@ -605,7 +687,7 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
 
         # record user's view of their own post, but don't increment any counters about it
         # their view will be filtered out when looking at Post.viewedBy
-        is_new_view = super().record_view_count(user_id, view_count, viewed_at=viewed_at)
+        super().record_view_count(user_id, view_count, viewed_at=viewed_at)
 
         if self.user_id == user_id:
             return True  # post owner's views don't count for trending, etc.
@@ -615,10 +697,7 @@ class Post(FlagModelMixin, TrendingModelMixin, ViewModelMixin):
         if recorded:
             self.user.trending_increment_score(**trending_kwargs)
 
-        # record the viewedBy on the post and user
-        if is_new_view:
-            self.dynamo.increment_viewed_by_count(self.id)
-            self.user_manager.dynamo.increment_post_viewed_by_count(self.user_id)
+        # the viewedBy counts of the post and user are incremented by the stream handlers, on the view's creation
 
         # If this is a non-original post, count this like a view of the original post as well
         if self.original_post_id != self.id:
@@ -1,5 +1,11 @@
+import bisect
+import collections
+import functools
+import hashlib
+import itertools
 import logging
 import os.path
+import threading
 
 import PIL.Image
 import PIL.ImageDraw
@@ -8,90 +14,110 @@ import PIL.ImageFont
 font_path = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'fonts', 'OpenSans-Regular.ttf')
 logger = logging.getLogger()
 
+# A 4k image takes up ~24MB, so only the most recently rendered few are kept.
+# Keyed by a hash of the text, so long texts aren't held onto by the cache keys.
+# Album art tiles are rendered from worker threads, so the cache is only touched under the lock.
+rendered_images = collections.OrderedDict()
+rendered_images_max_size = 4
+rendered_images_lock = threading.Lock()
 
-def generate_text_image(text, dimensions, font_size=None):
-    "Generate an image with text nicely wrapped and centered"
-    assert text, 'Must be called with some text to render'
-
-    image_width, image_height = dimensions
-    image_aspect_ratio = image_width / image_height
-    img = PIL.Image.new('RGB', dimensions)
 
-    font_size = font_size or image_height // 10
+@functools.lru_cache(maxsize=None)
+def get_font(font_size):
+    "Loading a font from disk is relatively slow, so they are loaded once per size and reused"
+    return PIL.ImageFont.truetype(font_path, size=font_size)
 
-    with open(font_path, 'rb') as fh:
-        font = PIL.ImageFont.truetype(fh, size=font_size)
 
-    # we want our text to match, more or less, the aspect ratio of the overall image
-    draw = PIL.ImageDraw.Draw(img)
-
-    # determine how big horizontal and vertical spaces are
+@functools.lru_cache(maxsize=None)
+def get_spacing(font_size):
+    "Returns (token_spacing, line_spacing, line_height) for the font of the given size"
+    font = get_font(font_size)
+    draw = PIL.ImageDraw.Draw(PIL.Image.new('RGB', (1, 1)))
     size_1 = draw.textsize('Z Z', font=font)
     size_2 = draw.textsize('Z\nZ', font=font)
-    token_spacing = size_1[0] - 2 * size_2[0]
-    line_height = size_1[1]
-    line_spacing = size_2[1] - 2 * size_1[1]
+    return size_1[0] - 2 * size_2[0], size_2[1] - 2 * size_1[1], size_1[1]
 
-    # tokenize then wrap the text so it looks good
-    raw_tokens = text.split()
-    token_widths = [draw.textsize(raw_token, font=font)[0] for raw_token in raw_tokens]
-    text, text_width, text_height = rectangle_wrap(
-        raw_tokens, token_widths, token_spacing, line_spacing, line_height, image_aspect_ratio
-    )
 
-    logger.debug(f'Computed text size: ({text_width}, {text_height})')
-    logger.debug(f'Actual text size:   {draw.textsize(text, font=font)}')
+def generate_text_image(text, dimensions, render_dimensions=None):
+    """
+    Generate an image with text nicely wrapped and centered.
 
-    # if it's too big to fit in the image, shrink the font size and re-run the algo
-    max_text_width = image_width * 0.9
-    if text_width > max_text_width:
-        font_size = int(font_size * max_text_width / text_width)
-        return generate_text_image(text, dimensions, font_size=font_size)
+    If `render_dimensions` is given and the rendering at that (larger) size is cached, it is
+    downscaled to `dimensions` rather than rendering the text again.
 
-    # write out the text in center of the image
-    xy = ((image_width - text_width) / 2, (image_height - text_height) / 2 - line_spacing / 2)
-    draw.text(xy, text, align='center', fill=(255, 255, 255), font=font)
+    The most recently rendered images are cached, so treat the returned image as readonly:
+    use image.copy() first if you want to make changes.
+    """
+    assert text, 'Must be called with some text to render'
+    text_hash = hashlib.sha256(text.encode()).hexdigest()
+    img = get_rendered_image((text_hash, tuple(dimensions)))
+    if img is not None:
+        return img
+    rendered = get_rendered_image((text_hash, tuple(render_dimensions))) if render_dimensions else None
+    if rendered is not None:
+        img = rendered.resize(dimensions, resample=PIL.Image.LANCZOS)
+    else:
+        img = render_text_image(text, dimensions)
+    with rendered_images_lock:
+        rendered_images[(text_hash, tuple(dimensions))] = img
+        while len(rendered_images) > rendered_images_max_size:
+            rendered_images.popitem(last=False)
     return img
 
 
-class Token:
-    "A word in a variable-width font"
-
-    def __init__(self, token, token_width):
-        self._token = token
-        self._token_width = token_width
-
-    def __str__(self):
-        return self._token
+def get_rendered_image(key):
+    "Get an image from the cache, marking it as the most recently used. None if not cached."
+    with rendered_images_lock:
+        img = rendered_images.get(key)
+        if img is not None:
+            rendered_images.move_to_end(key)
+        return img
 
-    def __len__(self):
-        return self._token_width
 
+def render_text_image(text, dimensions):
+    image_width, image_height = dimensions
+    image_aspect_ratio = image_width / image_height
+    max_text_width = image_width * 0.9
+    raw_tokens = text.split()
 
-class Line:
-    "A line of text in a variable-width font"
-
-    def __init__(self, tokens, token_spacing):
-        self._tokens = tokens
-        self._token_spacing = token_spacing
-
-    @property
-    def first_token(self):
-        return self._tokens[0] if self._tokens else None
-
-    def pop_first_token(self):
-        return self._tokens.pop(0)
+    # if it's too big to fit in the image, shrink the font size and re-run the algo
+    font_size = image_height // 10
+    while True:
+        font = get_font(font_size)
+        token_spacing, line_spacing, line_height = get_spacing(font_size)
+        # measure each distinct token just once
+        widths = {raw_token: font.getsize(raw_token)[0] for raw_token in set(raw_tokens)}
+        token_widths = [widths[raw_token] for raw_token in raw_tokens]
+        wrapped_text, text_width, text_height = rectangle_wrap(
+            raw_tokens, token_widths, token_spacing, line_spacing, line_height, image_aspect_ratio
+        )
+        if text_width <= max_text_width or font_size <= 1:
+            break
+        font_size = max(min(int(font_size * max_text_width / text_width), font_size - 1), 1)
+
+    logger.debug(f'Computed text size: ({text_width}, {text_height}) at font size {font_size}')
 
-    def append_token(self, token):
-        self._tokens.append(token)
+    # write out the text in center of the image
+    img = PIL.Image.new('RGB', dimensions)
+    draw = PIL.ImageDraw.Draw(img)
+    xy = ((image_width - text_width) / 2, (image_height - text_height) / 2 - line_spacing / 2)
+    draw.text(xy, wrapped_text, align='center', fill=(255, 255, 255), font=font)
+    return img
 
-    def __str__(self):
-        return ' '.join(str(t) for t in self._tokens)
 
-    def __len__(self):
-        if not self._tokens:
-            return 0
-        return sum(len(t) for t in self._tokens) + (len(self._tokens) - 1) * self._token_spacing
+def wrap_lines(token_ends, token_spacing, max_line_width):
+    """
+    Greedily fill lines no wider than `max_line_width`, except where a single token is wider.
+    `token_ends` is the running total of token width plus spacing, starting from zero.
+    Returns the (start, end) token indexes of each line.
+    """
+    lines, start, token_cnt = [], 0, len(token_ends) - 1
+    while start < token_cnt:
+        end = bisect.bisect_right(token_ends, token_ends[start] + max_line_width + token_spacing) - 1
+        end = min(max(end, start + 1), token_cnt)
+        lines.append((start, end))
+        start = end
+    return lines
 
 
 def rectangle_wrap(raw_tokens, token_widths, token_spacing, line_spacing, line_height, desired_aspect_ratio):
@@ -101,47 +127,29 @@ def rectangle_wrap(raw_tokens, token_widths, token_spacing, line_spacing, line_h
 
     Note that python standard library textwrap module assumes a monospace font, where as this
     utility is designed to work with variable width font.
+
+    Binary searches for the narrowest line width at which the wrapped text is at least as wide,
+    relative to its height, as the desired aspect ratio. Each candidate is wrapped greedily
+    with a bisect per line, so the whole is O(n log(n) log(total width)).
     """
-    tokens = [Token(*args) for args in zip(raw_tokens, token_widths)]
-
-    # start all tokens in separate lines, we will iteratively move tokens up lines
-    lines = [Line([token], token_spacing) for token in tokens]
-    text_width = max(len(line) for line in lines)
-    text_height = len(lines) * line_height + (len(lines) - 1) * line_spacing
-
-    # iteratively flow tokens up the paragraph until we have just passed our desired aspect ratio
-    while (line_cnt := len(lines)) > 1 and text_width / text_height < desired_aspect_ratio:
-
-        # operate until we have shrunk our line cnt
-        while len(lines) == line_cnt:
-
-            # determine what our next text_width needs to be to change the token distribution
-            this_line, next_line = lines[0], lines[1]
-            min_new_text_width = len(this_line) + token_spacing + len(next_line.first_token)
-            line_num_to_grow = 0
-            for i, this_line in enumerate(lines[1:-1]):
-                next_line = lines[i + 2]
-                this_new_text_width = len(this_line) + token_spacing + len(next_line.first_token)
-                if this_new_text_width < min_new_text_width:
-                    min_new_text_width = this_new_text_width
-                    line_num_to_grow = i
-
-            # flow tokens up for subsequent lines
-            line_num = line_num_to_grow
-            while line_num < len(lines) - 1:
-                this_line, next_line = lines[line_num], lines[line_num + 1]
-                if len(next_line) == 0:
-                    lines.pop(line_num + 1)
-                    break
-                new_line_width = len(this_line) + token_spacing + len(next_line.first_token)
-                if new_line_width <= min_new_text_width:
-                    this_line.append_token(next_line.pop_first_token())
-                    continue
-                line_num += 1
-
-        # re-compute our overall size
-        text_width = max(len(line) for line in lines)
+    token_ends = list(itertools.accumulate((width + token_spacing for width in token_widths), initial=0))
+
+    def layout(max_line_width):
+        lines = wrap_lines(token_ends, token_spacing, max_line_width)
+        text_width = max(token_ends[end] - token_ends[start] - token_spacing for start, end in lines)
         text_height = len(lines) * line_height + (len(lines) - 1) * line_spacing
+        return lines, text_width, text_height
+
+    low, high = max(token_widths), token_ends[-1] - token_spacing
+    while low < high:
+        mid = (low + high) // 2
+        _, text_width, text_height = layout(mid)
+        if text_width / text_height >= desired_aspect_ratio:
+            high = mid
+        else:
+            low = mid + 1
+    lines, text_width, text_height = layout(low)
 
     # serialize to our rectangle of text
-    return ('\n'.join(str(line) for line in lines), text_width, text_height)
+    text = '\n'.join(' '.join(raw_tokens[start:end]) for start, end in lines)
+    return (text, text_width, text_height)
@@ -26,6 +26,11 @@ class UserDynamo:
     def get_user(self, user_id, strongly_consistent=False):
         return self.client.get_item(self.pk(user_id), ConsistentRead=strongly_consistent)
 
+    def generate_users(self, user_ids, projection_expression=None):
+        "Fetch multiple users with batch gets. Order *not* maintained, users not found are skipped."
+        keys = (self.pk(user_id) for user_id in user_ids)
+        return self.client.generate_all_batch_get(keys, projection_expression=projection_expression)
+
     def get_user_by_username(self, username):
         query_kwargs = {
             'KeyConditionExpression': Key('gsiA1PartitionKey').eq(f'username/{username}'),
@@ -102,7 +107,8 @@ class UserDynamo:
         }
         return self.client.update_item(query_kwargs)
 
-    def set_user_photo_post_id(self, user_id, photo_id):
+    def set_user_photo_post_id(self, user_id, photo_id, variant_formats=None):
+        "`variant_formats` are the formats, other than jpeg, in which the photo thumbnails are available"
         query_kwargs = {
             'Key': self.pk(user_id),
         }
@@ -110,8 +116,13 @@ class UserDynamo:
         if photo_id:
             query_kwargs['UpdateExpression'] = 'SET photoPostId = :ppid'
             query_kwargs['ExpressionAttributeValues'] = {':ppid': photo_id}
+            if variant_formats:
+                query_kwargs['UpdateExpression'] += ', photoVariantFormats = :pvf'
+                query_kwargs['ExpressionAttributeValues'][':pvf'] = variant_formats
+            else:
+                query_kwargs['UpdateExpression'] += ' REMOVE photoVariantFormats'
         else:
-            query_kwargs['UpdateExpression'] = 'REMOVE photoPostId'
+            query_kwargs['UpdateExpression'] = 'REMOVE photoPostId, photoVariantFormats'
 
         return self.client.update_item(query_kwargs)
 
@@ -131,6 +142,25 @@ class UserDynamo:
             query_kwargs['ExpressionAttributeValues'][':lda'] = now.to_iso8601_string()
         return self.client.update_item(query_kwargs)
 
+    def set_user_deleting(self, user_id, now=None):
+        "Mark the user as deleting, stamped with when that was requested"
+        now = now or pendulum.now('utc')
+        query_kwargs = {
+            'Key': self.pk(user_id),
+            'UpdateExpression': 'SET userStatus = :s, deletingAt = :da',
+            'ExpressionAttributeValues': {':s': UserStatus.DELETING, ':da': now.to_iso8601_string()},
+        }
+        return self.client.update_item(query_kwargs)
+
+    def add_delete_cascade_step(self, user_id, step):
+        "Record that `step` of the deletion cascade of the user is done"
+        query_kwargs = {
+            'Key': self.pk(user_id),
+            'UpdateExpression': 'ADD deleteCascadeSteps :step',
+            'ExpressionAttributeValues': {':step': {step}},
+        }
+        return self.client.update_item(query_kwargs)
+
     def set_user_privacy_status(self, user_id, privacy_status):
         assert privacy_status in UserPrivacyStatus._ALL, f'Invalid privacy_status `{privacy_status}`'
         query_kwargs = {
@@ -164,7 +194,7 @@ class UserDynamo:
         likes_disabled=None,
         sharing_disabled=None,
         verification_hidden=None,
-        birthday=None
+        birthday=None,
     ):
         "To ignore an attribute, leave it set to None. To delete an attribute, set it to the empty string."
         expression_actions = collections.defaultdict(list)
@@ -279,6 +309,17 @@ class UserDynamo:
         failure_warning = f'Failed to update lastPostViewAt for user `{user_id}`'
         return self.client.update_item(query_kwargs, failure_warning=failure_warning)
 
+    def set_chats_with_unviewed_messages_count(self, user_id, count):
+        "Best-effort attempt to set chatsWithUnviewedMessagesCount. Logs a WARNING upon failure."
+        query_kwargs = {'Key': self.pk(user_id)}
+        if count:
+            query_kwargs['UpdateExpression'] = 'SET chatsWithUnviewedMessagesCount = :cnt'
+            query_kwargs['ExpressionAttributeValues'] = {':cnt': count}
+        else:
+            query_kwargs['UpdateExpression'] = 'REMOVE chatsWithUnviewedMessagesCount'
+        failure_warning = f'Failed to set chatsWithUnviewedMessagesCount for user `{user_id}`'
+        return self.client.update_item(query_kwargs, failure_warning=failure_warning)
+
     def increment_album_count(self, user_id):
         return self.client.increment_count(self.pk(user_id), 'albumCount')
 
@@ -306,20 +347,14 @@ class UserDynamo:
     def increment_chat_messages_forced_deletion_count(self, user_id):
         return self.client.increment_count(self.pk(user_id), 'chatMessagesForcedDeletionCount')
 
-    def increment_chats_with_unviewed_messages_count(self, user_id):
-        return self.client.increment_count(self.pk(user_id), 'chatsWithUnviewedMessagesCount')
-
-    def decrement_chats_with_unviewed_messages_count(self, user_id):
-        return self.client.decrement_count(self.pk(user_id), 'chatsWithUnviewedMessagesCount')
-
     def increment_comment_count(self, user_id):
         return self.client.increment_count(self.pk(user_id), 'commentCount')
 
     def decrement_comment_count(self, user_id):
-        return self.client.decrement_count(self.pk(user_id), 'commentCount')
+        return self.client.add_count_delta(self.pk(user_id), 'commentCount', -1)
 
     def increment_comment_deleted_count(self, user_id):
-        return self.client.increment_count(self.pk(user_id), 'commentDeletedCount')
+        return self.client.add_count_delta(self.pk(user_id), 'commentDeletedCount', 1)
 
     def increment_comment_forced_deletion_count(self, user_id):
         return self.client.increment_count(self.pk(user_id), 'commentForcedDeletionCount')
@@ -361,4 +396,4 @@ class UserDynamo:
         return self.client.increment_count(self.pk(user_id), 'postForcedArchivingCount')
 
     def increment_post_viewed_by_count(self, user_id):
-        return self.client.increment_count(self.pk(user_id), 'postViewedByCount')
+        return self.client.add_count_delta(self.pk(user_id), 'postViewedByCount', 1)
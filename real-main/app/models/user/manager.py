@@ -1,7 +1,10 @@
+import collections
 import logging
 import os
 import random
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from functools import partialmethod
 
 import pendulum
@@ -41,6 +44,8 @@ class UserManager(TrendingManagerMixin, ManagerBase):
     ]
     username_tag_regex = re.compile('@' + UserValidate.username_regex.pattern)
     item_type = 'user'
+    username_cache_max_size = 4096
+    resolve_usernames_max_workers = 8
 
     def __init__(self, clients, managers=None, placeholder_photos_directory=S3_PLACEHOLDER_PHOTOS_DIRECTORY):
         super().__init__(clients, managers=managers)
@@ -66,6 +71,10 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         self.validate = UserValidate()
         self.placeholder_photos_directory = placeholder_photos_directory
 
+        # username -> userId, least recently used first
+        self._username_cache = collections.OrderedDict()
+        self._username_cache_lock = threading.Lock()
+
     @property
     def real_user_id(self):
         "The userId of the 'real' user, if they exist"
@@ -214,6 +223,12 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         if real_user and real_user.id != user.id:
             self.follower_manager.request_to_follow(user, real_user)
 
+    def run_delete_cascade(self, user_id):
+        "Run the delete cascade of a user, if they are still marked as deleting"
+        user = self.get_user(user_id, strongly_consistent=True)
+        if user and user.status == UserStatus.DELETING:
+            user.delete_cascade()
+
     def get_text_tags(self, text):
         """
         Given a fragment of text, return a list of objects of form
@@ -221,13 +236,40 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         representing all the users tagged in the text.
         """
         username_tags = set(re.findall(self.username_tag_regex, text))
-        # note that dynamo does not support batch gets using GSI's, and the username is in a GSI
-        text_tags = []
-        for tag in username_tags:
-            user_item = self.dynamo.get_user_by_username(tag[1:])
-            if user_item:
-                text_tags.append({'tag': tag, 'userId': user_item['userId']})
-        return text_tags
+        user_ids = self.resolve_usernames([tag[1:] for tag in username_tags])
+        return [{'tag': tag, 'userId': user_ids[tag[1:]]} for tag in username_tags if user_ids[tag[1:]]]
+
+    def resolve_usernames(self, usernames):
+        """
+        Return a dict mapping each of `usernames` to the userId of the user with that username, or to None.
+
+        The userIds of usernames resolved before are cached, and confirmed with one batch get of those users,
+        as usernames can change. The rest are looked up concurrently, as dynamo does not support batch gets
+        using GSI's, and the username is in a GSI.
+        """
+        with self._username_cache_lock:
+            cached = {username: self._username_cache.get(username) for username in usernames}
+        user_ids = dict.fromkeys(usernames)
+        if cached_user_ids := {user_id: username for username, user_id in cached.items() if user_id}:
+            for item in self.dynamo.generate_users(cached_user_ids, projection_expression='userId, username'):
+                if item.get('username') == cached_user_ids[item['userId']]:
+                    user_ids[item['username']] = item['userId']
+
+        if misses := [username for username, user_id in user_ids.items() if not user_id]:
+            with ThreadPoolExecutor(max_workers=self.resolve_usernames_max_workers) as executor:
+                user_items = list(executor.map(self.dynamo.get_user_by_username, misses))
+            user_ids.update((username, item['userId']) for username, item in zip(misses, user_items) if item)
+
+        with self._username_cache_lock:
+            for username, user_id in user_ids.items():
+                if user_id:
+                    self._username_cache[username] = user_id
+                    self._username_cache.move_to_end(username)
+                else:
+                    self._username_cache.pop(username, None)
+            while len(self._username_cache) > self.username_cache_max_size:
+                self._username_cache.popitem(last=False)
+        return user_ids
 
     def clear_expired_subscriptions(self, now=None):
         "Clear expired subscriptions. Return a count of how many were cleared"
@@ -303,16 +345,29 @@ class UserManager(TrendingManagerMixin, ManagerBase):
         if status == UserStatus.DELETING:
             self.pinpoint_client.delete_user_endpoints(user_id)
 
-    def sync_chats_with_unviewed_messages_count(self, chat_id, new_item=None, old_item=None):
-        "Sync User.chatsWithUnviewedMessagesCount to changes to chat member items"
-        # digging kinda deep into the chat member object from here... should probably make a ChatMember class
-        user_id = (new_item or old_item)['sortKey'].split('/')[1]
-        new_count = (new_item or {}).get('messagesUnviewedCount', 0)
-        old_count = (old_item or {}).get('messagesUnviewedCount', 0)
-        if old_count == 0 and new_count > 0:
-            self.dynamo.increment_chats_with_unviewed_messages_count(user_id)
-        if old_count > 0 and new_count == 0:
-            self.dynamo.decrement_chats_with_unviewed_messages_count(user_id)
+    def resync_pinpoint_endpoints(self, user_items):
+        """
+        Bring the pinpoint endpoints of many users in line with their profile items, in bulk.
+        Returns the number of endpoints changed.
+        """
+        users_addresses, inactive_user_ids, deleting_user_ids = {}, [], []
+        for item in user_items:
+            user_id, status = item['userId'], item.get('userStatus', UserStatus.ACTIVE)
+            if status == UserStatus.DELETING:
+                deleting_user_ids.append(user_id)
+                continue
+            if status == UserStatus.DISABLED:
+                inactive_user_ids.append(user_id)
+            users_addresses[user_id] = {'EMAIL': item.get('email'), 'SMS': item.get('phoneNumber')}
+        for user_id in deleting_user_ids:
+            self.pinpoint_client.delete_user_endpoints(user_id)
+        return self.pinpoint_client.resync_users_endpoints(users_addresses, inactive_user_ids=inactive_user_ids)
+
+    def sync_chats_with_unviewed_messages_count(self, user_id, new_item, old_item=None):
+        "Sync User.chatsWithUnviewedMessagesCount to changes to the user's chat inbox item"
+        self.dynamo.set_chats_with_unviewed_messages_count(
+            user_id, new_item.get('chatsWithUnviewedMessagesCount', 0)
+        )
 
     def sync_follow_counts_due_to_follow_status(self, followed_user_id, new_item=None, old_item=None):
         follower_user_id = (new_item or old_item)['sortKey'].split('/')[1]
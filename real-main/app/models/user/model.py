@@ -1,5 +1,7 @@
+import itertools
 import logging
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import pendulum
 import stringcase
@@ -26,9 +28,18 @@ CONTACT_ATTRIBUTE_NAMES = {
 
 class User(TrendingModelMixin):
 
-    client_names = ['cloudfront', 'cognito', 'elasticsearch', 'dynamo', 'pinpoint', 's3_uploads']
+    client_names = [
+        'cloudfront',
+        'cognito',
+        'elasticsearch',
+        'dynamo',
+        'pinpoint',
+        's3_uploads',
+        'sqs_delete_cascade',
+    ]
     item_type = 'user'
     subscription_bonus_duration = pendulum.duration(months=3)
+    delete_cascade_max_workers = 8
 
     def __init__(
         self,
@@ -164,49 +175,80 @@ class User(TrendingModelMixin):
             raise Exception(f'Unrecognized user status `{self.status}`')
         return self
 
-    def delete(self, skip_cognito=False):
-        if self.status != UserStatus.DELETING:
-            self.item = self.dynamo.set_user_status(self.id, UserStatus.DELETING)
-
-        # for REQUESTED and DENIED, just delete them
-        # for FOLLOWING, unfollow so that the other user's counts remain correct
-        self.follower_manager.reset_followed_items(self.id)
-        self.follower_manager.reset_follower_items(self.id)
-
-        # unflag everything we've flagged
-        self.post_manager.unflag_all_by_user(self.id)
-        self.comment_manager.unflag_all_by_user(self.id)
+    def delete(self, now=None):
+        """
+        Mark the user as deleting and delete their cognito entries. The rest of the deletion, the cost of which
+        grows with everything the user has done, is queued to be done by `delete_cascade` in the background.
+        Deleting a user that is already deleting queues its cascade again.
+        """
+        self.item = self.dynamo.set_user_deleting(self.id, now=now)
+        self.sqs_delete_cascade_client.send_message({'itemType': 'user', 'itemId': self.id})
 
-        # delete all our likes & comments & albums & posts
-        self.like_manager.dislike_all_by_user(self.id)
-        self.comment_manager.delete_all_by_user(self.id)
-        self.album_manager.delete_all_by_user(self.id)
-        self.post_manager.delete_all_by_user(self.id)
-
-        # remove all blocks of and by us
-        self.block_manager.unblock_all_blocks(self.id)
+        # The cascade is queued first, so that if this fails the user can still sign in to try again
+        try:
+            self.cognito_client.delete_user_pool_entry(self.id)
+        except self.cognito_client.user_pool_client.exceptions.UserNotFoundException:
+            logger.warning(f'No cognito user pool entry found when deleting user `{self.id}`')
+        self.cognito_client.delete_identity_pool_entry(self.id)
+        return self
 
-        # leave all chats we are part of (auto-deletes direct & solo chats)
-        self.chat_manager.leave_all_chats(self.id)
+    def delete_cascade(self, release_username=False):
+        """
+        Delete all that hangs off the user, and then the user themselves.
+        Each step is idempotent and is checkpointed on the user item once done, so an interrupted
+        cascade that is run again picks up where it left off.
+        Cognito entries are left as they are. Set `release_username` to release the user's username there.
+        """
+        if self.status != UserStatus.DELETING:
+            self.item = self.dynamo.set_user_status(self.id, UserStatus.DELETING)
 
-        # remove our trending item, if it's there
-        self.trending_delete()
+        steps = {
+            # for REQUESTED and DENIED, just delete them
+            # for FOLLOWING, unfollow so that the other user's counts remain correct
+            'followeds': lambda: self.follower_manager.reset_followed_items(self.id),
+            'followers': lambda: self.follower_manager.reset_follower_items(self.id),
+            # unflag everything we've flagged
+            'postFlags': lambda: self.post_manager.unflag_all_by_user(self.id),
+            'commentFlags': lambda: self.comment_manager.unflag_all_by_user(self.id),
+            # delete all our likes & comments & albums & posts
+            'likes': lambda: self.like_manager.dislike_all_by_user(self.id),
+            'comments': lambda: self.comment_manager.delete_all_by_user(self.id),
+            'albums': lambda: self.album_manager.delete_all_by_user(self.id),
+            'posts': lambda: self.post_manager.delete_all_by_user(self.id),
+            # remove all blocks of and by us
+            'blocks': lambda: self.block_manager.unblock_all_blocks(self.id),
+            # leave all chats we are part of (auto-deletes direct & solo chats)
+            'chats': lambda: self.chat_manager.leave_all_chats(self.id),
+            # remove our trending item, if it's there
+            'trending': self.trending_delete,
+            # delete current and old profile photos
+            'photos': self.clear_photo_s3_objects,
+        }
 
-        # delete current and old profile photos
-        self.clear_photo_s3_objects()
+        # the steps are independent of one another, so they run concurrently. Checkpoints all go to the
+        # same user item, so they're written from this thread as steps finish. A failed step doesn't cancel
+        # the others, so as much as possible is checkpointed before it raises
+        done = self.item.get('deleteCascadeSteps', set())
+        error = None
+        with ThreadPoolExecutor(max_workers=self.delete_cascade_max_workers) as executor:
+            futures = {executor.submit(func): step for step, func in steps.items() if step not in done}
+            for future in as_completed(futures):
+                if future.exception():
+                    error = error or future.exception()
+                else:
+                    self.dynamo.add_delete_cascade_step(self.id, futures[future])
+        if error:
+            raise error
 
         # delete our own profile. Leave our stale item around so we can serialize
         self.dynamo.delete_user(self.id)
 
-        if skip_cognito:
+        if release_username:
             # release our preferred_username from cognito
             try:
                 self.cognito_client.clear_user_attribute(self.id, 'preferred_username')
             except self.cognito_client.user_pool_client.exceptions.UserNotFoundException:
                 logger.warning(f'No cognito user pool entry found when deleting user `{self.id}`')
-        else:
-            self.cognito_client.delete_user_pool_entry(self.id)
-            self.cognito_client.delete_identity_pool_entry(self.id)
 
         return self
 
@@ -285,21 +327,30 @@ class User(TrendingModelMixin):
                 raise UserException(f'Post `{post_id}` is not verified')
 
             # add the new s3 objects
-            self.add_photo_s3_objects(post)
+            variant_formats = self.add_photo_s3_objects(post)
+        else:
+            variant_formats = None
 
         # then dynamo
-        self.item = self.dynamo.set_user_photo_post_id(self.id, post_id)
+        self.item = self.dynamo.set_user_photo_post_id(self.id, post_id, variant_formats=variant_formats)
 
         # Leave the old images around as their may be existing urls out there that point to them
         # Could schedule a job to delete them a hour from now
         return self
 
     def add_photo_s3_objects(self, post):
+        "Returns a list of the formats, other than jpeg, that the photo thumbnails are also available in"
         assert post.type == PostType.IMAGE
-        for size in image_size.JPEGS:
-            source_path = post.get_s3_image_path(size)
-            dest_path = self.get_photo_path(size, photo_post_id=post.id)
-            self.s3_uploads_client.copy_object(source_path, dest_path)
+        variant_formats = (post.image_item or {}).get('variantFormats', [])
+        variant_sizes = [
+            size for image_format in variant_formats for size in image_size.VARIANT_FORMATS[image_format]
+        ]
+        with self.s3_uploads_client.uploader() as uploader:
+            for size in itertools.chain(image_size.JPEGS, variant_sizes):
+                source_path = post.get_s3_image_path(size)
+                dest_path = self.get_photo_path(size, photo_post_id=post.id)
+                uploader.copy_object(source_path, dest_path)
+        return variant_formats
 
     def update_details(
         self,
@@ -0,0 +1,180 @@
+import collections
+import contextlib
+import io
+import resource
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import colorthief
+import PIL.Image
+import PIL.ImageOps
+
+from app.utils import image_size
+
+EXIF_ORIENTATION_TAG = 0x0112
+# exif orientations under which the stored image is rotated a quarter turn from how it should be displayed
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+class ColorThiefFromImage(colorthief.ColorThief):
+    def __init__(self, image):
+        self.image = image
+
+
+class ImageMetrics:
+    "Records the wall time and memory use of each stage of processing an image"
+
+    def __init__(self):
+        self.stages = []
+
+    @contextlib.contextmanager
+    def stage(self, name, image=None):
+        start = time.perf_counter()
+        yield
+        self.stages.append(
+            {
+                'stage': name,
+                'seconds': round(time.perf_counter() - start, 4),
+                'imageMB': round(image_mb(image), 1) if image else None,
+                'peakRssMB': peak_rss_mb(),
+            }
+        )
+
+
+def image_mb(image):
+    return image.width * image.height * len(image.getbands()) / 2 ** 20
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+
+
+def fit_dimensions(dimensions, max_dimensions):
+    "The dimensions `dimensions` will shrink to when thumbnailed to fit within `max_dimensions`"
+    width, height = dimensions
+    scale = min(max_dimensions[0] / width, max_dimensions[1] / height, 1)
+    return max(round(width * scale), 1), max(round(height * scale), 1)
+
+
+def open_image(fh, max_dimensions=None):
+    """
+    Open and decode an image, respecting its exif orientation.
+
+    If `max_dimensions` is given and the image is a jpeg, it's decoded at the smallest
+    scale (down to 1/8) that's still big enough to be thumbnailed to `max_dimensions`.
+    Decoding at a reduced scale is much faster and uses a fraction of the memory.
+    """
+    image = PIL.Image.open(fh)
+    orientation = image.getexif().get(EXIF_ORIENTATION_TAG)
+    if max_dimensions and image.format == 'JPEG':
+        if orientation in TRANSPOSED_ORIENTATIONS:
+            max_dimensions = max_dimensions[::-1]
+        image.draft(image.mode, fit_dimensions(image.size, max_dimensions))
+    if orientation and orientation != 1:
+        return PIL.ImageOps.exif_transpose(image)
+    image.load()
+    return image
+
+
+def with_variants(sizes):
+    "Each of the thumbnail `sizes`, followed by those of its optional variants that can be produced here"
+    return tuple(size_or_variant for size in sizes for size_or_variant in (size, *get_variants(size)))
+
+
+def derive_image_set(source, sizes, metrics=None, max_workers=4):
+    """
+    Derive an encoded image of each of `sizes` from the decoded `source` image, which is not modified.
+    `sizes` must be ordered by decreasing size. Variants of a size, and sizes without max dimensions
+    (ex: native), are encoded from the same image as the size before them.
+    Generates (size, in-memory file) pairs, in the order of `sizes`.
+
+    There's one decode for the whole set, and each size is thumbnailed from the one before it. Encoding is
+    done on a thread pool, as pillow releases the GIL while encoding, so it overlaps both with thumbnailing
+    the smaller sizes and with whatever the caller does with the sizes already generated (ex: upload them).
+    """
+    metrics = metrics or ImageMetrics()
+
+    def encode(size, image):
+        with metrics.stage(f'encode {size.filename}'):
+            return encode_image(image, image_format=size.image_format, quality=size.quality)
+
+    # decode up front, as a lazily opened image would otherwise be loaded by both the first encode and
+    # the first thumbnail at once, and pillow's lazy loading isn't thread-safe
+    source.load()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        image, max_dimensions, pending = source, None, collections.deque()
+        for size in sizes:
+            if size.max_dimensions and size.max_dimensions != max_dimensions:
+                # a new image each time, as the previous ones may still be being encoded
+                with metrics.stage(f'thumbnail {size.name}', image=image):
+                    image = image.copy()
+                    image.thumbnail(size.max_dimensions, resample=PIL.Image.LANCZOS)
+                max_dimensions = size.max_dimensions
+            pending.append((size, executor.submit(encode, size, image)))
+            while pending and pending[0][1].done():
+                size, future = pending.popleft()
+                yield size, future.result()
+        while pending:
+            size, future = pending.popleft()
+            yield size, future.result()
+
+
+def get_palette(image, color_count=5):
+    """
+    The dominant colors of the image, by modified median cut quantization.
+    The cost is linear in the number of pixels, so pass in a thumbnail rather than a full-size image.
+    """
+    return ColorThiefFromImage(image).get_palette(color_count=color_count)
+
+
+def dhash(image, hash_size=8):
+    """
+    A perceptual 'difference hash' of the image, as a hex string.
+    Visually similar images (re-encoded, resized, slightly edited) have hashes that differ in only a few bits.
+    """
+    width = hash_size + 1
+    pixels = list(image.convert('L').resize((width, hash_size), resample=PIL.Image.LANCZOS).getdata())
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            bits = bits << 1 | (pixels[row * width + col] > pixels[row * width + col + 1])
+    return f'{bits:0{hash_size * hash_size // 4}x}'
+
+
+def hash_distance(hash1, hash2):
+    "The number of bits that differ between two perceptual hashes"
+    return bin(int(hash1, 16) ^ int(hash2, 16)).count('1')
+
+
+def can_encode(image_format):
+    "Whether the installed build of pillow is able to encode images in `image_format`"
+    PIL.Image.init()
+    return image_format in PIL.Image.SAVE
+
+
+def get_variants(size):
+    "The optional variants of the thumbnail `size` that can be produced here"
+    return tuple(variant for variant in image_size.VARIANTS.get(size, ()) if can_encode(variant.image_format))
+
+
+def encode_image(image, image_format='JPEG', quality=100):
+    "Encode a pil image, preserving its color profile and exif data. Returns an in-memory file"
+    fh = io.BytesIO()
+    kwargs = {  # Note: Pillow's Image.save treats None differently than not present for some kwargs
+        k: v
+        for k, v in {
+            'format': image_format,
+            'quality': quality,
+            'icc_profile': image.info.get('icc_profile'),
+            'exif': image.info.get('exif'),
+        }.items()
+        if v is not None
+    }
+    image.save(fh, **kwargs)
+    fh.seek(0)
+    return fh
+
+
+def encode_jpeg(image, quality=100):  # quality 100 per spec
+    return encode_image(image, image_format='JPEG', quality=quality)
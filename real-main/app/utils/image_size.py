@@ -2,12 +2,16 @@
 
 
 class _ImageSize:
-    def __init__(self, name, max_dimensions, content_type='image/jpeg', file_ext='jpg'):
+    def __init__(
+        self, name, max_dimensions, content_type='image/jpeg', file_ext='jpg', image_format='JPEG', quality=100
+    ):
         self.name = name
         self.max_dimensions = max_dimensions
         file_ext = file_ext or self.default_file_ext
         self.filename = f'{self.name}.{file_ext}'
         self.content_type = content_type
+        self.image_format = image_format  # as pillow names it
+        self.quality = quality
 
 
 NATIVE_HEIC = _ImageSize('native', None, content_type='image/heic', file_ext='heic')
@@ -19,3 +23,30 @@ P64 = _ImageSize('64p', (114, 64))
 
 JPEGS = (NATIVE, K4, P1080, P480, P64)
 THUMBNAILS = (K4, P1080, P480, P64)  # ordered by decreasing size
+
+# Optional variants of the jpeg thumbnails in more compact formats, produced only where
+# the image library can encode them. Note quality settings aren't comparable across formats.
+K4_WEBP = _ImageSize('4K', (3840, 2160), 'image/webp', 'webp', 'WEBP', quality=80)
+P1080_WEBP = _ImageSize('1080p', (1920, 1080), 'image/webp', 'webp', 'WEBP', quality=80)
+P480_WEBP = _ImageSize('480p', (854, 480), 'image/webp', 'webp', 'WEBP', quality=75)
+P64_WEBP = _ImageSize('64p', (114, 64), 'image/webp', 'webp', 'WEBP', quality=75)
+K4_AVIF = _ImageSize('4K', (3840, 2160), 'image/avif', 'avif', 'AVIF', quality=60)
+P1080_AVIF = _ImageSize('1080p', (1920, 1080), 'image/avif', 'avif', 'AVIF', quality=60)
+P480_AVIF = _ImageSize('480p', (854, 480), 'image/avif', 'avif', 'AVIF', quality=55)
+P64_AVIF = _ImageSize('64p', (114, 64), 'image/avif', 'avif', 'AVIF', quality=55)
+
+WEBPS = (K4_WEBP, P1080_WEBP, P480_WEBP, P64_WEBP)
+AVIFS = (K4_AVIF, P1080_AVIF, P480_AVIF, P64_AVIF)
+VARIANT_FORMATS = {'WEBP': WEBPS, 'AVIF': AVIFS}
+VARIANTS = {thumbnail: variants for thumbnail, *variants in zip(THUMBNAILS, WEBPS, AVIFS)}
+
+
+def variant_urls(get_url, variant_formats):
+    """
+    Given a function to get the url of an image of a given size, the urls of the image in each of
+    the `variant_formats` it's available in, keyed as in the graphql schema.
+    """
+    return {
+        image_format.lower(): {f'url{size.name.lower()}': get_url(size) for size in VARIANT_FORMATS[image_format]}
+        for image_format in variant_formats
+    }
@@ -0,0 +1,129 @@
+import logging
+import random
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+import requests
+from botocore.credentials import ReadOnlyCredentials
+
+from app.clients import AppSyncClient
+from app.clients.appsync import notification_mutation
+
+# the requests_mock parameter is auto-supplied, no need to even import the
+# requests-mock library # https://requests-mock.readthedocs.io/en/latest/pytest.html
+
+
+@pytest.fixture
+def appsync_client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'the-access-key')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'the-secret-key')
+    yield AppSyncClient(appsync_graphql_url='https://appsync/graphql')
+
+
+@pytest.fixture
+def async_appsync_client(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'the-access-key')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'the-secret-key')
+    yield AppSyncClient(appsync_graphql_url='https://appsync/graphql', async_mode=True)
+
+
+def test_notification_mutation_is_cached():
+    mutation = notification_mutation(('a', 'b'))
+    assert notification_mutation(('a', 'b')) is mutation
+    assert notification_mutation(('a',)) is not mutation
+
+
+def test_fire_notification(appsync_client, requests_mock):
+    requests_mock.post('https://appsync/graphql', json={'data': {}})
+    appsync_client.fire_notification('uid', 'the-type', foo='bar', baz=2)
+    appsync_client.fire_notification('uid2', 'the-type', baz=3, foo='bar2')
+    assert len(requests_mock.request_history) == 2
+
+    req = requests_mock.request_history[0]
+    assert req.json()['variables'] == {'input': {'userId': 'uid', 'type': 'the-type', 'foo': 'bar', 'baz': 2}}
+    assert 'triggerNotification' in req.json()['query']
+    assert 'baz\n    foo' in req.json()['query']
+    assert req.headers['Content-Type'] == 'application/json'
+    assert req.headers['Authorization'].startswith('AWS4-HMAC-SHA256 Credential=the-access-key/')
+
+    # same selection regardless of kwarg order
+    assert requests_mock.request_history[1].json()['query'] == req.json()['query']
+
+
+def test_send_error(appsync_client, requests_mock):
+    requests_mock.post('https://appsync/graphql', json={'errors': ['boom']})
+    with pytest.raises(Exception, match='boom'):
+        appsync_client.fire_notification('uid', 'the-type')
+
+    requests_mock.post('https://appsync/graphql', status_code=500)
+    with pytest.raises(requests.exceptions.HTTPError):
+        appsync_client.fire_notification('uid', 'the-type')
+
+
+def test_signer_reused_until_credentials_refreshed(appsync_client):
+    auth = appsync_client.get_auth()
+    assert appsync_client.get_auth() is auth
+
+    # simulate boto refreshing the credentials from under us
+    creds = ReadOnlyCredentials('new-access-key', 'new-secret-key', 'new-token')
+    with patch.object(appsync_client._aws_session, 'get_credentials') as get_credentials_mock:
+        get_credentials_mock.return_value.get_frozen_credentials.return_value = creds
+        new_auth = appsync_client.get_auth()
+        assert new_auth is not auth
+        assert new_auth.access_id == 'new-access-key'
+        assert appsync_client.get_auth() is new_auth
+
+
+def test_async_mode(async_appsync_client, requests_mock, caplog):
+    requests_mock.post('https://appsync/graphql', json={'data': {}})
+    for i in range(5):
+        async_appsync_client.fire_notification(f'uid{i}', 'the-type')
+    async_appsync_client.flush()
+    assert async_appsync_client.futures == []
+    assert sorted(req.json()['variables']['input']['userId'] for req in requests_mock.request_history) == [
+        'uid0',
+        'uid1',
+        'uid2',
+        'uid3',
+        'uid4',
+    ]
+
+    # failures are logged when flushed, not raised
+    requests_mock.post('https://appsync/graphql', json={'errors': ['boom']})
+    async_appsync_client.fire_notification('uid', 'the-type')
+    with caplog.at_level(logging.WARNING):
+        async_appsync_client.flush()
+    assert len(caplog.records) == 1
+    assert 'boom' in caplog.records[0].msg
+
+
+def test_async_mode_keeps_order_per_user(async_appsync_client, requests_mock):
+    def respond(request, context):
+        time.sleep(random.random() / 100)  # so requests would complete out of order if sent concurrently
+        return {'data': {}}
+
+    requests_mock.post('https://appsync/graphql', json=respond)
+    for i in range(10):
+        for user_id in ('uid1', 'uid2', 'uid3'):
+            async_appsync_client.fire_notification(user_id, 'the-type', seq=i)
+    async_appsync_client.flush()
+    assert async_appsync_client._queues == {}
+
+    sent = [req.json()['variables']['input'] for req in requests_mock.request_history]
+    assert len(sent) == 30
+    for user_id in ('uid1', 'uid2', 'uid3'):
+        assert [input_obj['seq'] for input_obj in sent if input_obj['userId'] == user_id] == list(range(10))
+
+
+def test_session_per_thread(appsync_client):
+    session = appsync_client.session
+    assert appsync_client.session is session
+
+    other_sessions = []
+    thread = threading.Thread(target=lambda: other_sessions.append(appsync_client.session))
+    thread.start()
+    thread.join()
+    assert other_sessions[0] is not session
+    assert other_sessions[0].headers['Content-Type'] == 'application/json'
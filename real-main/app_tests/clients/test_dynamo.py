@@ -0,0 +1,121 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+
+@pytest.fixture
+def key(dynamo_client):
+    key = {'partitionKey': 'item/iid', 'sortKey': '-'}
+    dynamo_client.add_item({'Item': {**key, 'count': 10}})
+    yield key
+
+
+def test_table_per_thread(dynamo_client, key):
+    table = dynamo_client.table
+    assert dynamo_client.table is table
+
+    # concurrent threads each get their own table, and can all use them
+    barrier = threading.Barrier(3)
+
+    def get_table(_):
+        barrier.wait()  # so all three threads are alive at once
+        assert dynamo_client.get_item(key)['count'] == 10
+        return dynamo_client.table
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        tables = list(executor.map(get_table, range(3)))
+    assert len({id(t) for t in [table, *tables]}) == 4
+
+    # once those threads are gone, their resources are reused rather than new ones built
+    resources = {id(t.meta.client) for t in tables}
+    thread_tables = []
+    thread = threading.Thread(target=lambda: thread_tables.append(dynamo_client.table))
+    thread.start()
+    thread.join()
+    assert id(thread_tables[0].meta.client) in resources
+
+
+def test_add_count_delta_unbuffered(dynamo_client, key):
+    assert dynamo_client.add_count_delta(key, 'count', 2)['count'] == 12
+    assert dynamo_client.add_count_delta(key, 'count', -3)['count'] == 9
+    assert dynamo_client.add_count_delta(key, 'count', 0) is None
+    assert dynamo_client.get_item(key)['count'] == 9
+
+
+def test_decrement_count_clamps_at_zero(dynamo_client, key, caplog):
+    # a decrement larger than the counter takes it to zero, rather than being dropped
+    assert dynamo_client.decrement_count(key, 'count', by=4)['count'] == 6
+    assert dynamo_client.decrement_count(key, 'count', by=20)['count'] == 0
+
+    # at zero, or without the counter at all, it fails softly
+    with caplog.at_level(logging.WARNING):
+        assert dynamo_client.decrement_count(key, 'count', by=2) is None
+        assert dynamo_client.decrement_count(key, 'other', by=2) is None
+        assert dynamo_client.decrement_count(key, 'count') is None
+    assert len(caplog.records) == 3
+    assert all('Failed to decrement' in rec.msg for rec in caplog.records)
+    assert dynamo_client.get_item(key)['count'] == 0
+
+
+def test_count_deltas_buffered_are_exact(dynamo_client, key):
+    other_key = {'partitionKey': 'item/iid2', 'sortKey': '-'}
+    dynamo_client.add_item({'Item': {**other_key}})
+
+    # many concurrent changes to the same counters, in one buffered context
+    deltas = [1, 1, -1, 1, 2, -1] * 50
+    with dynamo_client.count_deltas_buffered():
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda delta: dynamo_client.add_count_delta(key, 'count', delta), deltas))
+            list(executor.map(lambda delta: dynamo_client.add_count_delta(other_key, 'count', 1), deltas))
+        assert dynamo_client.get_item(key)['count'] == 10
+        assert 'count' not in dynamo_client.get_item(other_key)
+
+    # all applied on exit
+    assert dynamo_client.get_item(key)['count'] == 10 + sum(deltas)
+    assert dynamo_client.get_item(other_key)['count'] == len(deltas)
+
+    # outside the context, changes are written immediately again
+    dynamo_client.add_count_delta(key, 'count', 1)
+    assert dynamo_client.get_item(key)['count'] == 11 + sum(deltas)
+
+
+def test_count_deltas_buffered_write_failure_does_not_stop_the_rest(dynamo_client, key, caplog):
+    keys = [{'partitionKey': f'item/iid{i}', 'sortKey': '-'} for i in range(2, 5)]
+    for other_key in keys:
+        dynamo_client.add_item({'Item': {**other_key}})
+
+    # one of the writes on exit hits an error that isn't a failed condition, such as throttling
+    increment_count = dynamo_client.increment_count
+
+    def increment_count_or_throttle(key, attribute_name, by=1):
+        if key == keys[1]:
+            raise dynamo_client.exceptions.ProvisionedThroughputExceededException({}, 'UpdateItem')
+        return increment_count(key, attribute_name, by=by)
+
+    with patch.object(dynamo_client, 'increment_count', side_effect=increment_count_or_throttle):
+        with caplog.at_level(logging.WARNING):
+            with dynamo_client.count_deltas_buffered():
+                for other_key in keys:
+                    dynamo_client.add_count_delta(other_key, 'count', 2)
+                dynamo_client.add_count_delta(key, 'count', -1)
+
+    # verify the failure was logged, and all the others were written
+    assert len(caplog.records) == 1
+    assert 'Failed to add `2` to count' in caplog.records[0].msg
+    assert 'iid3' in caplog.records[0].msg
+    assert dynamo_client.get_item(keys[0])['count'] == 2
+    assert 'count' not in dynamo_client.get_item(keys[1])
+    assert dynamo_client.get_item(keys[2])['count'] == 2
+    assert dynamo_client.get_item(key)['count'] == 9
+
+
+def test_count_deltas_buffered_dropped_on_error(dynamo_client, key):
+    # the error means the stream records will be re-processed, so the changes must not be written
+    with pytest.raises(Exception, match='failed'):
+        with dynamo_client.count_deltas_buffered():
+            dynamo_client.add_count_delta(key, 'count', 5)
+            raise Exception('failed')
+    assert dynamo_client.get_item(key)['count'] == 10
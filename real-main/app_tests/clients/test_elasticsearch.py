@@ -1,4 +1,8 @@
+import json
+import logging
+
 import pytest
+import requests
 import requests_mock
 
 from app.clients import ElasticSearchClient
@@ -85,3 +89,92 @@ def test_delete_user(elasticsearch_client, monkeypatch):
 
     assert len(m.request_history) == 1
     assert m.request_history[0].method == 'DELETE'
+
+
+def test_buffered_put_and_delete_users(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'foo')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'bar')
+    elasticsearch_client = ElasticSearchClient(domain='real.es.amazonaws.com', buffered=True)
+
+    with requests_mock.mock() as m:
+        m.post('https://real.es.amazonaws.com/_bulk', json={'errors': False, 'items': []})
+
+        # buffer some changes, verify nothing sent yet
+        elasticsearch_client.put_user('uid1', 'u1', None)
+        elasticsearch_client.put_user('uid2', 'u2', 'fn2')
+        elasticsearch_client.put_user('uid1', 'u1-new', 'fn1')
+        elasticsearch_client.delete_user('uid3')
+        assert len(m.request_history) == 0
+
+        # flush, verify one bulk request with only the last action per user
+        elasticsearch_client.flush()
+        assert len(m.request_history) == 1
+        assert m.request_history[0].headers['Content-Type'].startswith('application/x-ndjson')
+        lines = [json.loads(line) for line in m.request_history[0].text.splitlines()]
+        assert lines == [
+            {'index': {'_index': 'users', '_id': 'uid2'}},
+            {'userId': 'uid2', 'username': 'u2', 'fullName': 'fn2'},
+            {'index': {'_index': 'users', '_id': 'uid1'}},
+            {'userId': 'uid1', 'username': 'u1-new', 'fullName': 'fn1'},
+            {'delete': {'_index': 'users', '_id': 'uid3'}},
+        ]
+
+        # flush with nothing buffered, verify no request
+        elasticsearch_client.flush()
+        assert len(m.request_history) == 1
+
+
+def test_buffer_flushes_itself_when_full(monkeypatch):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'foo')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'bar')
+    elasticsearch_client = ElasticSearchClient(domain='real.es.amazonaws.com', buffered=True)
+    elasticsearch_client.bulk_batch_size = 2
+
+    with requests_mock.mock() as m:
+        m.post('https://real.es.amazonaws.com/_bulk', json={'errors': False, 'items': []})
+        for i in range(5):
+            elasticsearch_client.put_user(f'uid{i}', f'u{i}', None)
+        assert len(m.request_history) == 2
+        elasticsearch_client.flush()
+        assert len(m.request_history) == 3
+
+
+def test_flush_logs_rather_than_raises_failures(monkeypatch, caplog):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'foo')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'bar')
+    elasticsearch_client = ElasticSearchClient(domain='real.es.amazonaws.com', buffered=True)
+    elasticsearch_client.put_user('uid1', 'u1', None)
+
+    with requests_mock.mock() as m:
+        m.post('https://real.es.amazonaws.com/_bulk', exc=requests.exceptions.ConnectionError('nope'))
+        with caplog.at_level(logging.WARNING):
+            elasticsearch_client.flush()
+    assert len(m.request_history) == 1
+    assert len(caplog.records) == 1
+    assert 'Failed to apply `1` actions in bulk' in caplog.records[0].msg
+    assert 'nope' in caplog.records[0].msg
+    assert elasticsearch_client.buffer == {}
+
+
+def test_bulk_logs_item_failures(elasticsearch_client, monkeypatch, caplog):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'foo')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'bar')
+    resp = {
+        'errors': True,
+        'items': [
+            {'index': {'_id': 'uid1', 'status': 201}},
+            {'index': {'_id': 'uid2', 'status': 400, 'error': {'type': 'mapper_parsing_exception'}}},
+            {'delete': {'_id': 'uid3', 'status': 404}},
+        ],
+    }
+    actions = [
+        ({'index': {'_index': 'users', '_id': 'uid1'}}, {'userId': 'uid1'}),
+        ({'index': {'_index': 'users', '_id': 'uid2'}}, {'userId': 'uid2'}),
+        ({'delete': {'_index': 'users', '_id': 'uid3'}}, None),
+    ]
+    with requests_mock.mock() as m:
+        m.post('https://real.es.amazonaws.com/_bulk', json=resp)
+        elasticsearch_client.bulk(actions)
+    assert len(caplog.records) == 1
+    assert 'uid2' in caplog.records[0].msg
+    assert 'mapper_parsing_exception' in caplog.records[0].msg
@@ -194,3 +194,227 @@ def test_enable_disable_and_delete_user_endpoints(real_pinpoint_client):
     # delete them, verify
     pinpoint_client.delete_user_endpoints(user_id)
     assert pinpoint_client.get_user_endpoints(user_id) == {}
+
+
+def test_send_users_apns(mocked_pinpoint_client):
+    user_id_1, user_id_2, user_id_3 = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+    sample_resp = {
+        'ResponseMetadata': {},
+        'SendUsersMessageResponse': {
+            'ApplicationId': '',
+            'RequestId': '',
+            'Result': {
+                user_id_1: {
+                    str(uuid.uuid4()): {
+                        'Address': '123456778890abccdef123456778890aaaaaaaaaaaaaabbbbbbbbbbbcccccccc',
+                        'DeliveryStatus': 'SUCCESSFUL',
+                        'StatusCode': 200,
+                        'StatusMessage': '',
+                    },
+                },
+                user_id_2: {
+                    str(uuid.uuid4()): {
+                        'Address': '123456778890abccdef123456778890aaaaaaaaaaaaaabbbbbbbbbbbcccccccc',
+                        'DeliveryStatus': 'PERMANENT_FAILURE',
+                        'StatusCode': 400,
+                        'StatusMessage': 'No endpoints found for userId.',
+                    },
+                },
+            },
+        },
+    }
+    mocked_pinpoint_client.client.configure_mock(**{'send_users_messages.return_value': sample_resp})
+    user_messages = {
+        user_id_1: {'title': 'title-1', 'body': 'body-1'},
+        user_id_2: {'title': 'title-2'},
+        user_id_3: {'title': 'title-3', 'body': None},
+    }
+    resp = mocked_pinpoint_client.send_users_apns('the-url', user_messages)
+    assert resp == {user_id_1: True, user_id_2: False, user_id_3: False}
+    assert mocked_pinpoint_client.client.mock_calls == [
+        call.send_users_messages(
+            ApplicationId='testing-pinpoint-app-id',
+            SendUsersMessageRequest={
+                'MessageConfiguration': {'APNSMessage': {'Action': 'URL', 'Url': 'the-url'}},
+                'Users': {
+                    user_id_1: {'TitleOverride': 'title-1', 'BodyOverride': 'body-1'},
+                    user_id_2: {'TitleOverride': 'title-2'},
+                    user_id_3: {'TitleOverride': 'title-3'},
+                },
+            },
+        )
+    ]
+
+
+def endpoints_response(*endpoints):
+    return {'EndpointsResponse': {'Item': list(endpoints)}}
+
+
+def test_endpoints_cache(mocked_pinpoint_client):
+    user_id = str(uuid.uuid4())
+    email_endpoint = {
+        'Id': 'eid1',
+        'Address': 'e@real.app',
+        'ChannelType': 'EMAIL',
+        'EndpointStatus': 'ACTIVE',
+        'User': {'UserId': user_id},
+    }
+    mocked_pinpoint_client.client.configure_mock(
+        **{'get_user_endpoints.return_value': endpoints_response(email_endpoint)}
+    )
+
+    # outside the cache context, every lookup goes to pinpoint
+    assert mocked_pinpoint_client.get_user_endpoints(user_id) == {'eid1': email_endpoint}
+    assert mocked_pinpoint_client.get_user_endpoints(user_id, channel_type='EMAIL') == {'eid1': email_endpoint}
+    assert len(mocked_pinpoint_client.client.get_user_endpoints.mock_calls) == 2
+
+    # inside the context, just one lookup, and changes are written through
+    mocked_pinpoint_client.client.reset_mock()
+    with mocked_pinpoint_client.endpoints_cache():
+        assert mocked_pinpoint_client.get_user_endpoints(user_id) == {'eid1': email_endpoint}
+        assert mocked_pinpoint_client.get_user_endpoints(user_id, channel_type='SMS') == {}
+
+        # no-op update, verify no write
+        assert mocked_pinpoint_client.update_user_endpoint(user_id, 'EMAIL', 'e@real.app') == 'eid1'
+        assert mocked_pinpoint_client.client.update_endpoint.mock_calls == []
+
+        # add an sms endpoint, disable all endpoints
+        sms_endpoint_id = mocked_pinpoint_client.update_user_endpoint(user_id, 'SMS', '+14155551212')
+        mocked_pinpoint_client.disable_user_endpoints(user_id)
+        endpoints = mocked_pinpoint_client.get_user_endpoints(user_id)
+        assert endpoints.keys() == {'eid1', sms_endpoint_id}
+        assert endpoints[sms_endpoint_id]['Address'] == '+14155551212'
+        assert all(endpoint['EndpointStatus'] == 'INACTIVE' for endpoint in endpoints.values())
+
+        # disabling again is a no-op
+        mocked_pinpoint_client.disable_user_endpoints(user_id)
+        assert len(mocked_pinpoint_client.client.update_endpoints_batch.mock_calls) == 1
+
+        # delete the email endpoint, then all of them
+        mocked_pinpoint_client.delete_user_endpoint(user_id, 'EMAIL')
+        assert mocked_pinpoint_client.get_user_endpoints(user_id).keys() == {sms_endpoint_id}
+        mocked_pinpoint_client.delete_user_endpoints(user_id)
+        assert mocked_pinpoint_client.get_user_endpoints(user_id) == {}
+    assert len(mocked_pinpoint_client.client.get_user_endpoints.mock_calls) == 1
+
+    # leaving the context drops the cache
+    assert mocked_pinpoint_client.get_user_endpoints(user_id) == {'eid1': email_endpoint}
+    assert len(mocked_pinpoint_client.client.get_user_endpoints.mock_calls) == 2
+
+
+def test_set_user_endpoints_status(mocked_pinpoint_client):
+    user_id = str(uuid.uuid4())
+    endpoints = [
+        {'Id': 'eid1', 'Address': 'e@real.app', 'ChannelType': 'EMAIL', 'EndpointStatus': 'ACTIVE'},
+        {'Id': 'eid2', 'Address': 'token', 'ChannelType': 'APNS', 'EndpointStatus': 'INACTIVE'},
+    ]
+    for endpoint in endpoints:
+        endpoint['User'] = {'UserId': user_id}
+    mocked_pinpoint_client.client.configure_mock(
+        **{'get_user_endpoints.return_value': endpoints_response(*endpoints)}
+    )
+
+    # verify all endpoints updated in one request, skipping those already in the right state
+    mocked_pinpoint_client.enable_user_endpoints(user_id)
+    assert mocked_pinpoint_client.client.mock_calls == [
+        call.get_user_endpoints(ApplicationId='testing-pinpoint-app-id', UserId=user_id),
+        call.update_endpoints_batch(
+            ApplicationId='testing-pinpoint-app-id',
+            EndpointBatchRequest={
+                'Item': [
+                    {
+                        'Id': 'eid2',
+                        'Address': 'token',
+                        'ChannelType': 'APNS',
+                        'User': {'UserId': user_id},
+                        'EndpointStatus': 'ACTIVE',
+                    }
+                ]
+            },
+        ),
+    ]
+
+
+def test_resync_users_endpoints(mocked_pinpoint_client):
+    user_id_1, user_id_2, user_id_3 = 'uid1', 'uid2', 'uid3'
+    endpoints = {
+        # user 1 has a stale email endpoint and an sms endpoint that should be removed
+        user_id_1: [
+            {'Id': 'e11', 'Address': 'old@real.app', 'ChannelType': 'EMAIL', 'EndpointStatus': 'ACTIVE'},
+            {'Id': 'e12', 'Address': '+14155551212', 'ChannelType': 'SMS', 'EndpointStatus': 'ACTIVE'},
+        ],
+        # user 2 has duplicate email endpoints, one matching, and an apns endpoint to be disabled
+        user_id_2: [
+            {'Id': 'e21', 'Address': 'other@real.app', 'ChannelType': 'EMAIL', 'EndpointStatus': 'ACTIVE'},
+            {'Id': 'e22', 'Address': 'two@real.app', 'ChannelType': 'EMAIL', 'EndpointStatus': 'ACTIVE'},
+            {'Id': 'e23', 'Address': 'token', 'ChannelType': 'APNS', 'EndpointStatus': 'ACTIVE'},
+        ],
+        # user 3 has no endpoints at all
+    }
+    for user_id, user_endpoints in endpoints.items():
+        for endpoint in user_endpoints:
+            endpoint['User'] = {'UserId': user_id}
+
+    def get_user_endpoints(ApplicationId, UserId):
+        if UserId not in endpoints:
+            raise mocked_pinpoint_client.client.exceptions.NotFoundException({}, 'op')
+        return endpoints_response(*endpoints[UserId])
+
+    mocked_pinpoint_client.client.configure_mock(
+        **{
+            'get_user_endpoints.side_effect': get_user_endpoints,
+            'exceptions.NotFoundException': type('NotFoundException', (Exception,), {}),
+        }
+    )
+
+    users_addresses = {
+        user_id_1: {'EMAIL': 'one@real.app', 'SMS': None},
+        user_id_2: {'EMAIL': 'two@real.app', 'SMS': None},
+        user_id_3: {'EMAIL': 'three@real.app', 'SMS': '+12125551212'},
+    }
+    cnt = mocked_pinpoint_client.resync_users_endpoints(users_addresses, inactive_user_ids=[user_id_2])
+    assert cnt == 7
+
+    # verify one batch write
+    assert len(mocked_pinpoint_client.client.update_endpoints_batch.mock_calls) == 1
+    items = mocked_pinpoint_client.client.update_endpoints_batch.call_args.kwargs['EndpointBatchRequest']['Item']
+    items_by_id = {item.pop('Id'): item for item in items}
+    new_endpoint_ids = set(items_by_id) - {'e11', 'e22', 'e23'}
+    assert len(new_endpoint_ids) == 2
+    assert items_by_id.pop('e11') == {
+        'Address': 'one@real.app',
+        'ChannelType': 'EMAIL',
+        'User': {'UserId': user_id_1},
+        'EndpointStatus': 'ACTIVE',
+    }
+    assert items_by_id.pop('e22') == {
+        'Address': 'two@real.app',
+        'ChannelType': 'EMAIL',
+        'User': {'UserId': user_id_2},
+        'EndpointStatus': 'INACTIVE',
+    }
+    assert items_by_id.pop('e23') == {
+        'Address': 'token',
+        'ChannelType': 'APNS',
+        'User': {'UserId': user_id_2},
+        'EndpointStatus': 'INACTIVE',
+    }
+    assert sorted(items_by_id.values(), key=lambda item: item['ChannelType']) == [
+        {
+            'Address': 'three@real.app',
+            'ChannelType': 'EMAIL',
+            'User': {'UserId': user_id_3},
+            'EndpointStatus': 'ACTIVE',
+        },
+        {
+            'Address': '+12125551212',
+            'ChannelType': 'SMS',
+            'User': {'UserId': user_id_3},
+            'EndpointStatus': 'ACTIVE',
+        },
+    ]
+
+    # verify the extras were deleted
+    assert sorted(
+        ca.kwargs['EndpointId'] for ca in mocked_pinpoint_client.client.delete_endpoint.call_args_list
+    ) == ['e12', 'e21',]
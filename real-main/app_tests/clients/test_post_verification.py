@@ -1,3 +1,5 @@
+from unittest import mock
+
 import pytest
 
 from app.clients import PostVerificationClient
@@ -26,6 +28,7 @@ def test_verify_image_success_minimal(post_verification_client, requests_mock):
         'url': 'https://image-url',
     }
     assert req._request.headers['x-api-key'] == 'the-api-key'
+    assert req.timeout == post_verification_client.timeout
 
 
 def test_verify_image_success_maximal(post_verification_client, requests_mock):
@@ -65,3 +68,14 @@ def test_verify_image_handle_bad_resp_fmt(post_verification_client, requests_moc
     # do the call
     with pytest.raises(Exception, match='Unable to parse response'):
         post_verification_client.verify_image('https://image-url')
+
+
+def test_verify_image_reuses_session(post_verification_client, requests_mock):
+    requests_mock.post('https://url-root/verify/image', json={'errors': [], 'data': {'isVerified': True}})
+    with mock.patch.object(
+        post_verification_client.session, 'post', wraps=post_verification_client.session.post
+    ) as post_mock:
+        assert post_verification_client.verify_image('https://image-url-1') is True
+        assert post_verification_client.verify_image('https://image-url-2') is True
+    assert len(post_mock.mock_calls) == 2
+    assert len(requests_mock.request_history) == 2
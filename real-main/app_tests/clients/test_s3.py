@@ -0,0 +1,49 @@
+import threading
+import time
+
+import botocore
+import pytest
+
+from app.clients.s3 import S3Uploader
+
+
+def test_uploader_put_and_copy_objects(s3_uploads_client):
+    with s3_uploads_client.uploader() as uploader:
+        for i in range(10):
+            uploader.put_object(f'path/{i}', f'data {i}'.encode(), 'text/plain')
+    for i in range(10):
+        assert s3_uploads_client.get_object_data_stream(f'path/{i}').read() == f'data {i}'.encode()
+
+    with s3_uploads_client.uploader() as uploader:
+        uploader.copy_object('path/0', 'copied/0')
+    assert s3_uploads_client.get_object_data_stream('copied/0').read() == b'data 0'
+
+
+def test_uploader_raises_first_error_on_exit(s3_uploads_client):
+    with pytest.raises(botocore.exceptions.ClientError):
+        with s3_uploads_client.uploader() as uploader:
+            uploader.put_object('path/ok', b'data', 'text/plain')
+            uploader.copy_object('path/does-not-exist', 'path/copy')
+    # the successful write still went through
+    assert s3_uploads_client.exists('path/ok')
+    assert not s3_uploads_client.exists('path/copy')
+
+
+def test_uploader_bounds_pending_writes(s3_uploads_client):
+    in_flight, max_in_flight, lock = [0], [0], threading.Lock()
+
+    def slow_write():
+        with lock:
+            in_flight[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+
+    with S3Uploader(s3_uploads_client, max_workers=2, max_pending=3) as uploader:
+        for _ in range(10):
+            uploader.submit(slow_write)
+            # submitting blocks until there's room in the queue
+            assert sum(1 for future in uploader.futures if not future.done()) <= 3
+    assert max_in_flight[0] == 2
+    assert uploader.futures == []
@@ -0,0 +1,21 @@
+import json
+
+import boto3
+import moto
+import pytest
+
+from app.clients import SQSClient
+
+
+@pytest.fixture
+def sqs_client():
+    with moto.mock_sqs():
+        queue_url = boto3.client('sqs').create_queue(QueueName='my-queue')['QueueUrl']
+        yield SQSClient(queue_url)
+
+
+def test_send_message(sqs_client):
+    message_id = sqs_client.send_message({'itemType': 'post', 'itemId': 'pid'})
+    messages = sqs_client.client.receive_message(QueueUrl=sqs_client.queue_url)['Messages']
+    assert [m['MessageId'] for m in messages] == [message_id]
+    assert json.loads(messages[0]['Body']) == {'itemType': 'post', 'itemId': 'pid'}
@@ -7,7 +7,9 @@ import moto
 import pytest
 
 from app import clients, models
+from app.models.album import art
 from app.models.card.templates import CardTemplate
+from app.utils import image_size
 
 from .dynamodb.table_schema import feed_table_schema, main_table_schema
 
@@ -55,6 +57,25 @@ def heic_dims():
     yield (4032, 3024)
 
 
+@pytest.fixture
+def png_image_variants():
+    "Stand in png for the optional thumbnail formats, as the local pillow build may not be able to encode them"
+    variants = {
+        size: image_size._ImageSize(size.name, size.max_dimensions, 'image/png', 'png', 'PNG')
+        for size in image_size.THUMBNAILS
+    }
+    with mock.patch.dict(image_size.VARIANTS, {size: (v,) for size, v in variants.items()}, clear=True):
+        with mock.patch.dict(image_size.VARIANT_FORMATS, {'PNG': tuple(variants.values())}, clear=True):
+            yield tuple(variants.values())
+
+
+@pytest.fixture(autouse=True)
+def album_art_tile_cache():
+    "Album art tiles are cached for the life of the process, which would otherwise leak between tests"
+    yield art.tile_cache
+    art.tile_cache.clear()
+
+
 @pytest.fixture
 def appsync_client():
     yield mock.Mock(clients.AppSyncClient(appsync_graphql_url='my-graphql-url'))
@@ -169,6 +190,11 @@ def s3_placeholder_photos_client(s3_clients):
     yield s3_clients['placeholder-photos']
 
 
+@pytest.fixture
+def sqs_delete_cascade_client():
+    yield mock.Mock(clients.SQSClient(queue_url='my-queue-url'))
+
+
 @pytest.fixture
 def album_manager(dynamo_client, s3_uploads_client, cloudfront_client):
     yield models.AlbumManager(
@@ -240,7 +266,14 @@ def like_manager(dynamo_client):
 
 
 @pytest.fixture
-def post_manager(appsync_client, dynamo_client, s3_uploads_client, cloudfront_client, post_verification_client):
+def post_manager(
+    appsync_client,
+    dynamo_client,
+    s3_uploads_client,
+    cloudfront_client,
+    post_verification_client,
+    sqs_delete_cascade_client,
+):
     yield models.PostManager(
         {
             'appsync': appsync_client,
@@ -248,6 +281,7 @@ def post_manager(appsync_client, dynamo_client, s3_uploads_client, cloudfront_cl
             's3_uploads': s3_uploads_client,
             'cloudfront': cloudfront_client,
             'post_verification': post_verification_client,
+            'sqs_delete_cascade': sqs_delete_cascade_client,
         }
     )
 
@@ -265,6 +299,7 @@ def user_manager(
     google_client,
     pinpoint_client,
     elasticsearch_client,
+    sqs_delete_cascade_client,
 ):
     yield models.UserManager(
         {
@@ -279,5 +314,6 @@ def user_manager(
             'google': google_client,
             'pinpoint': pinpoint_client,
             'elasticsearch': elasticsearch_client,
+            'sqs_delete_cascade': sqs_delete_cascade_client,
         }
     )
@@ -64,6 +64,19 @@ def test_add_and_increment_view(view_dynamo):
     assert view_dynamo.get_view(item_id, user_id) == view
 
 
+def test_add_view_with_extra_attributes(view_dynamo):
+    viewed_at = pendulum.now('utc')
+    view = view_dynamo.add_view('iid', 'uid', 1, viewed_at, extra_attributes={'postedByUserId': 'uid2'})
+    assert view['postedByUserId'] == 'uid2'
+    assert view['viewCount'] == 1
+    assert view_dynamo.get_view('iid', 'uid') == view
+
+    # incrementing leaves them as they are
+    view = view_dynamo.increment_view_count('iid', 'uid', 1, pendulum.now('utc'))
+    assert view['postedByUserId'] == 'uid2'
+    assert view['viewCount'] == 2
+
+
 def test_generate_views(view_dynamo):
     item_id = 'iid'
 
@@ -1,3 +1,4 @@
+from unittest.mock import patch
 from uuid import uuid4
 
 import pytest
@@ -35,6 +36,28 @@ def test_record_views_implemented(manager):
     manager.record_views(['iid1', 'iid2'], 'uid')
 
 
+@pytest.mark.parametrize(
+    'manager, model1, model2',
+    [
+        pytest.lazy_fixture(['post_manager', 'post', 'post2']),
+        pytest.lazy_fixture(['chat_manager', 'chat', 'chat2']),
+    ],
+)
+def test_record_view_counts(manager, model1, model2, user2):
+    model1.record_view_count(user2.id, 2)
+
+    # only the item not viewed before is a first view
+    assert manager.record_view_counts({model1.id: 1, model2.id: 3}, user2.id) == {model2.id}
+    assert manager.view_dynamo.get_view(model1.id, user2.id)['viewCount'] == 3
+    assert manager.view_dynamo.get_view(model2.id, user2.id)['viewCount'] == 3
+
+    # lose a race to add the view, verify the view count is still recorded
+    with patch.object(manager.view_dynamo, 'generate_viewed_item_ids', return_value=[]):
+        assert manager.record_view_counts({model2.id: 2}, user2.id) == set()
+    assert manager.view_dynamo.get_view(model2.id, user2.id)['viewCount'] == 5
+    assert manager.record_view_counts({}, user2.id) == set()
+
+
 @pytest.mark.parametrize(
     'manager, model1, model2',
     [
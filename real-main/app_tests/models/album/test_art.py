@@ -49,3 +49,61 @@ def test_generate_zoomed_grid_failures(cnt):
 def test_generate_zoomed_grid_success(cnt, size):
     assert (image := art.generate_zoomed_grid(get_images(cnt)))
     assert image.size == size
+
+
+@pytest.mark.parametrize('cnt, cell_size', [[4, (1920, 1080)], [9, (1280, 720)], [16, (960, 540)]])
+def test_get_cell_dimensions(cnt, cell_size):
+    assert art.get_cell_dimensions(cnt) == cell_size
+
+
+def test_cover_dimensions():
+    # wider than the cell, height is the constraint
+    assert art.cover_dimensions((1920, 960), (960, 540)) == (1080, 540)
+    # taller than the cell, width is the constraint
+    assert art.cover_dimensions((607, 1080), (960, 540)) == (960, 1709)
+    # same aspect ratio, smaller and bigger
+    assert art.cover_dimensions((1920, 1080), (960, 540)) == (960, 540)
+    assert art.cover_dimensions((480, 270), (960, 540)) == (960, 540)
+
+
+@pytest.mark.parametrize('path', [grant_path, grant_horz_path, grant_vert_path, big_blank_path])
+def test_zoom_to_fill(path):
+    image = art.zoom_to_fill(PIL.Image.open(path), (100, 50))
+    assert image.size == (100, 50)
+
+
+def test_composite_grid():
+    tiles = [PIL.Image.new('RGB', (4, 3), color=(i, i, i)) for i in range(9)]
+    image = art.composite_grid(tiles)
+    assert image.size == (12, 9)
+    assert image.getpixel((0, 0)) == (0, 0, 0)
+    assert image.getpixel((11, 0)) == (2, 2, 2)
+    assert image.getpixel((4, 3)) == (4, 4, 4)
+    assert image.getpixel((11, 8)) == (8, 8, 8)
+
+
+def test_tile_cache():
+    tile_cache = art.TileCache(max_mb=2)
+    tile = PIL.Image.new('RGB', (512, 512))  # 0.75 MB
+    assert tile_cache.get('k1') is None
+
+    tile_cache.put('k1', tile)
+    tile_cache.put('k2', tile)
+    assert tile_cache.get('k1') is tile
+    assert tile_cache.get('k2') is tile
+
+    # the least recently used tile is dropped when over budget
+    tile_cache.put('k3', tile)
+    assert tile_cache.get('k1') is None
+    assert tile_cache.get('k2') is tile
+    assert tile_cache.get('k3') is tile
+
+    # a tile bigger than the budget is still kept, on its own
+    big_tile = PIL.Image.new('RGB', (1024, 1024))
+    tile_cache.put('k4', big_tile)
+    assert tile_cache.get('k4') is big_tile
+    assert tile_cache.get('k2') is None
+    assert tile_cache.get('k3') is None
+
+    tile_cache.clear()
+    assert tile_cache.get('k4') is None
@@ -1,5 +1,4 @@
 import logging
-from unittest.mock import call, patch
 from uuid import uuid4
 
 import pendulum
@@ -269,6 +268,17 @@ def test_set_album_hash(album_dynamo, album_item):
     assert album_dynamo.set_album_art_hash(album_id, None) == album_item
     assert album_dynamo.get_album(album_id) == album_item
 
+    # test setting it along with variant formats, then clearing them
+    album_item = album_dynamo.set_album_art_hash(album_id, art_hash, variant_formats=['WEBP'])
+    assert album_item['artVariantFormats'] == ['WEBP']
+    album_item = album_dynamo.set_album_art_hash(album_id, 'bhash')
+    assert album_item['artHash'] == 'bhash'
+    assert 'artVariantFormats' not in album_item
+    album_dynamo.set_album_art_hash(album_id, art_hash, variant_formats=['WEBP'])
+    album_item = album_dynamo.set_album_art_hash(album_id, None)
+    assert 'artHash' not in album_item
+    assert 'artVariantFormats' not in album_item
+
 
 def test_set_and_clear_delete_at(album_dynamo, album_item, caplog):
     album_id = album_item['albumId']
@@ -347,10 +357,3 @@ def test_generate_keys_to_delete(album_dynamo):
         {k: album_item1[k] for k in ('partitionKey', 'sortKey')},
         {k: album_item2[k] for k in ('partitionKey', 'sortKey')},
     ]
-
-
-def test_increment_rank_count(album_dynamo):
-    album_id = str(uuid4())
-    with patch.object(album_dynamo, 'client') as dynamo_client_mock:
-        album_dynamo.increment_rank_count(album_id)
-    assert dynamo_client_mock.mock_calls == [call.increment_count(album_dynamo.pk(album_id), 'rankCount')]
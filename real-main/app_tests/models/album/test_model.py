@@ -1,9 +1,8 @@
-import io
-import logging
 import uuid
 from os import path
-from unittest.mock import Mock, patch
+from unittest.mock import Mock
 
+import PIL.Image
 import pytest
 
 from app.models.album.exceptions import AlbumException
@@ -146,9 +145,8 @@ def test_save_art_images(album):
         assert not album.s3_uploads_client.exists(path)
 
     # save an image as the art
-    with open(grant_horz_path, 'rb') as fh:
-        image_data = fh.read()
-    album.save_art_images(art_hash, io.BytesIO(image_data))
+    image = PIL.Image.open(grant_horz_path)
+    album.save_art_images(art_hash, image)
 
     # check all sizes are in S3
     for size in image_size.JPEGS:
@@ -157,12 +155,13 @@ def test_save_art_images(album):
 
     # check the value of the native image
     native_path = album.get_art_image_path(image_size.NATIVE, art_hash)
-    assert album.s3_uploads_client.get_object_data_stream(native_path).read() == image_data
+    native_image = PIL.Image.open(album.s3_uploads_client.get_object_data_stream(native_path))
+    assert native_image.format == 'JPEG'
+    assert native_image.size == image.size
 
     # save an new image as the art
-    with open(grant_vert_path, 'rb') as fh:
-        image_data = fh.read()
-    album.save_art_images(art_hash, io.BytesIO(image_data))
+    image = PIL.Image.open(grant_vert_path)
+    album.save_art_images(art_hash, image)
 
     # check all sizes are in S3
     for size in image_size.JPEGS:
@@ -171,64 +170,9 @@ def test_save_art_images(album):
 
     # check the value of the native image
     native_path = album.get_art_image_path(image_size.NATIVE, art_hash)
-    assert album.s3_uploads_client.get_object_data_stream(native_path).read() == image_data
-
-
-def test_increment_rank_count(album, caplog):
-    assert 'rankCount' not in album.refresh_item().item
-    album_id = album.id
-    org_album_item = album.item.copy()
-
-    # verify increment from nothing
-    assert album.increment_rank_count().id == album.id
-    assert {**org_album_item, 'rankCount': 1} == album.item
-
-    # verify increment again
-    assert album.increment_rank_count().id == album_id
-    assert {**org_album_item, 'rankCount': 2} == album.item
-
-    # verify for album that has disappeared from dynamo
-    album.dynamo.delete_album(album_id)
-    with caplog.at_level(logging.WARNING):
-        assert album.increment_rank_count() is None
-    assert len(caplog.records) == 1
-    assert caplog.records[0].levelname == 'WARNING'
-    assert all(x in caplog.records[0].msg for x in ('Failed to increment', 'rankCount', album_id))
-    assert album.item is None
-
-
-def test_rank_count(album):
-    with patch.object(album, 'item', None):
-        assert album.get_first_rank() is None
-        assert album.get_last_rank() is None
-
-    with patch.dict(album.item, {'rankCount': 0}):
-        assert album.get_first_rank() is None
-        assert album.get_last_rank() is None
-
-    with patch.dict(album.item, {'rankCount': 1}):
-        assert album.get_first_rank() == 0
-        assert album.get_last_rank() == 0
-
-    with patch.dict(album.item, {'rankCount': 2}):
-        assert album.get_first_rank() == pytest.approx(-1 / 3)
-        assert album.get_last_rank() == pytest.approx(1 / 3)
-
-    with patch.dict(album.item, {'rankCount': 3}):
-        assert album.get_first_rank() == pytest.approx(-2 / 4)
-        assert album.get_last_rank() == pytest.approx(2 / 4)
-
-    with patch.dict(album.item, {'rankCount': 4}):
-        assert album.get_first_rank() == pytest.approx(-3 / 5)
-        assert album.get_last_rank() == pytest.approx(3 / 5)
-
-    with patch.dict(album.item, {'rankCount': 5}):
-        assert album.get_first_rank() == pytest.approx(-4 / 6)
-        assert album.get_last_rank() == pytest.approx(4 / 6)
-
-    with patch.dict(album.item, {'rankCount': 6}):
-        assert album.get_first_rank() == pytest.approx(-5 / 7)
-        assert album.get_last_rank() == pytest.approx(5 / 7)
+    native_image = PIL.Image.open(album.s3_uploads_client.get_object_data_stream(native_path))
+    assert native_image.format == 'JPEG'
+    assert native_image.size == image.size
 
 
 def test_get_post_ids_for_art(album):
@@ -2,6 +2,7 @@ import base64
 import uuid
 from decimal import Decimal
 from os import path
+from unittest.mock import patch
 
 import pytest
 
@@ -108,6 +109,24 @@ def test_update_art_if_needed_add_change_and_remove_one_post(album, post1, s3_up
         assert not album.s3_uploads_client.exists(path)
 
 
+def test_update_art_if_needed_with_variants(png_image_variants, album, post1, s3_uploads_client):
+    post1.dynamo.set_album_id(post1.item, album.id, album_rank=0)
+
+    # update art, check variants are in S3 alongside the jpegs
+    album.update_art_if_needed()
+    art_hash = album.item['artHash']
+    assert album.item['artVariantFormats'] == ['PNG']
+    for size in image_size.JPEGS + png_image_variants:
+        assert album.s3_uploads_client.exists(album.get_art_image_path(size))
+
+    # remove the post from the album, check they're all removed from S3
+    post1.dynamo.set_album_id(post1.item, None)
+    album.update_art_if_needed()
+    assert 'artVariantFormats' not in album.item
+    for size in image_size.JPEGS + png_image_variants:
+        assert not album.s3_uploads_client.exists(album.get_art_image_path(size, art_hash=art_hash))
+
+
 def test_changing_post_rank_changes_art(album, post1, post2, s3_uploads_client):
     assert 'artHash' not in album.item
 
@@ -241,3 +260,46 @@ def test_1_4_9_16_posts_in_album(
     assert native_path_16 != native_path_9
     assert (native_data_16 := album.s3_uploads_client.get_object_data_stream(native_path_16).read())
     assert native_data_16 != native_data_9
+
+
+def test_update_art_if_needed_reuses_cached_tiles(album, post1, post2, post3, post4, album_art_tile_cache):
+    post_dynamo = post1.dynamo
+    for rank, post in enumerate([post1, post2, post3, post4]):
+        post_dynamo.set_album_id(post.item, album.id, album_rank=Decimal(rank) / 10)
+
+    # generate art, all tiles decoded
+    with patch.object(album, 'get_art_tile', wraps=album.get_art_tile) as get_art_tile_mock:
+        album.update_art_if_needed()
+    assert sorted(c.args[0].id for c in get_art_tile_mock.call_args_list) == sorted(
+        [post1.id, post2.id, post3.id, post4.id]
+    )
+    assert (first_native_path := album.get_art_image_path(image_size.NATIVE))
+    assert (first_art_data := album.s3_uploads_client.get_object_data_stream(first_native_path).read())
+
+    # re-order the album, check the art changed without decoding any tiles
+    post_dynamo.set_album_rank(post4.id, Decimal('-0.1'))
+    with patch.object(album, 'get_art_tile', wraps=album.get_art_tile) as get_art_tile_mock:
+        album.update_art_if_needed()
+    assert get_art_tile_mock.call_count == 0
+    assert (second_native_path := album.get_art_image_path(image_size.NATIVE))
+    assert second_native_path != first_native_path
+    assert album.s3_uploads_client.get_object_data_stream(second_native_path).read() != first_art_data
+
+    # edit the text-only post and re-order back, check only its tile is decoded again
+    post4.dynamo.set(post4.id, text='dolor sit amet')
+    post_dynamo.set_album_rank(post4.id, Decimal('0.3'))
+    with patch.object(album, 'get_art_tile', wraps=album.get_art_tile) as get_art_tile_mock:
+        album.update_art_if_needed()
+    assert [c.args[0].id for c in get_art_tile_mock.call_args_list] == [post4.id]
+    assert album.get_art_image_path(image_size.NATIVE) == first_native_path
+    assert album.s3_uploads_client.get_object_data_stream(first_native_path).read() != first_art_data
+
+
+def test_get_art_tile(album, post1, post3, post4):
+    # image posts
+    for post in (post1, post3):
+        assert album.get_art_tile(post, (960, 540)).size == (960, 540)
+        assert album.get_art_tile(post, (64, 36)).size == (64, 36)
+
+    # text-only posts
+    assert album.get_art_tile(post4, (960, 540)).size == (960, 540)
@@ -327,3 +327,38 @@ def test_generate_card_ids_by_notify_user_at_only_user_ids(card_dynamo):
             card_dynamo.generate_card_ids_by_notify_user_at(now, only_user_ids=[user_id_1, user_id_2, user_id_3])
         )
     ) == sorted([card_id_10, card_id_20, card_id_21, card_id_30, card_id_31, card_id_32])
+
+
+def test_generate_cards_by_notify_user_at(card_dynamo):
+    user_id_1, user_id_2 = str(uuid4()), str(uuid4())
+    now = pendulum.now('utc')
+
+    # add a card with no user notification, and one with a notification in the future
+    card_dynamo.add_card(str(uuid4()), user_id_1, 't', 'a')
+    card_dynamo.add_card(str(uuid4()), user_id_1, 't', 'a', notify_user_at=now + pendulum.duration(hours=1))
+    assert list(card_dynamo.generate_cards_by_notify_user_at(now)) == []
+
+    # add five cards with notifications due
+    items = [
+        card_dynamo.add_card(str(uuid4()), user_id, f't{i}', f'a{i}', notify_user_at=now)
+        for i, user_id in enumerate([user_id_1, user_id_2, user_id_1, user_id_2, user_id_1])
+    ]
+    items_by_pk = {item['partitionKey']: item for item in items}
+
+    # generate them all in one page, verify full items are returned
+    pages = list(card_dynamo.generate_cards_by_notify_user_at(now))
+    assert len(pages) == 1
+    assert sorted(pages[0], key=lambda item: item['partitionKey']) == [
+        items_by_pk[pk] for pk in sorted(items_by_pk)
+    ]
+
+    # generate them in pages of two
+    pages = list(card_dynamo.generate_cards_by_notify_user_at(now, page_size=2))
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert sorted(item['partitionKey'] for page in pages for item in page) == sorted(items_by_pk)
+
+    # filter based on user
+    pages = list(card_dynamo.generate_cards_by_notify_user_at(now, only_user_ids=[user_id_2]))
+    assert sorted(item['partitionKey'] for page in pages for item in page) == sorted(
+        item['partitionKey'] for item in items[1::2]
+    )
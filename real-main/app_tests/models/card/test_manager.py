@@ -231,9 +231,19 @@ def test_delete_by_comment(card_manager, user1, user2, TestCardTemplate):
         assert not card_manager.get_card(card.id)
 
 
+def apns_results(success):
+    "Mock side effect for PinpointClient.send_users_apns reporting the same result for all users"
+    return lambda url, user_messages: {user_id: success for user_id in user_messages}
+
+
+def sorted_calls(mock):
+    "Calls are made concurrently, so sort them by url for comparison"
+    return sorted(mock.mock_calls, key=lambda c: c[1][0])
+
+
 def test_notify_users(card_manager, pinpoint_client, user, user2, TestCardTemplate):
     # configure mock to claim all apns-sending attempts succeeded
-    pinpoint_client.configure_mock(**{'send_user_apns.return_value': True})
+    pinpoint_client.configure_mock(**{'send_users_apns.side_effect': apns_results(True)})
     now = pendulum.now('utc')
 
     # add a card with a notification in the far future
@@ -271,8 +281,8 @@ def test_notify_users(card_manager, pinpoint_client, user, user2, TestCardTempla
     # run notificiations, verify one sent
     cnts = card_manager.notify_users()
     assert cnts == (1, 1)
-    assert pinpoint_client.mock_calls == [
-        call.send_user_apns(user.id, 'a3', 't3', body=None),
+    assert sorted_calls(pinpoint_client) == [
+        call.send_users_apns('a3', {user.id: {'title': 't3', 'body': None}}),
     ]
     assert card1.item == card1.refresh_item().item
     assert card2.item == card2.refresh_item().item
@@ -296,9 +306,9 @@ def test_notify_users(card_manager, pinpoint_client, user, user2, TestCardTempla
     pinpoint_client.reset_mock()
     cnts = card_manager.notify_users()
     assert cnts == (2, 2)
-    assert pinpoint_client.mock_calls == [
-        call.send_user_apns(user.id, 'a5', 't5', body='s'),
-        call.send_user_apns(user2.id, 'a4', 't4', body=None),
+    assert sorted_calls(pinpoint_client) == [
+        call.send_users_apns('a4', {user2.id: {'title': 't4', 'body': None}}),
+        call.send_users_apns('a5', {user.id: {'title': 't5', 'body': 's'}}),
     ]
     assert card1.item == card1.refresh_item().item
     assert card2.item == card2.refresh_item().item
@@ -315,12 +325,12 @@ def test_notify_users_failed_notification(card_manager, pinpoint_client, user, T
     assert card.notify_user_at == now
 
     # configure our mock to report a failed message send
-    pinpoint_client.configure_mock(**{'send_user_apns.return_value': False})
+    pinpoint_client.configure_mock(**{'send_users_apns.side_effect': apns_results(False)})
 
     # run notificiations, verify attempted send and correct DB changes upon failure
     cnts = card_manager.notify_users()
     assert cnts == (1, 0)
-    assert pinpoint_client.mock_calls == [call.send_user_apns(user.id, 'a', 't', body=None)]
+    assert sorted_calls(pinpoint_client) == [call.send_users_apns('a', {user.id: {'title': 't', 'body': None}})]
     org_item = card.item
     card.refresh_item()
     assert 'gsiK1PartitionKey' not in card.item
@@ -332,7 +342,7 @@ def test_notify_users_failed_notification(card_manager, pinpoint_client, user, T
 
 def test_notify_users_only_usernames(card_manager, pinpoint_client, user, user2, user3, TestCardTemplate):
     # configure mock to claim all apns-sending attempts succeeded
-    pinpoint_client.configure_mock(**{'send_user_apns.return_value': True})
+    pinpoint_client.configure_mock(**{'send_users_apns.side_effect': apns_results(True)})
 
     # add one notification for each user in immediate past, verify they're there
     card1 = card_manager.add_or_update_card(
@@ -352,9 +362,9 @@ def test_notify_users_only_usernames(card_manager, pinpoint_client, user, user2,
     pinpoint_client.reset_mock()
     cnts = card_manager.notify_users(only_usernames=[user.username, user3.username])
     assert cnts == (2, 2)
-    assert pinpoint_client.mock_calls == [
-        call.send_user_apns(user.id, 'a1', 't1', body=None),
-        call.send_user_apns(user3.id, 'a3', 't3', body=None),
+    assert sorted_calls(pinpoint_client) == [
+        call.send_users_apns('a1', {user.id: {'title': 't1', 'body': None}}),
+        call.send_users_apns('a3', {user3.id: {'title': 't3', 'body': None}}),
     ]
     assert card1.refresh_item().notify_user_at is None
     assert card2.refresh_item().notify_user_at
@@ -376,8 +386,8 @@ def test_notify_users_only_usernames(card_manager, pinpoint_client, user, user2,
     pinpoint_client.reset_mock()
     cnts = card_manager.notify_users(only_usernames=[user2.username])
     assert cnts == (1, 1)
-    assert pinpoint_client.mock_calls == [
-        call.send_user_apns(user2.id, 'a2', 't2', body=None),
+    assert sorted_calls(pinpoint_client) == [
+        call.send_users_apns('a2', {user2.id: {'title': 't2', 'body': None}}),
     ]
     assert card1.refresh_item().notify_user_at
     assert card2.refresh_item().notify_user_at is None
@@ -403,11 +413,90 @@ def test_notify_users_only_usernames(card_manager, pinpoint_client, user, user2,
     pinpoint_client.reset_mock()
     cnts = card_manager.notify_users()
     assert cnts == (3, 3)
-    assert pinpoint_client.mock_calls == [
-        call.send_user_apns(user.id, 'a1', 't1', body=None),
-        call.send_user_apns(user2.id, 'a2', 't2', body=None),
-        call.send_user_apns(user3.id, 'a3', 't3', body=None),
+    assert sorted_calls(pinpoint_client) == [
+        call.send_users_apns('a1', {user.id: {'title': 't1', 'body': None}}),
+        call.send_users_apns('a2', {user2.id: {'title': 't2', 'body': None}}),
+        call.send_users_apns('a3', {user3.id: {'title': 't3', 'body': None}}),
     ]
     assert card1.refresh_item().notify_user_at is None
     assert card2.refresh_item().notify_user_at is None
     assert card3.refresh_item().notify_user_at is None
+
+
+def test_notify_users_batches(card_manager, pinpoint_client, user, user2, user3, TestCardTemplate):
+    pinpoint_client.configure_mock(**{'send_users_apns.side_effect': apns_results(True)})
+
+    # add cards sharing an action for all three users, plus a second one for the first user
+    card1 = card_manager.add_or_update_card(
+        TestCardTemplate(user.id, title='t1', action='a', notify_user_after=pendulum.duration())
+    )
+    card2 = card_manager.add_or_update_card(
+        TestCardTemplate(user2.id, title='t2', action='a', notify_user_after=pendulum.duration())
+    )
+    card3 = card_manager.add_or_update_card(
+        TestCardTemplate(user3.id, title='t3', action='a', notify_user_after=pendulum.duration(), sub_title='s')
+    )
+    card4 = card_manager.add_or_update_card(
+        TestCardTemplate(user.id, title='t4', action='a', notify_user_after=pendulum.duration())
+    )
+
+    # run notifications, verify sent in two batches since a user can't appear twice in one batch
+    cnts = card_manager.notify_users()
+    assert cnts == (4, 4)
+    assert len(pinpoint_client.mock_calls) == 2
+    user_messages_1 = pinpoint_client.mock_calls[0][1][1]
+    user_messages_2 = pinpoint_client.mock_calls[1][1][1]
+    assert sorted([len(user_messages_1), len(user_messages_2)]) == [1, 3]
+    assert {**user_messages_2, **user_messages_1}.keys() == {user.id, user2.id, user3.id}
+    assert user_messages_1.get(user3.id, user_messages_2.get(user3.id)) == {'title': 't3', 'body': 's'}
+    assert {user_messages_1[user.id]['title'], user_messages_2[user.id]['title']} == {'t1', 't4'}
+    for card in (card1, card2, card3, card4):
+        assert card.refresh_item().notify_user_at is None
+
+
+def test_notify_users_batch_size(card_manager, pinpoint_client, user, user2, user3, TestCardTemplate):
+    pinpoint_client.configure_mock(**{'send_users_apns.side_effect': apns_results(True)})
+    for u in (user, user2, user3):
+        card_manager.add_or_update_card(
+            TestCardTemplate(u.id, title='t', action='a', notify_user_after=pendulum.duration())
+        )
+
+    # verify batches are split according to size
+    with patch.object(card_manager, 'notify_users_batch_size', 2):
+        assert card_manager.notify_users() == (3, 3)
+    assert sorted(len(c[1][1]) for c in pinpoint_client.mock_calls) == [1, 2]
+
+
+def test_notify_users_batch_send_exception(card_manager, pinpoint_client, user, TestCardTemplate, caplog):
+    card = card_manager.add_or_update_card(
+        TestCardTemplate(user.id, title='t', action='a', notify_user_after=pendulum.duration())
+    )
+    pinpoint_client.configure_mock(**{'send_users_apns.side_effect': Exception('boom')})
+
+    # verify the failure is logged and the card is left to be retried on the next run
+    cnts = card_manager.notify_users()
+    assert cnts == (0, 0)
+    assert len(caplog.records) == 1
+    assert caplog.records[0].levelname == 'WARNING'
+    assert 'boom' in caplog.records[0].msg
+    assert card.refresh_item().notify_user_at
+
+
+def test_notify_users_deadline(card_manager, pinpoint_client, user, TestCardTemplate, caplog):
+    pinpoint_client.configure_mock(**{'send_users_apns.side_effect': apns_results(True)})
+    card = card_manager.add_or_update_card(
+        TestCardTemplate(user.id, title='t', action='a', notify_user_after=pendulum.duration())
+    )
+
+    # a deadline in the past, verify nothing sent
+    cnts = card_manager.notify_users(deadline=pendulum.now('utc') - pendulum.duration(seconds=1))
+    assert cnts == (0, 0)
+    assert pinpoint_client.mock_calls == []
+    assert len(caplog.records) == 1
+    assert 'Deadline' in caplog.records[0].msg
+    assert card.refresh_item().notify_user_at
+
+    # a deadline in the future, verify sent
+    cnts = card_manager.notify_users(deadline=pendulum.now('utc') + pendulum.duration(minutes=1))
+    assert cnts == (1, 1)
+    assert card.refresh_item().notify_user_at is None
@@ -113,10 +113,17 @@ def test_on_post_delete_delete_cards(card_manager, post):
     assert delete_by_post_mock.mock_calls == [call(post.id)]
 
 
-def test_on_comment_delete_delete_cards(card_manager, comment):
+def test_on_comment_delete_delete_cards(card_manager, comment_manager, comment, user, post):
+    # a comment that mentions no one has no cards to delete
     with patch.object(card_manager, 'delete_by_comment') as delete_by_comment_mock:
         card_manager.on_comment_delete_delete_cards(comment.id, old_item=comment.item)
-    assert delete_by_comment_mock.mock_calls == [call(comment.id)]
+    assert delete_by_comment_mock.mock_calls == []
+
+    tagging_comment = comment_manager.add_comment(str(uuid4()), post.id, user.id, f'hi @{user.username}')
+    assert tagging_comment.item['textTags']
+    with patch.object(card_manager, 'delete_by_comment') as delete_by_comment_mock:
+        card_manager.on_comment_delete_delete_cards(tagging_comment.id, old_item=tagging_comment.item)
+    assert delete_by_comment_mock.mock_calls == [call(tagging_comment.id)]
 
 
 @pytest.mark.parametrize(
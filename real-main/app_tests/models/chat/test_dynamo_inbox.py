@@ -0,0 +1,282 @@
+import logging
+from unittest.mock import patch
+
+import pendulum
+import pytest
+
+from app.models.chat.dynamo import ChatInboxDynamo
+
+
+@pytest.fixture
+def ci_dynamo(dynamo_client):
+    yield ChatInboxDynamo(dynamo_client)
+
+
+def test_shard_pk(ci_dynamo):
+    pk = ci_dynamo.shard_pk('uid', 'cid')
+    assert pk['partitionKey'] == 'user/uid'
+    assert pk['sortKey'].startswith('chatInbox/')
+    assert ci_dynamo.shard_pk('uid', 'cid') == pk
+    shards = {ci_dynamo.shard_pk('uid', f'cid{i}')['sortKey'] for i in range(100)}
+    assert len(shards) == ci_dynamo.shard_count
+
+
+def test_add_chat(ci_dynamo):
+    user_id = 'uid'
+    at1 = pendulum.now('utc')
+    at2 = at1.add(minutes=1)
+    assert ci_dynamo.get_chat(user_id, 'cid1') is None
+    assert list(ci_dynamo.generate_chats(user_id)) == []
+
+    # add a chat, verify the shard is created
+    ci_dynamo.add_chat(user_id, 'cid1', at1)
+    chat1 = {'chatId': 'cid1', 'lastMessageActivityAt': at1.to_iso8601_string(), 'messagesUnviewedCount': 0}
+    assert ci_dynamo.get_chat(user_id, 'cid1') == chat1
+    shard = ci_dynamo.client.get_item(ci_dynamo.shard_pk(user_id, 'cid1'))
+    assert shard == {
+        **ci_dynamo.shard_pk(user_id, 'cid1'),
+        'schemaVersion': 0,
+        'userId': 'uid',
+        'chats': {'cid1': {'lastMessageActivityAt': at1.to_iso8601_string(), 'messagesUnviewedCount': 0}},
+    }
+
+    # add some more chats, enough that at least two share a shard
+    chat_ids = [f'cid{i}' for i in range(2, ci_dynamo.shard_count + 2)]
+    for chat_id in chat_ids:
+        ci_dynamo.add_chat(user_id, chat_id, at2)
+    chats = sorted(ci_dynamo.generate_chats(user_id), key=lambda chat: chat['chatId'])
+    assert [chat['chatId'] for chat in chats] == sorted(['cid1', *chat_ids])
+
+    # add an existing chat, verify no-op
+    ci_dynamo.add_chat(user_id, 'cid1', at2)
+    assert ci_dynamo.get_chat(user_id, 'cid1') == chat1
+
+    # chats with no unviewed messages, so no summary
+    assert ci_dynamo.get(user_id) is None
+
+
+def test_remove_chat(ci_dynamo):
+    user_id = 'uid'
+    now = pendulum.now('utc')
+
+    # remove from an inbox that doesn't exist, verify no-op
+    ci_dynamo.remove_chat(user_id, 'cid1')
+    assert list(ci_dynamo.generate_chats(user_id)) == []
+
+    # set up an inbox with two chats, one with unviewed messages
+    ci_dynamo.add_chat(user_id, 'cid1', now)
+    ci_dynamo.add_chat(user_id, 'cid2', now)
+    ci_dynamo.update_chat(user_id, 'cid1', now, increment_messages_unviewed_count=True)
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 1
+
+    # remove a chat that isn't there, verify no-op
+    ci_dynamo.remove_chat(user_id, 'cid3')
+    assert sorted(chat['chatId'] for chat in ci_dynamo.generate_chats(user_id)) == ['cid1', 'cid2']
+
+    # remove the chat with unviewed messages, verify
+    ci_dynamo.remove_chat(user_id, 'cid1')
+    assert [chat['chatId'] for chat in ci_dynamo.generate_chats(user_id)] == ['cid2']
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 0
+
+    # remove the other chat, verify
+    ci_dynamo.remove_chat(user_id, 'cid2')
+    assert list(ci_dynamo.generate_chats(user_id)) == []
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 0
+
+
+def test_update_chat(ci_dynamo):
+    user_id = 'uid'
+    at1 = pendulum.now('utc')
+    at2 = at1.add(minutes=1)
+    at3 = at1.add(minutes=2)
+    ci_dynamo.add_chat(user_id, 'cid1', at1)
+
+    # new message activity, verify it moves forward
+    ci_dynamo.update_chat(user_id, 'cid1', at2)
+    assert ci_dynamo.get_chat(user_id, 'cid1') == {
+        'chatId': 'cid1',
+        'lastMessageActivityAt': at2.to_iso8601_string(),
+        'messagesUnviewedCount': 0,
+    }
+    assert ci_dynamo.get(user_id) is None
+
+    # new unviewed message, verify
+    ci_dynamo.update_chat(user_id, 'cid1', at3, increment_messages_unviewed_count=True)
+    assert ci_dynamo.get_chat(user_id, 'cid1') == {
+        'chatId': 'cid1',
+        'lastMessageActivityAt': at3.to_iso8601_string(),
+        'messagesUnviewedCount': 1,
+    }
+    assert ci_dynamo.get(user_id) == {
+        **ci_dynamo.pk(user_id),
+        'schemaVersion': 0,
+        'userId': 'uid',
+        'chatsWithUnviewedMessagesCount': 1,
+    }
+
+    # out-of-order message activity doesn't move the timestamp backwards, but still counts
+    ci_dynamo.update_chat(user_id, 'cid1', at1, increment_messages_unviewed_count=True)
+    assert ci_dynamo.get_chat(user_id, 'cid1') == {
+        'chatId': 'cid1',
+        'lastMessageActivityAt': at3.to_iso8601_string(),
+        'messagesUnviewedCount': 2,
+    }
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 1
+
+
+def test_update_chat_not_in_inbox_writes_nothing(ci_dynamo):
+    user_id = 'uid'
+    at1 = pendulum.now('utc')
+    at2 = at1.add(minutes=1)
+
+    # message activity gets here before the membership does, verify chat is not added
+    assert ci_dynamo.update_chat(user_id, 'cid1', at2, increment_messages_unviewed_count=True) is False
+    assert ci_dynamo.update_chat(user_id, 'cid1', at2) is False
+    assert ci_dynamo.get_chat(user_id, 'cid1') is None
+    assert ci_dynamo.get(user_id) is None
+
+    # another chat in the same shard is present, verify still not added
+    chat_id = next(
+        f'cid{i}'
+        for i in range(2, 100)
+        if ci_dynamo.shard_pk(user_id, f'cid{i}') == ci_dynamo.shard_pk(user_id, 'cid1')
+    )
+    ci_dynamo.add_chat(user_id, chat_id, at1)
+    assert ci_dynamo.update_chat(user_id, 'cid1', at2, increment_messages_unviewed_count=True) is False
+    assert ci_dynamo.get_chat(user_id, 'cid1') is None
+    assert ci_dynamo.get(user_id) is None
+
+    # activity that arrives out of order for a chat that is present, verify reported as present
+    at0 = at1.subtract(minutes=1)
+    assert ci_dynamo.update_chat(user_id, chat_id, at0) is True
+    assert ci_dynamo.update_chat(user_id, chat_id, at0, increment_messages_unviewed_count=True) is True
+    assert ci_dynamo.get_chat(user_id, chat_id) == {
+        'chatId': chat_id,
+        'lastMessageActivityAt': at1.to_iso8601_string(),
+        'messagesUnviewedCount': 1,
+    }
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 1
+
+
+def test_add_chat_with_messages_unviewed(ci_dynamo):
+    user_id = 'uid'
+    now = pendulum.now('utc')
+    ci_dynamo.add_chat(user_id, 'cid1', now, messages_unviewed_count=2)
+    assert ci_dynamo.get_chat(user_id, 'cid1') == {
+        'chatId': 'cid1',
+        'lastMessageActivityAt': now.to_iso8601_string(),
+        'messagesUnviewedCount': 2,
+    }
+    assert ci_dynamo.get(user_id) == {
+        'partitionKey': 'user/uid',
+        'sortKey': 'chatInbox',
+        'schemaVersion': 0,
+        'userId': 'uid',
+        'chatsWithUnviewedMessagesCount': 1,
+    }
+
+    # add another, verify the summary is incremented in place
+    ci_dynamo.add_chat(user_id, 'cid2', now, messages_unviewed_count=1)
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 2
+
+
+def test_update_chat_does_not_read(ci_dynamo):
+    user_id = 'uid'
+    now = pendulum.now('utc')
+    ci_dynamo.add_chat(user_id, 'cid1', now)
+
+    with patch.object(ci_dynamo.client, 'get_item') as get_item_mock:
+        with patch.object(ci_dynamo.client, 'update_item', wraps=ci_dynamo.client.update_item) as update_mock:
+            ci_dynamo.update_chat(user_id, 'cid1', now.add(seconds=1), increment_messages_unviewed_count=True)
+            ci_dynamo.update_chat(user_id, 'cid1', now.add(seconds=2), increment_messages_unviewed_count=True)
+    assert get_item_mock.call_count == 0
+    # one write per message, plus one to the summary as the chat's count moves from zero
+    assert update_mock.call_count == 3
+    assert ci_dynamo.get_chat(user_id, 'cid1')['messagesUnviewedCount'] == 2
+
+
+def test_increment_decrement_messages_unviewed_count(ci_dynamo, caplog):
+    user_id = 'uid'
+    now = pendulum.now('utc')
+
+    # chat not in inbox, verify fail softly
+    with caplog.at_level(logging.WARNING):
+        ci_dynamo.increment_messages_unviewed_count(user_id, 'cid1')
+        ci_dynamo.decrement_messages_unviewed_count(user_id, 'cid1')
+    assert len(caplog.records) == 2
+    assert 'Failed to increment messagesUnviewedCount' in caplog.records[0].msg
+    assert 'Failed to decrement messagesUnviewedCount' in caplog.records[1].msg
+    assert ci_dynamo.get_chat(user_id, 'cid1') is None
+
+    # increment up, verify summary tracks the move from zero
+    ci_dynamo.add_chat(user_id, 'cid1', now)
+    ci_dynamo.increment_messages_unviewed_count(user_id, 'cid1')
+    ci_dynamo.increment_messages_unviewed_count(user_id, 'cid1')
+    assert ci_dynamo.get_chat(user_id, 'cid1')['messagesUnviewedCount'] == 2
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 1
+
+    # decrement down, verify summary tracks the move to zero
+    ci_dynamo.decrement_messages_unviewed_count(user_id, 'cid1')
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 1
+    ci_dynamo.decrement_messages_unviewed_count(user_id, 'cid1')
+    assert ci_dynamo.get_chat(user_id, 'cid1')['messagesUnviewedCount'] == 0
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 0
+
+    # verify can't go below zero
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        ci_dynamo.decrement_messages_unviewed_count(user_id, 'cid1')
+    assert len(caplog.records) == 1
+    assert ci_dynamo.get_chat(user_id, 'cid1')['messagesUnviewedCount'] == 0
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 0
+
+
+def test_clear_messages_unviewed_count(ci_dynamo):
+    user_id = 'uid'
+    now = pendulum.now('utc')
+    ci_dynamo.add_chat(user_id, 'cid1', now)
+    ci_dynamo.add_chat(user_id, 'cid2', now)
+    ci_dynamo.update_chat(user_id, 'cid1', now, increment_messages_unviewed_count=True)
+    ci_dynamo.update_chat(user_id, 'cid1', now, increment_messages_unviewed_count=True)
+    ci_dynamo.update_chat(user_id, 'cid2', now, increment_messages_unviewed_count=True)
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 2
+
+    ci_dynamo.clear_messages_unviewed_count(user_id, 'cid1')
+    counts = {chat['chatId']: chat['messagesUnviewedCount'] for chat in ci_dynamo.generate_chats(user_id)}
+    assert counts == {'cid1': 0, 'cid2': 1}
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 1
+
+    # clearing again, or clearing a chat not in the inbox, is a no-op
+    ci_dynamo.clear_messages_unviewed_count(user_id, 'cid1')
+    ci_dynamo.clear_messages_unviewed_count(user_id, 'cid3')
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 1
+    assert ci_dynamo.get_chat(user_id, 'cid3') is None
+
+
+def test_delete(ci_dynamo):
+    now = pendulum.now('utc')
+    for i in range(10):
+        ci_dynamo.add_chat('uid', f'cid{i}', now, messages_unviewed_count=1)
+    ci_dynamo.add_chat('uid2', 'cid0', now)
+    assert ci_dynamo.get('uid')
+    assert sum(1 for _ in ci_dynamo.generate_chats('uid')) == 10
+
+    assert ci_dynamo.delete('uid') > 1
+    assert ci_dynamo.get('uid') is None
+    assert list(ci_dynamo.generate_chats('uid')) == []
+    assert ci_dynamo.delete('uid') == 0
+
+    # verify other user's inbox untouched
+    assert ci_dynamo.get_chat('uid2', 'cid0')
+
+
+def test_update_chat_activity_only_leaves_summary(ci_dynamo):
+    user_id = 'uid'
+    now = pendulum.now('utc')
+    ci_dynamo.add_chat(user_id, 'cid1', now, messages_unviewed_count=1)
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 1
+
+    # activity that doesn't add to the unviewed messages, such as the user's own message, verify
+    ci_dynamo.update_chat(user_id, 'cid1', now.add(seconds=1))
+    assert ci_dynamo.get_chat(user_id, 'cid1')['messagesUnviewedCount'] == 1
+    assert ci_dynamo.get(user_id)['chatsWithUnviewedMessagesCount'] == 1
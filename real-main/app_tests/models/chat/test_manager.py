@@ -194,3 +194,40 @@ def test_record_views(chat_manager, user1, user2, user3, caplog):
     chat_manager.record_views([chat_id], user1.id)
     assert caplog.records == []
     assert chat.get_viewed_status(user1.id) == ViewedStatus.VIEWED
+
+
+def test_get_inbox_page(chat_manager):
+    user_id = str(uuid.uuid4())
+    assert chat_manager.get_inbox_page(user_id) == {'items': [], 'nextToken': None}
+
+    # add five chats, two with the same last message activity
+    at = pendulum.now('utc')
+    chat_ids = ['cid0', 'cid1', 'cid2', 'cid3', 'cid4']
+    for i, chat_id in enumerate(chat_ids):
+        chat_manager.inbox_dynamo.add_chat(user_id, chat_id, at.add(minutes=min(i, 3)))
+
+    # get them all in one page
+    page = chat_manager.get_inbox_page(user_id)
+    assert page == {'items': ['cid4', 'cid3', 'cid2', 'cid1', 'cid0'], 'nextToken': None}
+
+    # page through them, verify the tie is broken by chatId
+    page = chat_manager.get_inbox_page(user_id, limit=2)
+    assert page['items'] == ['cid4', 'cid3']
+    assert page['nextToken'] == f'{at.add(minutes=3).to_iso8601_string()}/cid3'
+    next_token = page['nextToken']
+
+    # new activity in a chat on the first page, verify it doesn't shift later pages
+    chat_manager.inbox_dynamo.update_chat(user_id, 'cid3', at.add(minutes=4))
+    page = chat_manager.get_inbox_page(user_id, limit=2, next_token=next_token)
+    assert page['items'] == ['cid2', 'cid1']
+    page = chat_manager.get_inbox_page(user_id, limit=2, next_token=page['nextToken'])
+    assert page == {'items': ['cid0'], 'nextToken': None}
+
+    # exactly enough to fill a page, verify no nextToken
+    page = chat_manager.get_inbox_page(user_id, limit=5)
+    assert page == {'items': ['cid3', 'cid4', 'cid2', 'cid1', 'cid0'], 'nextToken': None}
+
+    # a nextToken that isn't a cursor, such as one from the old resolver, verify starts from the first page
+    for next_token in ('inbox2', 'eyJ2ZXJzaW9uIjoyfQ/eyJ0b2tlbiI6IkFRSUN9', f'{at.to_iso8601_string()}/'):
+        page = chat_manager.get_inbox_page(user_id, limit=2, next_token=next_token)
+        assert page['items'] == ['cid3', 'cid4']
@@ -142,11 +142,11 @@ def test_on_chat_message_delete(chat_manager, chat, user1, user2, caplog, user1_
     # react to a message delete, verify fails softly and final state
     with caplog.at_level(logging.WARNING):
         chat_manager.on_chat_message_delete(user1_message.id, old_item=user1_message.item)
-    assert len(caplog.records) == 2
+    assert len(caplog.records) == 3
     assert 'Failed to decrement messagesCount' in caplog.records[0].msg
     assert 'Failed to decrement messagesUnviewedCount' in caplog.records[1].msg
-    assert chat.id in caplog.records[0].msg
-    assert chat.id in caplog.records[1].msg
+    assert 'Failed to decrement messagesUnviewedCount' in caplog.records[2].msg
+    assert all(chat.id in rec.msg for rec in caplog.records)
     assert chat.refresh_item().item['messagesCount'] == 0
     assert chat.member_dynamo.get(chat.id, user1.id).get('messagesUnviewedCount', 0) == 0
     assert chat.member_dynamo.get(chat.id, user2.id).get('messagesUnviewedCount', 0) == 0
@@ -231,3 +231,96 @@ def test_on_chat_delete_delete_memberships(chat_manager, user1, user2, chat):
     chat_manager.on_chat_delete_delete_memberships(group_chat.id, old_item=group_chat.item)
     assert sum(1 for _ in chat_manager.member_dynamo.generate_chat_ids_by_user(user1.id)) == 0
     assert sum(1 for _ in chat_manager.member_dynamo.generate_chat_ids_by_user(user2.id)) == 0
+
+
+def test_on_chat_member_add_and_delete_update_inbox(chat_manager, user1, user2, chat):
+    assert list(chat_manager.inbox_dynamo.generate_chats(user1.id)) == []
+
+    # react to the add of user1's membership, verify chat added to their inbox
+    member_item = chat.member_dynamo.get(chat.id, user1.id)
+    chat_manager.on_chat_member_add_update_inbox(chat.id, new_item=member_item)
+    assert list(chat_manager.inbox_dynamo.generate_chats(user1.id)) == [
+        {'chatId': chat.id, 'lastMessageActivityAt': chat.item['createdAt'], 'messagesUnviewedCount': 0}
+    ]
+    assert list(chat_manager.inbox_dynamo.generate_chats(user2.id)) == []
+
+    # react to the delete of that membership, verify chat removed from inbox
+    chat_manager.on_chat_member_delete_update_inbox(chat.id, old_item=member_item)
+    assert list(chat_manager.inbox_dynamo.generate_chats(user1.id)) == []
+
+
+def test_on_chat_message_add_delete_and_view_update_inbox(
+    chat_manager, chat, user1, user2, user1_message, user2_message
+):
+    # react to adding a message by user1 before the memberships got to the inboxes, verify inboxes
+    chat_manager.on_chat_message_add(user1_message.id, new_item=user1_message.item)
+    at_str = user1_message.created_at.to_iso8601_string()
+    assert chat_manager.inbox_dynamo.get_chat(user1.id, chat.id) == {
+        'chatId': chat.id,
+        'lastMessageActivityAt': at_str,
+        'messagesUnviewedCount': 0,
+    }
+    assert chat_manager.inbox_dynamo.get_chat(user2.id, chat.id) == {
+        'chatId': chat.id,
+        'lastMessageActivityAt': at_str,
+        'messagesUnviewedCount': 1,
+    }
+    assert chat_manager.inbox_dynamo.get(user1.id) is None
+    assert chat_manager.inbox_dynamo.get(user2.id)['chatsWithUnviewedMessagesCount'] == 1
+
+    # the memberships get to the inboxes, verify no change
+    for user in (user1, user2):
+        member_item = chat.member_dynamo.get(chat.id, user.id)
+        chat_manager.on_chat_member_add_update_inbox(chat.id, new_item=member_item)
+    assert chat_manager.inbox_dynamo.get_chat(user1.id, chat.id)['lastMessageActivityAt'] == at_str
+    assert chat_manager.inbox_dynamo.get_chat(user2.id, chat.id)['messagesUnviewedCount'] == 1
+
+    # react to adding a message by user2, verify inboxes
+    chat_manager.on_chat_message_add(user2_message.id, new_item=user2_message.item)
+    assert chat_manager.inbox_dynamo.get_chat(user1.id, chat.id)['messagesUnviewedCount'] == 1
+    assert chat_manager.inbox_dynamo.get_chat(user2.id, chat.id)['messagesUnviewedCount'] == 1
+    assert chat_manager.inbox_dynamo.get(user1.id)['chatsWithUnviewedMessagesCount'] == 1
+
+    # react to user2's message being deleted, verify inboxes
+    chat_manager.on_chat_message_delete(user2_message.id, old_item=user2_message.item)
+    assert chat_manager.inbox_dynamo.get_chat(user1.id, chat.id)['messagesUnviewedCount'] == 0
+    assert chat_manager.inbox_dynamo.get_chat(user2.id, chat.id)['messagesUnviewedCount'] == 1
+    assert chat_manager.inbox_dynamo.get(user1.id)['chatsWithUnviewedMessagesCount'] == 0
+
+    # react to user2 viewing the chat, verify inboxes
+    chat_manager.record_views([chat.id], user2.id)
+    view_item = chat_manager.view_dynamo.get_view(chat.id, user2.id)
+    chat_manager.sync_member_messages_unviewed_count(chat.id, new_item=view_item)
+    assert chat_manager.inbox_dynamo.get_chat(user2.id, chat.id)['messagesUnviewedCount'] == 0
+    assert chat_manager.inbox_dynamo.get(user2.id)['chatsWithUnviewedMessagesCount'] == 0
+
+
+def test_on_chat_message_add_does_not_add_inbox_chat_for_former_member(
+    chat_manager, chat, user1, user2, user1_message
+):
+    # user2 leaves the chat after the message's members were listed but before their inbox was written
+    user_ids = list(chat_manager.member_dynamo.generate_user_ids_by_chat(chat.id))
+    chat_manager.member_dynamo.delete(chat.id, user2.id)
+    with patch.object(chat_manager.member_dynamo, 'generate_user_ids_by_chat', return_value=user_ids):
+        chat_manager.on_chat_message_add(user1_message.id, new_item=user1_message.item)
+
+    # verify no chat was added to user2's inbox, but user1's inbox got it
+    assert chat_manager.inbox_dynamo.get_chat(user2.id, chat.id) is None
+    assert chat_manager.inbox_dynamo.get(user2.id) is None
+    assert chat_manager.inbox_dynamo.get_chat(user1.id, chat.id)
+
+    # verify no read of the member item for a chat already in the inbox
+    with patch.object(chat_manager.member_dynamo, 'get') as get_mock:
+        chat_manager.on_chat_message_add(user1_message.id, new_item=user1_message.item)
+    assert get_mock.call_count == 0
+
+
+def test_on_user_delete_delete_inbox(chat_manager, chat, user1, user2, user1_message):
+    chat_manager.on_chat_message_add(user1_message.id, new_item=user1_message.item)
+    assert chat_manager.inbox_dynamo.get_chat(user1.id, chat.id)
+    assert chat_manager.inbox_dynamo.get(user2.id)
+
+    chat_manager.on_user_delete_delete_inbox(user2.id, old_item=user2.item)
+    assert chat_manager.inbox_dynamo.get_chat(user2.id, chat.id) is None
+    assert chat_manager.inbox_dynamo.get(user2.id) is None
+    assert chat_manager.inbox_dynamo.get_chat(user1.id, chat.id)
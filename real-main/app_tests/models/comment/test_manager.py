@@ -1,4 +1,5 @@
 import uuid
+from unittest.mock import patch
 
 import pendulum
 import pytest
@@ -173,3 +174,21 @@ def test_delete_all_on_post(comment_manager, user, post, post_manager, user2, us
 
     # verify the unrelated comment was untouched
     assert comment_manager.get_comment(comment_other.id)
+
+
+def test_delete_all_in_batches(comment_manager, post, user2, user3):
+    comment_ids = [comment_manager.add_comment(f'cid{i}', post.id, user2.id, 'lore').id for i in range(4)]
+    comment_other = comment_manager.add_comment('coid', post.id, user3.id, 'lore')
+
+    # batches smaller than the number of comments, verify they all get deleted
+    with patch.object(comment_manager, 'delete_batch_size', 3):
+        with patch.object(
+            comment_manager.dynamo, 'batch_delete_comments', wraps=comment_manager.dynamo.batch_delete_comments
+        ) as delete_mock:
+            assert comment_manager.delete_all_by_user(user2.id) == 4
+    assert [len(list(c.args[0])) for c in delete_mock.call_args_list] == [3, 1]
+    assert all(comment_manager.get_comment(comment_id) is None for comment_id in comment_ids)
+    assert comment_manager.get_comment(comment_other.id)
+
+    # nothing to delete
+    assert comment_manager.delete_all_by_user(user2.id) == 0
@@ -1,4 +1,5 @@
 import uuid
+from unittest.mock import patch
 
 import pytest
 
@@ -292,3 +293,22 @@ def test_dislike_all_by_user_from_user(like_manager, user1, user2, user1_posts,
     # check likes
     assert list(like_manager.dynamo.generate_of_post(post1.id)) == []
     assert list(like_manager.dynamo.generate_of_post(post2.id)) == []
+
+
+def test_dislike_all_in_batches(like_manager, user1, user2, user1_posts, user2_posts):
+    for post in (*user1_posts, *user2_posts):
+        like_manager.like_post(user1, post, LikeStatus.ONYMOUSLY_LIKED)
+    like_manager.like_post(user2, user2_posts[0], LikeStatus.ANONYMOUSLY_LIKED)
+
+    # batches smaller than the number of likes, verify they all get deleted
+    with patch.object(like_manager, 'dislike_batch_size', 3):
+        with patch.object(
+            like_manager.dynamo, 'batch_delete_likes', wraps=like_manager.dynamo.batch_delete_likes
+        ) as delete_mock:
+            assert like_manager.dislike_all_by_user(user1.id) == 4
+    assert [len(list(c.args[0])) for c in delete_mock.call_args_list] == [3, 1]
+    assert list(like_manager.dynamo.generate_by_liked_by(user1.id)) == []
+    assert [li['likedByUserId'] for li in like_manager.dynamo.generate_of_post(user2_posts[0].id)] == [user2.id]
+
+    # nothing to dislike
+    assert like_manager.dislike_all_by_user(user1.id) == 0
@@ -0,0 +1,106 @@
+import hashlib
+from os import path
+
+import pytest
+
+from app.models.post.cached_image import CachedImage
+from app.models.post.exceptions import PostException
+from app.utils import image_size
+
+grant_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'grant.jpg')
+grant_rotated_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'grant-rotated.jpg')
+heic_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'IMG_0265.HEIC')
+
+
+@pytest.fixture
+def jpeg_cache(s3_uploads_client):
+    s3_uploads_client.put_object('native.jpg', open(grant_path, 'rb'), 'image/jpeg')
+    yield CachedImage('pid', image_size=image_size.NATIVE, s3_client=s3_uploads_client, s3_path='native.jpg')
+
+
+@pytest.fixture
+def heic_cache(s3_uploads_client):
+    s3_uploads_client.put_object('native.heic', open(heic_path, 'rb'), 'image/heic')
+    yield CachedImage(
+        'pid', image_size=image_size.NATIVE_HEIC, s3_client=s3_uploads_client, s3_path='native.heic'
+    )
+
+
+def test_refresh_streams_to_spooled_file(jpeg_cache):
+    jpeg_cache.read_chunk_size = 1000
+    jpeg_cache.refresh()
+    assert jpeg_cache.is_synced is True
+    assert jpeg_cache._image is None
+    assert jpeg_cache._rewound_data().read() == open(grant_path, 'rb').read()
+    assert jpeg_cache.checksum == hashlib.md5(open(grant_path, 'rb').read()).hexdigest()
+    assert [stage['stage'] for stage in jpeg_cache.metrics.stages] == ['read native.jpg']
+    assert jpeg_cache.metrics.stages[0]['peakRssMB'] > 0
+
+
+def test_large_data_spills_to_disk(jpeg_cache):
+    jpeg_cache.spool_max_size = 1000
+    jpeg_cache.refresh()
+    assert jpeg_cache._data._rolled is True
+    assert jpeg_cache.readonly_image.size == (240, 320)
+
+
+def test_synced_data_dropped_once_decoded(jpeg_cache):
+    assert jpeg_cache.readonly_image.size == (240, 320)
+    assert jpeg_cache._data is None
+    assert [stage['stage'] for stage in jpeg_cache.metrics.stages] == ['read native.jpg', 'decode native.jpg']
+
+    # checksum is still known
+    assert jpeg_cache.checksum == hashlib.md5(open(grant_path, 'rb').read()).hexdigest()
+
+
+def test_unsynced_data_kept_once_decoded(jpeg_cache, s3_uploads_client):
+    jpeg_cache.set_data(open(grant_rotated_path, 'rb'))
+    assert jpeg_cache.readonly_image.size == (320, 240)
+    assert jpeg_cache._data is not None
+
+    # the original bytes are flushed, not a re-encoding of them
+    jpeg_cache.flush()
+    assert s3_uploads_client.get_object_data_stream('native.jpg').read() == open(grant_rotated_path, 'rb').read()
+
+
+def test_size_read_from_header(jpeg_cache):
+    assert jpeg_cache.size == (240, 320)
+    assert jpeg_cache._image is None
+    assert [stage['stage'] for stage in jpeg_cache.metrics.stages] == ['read native.jpg']
+
+    # respects exif orientation
+    jpeg_cache.set_data(open(grant_rotated_path, 'rb'))
+    assert jpeg_cache.size == (320, 240)
+    assert jpeg_cache._image is None
+
+
+def test_size_of_bad_data(jpeg_cache, s3_uploads_client):
+    s3_uploads_client.put_object('native.jpg', b'aintnojpeg', 'image/jpeg')
+    with pytest.raises(PostException, match='Unable to decode native jpeg data'):
+        jpeg_cache.size
+
+
+def test_decode_heic(heic_cache):
+    image = heic_cache.readonly_image
+    assert image.size == (4032, 3024)
+    assert image.mode == 'RGB'
+    assert heic_cache._data is None
+
+
+def test_release(heic_cache):
+    # can't release what isn't stored
+    heic_cache.set_data(open(heic_path, 'rb'))
+    assert heic_cache.readonly_image
+    heic_cache.release()
+    assert heic_cache._image is not None
+
+    # once it's stored, can release
+    heic_cache.refresh()
+    assert heic_cache.readonly_image
+    heic_cache.release()
+    assert heic_cache._image is None
+    assert heic_cache._data is None
+    assert heic_cache.is_synced is None
+
+    # and it's re-read as needed
+    assert heic_cache.readonly_image.size == (4032, 3024)
@@ -1,5 +1,6 @@
 import logging
 from decimal import Decimal
+from unittest import mock
 from uuid import uuid4
 
 import pendulum
@@ -36,6 +37,18 @@ def test_post_add_and_delete(post_dynamo):
     assert post_dynamo.get_post(post_id) is None
 
 
+def test_generate_posts(post_dynamo):
+    # none
+    assert list(post_dynamo.generate_posts([])) == []
+    assert list(post_dynamo.generate_posts(['pid-dne'])) == []
+
+    # add two posts, fetch them together, skipping one that does not exist
+    post1 = post_dynamo.add_pending_post('uid', 'pid1', 'ptype', text='lore')
+    post2 = post_dynamo.add_pending_post('uid', 'pid2', 'ptype', text='ipsum')
+    posts = list(post_dynamo.generate_posts(['pid2', 'pid-dne', 'pid1']))
+    assert sorted(posts, key=lambda item: item['postId']) == [post1, post2]
+
+
 def test_add_pending_post_sans_options(post_dynamo):
     user_id = 'pbuid'
     post_id = 'pid'
@@ -334,6 +347,11 @@ def test_set_checksum(post_dynamo):
     assert new_item.pop('gsiK2SortKey') == posted_at_str
     assert new_item == post_item
 
+    # set the checksum along with a perceptual hash, check result
+    new_item = post_dynamo.set_checksum(post_id, posted_at_str, 'other sum', perceptual_hash='0f0f0f0f0f0f0f0f')
+    assert new_item['checksum'] == 'other sum'
+    assert new_item['perceptualHash'] == '0f0f0f0f0f0f0f0f'
+
 
 def test_get_first_with_checksum(post_dynamo):
     checksum = 'shaken, not checked'
@@ -689,6 +707,20 @@ def test_generate_expired_post_pks_with_scan(post_dynamo):
     assert expired_posts[1]['sortKey'] == post2['sortKey']
 
 
+def test_generate_expired_post_pks_with_parallel_scan(post_dynamo):
+    def scan(scan_kwargs):
+        return [{'partitionKey': f'post/p{scan_kwargs["Segment"]}', 'sortKey': '-'}]
+
+    today = pendulum.now('utc').date()
+    with mock.patch.object(post_dynamo.client, 'generate_all_scan', side_effect=scan) as scan_mock:
+        expired_posts = list(post_dynamo.generate_expired_post_pks_with_scan(today, total_segments=3))
+    assert sorted(pk['partitionKey'] for pk in expired_posts) == ['post/p0', 'post/p1', 'post/p2']
+    scan_kwargs = [c.args[0] for c in scan_mock.call_args_list]
+    assert sorted(kwargs['Segment'] for kwargs in scan_kwargs) == [0, 1, 2]
+    assert all(kwargs['TotalSegments'] == 3 for kwargs in scan_kwargs)
+    assert all('FilterExpression' in kwargs for kwargs in scan_kwargs)
+
+
 def test_set_last_unviewed_comment_at(post_dynamo):
     user_id = 'uid'
     post_id = 'pid'
@@ -926,6 +958,29 @@ def test_set_album_rank(post_dynamo):
     assert post_item['gsiK3SortKey'] == 0.5
 
 
+def test_get_last_album_rank_and_get_next_in_album(post_dynamo):
+    # empty album
+    album_id = 'aid'
+    assert post_dynamo.get_last_album_rank(album_id) is None
+    assert post_dynamo.get_next_in_album(album_id) == (None, None)
+
+    # add a pending post, which isn't ranked
+    post_item_1 = post_dynamo.add_pending_post('uid', 'pid1', 'ptype', text='lore', album_id=album_id)
+    assert post_dynamo.get_last_album_rank(album_id) is None
+    assert post_dynamo.get_next_in_album(album_id) == (None, None)
+
+    # complete it and another post
+    post_item_2 = post_dynamo.add_pending_post('uid', 'pid2', 'ptype', text='lore', album_id=album_id)
+    post_dynamo.set_post_status(post_item_1, PostStatus.COMPLETED, album_rank=Decimal('0.5'))
+    post_dynamo.set_post_status(post_item_2, PostStatus.COMPLETED, album_rank=Decimal(2))
+    assert post_dynamo.get_last_album_rank(album_id) == 2
+    assert post_dynamo.get_next_in_album(album_id) == ('pid1', Decimal('0.5'))
+    assert post_dynamo.get_next_in_album(album_id, after_rank=Decimal(0)) == ('pid1', Decimal('0.5'))
+    assert post_dynamo.get_next_in_album(album_id, after_rank=Decimal('0.5')) == ('pid2', 2)
+    assert post_dynamo.get_next_in_album(album_id, after_rank=Decimal(2)) == (None, None)
+    assert post_dynamo.get_last_album_rank('aid-other') is None
+
+
 def test_transact_increment_decrement_clear_comments_unviewed_count(post_dynamo, caplog):
     post_id = str(uuid4())
 
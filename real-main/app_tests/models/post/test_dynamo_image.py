@@ -126,6 +126,30 @@ def test_set_colors(post_image_dynamo, post_id, core_item):
     assert item == core_item
 
 
+def test_set_processed_attributes(post_image_dynamo, post_id, core_item):
+    assert post_image_dynamo.get(post_id) is None
+
+    # test minimal, from nothing
+    item = post_image_dynamo.set_processed_attributes(post_id, 100, 200)
+    assert post_image_dynamo.get(post_id) == item
+    assert item.pop('height') == 100
+    assert item.pop('width') == 200
+    assert item == core_item
+
+    # test maximal, over the top of other attributes
+    post_image_dynamo.set_initial_attributes(post_id, image_format='go')
+    item = post_image_dynamo.set_processed_attributes(
+        post_id, 300, 400, colors=[(1, 2, 3), (4, 5, 6)], variant_formats=['WEBP']
+    )
+    assert post_image_dynamo.get(post_id) == item
+    assert item.pop('imageFormat') == 'go'
+    assert item.pop('height') == 300
+    assert item.pop('width') == 400
+    assert item.pop('colors') == [{'r': 1, 'g': 2, 'b': 3}, {'r': 4, 'g': 5, 'b': 6}]
+    assert item.pop('variantFormats') == ['WEBP']
+    assert item == core_item
+
+
 def test_delete(post_image_dynamo):
     post_id = str(uuid4())
     assert post_image_dynamo.get(post_id) is None
@@ -1,5 +1,6 @@
 import logging
 import uuid
+from unittest.mock import patch
 
 import pendulum
 import pytest
@@ -45,6 +46,14 @@ def test_get_post_dne(post_manager):
     assert post_manager.get_post('pid-dne') is None
 
 
+def test_get_posts(post_manager, posts):
+    post1, post2 = posts
+    assert post_manager.get_posts([]) == []
+    assert [post.id for post in post_manager.get_posts([post2.id, 'pid-dne', post1.id])] == [post2.id, post1.id]
+    assert [post.id for post in post_manager.get_posts([post1.id, post2.id])] == [post1.id, post2.id]
+    assert post_manager.get_posts([post1.id])[0].item == post1.item
+
+
 def test_add_post_errors(post_manager, user):
     # try to add a post without any content (no text or media)
     with pytest.raises(PostException, match='without text'):
@@ -170,7 +179,6 @@ def test_add_text_only_post_to_album(post_manager, user, album):
     post.refresh_item()
     assert post.item['albumId'] == album.id
     assert post.item['gsiK3SortKey'] == 0  # album rank
-    assert album.refresh_item().item['rankCount'] == 1
 
 
 def test_video_post_to_album(post_manager, user, album, s3_uploads_client, grant_data):
@@ -181,7 +189,6 @@ def test_video_post_to_album(post_manager, user, album, s3_uploads_client, grant
     assert post.id == post_id
     assert post.item['albumId'] == album.id
     assert post.item['gsiK3SortKey'] == -1  # album rank
-    assert 'rankCount' not in album.refresh_item().item
 
     # complete the video post
     post.item = post.dynamo.set_post_status(post.item, PostStatus.PROCESSING)
@@ -195,7 +202,6 @@ def test_video_post_to_album(post_manager, user, album, s3_uploads_client, grant
     post.refresh_item()
     assert post.item['albumId'] == album.id
     assert post.item['gsiK3SortKey'] == 0  # album rank
-    assert album.refresh_item().item['rankCount'] == 1
 
 
 def test_add_video_post_minimal(post_manager, user):
@@ -454,11 +460,11 @@ def test_delete_recently_expired_posts(post_manager, user, caplog):
     assert 'Deleting' in caplog.records[0].msg
     assert post_expired_today.id in caplog.records[0].msg
 
-    # check one of the posts is missing from the DB, but the rest are still there
-    assert post_no_expires.refresh_item().item
-    assert post_future_expires.refresh_item().item
-    assert post_expired_today.refresh_item().item is None
-    assert post_expired_last_week.refresh_item().item
+    # check one of the posts is being deleted, but the rest are untouched
+    assert post_no_expires.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+    assert post_future_expires.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+    assert post_expired_today.refresh_item().item['postStatus'] == PostStatus.DELETING
+    assert post_expired_last_week.refresh_item().item['postStatus'] == PostStatus.COMPLETED
 
 
 def test_delete_older_expired_posts(post_manager, user, caplog):
@@ -503,11 +509,11 @@ def test_delete_older_expired_posts(post_manager, user, caplog):
     assert 'Deleting' in caplog.records[0].msg
     assert post_expired_last_week.id in caplog.records[0].msg
 
-    # check one of the posts is missing from the DB, but the rest are still there
-    assert post_no_expires.refresh_item().item
-    assert post_future_expires.refresh_item().item
-    assert post_expired_today.refresh_item().item
-    assert post_expired_last_week.refresh_item().item is None
+    # check one of the posts is being deleted, but the rest are untouched
+    assert post_no_expires.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+    assert post_future_expires.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+    assert post_expired_today.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+    assert post_expired_last_week.refresh_item().item['postStatus'] == PostStatus.DELETING
 
 
 def test_set_post_status_to_error(post_manager, user_manager, user):
@@ -556,6 +562,72 @@ def test_record_views(post_manager, user, user2, posts, caplog):
     assert user2.refresh_item().item['lastPostViewAt']
 
 
+@pytest.fixture
+def posts_at_start_of_day(post_manager, user):
+    # posted at the exact begining of a day, so views that day add exactly their multiplier to trending
+    now = pendulum.parse('2020-06-09T00:00:00Z')
+    post1 = post_manager.add_post(user, 'pid1', PostType.TEXT_ONLY, text='t', now=now)
+    post2 = post_manager.add_post(user, 'pid2', PostType.TEXT_ONLY, text='t', now=now)
+    yield (post1, post2)
+
+
+def test_record_views_coalesces_writes(post_manager, user, user2, posts_at_start_of_day):
+    post1, post2 = posts_at_start_of_day
+    viewed_at = post1.posted_at
+    assert post1.trending_score == 1
+    assert post2.trending_score == 1
+    assert user.refresh_trending_item().trending_item is None
+
+    # record views across both posts, verify the viewedBy counts are left to the stream handlers
+    client = post_manager.dynamo.client
+    with patch.object(client, 'increment_count', wraps=client.increment_count) as increment_mock:
+        post_manager.record_views([post1.id, post2.id, post1.id], user2.id, viewed_at=viewed_at)
+    assert increment_mock.call_args_list == []
+    view_item1 = post_manager.view_dynamo.get_view(post1.id, user2.id)
+    view_item2 = post_manager.view_dynamo.get_view(post2.id, user2.id)
+    assert view_item1['viewCount'] == 2
+    assert view_item1['postedByUserId'] == user.id
+    assert view_item2['viewCount'] == 1
+    assert view_item2['postedByUserId'] == user.id
+    assert post1.refresh_item().item.get('viewedByCount', 0) == 0
+    assert user.refresh_item().item.get('postViewedByCount', 0) == 0
+    assert post1.refresh_trending_item().trending_score == 2
+    assert post2.refresh_trending_item().trending_score == 2
+    assert user.refresh_trending_item().trending_score == 2
+
+    # record views again, verify only view counts and trending go up
+    post_manager.record_views([post1.id, post2.id], user2.id, viewed_at=viewed_at)
+    assert post_manager.view_dynamo.get_view(post1.id, user2.id)['viewCount'] == 3
+    assert post1.refresh_trending_item().trending_score == 3
+    assert user.refresh_trending_item().trending_score == 4
+
+
+def test_record_views_of_non_original_post(post_manager, user, user2, posts_at_start_of_day):
+    post1, post2 = posts_at_start_of_day
+    viewed_at = post1.posted_at
+    post_manager.dynamo.client.set_attributes(post_manager.dynamo.pk(post2.id), originalPostId=post1.id)
+
+    # the post owner's views are not passed on to the original
+    post_manager.record_views([post2.id], user.id, viewed_at=viewed_at)
+    assert post_manager.view_dynamo.get_view(post2.id, user.id)
+    assert post_manager.view_dynamo.get_view(post1.id, user.id) is None
+
+    # another user's are, coalesced with their views of the original itself
+    post_manager.record_views([post2.id, post1.id, post2.id], user2.id, viewed_at=viewed_at)
+    assert post_manager.view_dynamo.get_view(post2.id, user2.id)['viewCount'] == 2
+    assert post_manager.view_dynamo.get_view(post1.id, user2.id)['viewCount'] == 3
+    assert post_manager.view_dynamo.get_view(post1.id, user2.id)['postedByUserId'] == user.id
+    assert post1.refresh_trending_item().trending_score == 1 + 2
+
+    # the original is gone, views of the copy are still recorded
+    post1.delete()
+    with patch.object(post_manager.view_dynamo, 'add_view') as add_view_mock:
+        post_manager.record_views([post2.id], user2.id, viewed_at=viewed_at)
+    assert add_view_mock.mock_calls == []
+    assert post_manager.view_dynamo.get_view(post2.id, user2.id)['viewCount'] == 3
+    assert post_manager.view_dynamo.get_view(post1.id, user2.id)['viewCount'] == 3
+
+
 def test_delete_all_by_user(post_manager, user):
     assert list(post_manager.dynamo.generate_posts_by_user(user.id)) == []
 
@@ -573,4 +645,78 @@ def test_delete_all_by_user(post_manager, user):
 
     # test delete those posts
     post_manager.delete_all_by_user(user.id)
-    assert list(post_manager.dynamo.generate_posts_by_user(user.id)) == []
+    post_items = list(post_manager.dynamo.generate_posts_by_user(user.id))
+    assert [post_item['postStatus'] for post_item in post_items] == [PostStatus.DELETING] * 2
+
+
+def test_run_delete_cascade(post_manager, user):
+    post = post_manager.add_post(user, 'pid1', PostType.TEXT_ONLY, text='t')
+
+    # a post that isn't deleting, verify no cascade
+    post_manager.run_delete_cascade(post.id)
+    assert post.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+
+    # mark the post as deleting, run the cascade and verify the post is gone
+    post.delete()
+    assert post.refresh_item().item['postStatus'] == PostStatus.DELETING
+    post_manager.run_delete_cascade(post.id)
+    assert post.refresh_item().item is None
+
+    # a post that's already gone, verify a no-op
+    post_manager.run_delete_cascade(post.id)
+
+
+def test_delete_older_expired_posts_sweep_window_and_backfill(post_manager, user, caplog):
+    now = pendulum.now('utc')
+    post_expired_last_week = post_manager.add_post(
+        user,
+        'pid1',
+        PostType.TEXT_ONLY,
+        text='t',
+        lifetime_duration=pendulum.duration(hours=1),
+        now=(now - pendulum.duration(days=7)),
+    )
+    days_ago = post_manager.expired_posts_sweep_days + 10
+    post_expired_long_ago = post_manager.add_post(
+        user,
+        'pid2',
+        PostType.TEXT_ONLY,
+        text='t',
+        lifetime_duration=pendulum.duration(hours=1),
+        now=(now - pendulum.duration(days=days_ago)),
+    )
+
+    # the daily sweep only reaches back so far
+    post_manager.delete_older_expired_posts()
+    assert post_expired_last_week.refresh_item().item['postStatus'] == PostStatus.DELETING
+    assert post_expired_long_ago.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+
+    # a backfill finds the rest. Note moto doesn't support scan segments
+    with patch.object(post_manager, 'expired_posts_scan_segments', 1):
+        post_manager.delete_older_expired_posts(backfill=True)
+    assert post_expired_long_ago.refresh_item().item['postStatus'] == PostStatus.DELETING
+
+
+def test_delete_older_expired_posts_concurrently(post_manager, user):
+    now = pendulum.now('utc')
+    posts = [
+        post_manager.add_post(
+            user,
+            f'pid{i}',
+            PostType.TEXT_ONLY,
+            text='t',
+            lifetime_duration=pendulum.duration(hours=1),
+            now=(now - pendulum.duration(days=i + 2)),
+        )
+        for i in range(4)
+    ]
+    with patch.object(post_manager, 'delete_expired_post', wraps=post_manager.delete_expired_post) as delete_mock:
+        post_manager.delete_older_expired_posts()
+    assert sorted(c.args[0]['partitionKey'] for c in delete_mock.call_args_list) == sorted(
+        f'post/{post.id}' for post in posts
+    )
+    assert all(post.refresh_item().item['postStatus'] == PostStatus.DELETING for post in posts)
+
+    # a post deleted since it was found is skipped
+    posts[0].refresh_item().delete_cascade()
+    assert post_manager.delete_expired_post(post_manager.dynamo.pk(posts[0].id)) is None
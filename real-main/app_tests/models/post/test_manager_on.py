@@ -153,6 +153,104 @@ def test_on_like_delete(post_manager, post, like_onymous, like_anonymous, caplog
     assert post.item.get('anonymousLikeCount', 0) == 0
 
 
+def test_on_like_delete_buffered(post_manager, post, like_onymous, like_anonymous, caplog):
+    for _ in range(3):
+        post_manager.dynamo.increment_onymous_like_count(post.id)
+    post_manager.dynamo.increment_anonymous_like_count(post.id)
+
+    # within the context, the decrements are held back
+    with post_manager.dynamo.client.count_deltas_buffered():
+        post_manager.on_like_delete(post.id, like_onymous.item)
+        post_manager.on_like_delete(post.id, like_onymous.item)
+        post_manager.on_like_delete(post.id, like_anonymous.item)
+        post.refresh_item()
+        assert post.item.get('onymousLikeCount', 0) == 3
+        assert post.item.get('anonymousLikeCount', 0) == 1
+
+    # and applied in aggregate on exit
+    post.refresh_item()
+    assert post.item.get('onymousLikeCount', 0) == 1
+    assert post.item.get('anonymousLikeCount', 0) == 0
+
+    # an aggregate decrement that would take a count negative takes it to zero instead
+    with post_manager.dynamo.client.count_deltas_buffered():
+        post_manager.on_like_delete(post.id, like_onymous.item)
+        post_manager.on_like_delete(post.id, like_onymous.item)
+    assert post.refresh_item().item.get('onymousLikeCount', 0) == 0
+
+    # once at zero, it fails softly
+    with caplog.at_level(logging.WARNING):
+        with post_manager.dynamo.client.count_deltas_buffered():
+            post_manager.on_like_delete(post.id, like_onymous.item)
+            post_manager.on_like_delete(post.id, like_onymous.item)
+    assert len(caplog.records) == 1
+    assert 'Failed to decrement' in caplog.records[0].msg
+    assert post.refresh_item().item.get('onymousLikeCount', 0) == 0
+
+
+def test_on_post_view_add_update_viewed_by_counts(post_manager, post, user):
+    post2 = post_manager.add_post(user, str(uuid4()), PostType.TEXT_ONLY, text='go')
+    viewer_ids = [str(uuid4()) for _ in range(5)]
+    for viewer_id in [*viewer_ids, user.id]:
+        post_manager.record_views([post.id, post2.id, post.id], viewer_id)
+    view_items = [
+        post_manager.view_dynamo.get_view(p.id, viewer_id) for p in (post, post2) for viewer_id in viewer_ids
+    ]
+    owner_view_items = [post_manager.view_dynamo.get_view(p.id, user.id) for p in (post, post2)]
+
+    # process one view by a rando, verify counted without reading the post
+    with patch.object(post_manager, 'get_post') as get_post_mock:
+        post_manager.on_post_view_add_update_viewed_by_counts(post.id, new_item=view_items[0])
+    assert get_post_mock.call_count == 0
+    assert post.refresh_item().item['viewedByCount'] == 1
+    assert user.refresh_item().item['postViewedByCount'] == 1
+
+    # a batch of stream records that fails is retried, verify nothing counted from the failed attempt
+    client = post_manager.dynamo.client
+    batch = [*view_items[1:], *owner_view_items]
+    with pytest.raises(Exception, match='batch failed'):
+        with client.count_deltas_buffered():
+            for view_item in batch:
+                post_id = view_item['partitionKey'].split('/')[1]
+                post_manager.on_post_view_add_update_viewed_by_counts(post_id, new_item=view_item)
+            raise Exception('batch failed')
+    assert post.refresh_item().item['viewedByCount'] == 1
+    assert user.refresh_item().item['postViewedByCount'] == 1
+
+    # the retry, verify one write per counter and exact counts, owner's views not counted
+    with patch.object(client, 'increment_count', wraps=client.increment_count) as increment_mock:
+        with client.count_deltas_buffered():
+            for view_item in batch:
+                post_id = view_item['partitionKey'].split('/')[1]
+                post_manager.on_post_view_add_update_viewed_by_counts(post_id, new_item=view_item)
+            assert increment_mock.call_count == 0
+    writes = [(c.args[0]['partitionKey'], c.args[1], c.kwargs['by']) for c in increment_mock.call_args_list]
+    assert len(writes) == 3
+    assert set(writes) == {
+        (f'post/{post.id}', 'viewedByCount', 4),
+        (f'post/{post2.id}', 'viewedByCount', 5),
+        (f'user/{user.id}', 'postViewedByCount', 9),
+    }
+    assert post.refresh_item().item['viewedByCount'] == 5
+    assert post2.refresh_item().item['viewedByCount'] == 5
+    assert user.refresh_item().item['postViewedByCount'] == 10
+
+
+def test_on_post_view_add_update_viewed_by_counts_view_without_author(post_manager, post, user, user2):
+    # a view added before views carried the post's author, verify the post is read for it
+    post.record_view_count(user2.id, 1)
+    view_item = post_manager.view_dynamo.get_view(post.id, user2.id)
+    del view_item['postedByUserId']
+    post_manager.on_post_view_add_update_viewed_by_counts(post.id, new_item=view_item)
+    assert post.refresh_item().item['viewedByCount'] == 1
+    assert user.refresh_item().item['postViewedByCount'] == 1
+
+    # the post is gone, nothing to count
+    post.delete().delete_cascade()
+    post_manager.on_post_view_add_update_viewed_by_counts(post.id, new_item=view_item)
+    assert user.refresh_item().item['postViewedByCount'] == 1
+
+
 def test_on_post_view_count_change_update_counts_view_by_post_owner_clears_unviewed_comments(post_manager, post):
     # add some state to clear, verify
     post_manager.dynamo.set_last_unviewed_comment_at(post.item, pendulum.now('utc'))
@@ -187,7 +285,7 @@ def test_on_post_view_count_change_update_counts_view_by_post_owner_clears_unvie
 
 def test_on_post_view_count_change_update_counts_view_by_post_owner_race_condition(post_manager, post):
     # delete the post from the DB, verify it's gone
-    post.delete()
+    post.delete().delete_cascade()
     assert post_manager.get_post(post.id) is None
 
     # react to a view by post owner, with the manager mocked so the handler
@@ -270,6 +368,24 @@ def test_on_comment_delete(post_manager, post, user2, caplog, comment_manager):
     assert post.item['commentsUnviewedCount'] == 0
 
 
+def test_on_comment_delete_of_deleting_post(post_manager, post, user2, comment_manager):
+    post_manager.dynamo.increment_comment_count(post.id, viewed=False)
+    comment = comment_manager.add_comment(str(uuid4()), post.id, user2.id, 'lore')
+
+    # the comments of a post being deleted go with it, verify counts left alone
+    post.delete()
+    with patch.object(post_manager.view_dynamo, 'get_view') as get_view_mock:
+        post_manager.on_comment_delete(comment.id, comment.item)
+    assert get_view_mock.mock_calls == []
+    post.refresh_item()
+    assert post.item['commentCount'] == 1
+    assert post.item['commentsUnviewedCount'] == 1
+
+    # verify no error if the post is already gone
+    post.delete_cascade()
+    post_manager.on_comment_delete(comment.id, comment.item)
+
+
 def test_comment_deleted_with_post_views(post_manager, post, user, user2, caplog, comment_manager):
     # post owner adds a acomment
     comment1 = comment_manager.add_comment(str(uuid4()), post.id, user.id, 'lore ipsum')
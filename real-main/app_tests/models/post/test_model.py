@@ -9,12 +9,10 @@ import pytest
 
 from app.models.post.enums import PostStatus, PostType
 from app.models.post.exceptions import PostException
-from app.models.post.model import Post
+from app.models.post.model import ALBUM_RANK_PRECISION, Post
 from app.models.user.enums import UserSubscriptionLevel
 from app.utils import image_size
 
-grant_height = 320
-grant_width = 240
 grant_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'grant.jpg')
 blank_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'big-blank.jpg')
 
@@ -22,12 +20,13 @@ heic_path = path.join(path.dirname(__file__), '..', '..', 'fixtures', 'IMG_0265.
 heic_width = 4032
 heic_height = 3024
 
+# as taken from the 480p thumbnail
 grant_colors = [
-    {'r': 51, 'g': 58, 'b': 45},
-    {'r': 186, 'g': 206, 'b': 228},
-    {'r': 145, 'g': 154, 'b': 169},
-    {'r': 158, 'g': 180, 'b': 205},
-    {'r': 130, 'g': 123, 'b': 125},
+    {'r': 52, 'g': 55, 'b': 47},
+    {'r': 183, 'g': 205, 'b': 230},
+    {'r': 151, 'g': 161, 'b': 178},
+    {'r': 121, 'g': 136, 'b': 117},
+    {'r': 168, 'g': 157, 'b': 151},
 ]
 
 
@@ -194,35 +193,10 @@ def test_get_hls_access_cookies(cloudfront_client, s3_uploads_client):
     assert cloudfront_client.mock_calls == [mock.call.generate_presigned_cookies(cookie_path)]
 
 
-def test_set_checksum(post):
-    assert 'checksum' not in post.item
-
-    # put some content with a known md5 up in s3
-    content = b'anything'
-    md5 = 'f0e166dc34d14d6c228ffac576c9a43c'
-    path = post.get_image_path(image_size.NATIVE)
-    post.s3_uploads_client.put_object(path, content, 'application/octet-stream')
-
-    # set the checksum, check what was saved to the DB
-    post.set_checksum()
-    assert post.item['checksum'] == md5
-    post.refresh_item()
-    assert post.item['checksum'] == md5
-
-
-def test_set_is_verified_minimal(pending_image_post):
-    # check initial state and configure mock
+def test_get_is_verified(pending_image_post):
     post = pending_image_post
-    assert 'isVerified' not in post.item
     post.post_verification_client = mock.Mock(**{'verify_image.return_value': True})
-
-    # do the call, check final state
-    post.set_is_verified()
-    assert post.item == post.refresh_item().item
-    assert post.item['isVerified'] is True
-    assert 'isVerifiedHiddenValue' not in post.item
-
-    # check mock called correctly
+    assert post.get_is_verified() is True
     assert post.post_verification_client.mock_calls == [
         mock.call.verify_image(
             post.get_image_readonly_url(image_size.NATIVE),
@@ -232,24 +206,12 @@ def test_set_is_verified_minimal(pending_image_post):
         )
     ]
 
-
-def test_set_is_verified_maximal(pending_image_post):
-    # check initial state and configure mock
-    post = pending_image_post
-    assert 'isVerified' not in post.item
-    post.post_verification_client = mock.Mock(**{'verify_image.return_value': False})
-    post.image_item['imageFormat'] = 'ii'
-    post.image_item['originalFormat'] = 'oo'
-    post.image_item['takenInReal'] = False
-    post.item['verificationHidden'] = True
-
-    # do the call, check final state
-    post.set_is_verified()
-    assert post.item == post.refresh_item().item
-    assert post.item['isVerified'] is True
-    assert post.item['isVerifiedHiddenValue'] is False
-
-    # check mock called correctly
+    # what's passed in is passed on, nothing is read from the image item
+    post.post_verification_client.reset_mock()
+    post.post_verification_client.verify_image.return_value = False
+    with mock.patch.object(post, 'image_dynamo') as image_dynamo_mock:
+        assert post.get_is_verified(image_format='ii', original_format='oo', taken_in_real=False) is False
+    assert image_dynamo_mock.mock_calls == []
     assert post.post_verification_client.mock_calls == [
         mock.call.verify_image(
             post.get_image_readonly_url(image_size.NATIVE),
@@ -451,45 +413,34 @@ def test_set_album_completed_post(albums, post_with_media):
 
     # verify starting state
     assert 'albumId' not in post.item
-    assert album1.item.get('rankCount', 0) == 0
-    assert album2.item.get('rankCount', 0) == 0
 
     # go from no album to an album
     post.set_album(album1.id)
     assert post.item['albumId'] == album1.id
     assert post.item['gsiK3SortKey'] == 0  # album rank
-    assert album1.refresh_item().item.get('rankCount', 0) == 1
-    assert album2.refresh_item().item.get('rankCount', 0) == 0
 
     # change the album
     post.set_album(album2.id)
     assert post.item['albumId'] == album2.id
     assert post.item['gsiK3SortKey'] == 0  # album rank
-    assert album1.refresh_item().item.get('rankCount', 0) == 1
-    assert album2.refresh_item().item.get('rankCount', 0) == 1
 
     # no-op
     post.set_album(album2.id)
     assert post.item['albumId'] == album2.id
     assert post.item['gsiK3SortKey'] == 0  # album rank
-    assert album1.refresh_item().item.get('rankCount', 0) == 1
-    assert album2.refresh_item().item.get('rankCount', 0) == 1
 
     # remove post from all albums
     post.set_album(None)
     assert 'albumId' not in post.item
     assert 'gsiK3SortKey' not in post.item
-    assert album1.refresh_item().item.get('rankCount', 0) == 1
-    assert album2.refresh_item().item.get('rankCount', 0) == 1
 
     # archive the post
     post.archive()
 
-    # add it back to an album, should not increment counts
+    # add it back to an album, should not be ranked
     post.set_album(album1.id)
     assert post.item['albumId'] == album1.id
     assert post.item['gsiK3SortKey'] == -1  # album rank
-    assert album1.refresh_item().item.get('rankCount', 0) == 1
 
 
 def test_set_album_order_failures(user, user2, albums, post_manager, image_data_b64):
@@ -506,7 +457,7 @@ def test_set_album_order_failures(user, user2, albums, post_manager, image_data_
 
     post3.set_album(album1.id)
     assert post3.item['albumId'] == album1.id
-    assert post3.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 3))
+    assert post3.item['gsiK3SortKey'] == 1
 
     # put post4 in second album
     post4.set_album(album2.id)
@@ -532,7 +483,7 @@ def test_set_album_order_failures(user, user2, albums, post_manager, image_data_
     # verify *can* change order if everything correct
     post2.set_album_order(post3.id)
     assert post2.item['albumId'] == album1.id
-    assert post2.item['gsiK3SortKey'] == decimal.Decimal(0.5)
+    assert post2.item['gsiK3SortKey'] == 2
 
     # verify if album no longer exists in DB, can't change order
     album1.dynamo.delete_album(album1.id)
@@ -557,28 +508,28 @@ def test_set_album_order_lots_of_set_middle(user2, albums, post_manager, image_d
     # check starting state
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post2.id, post3.id]
     assert post1.item['gsiK3SortKey'] == 0
-    assert post2.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 3))
-    assert post3.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 2))
+    assert post2.item['gsiK3SortKey'] == 1
+    assert post3.item['gsiK3SortKey'] == 2
 
     # change middle post, check order
     post3.set_album_order(post1.id)
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post3.id, post2.id]
-    assert post3.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 6))
+    assert post3.item['gsiK3SortKey'] == decimal.Decimal('0.5')
 
     # change middle post, check order
     post2.set_album_order(post1.id)
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post2.id, post3.id]
-    assert post2.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 12))
+    assert post2.item['gsiK3SortKey'] == decimal.Decimal('0.25')
 
     # change middle post, check order
     post3.set_album_order(post1.id)
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post3.id, post2.id]
-    assert post3.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 24))
+    assert post3.item['gsiK3SortKey'] == decimal.Decimal('0.125')
 
     # change middle post, check order
     post2.set_album_order(post1.id)
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post2.id, post3.id]
-    assert post2.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 48))
+    assert post2.item['gsiK3SortKey'] == decimal.Decimal('0.0625')
 
 
 def test_set_album_order_lots_of_set_front(user2, albums, post_manager, image_data_b64):
@@ -594,22 +545,22 @@ def test_set_album_order_lots_of_set_front(user2, albums, post_manager, image_da
     # check starting state
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post2.id]
     assert post1.item['gsiK3SortKey'] == 0
-    assert post2.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 3))
+    assert post2.item['gsiK3SortKey'] == 1
 
     # change first post, check order
     post2.set_album_order(None)
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post2.id, post1.id]
-    assert post2.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(-2 / 4))
+    assert post2.item['gsiK3SortKey'] == decimal.Decimal('-0.5')
 
     # change first post, check order
     post1.set_album_order(None)
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post2.id]
-    assert post1.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(-3 / 5))
+    assert post1.item['gsiK3SortKey'] == decimal.Decimal('-0.75')
 
     # change first post, check order
     post2.set_album_order(None)
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post2.id, post1.id]
-    assert post2.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(-4 / 6))
+    assert post2.item['gsiK3SortKey'] == decimal.Decimal('-0.875')
 
 
 def test_set_album_order_lots_of_set_back(user2, albums, post_manager, image_data_b64):
@@ -625,22 +576,48 @@ def test_set_album_order_lots_of_set_back(user2, albums, post_manager, image_dat
     # check starting state
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post2.id]
     assert post1.item['gsiK3SortKey'] == 0
-    assert post2.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 3))
+    assert post2.item['gsiK3SortKey'] == 1
 
     # change last post, check order
     post1.set_album_order(post2.id)
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post2.id, post1.id]
-    assert post1.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(2 / 4))
+    assert post1.item['gsiK3SortKey'] == 2
 
     # change last post, check order
     post2.set_album_order(post1.id)
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post2.id]
-    assert post2.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(3 / 5))
+    assert post2.item['gsiK3SortKey'] == 3
 
     # change last post, check order
     post1.set_album_order(post2.id)
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post2.id, post1.id]
-    assert post1.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(4 / 6))
+    assert post1.item['gsiK3SortKey'] == 4
+
+
+def test_set_album_order_rebalances_album_when_out_of_room(user2, albums, post_manager, image_data_b64):
+    # album with three posts in it
+    album, _ = albums
+    post1 = post_manager.add_post(
+        user2, 'pid1', PostType.IMAGE, image_input={'imageData': image_data_b64}, album_id=album.id,
+    )
+    post2 = post_manager.add_post(
+        user2, 'pid2', PostType.IMAGE, image_input={'imageData': image_data_b64}, album_id=album.id,
+    )
+    post3 = post_manager.add_post(
+        user2, 'pid3', PostType.IMAGE, image_input={'imageData': image_data_b64}, album_id=album.id,
+    )
+
+    # squeeze the first two posts as close together as ranks go
+    post2.item = post2.dynamo.set_album_rank(post2.id, post1.item['gsiK3SortKey'] + ALBUM_RANK_PRECISION)
+    assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post2.id, post3.id]
+
+    # move the last post between them, the album gets rebalanced to make room
+    post3.set_album_order(post1.id)
+    assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post3.id, post2.id]
+    assert post1.refresh_item().item['gsiK3SortKey'] == 0
+    assert post3.item['gsiK3SortKey'] == decimal.Decimal('0.5')
+    assert post2.refresh_item().item['gsiK3SortKey'] == 1
+    assert post3.refresh_item().item['gsiK3SortKey'] == decimal.Decimal('0.5')
 
 
 def test_set_album_order_no_op(user2, albums, post_manager, image_data_b64):
@@ -657,7 +634,7 @@ def test_set_album_order_no_op(user2, albums, post_manager, image_data_b64):
     assert album.refresh_item().item
     assert list(post_manager.dynamo.generate_post_ids_in_album(album.id)) == [post1.id, post2.id]
     assert post1.item['gsiK3SortKey'] == 0
-    assert post2.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 3))
+    assert post2.item['gsiK3SortKey'] == 1
 
     # set post1 to first position, which it already is in
     post1.set_album_order(None)
@@ -712,47 +689,42 @@ def test_get_image_writeonly_url(pending_image_post, cloudfront_client, dynamo_c
     assert 'native.heic' in cloudfront_client.generate_presigned_url.call_args.args[0]
 
 
-def test_set_height_and_width(s3_uploads_client, pending_image_post):
+def test_get_colors(s3_uploads_client, pending_image_post):
     post = pending_image_post
-    assert 'height' not in post.image_item
-    assert 'width' not in post.image_item
 
     # put an image in the bucket
     s3_path = post.get_image_path(image_size.NATIVE)
     s3_uploads_client.put_object(s3_path, open(grant_path, 'rb'), 'image/jpeg')
+    post.build_image_thumbnails()
 
-    post.set_height_and_width()
-    assert post.image_item['height'] == grant_height
-    assert post.image_item['width'] == grant_width
-    post.refresh_image_item()
-    assert post.image_item['height'] == grant_height
-    assert post.image_item['width'] == grant_width
+    assert [{'r': r, 'g': g, 'b': b} for r, g, b in post.get_colors()] == grant_colors
 
 
-def test_set_colors(s3_uploads_client, pending_image_post):
+def test_get_colors_uses_thumbnail(s3_uploads_client, pending_image_post):
     post = pending_image_post
-    assert 'colors' not in post.image_item
 
-    # put an image in the bucket
-    s3_path = post.get_image_path(image_size.NATIVE)
-    s3_uploads_client.put_object(s3_path, open(grant_path, 'rb'), 'image/jpeg')
+    # put a big image in the bucket, and thumbnail it
+    post.native_heic_cache.set_data(open(heic_path, 'rb'))
+    post.native_jpeg_cache.set_image(post.native_heic_cache.readonly_image).flush()
+    post.build_image_thumbnails()
 
-    post.set_colors()
-    assert post.image_item['colors'] == grant_colors
+    # verify the native image isn't needed to get the palette
+    post.native_jpeg_cache.clear()
+    s3_uploads_client.delete_object(post.get_image_path(image_size.NATIVE))
+    assert len(post.get_colors()) == 5
 
 
-def test_set_colors_colortheif_fails(s3_uploads_client, pending_image_post, caplog):
+def test_get_colors_colortheif_fails(s3_uploads_client, pending_image_post, caplog):
     post = pending_image_post
-    assert 'colors' not in post.image_item
 
     # put an image in the bucket
     s3_path = post.get_image_path(image_size.NATIVE)
     s3_uploads_client.put_object(s3_path, open(blank_path, 'rb'), 'image/jpeg')
+    post.build_image_thumbnails()
 
     assert len(caplog.records) == 0
     with caplog.at_level(logging.WARNING):
-        post.set_colors()
-        assert 'colors' not in post.image_item
+        assert post.get_colors() is None
 
     assert len(caplog.records) == 1
     assert caplog.records[0].levelname == 'WARNING'
@@ -86,10 +86,6 @@ def test_archive_completed_post_with_album(album_manager, post_manager, post_wit
     assert post.item['gsiK3PartitionKey'] == f'post/{album.id}'
     assert post.item['gsiK3SortKey'] == 0
 
-    # check our starting rank count
-    album.refresh_item()
-    assert album.item['rankCount'] == 1
-
     # mock out some calls to far-flung other managers
     post.like_manager = mock.Mock(LikeManager({}))
     post.follower_manager = mock.Mock(post.follower_manager)
@@ -98,12 +94,10 @@ def test_archive_completed_post_with_album(album_manager, post_manager, post_wit
     post.archive()
     assert post.item['postStatus'] == PostStatus.ARCHIVED
 
-    # check the post is still in the album, but since it's no longer completed, it doesn't show in the count
+    # check the post is still in the album, but since it's no longer completed, it's no longer ranked
     assert post.item['albumId'] == album.id
     assert post.item['gsiK3PartitionKey'] == f'post/{album.id}'
     assert post.item['gsiK3SortKey'] == -1
-    album.refresh_item()
-    assert album.item['rankCount'] == 1
 
     # check calls to mocked out managers
     assert post.like_manager.mock_calls == [
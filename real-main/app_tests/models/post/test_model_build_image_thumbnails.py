@@ -1,6 +1,7 @@
 import io
 import uuid
 from os import path
+from unittest import mock
 
 import PIL.Image
 import pytest
@@ -207,3 +208,60 @@ def test_build_image_thumbnails_content_type(s3_uploads_client, processing_image
     # check 64p content type
     path_64 = post.get_image_path(image_size.P64)
     assert s3_uploads_client.bucket.Object(path_64).content_type == 'image/jpeg'
+
+
+def test_build_image_thumbnails_records_metrics(s3_uploads_client, processing_image_post):
+    post = processing_image_post
+    path = post.get_image_path(image_size.NATIVE)
+    s3_uploads_client.put_object(path, open(blank_path, 'rb'), 'image/jpeg')
+
+    post.build_image_thumbnails()
+    # sizes are encoded concurrently, so those stages complete in any order
+    stages = [stage['stage'] for stage in post.image_metrics.stages]
+    assert [stage for stage in stages if not stage.startswith('encode')] == [
+        'read native.jpg',
+        'decode',
+        'thumbnail 4K',
+        'thumbnail 1080p',
+        'thumbnail 480p',
+        'thumbnail 64p',
+        'upload',
+    ]
+    assert sorted(stage for stage in stages if stage.startswith('encode')) == [
+        'encode 1080p.jpg',
+        'encode 480p.jpg',
+        'encode 4K.jpg',
+        'encode 64p.jpg',
+    ]
+    assert all(stage['seconds'] >= 0 for stage in post.image_metrics.stages)
+
+
+def test_build_image_thumbnails_variants(s3_uploads_client, processing_image_post, png_image_variants):
+    post = processing_image_post
+    path = post.get_image_path(image_size.NATIVE)
+    s3_uploads_client.put_object(path, open(blank_path, 'rb'), 'image/jpeg')
+
+    post.build_image_thumbnails()
+    assert post.image_item['variantFormats'] == ['PNG']
+    post.refresh_image_item()
+    assert post.image_item['variantFormats'] == ['PNG']
+
+    # check the variants are there, alongside the jpegs and of the same dimensions
+    for size, variant in zip(image_size.THUMBNAILS, png_image_variants):
+        jpeg = PIL.Image.open(s3_uploads_client.get_object_data_stream(post.get_image_path(size)))
+        image = PIL.Image.open(s3_uploads_client.get_object_data_stream(post.get_image_path(variant)))
+        assert image.format == 'PNG'
+        assert image.size == jpeg.size
+    assert 'encode 64p.png' in [stage['stage'] for stage in post.image_metrics.stages]
+
+
+def test_build_image_thumbnails_no_encodable_variants(s3_uploads_client, processing_image_post):
+    post = processing_image_post
+    path = post.get_image_path(image_size.NATIVE)
+    s3_uploads_client.put_object(path, open(blank_path, 'rb'), 'image/jpeg')
+
+    with mock.patch('app.utils.image.can_encode', return_value=False):
+        post.build_image_thumbnails()
+    assert 'variantFormats' not in (post.image_item or {})
+    for variant in image_size.WEBPS + image_size.AVIFS:
+        assert not s3_uploads_client.exists(post.get_image_path(variant))
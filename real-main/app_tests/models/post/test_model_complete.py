@@ -134,7 +134,6 @@ def test_complete_with_album(album_manager, post_manager, post_with_media_with_a
     post.follower_manager = mock.Mock(post.follower_manager)
 
     # check starting state
-    assert album.item.get('rankCount', 0) == 0
     assert post.item['postStatus'] == PostStatus.PENDING
 
     # complete the post, check state
@@ -142,8 +141,7 @@ def test_complete_with_album(album_manager, post_manager, post_with_media_with_a
     assert post.item['postStatus'] == PostStatus.COMPLETED
     assert post.item['gsiK3PartitionKey'] == f'post/{album.id}'
     assert post.item['gsiK3SortKey'] == 0
-    album.refresh_item()
-    assert album.item.get('rankCount', 0) == 1
+    assert album.item == album.refresh_item().item  # album rank doesn't touch the album
 
     # check correct calls happened to far-flung other managers
     assert post.follower_manager.mock_calls == []
@@ -179,8 +177,7 @@ def test_complete_with_original_post(post_manager, post_with_media, post_with_me
     post2.follower_manager = mock.Mock(post2.follower_manager)
 
     # complete the post that has the earlier postedAt, should not get an originalPostId
-    post1.set_checksum()
-    post1.complete()
+    post1.complete(checksum=post1.native_jpeg_cache.checksum)
     assert post1.item['postStatus'] == PostStatus.COMPLETED
     assert 'originalPostId' not in post1.item
     post1.refresh_item()
@@ -188,8 +185,7 @@ def test_complete_with_original_post(post_manager, post_with_media, post_with_me
     assert 'originalPostId' not in post1.item
 
     # complete the post with the later postedAt, *should* get an originalPostId
-    post2.set_checksum()
-    post2.complete()
+    post2.complete(checksum=post2.native_jpeg_cache.checksum)
     assert post2.item['postStatus'] == PostStatus.COMPLETED
     assert post2.item['originalPostId'] == post1.id
     post2.refresh_item()
@@ -197,6 +193,28 @@ def test_complete_with_original_post(post_manager, post_with_media, post_with_me
     assert post2.item['originalPostId'] == post1.id
 
 
+def test_complete_sets_checksum_and_verification(post_with_media, post_with_media_with_expiration):
+    post1, post2 = post_with_media, post_with_media_with_expiration
+    post1.follower_manager = mock.Mock(post1.follower_manager)
+    post2.follower_manager = mock.Mock(post2.follower_manager)
+
+    post1.complete(checksum='sum', perceptual_hash='0f0f0f0f0f0f0f0f', is_verified=True)
+    assert post1.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+    assert post1.item['checksum'] == 'sum'
+    assert post1.item['perceptualHash'] == '0f0f0f0f0f0f0f0f'
+    assert post1.item['isVerified'] is True
+
+    # the checksum is carried in, rather than read back from dynamo
+    with mock.patch.object(post2, 'refresh_item') as refresh_item_mock:
+        post2.complete(checksum='sum', is_verified=False)
+    assert refresh_item_mock.mock_calls == []
+    assert post2.item['originalPostId'] == post1.id
+    assert post2.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+    assert post2.item['checksum'] == 'sum'
+    assert post2.item['isVerified'] is False
+    assert 'perceptualHash' not in post2.item
+
+
 def test_complete_with_set_as_user_photo(post_manager, user, post_with_media, post_set_as_user_photo):
     # complete the post without use_as_user_photo, verify user photo change api no called
     post_with_media.user.update_photo = mock.Mock()
@@ -59,6 +59,7 @@ def test_delete_completed_text_only_post_with_expiration(post_manager, post_with
     post.delete()
     assert post.item['postStatus'] == PostStatus.DELETING
     post_item = post.item
+    post.delete_cascade()
 
     # check the post is no longer in the DB
     post.refresh_item()
@@ -90,6 +91,7 @@ def test_delete_pending_media_post(post_manager, post_with_media, user_manager):
     # delete the post
     post.delete()
     assert post.item['postStatus'] == PostStatus.DELETING
+    post.delete_cascade()
 
     # check the db again
     post.refresh_item()
@@ -116,6 +118,7 @@ def test_delete_completed_media_post(post_manager, completed_post_with_media, us
     # delete the post
     post.delete()
     assert post.item['postStatus'] == PostStatus.DELETING
+    post.delete_cascade()
 
     # check the all the images got deleted
     for size in image_size.JPEGS:
@@ -147,8 +150,6 @@ def test_delete_completed_post_in_album(album_manager, post_manager, post_with_a
 
     # check our starting point
     assert post.item['postStatus'] == PostStatus.COMPLETED
-    album.refresh_item()
-    assert album.item.get('rankCount', 0) == 1
 
     # mock out some calls to far-flung other managers
     post.comment_manager = mock.Mock(CommentManager({}))
@@ -160,15 +161,12 @@ def test_delete_completed_post_in_album(album_manager, post_manager, post_with_a
     assert post.item['postStatus'] == PostStatus.DELETING
     assert post.item['gsiK3PartitionKey'] == f'post/{album.id}'
     assert post.item['gsiK3SortKey'] == -1
+    post.delete_cascade()
 
     # check the DB again
     post.refresh_item()
     assert post.item is None
 
-    # check our post count - should have decremented
-    album.refresh_item()
-    assert album.item.get('rankCount', 0) == 1
-
     # check calls to mocked out managers
     assert post.comment_manager.mock_calls == [
         mock.call.delete_all_on_post(post.id),
@@ -200,3 +198,63 @@ def test_delete_post_deletes_trending(completed_post_with_media):
     post.delete()
     assert post.trending_item is None
     assert post.refresh_trending_item().trending_item is None
+
+
+def test_delete_leaves_cascade_to_background(post_with_expiration, sqs_delete_cascade_client):
+    post = post_with_expiration
+    sqs_delete_cascade_client.reset_mock()
+    post.comment_manager = mock.Mock(CommentManager({}))
+    post.follower_manager = mock.Mock(post.follower_manager)
+    post.like_manager = mock.Mock(LikeManager({}))
+
+    # delete the post, verify it's marked as deleting but nothing has been cascaded yet
+    now = pendulum.now('utc')
+    post.delete(now=now)
+    assert post.item['postStatus'] == PostStatus.DELETING
+    assert post.item['deletingAt'] == now.to_iso8601_string()
+    assert post.refresh_item().item['postStatus'] == PostStatus.DELETING
+    assert post.comment_manager.mock_calls == []
+    assert post.follower_manager.mock_calls == []
+    assert post.like_manager.mock_calls == []
+
+    # verify the cascade was queued
+    queued = mock.call.send_message({'itemType': 'post', 'itemId': post.id})
+    assert sqs_delete_cascade_client.mock_calls == [queued]
+
+    # deleting it again queues the cascade again
+    now = pendulum.now('utc')
+    post.delete(now=now)
+    assert post.item['postStatus'] == PostStatus.DELETING
+    assert post.item['deletingAt'] == now.to_iso8601_string()
+    assert sqs_delete_cascade_client.mock_calls == [queued, queued]
+
+
+def test_delete_cascade_requires_deleting(completed_post_with_media):
+    post = completed_post_with_media
+    with pytest.raises(AssertionError, match='marked as deleting'):
+        post.delete_cascade()
+    assert post.refresh_item().item['postStatus'] == PostStatus.COMPLETED
+
+
+def test_delete_cascade_resumes_from_checkpoint(post_manager, completed_post_with_media):
+    post = completed_post_with_media
+    post.comment_manager = mock.Mock(CommentManager({}))
+    post.like_manager = mock.Mock(LikeManager({}))
+    post.comment_manager.delete_all_on_post.side_effect = Exception('timed out')
+    post.delete()
+
+    # one step fails, the others get done and are checkpointed
+    with pytest.raises(Exception, match='timed out'):
+        post.delete_cascade()
+    post.refresh_item()
+    assert post.item['deleteCascadeSteps'] == {'likes', 'media'}
+    assert post_manager.clients['s3_uploads'].exists(post.get_image_path(image_size.NATIVE)) is False
+    assert post.like_manager.mock_calls == [mock.call.dislike_all_of_post(post.id)]
+
+    # run it again, only the failed step is retried
+    post.comment_manager.reset_mock(side_effect=True)
+    post.like_manager.reset_mock()
+    post.delete_cascade()
+    assert post.comment_manager.mock_calls == [mock.call.delete_all_on_post(post.id)]
+    assert post.like_manager.mock_calls == []
+    assert post.refresh_item().item is None
@@ -1,3 +1,4 @@
+import threading
 import uuid
 from unittest import mock
 
@@ -73,11 +74,10 @@ def test_process_image_upload_success_jpeg(pending_post, s3_uploads_client, gran
 
     # mock out a bunch of methods
     post.native_jpeg_cache.flush = mock.Mock(wraps=post.native_jpeg_cache.flush)
-    post.build_image_thumbnails = mock.Mock(wraps=post.build_image_thumbnails)
-    post.set_height_and_width = mock.Mock(wraps=post.set_height_and_width)
-    post.set_colors = mock.Mock(wraps=post.set_colors)
-    post.set_is_verified = mock.Mock(wraps=post.set_is_verified)
-    post.set_checksum = mock.Mock(wraps=post.set_checksum)
+    post._build_image_thumbnails = mock.Mock(wraps=post._build_image_thumbnails)
+    post.get_colors = mock.Mock(wraps=post.get_colors)
+    post.get_is_verified = mock.Mock(wraps=post.get_is_verified)
+    post.image_dynamo = mock.Mock(wraps=post.image_dynamo)
     post.complete = mock.Mock(wraps=post.complete)
 
     now = pendulum.now('utc')
@@ -85,17 +85,67 @@ def test_process_image_upload_success_jpeg(pending_post, s3_uploads_client, gran
 
     # check the mocks were called correctly
     assert post.native_jpeg_cache.flush.mock_calls == []
-    assert post.build_image_thumbnails.mock_calls == [mock.call()]
-    assert post.set_height_and_width.mock_calls == [mock.call()]
-    assert post.set_colors.mock_calls == [mock.call()]
-    assert post.set_is_verified.mock_calls == [mock.call()]
-    assert post.set_checksum.mock_calls == [mock.call()]
-    assert post.complete.mock_calls == [mock.call(now=now)]
+    assert post._build_image_thumbnails.mock_calls == [mock.call()]
+    assert post.get_colors.mock_calls == [mock.call()]
+    assert post.get_is_verified.mock_calls == [
+        mock.call(image_format=None, original_format=None, taken_in_real=None)
+    ]
+    assert post.image_dynamo.mock_calls == [
+        mock.call.set_processed_attributes(
+            post.id, *post.native_jpeg_cache.size[::-1], colors=mock.ANY, variant_formats=[]
+        )
+    ]
+    assert post.complete.mock_calls == [
+        mock.call(now=now, checksum=post.native_jpeg_cache.checksum, perceptual_hash=mock.ANY, is_verified=True)
+    ]
+    assert post.item['checksum'] == post.native_jpeg_cache.checksum
+    assert post.item['isVerified'] is True
 
     assert post.item['postStatus'] == PostStatus.COMPLETED
     assert post.refresh_item().item['postStatus'] == PostStatus.COMPLETED
 
 
+def test_process_image_upload_verifies_concurrently(pending_post, s3_uploads_client, grant_data):
+    post = pending_post
+    native_path = post.get_image_path(image_size.NATIVE)
+    s3_uploads_client.put_object(native_path, grant_data, 'image/jpeg')
+
+    # verification only completes once thumbnailing has started, so would time out if done in sequence
+    thumbnailing_started = threading.Event()
+    post.post_verification_client = mock.Mock(
+        **{'verify_image.side_effect': lambda *args, **kwargs: thumbnailing_started.wait(timeout=10)}
+    )
+    build_image_thumbnails = post._build_image_thumbnails
+
+    def _build_image_thumbnails():
+        thumbnailing_started.set()
+        return build_image_thumbnails()
+
+    post._build_image_thumbnails = _build_image_thumbnails
+    post.process_image_upload()
+
+    assert post.item['postStatus'] == PostStatus.COMPLETED
+    assert post.item['isVerified'] is True
+    assert 'verify' in [stage['stage'] for stage in post.image_metrics.stages]
+
+    # check the image attributes were all set
+    post.refresh_image_item()
+    assert (post.image_item['width'], post.image_item['height']) == post.native_jpeg_cache.size
+    assert len(post.image_item['colors']) == 5
+
+
+def test_process_image_upload_verification_error(pending_post, s3_uploads_client, grant_data):
+    post = pending_post
+    native_path = post.get_image_path(image_size.NATIVE)
+    s3_uploads_client.put_object(native_path, grant_data, 'image/jpeg')
+    post.post_verification_client = mock.Mock(**{'verify_image.side_effect': Exception('verification failed')})
+
+    with pytest.raises(Exception, match='verification failed'):
+        post.process_image_upload()
+    assert post.refresh_item().item['postStatus'] == PostStatus.PROCESSING
+    assert 'isVerified' not in post.item
+
+
 def test_process_image_upload_success_jpeg_with_crop(pending_post, s3_uploads_client, grant_data):
     post = pending_post
     assert post.item['postStatus'] == PostStatus.PENDING
@@ -107,11 +157,10 @@ def test_process_image_upload_success_jpeg_with_crop(pending_post, s3_uploads_cl
 
     # mock out a bunch of methods
     post.native_jpeg_cache.flush = mock.Mock(wraps=post.native_jpeg_cache.flush)
-    post.build_image_thumbnails = mock.Mock(wraps=post.build_image_thumbnails)
-    post.set_height_and_width = mock.Mock(wraps=post.set_height_and_width)
-    post.set_colors = mock.Mock(wraps=post.set_colors)
-    post.set_is_verified = mock.Mock(wraps=post.set_is_verified)
-    post.set_checksum = mock.Mock(wraps=post.set_checksum)
+    post._build_image_thumbnails = mock.Mock(wraps=post._build_image_thumbnails)
+    post.get_colors = mock.Mock(wraps=post.get_colors)
+    post.get_is_verified = mock.Mock(wraps=post.get_is_verified)
+    post.image_dynamo = mock.Mock(wraps=post.image_dynamo)
     post.complete = mock.Mock(wraps=post.complete)
 
     now = pendulum.now('utc')
@@ -119,12 +168,21 @@ def test_process_image_upload_success_jpeg_with_crop(pending_post, s3_uploads_cl
 
     # check the mocks were called correctly
     assert post.native_jpeg_cache.flush.mock_calls == [mock.call()]
-    assert post.build_image_thumbnails.mock_calls == [mock.call()]
-    assert post.set_height_and_width.mock_calls == [mock.call()]
-    assert post.set_colors.mock_calls == [mock.call()]
-    assert post.set_is_verified.mock_calls == [mock.call()]
-    assert post.set_checksum.mock_calls == [mock.call()]
-    assert post.complete.mock_calls == [mock.call(now=now)]
+    assert post._build_image_thumbnails.mock_calls == [mock.call()]
+    assert post.get_colors.mock_calls == [mock.call()]
+    assert post.get_is_verified.mock_calls == [
+        mock.call(image_format=None, original_format=None, taken_in_real=None)
+    ]
+    assert post.image_dynamo.mock_calls == [
+        mock.call.set_processed_attributes(
+            post.id, *post.native_jpeg_cache.size[::-1], colors=mock.ANY, variant_formats=[]
+        )
+    ]
+    assert post.complete.mock_calls == [
+        mock.call(now=now, checksum=post.native_jpeg_cache.checksum, perceptual_hash=mock.ANY, is_verified=True)
+    ]
+    assert post.item['checksum'] == post.native_jpeg_cache.checksum
+    assert post.item['isVerified'] is True
 
     assert post.item['postStatus'] == PostStatus.COMPLETED
     assert post.refresh_item().item['postStatus'] == PostStatus.COMPLETED
@@ -143,11 +201,10 @@ def test_process_image_upload_success_heic_with_crop(pending_post, s3_uploads_cl
 
     # mock out a bunch of methods
     post.native_jpeg_cache.flush = mock.Mock(wraps=post.native_jpeg_cache.flush)
-    post.build_image_thumbnails = mock.Mock(wraps=post.build_image_thumbnails)
-    post.set_height_and_width = mock.Mock(wraps=post.set_height_and_width)
-    post.set_colors = mock.Mock(wraps=post.set_colors)
-    post.set_is_verified = mock.Mock(wraps=post.set_is_verified)
-    post.set_checksum = mock.Mock(wraps=post.set_checksum)
+    post._build_image_thumbnails = mock.Mock(wraps=post._build_image_thumbnails)
+    post.get_colors = mock.Mock(wraps=post.get_colors)
+    post.get_is_verified = mock.Mock(wraps=post.get_is_verified)
+    post.image_dynamo = mock.Mock(wraps=post.image_dynamo)
     post.complete = mock.Mock(wraps=post.complete)
 
     now = pendulum.now('utc')
@@ -155,12 +212,21 @@ def test_process_image_upload_success_heic_with_crop(pending_post, s3_uploads_cl
 
     # check the mocks were called correctly
     assert post.native_jpeg_cache.flush.mock_calls == [mock.call()]
-    assert post.build_image_thumbnails.mock_calls == [mock.call()]
-    assert post.set_height_and_width.mock_calls == [mock.call()]
-    assert post.set_colors.mock_calls == [mock.call()]
-    assert post.set_is_verified.mock_calls == [mock.call()]
-    assert post.set_checksum.mock_calls == [mock.call()]
-    assert post.complete.mock_calls == [mock.call(now=now)]
+    assert post._build_image_thumbnails.mock_calls == [mock.call()]
+    assert post.get_colors.mock_calls == [mock.call()]
+    assert post.get_is_verified.mock_calls == [
+        mock.call(image_format='HEIC', original_format=None, taken_in_real=None)
+    ]
+    assert post.image_dynamo.mock_calls == [
+        mock.call.set_processed_attributes(
+            post.id, *post.native_jpeg_cache.size[::-1], colors=mock.ANY, variant_formats=[]
+        )
+    ]
+    assert post.complete.mock_calls == [
+        mock.call(now=now, checksum=post.native_jpeg_cache.checksum, perceptual_hash=mock.ANY, is_verified=True)
+    ]
+    assert post.item['checksum'] == post.native_jpeg_cache.checksum
+    assert post.item['isVerified'] is True
 
     # check the heic image was deleted because of the crop
     assert not s3_uploads_client.exists(native_path)
@@ -1,4 +1,3 @@
-import decimal
 import uuid
 from unittest import mock
 
@@ -93,10 +92,6 @@ def test_restore_completed_post_in_album(post_manager, post_with_media_completed
     assert post.item['gsiK3PartitionKey'] == f'post/{album.id}'
     assert post.item['gsiK3SortKey'] == -1
 
-    # check our starting rank count
-    album.refresh_item()
-    assert album.item.get('rankCount', 0) == 1
-
     # mock out some calls to far-flung other managers
     post.follower_manager = mock.Mock(post.follower_manager)
 
@@ -105,18 +100,14 @@ def test_restore_completed_post_in_album(post_manager, post_with_media_completed
     assert post.item['postStatus'] == PostStatus.COMPLETED
     assert post.item['albumId'] == album.id
     assert post.item['gsiK3PartitionKey'] == f'post/{album.id}'
-    assert post.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 3))
+    assert post.item['gsiK3SortKey'] == 0
 
     # check the post straight from the db
     post.refresh_item()
     assert post.item['postStatus'] == PostStatus.COMPLETED
     assert post.item['albumId'] == album.id
     assert post.item['gsiK3PartitionKey'] == f'post/{album.id}'
-    assert post.item['gsiK3SortKey'] == pytest.approx(decimal.Decimal(1 / 3))
-
-    # check our rank count - should have incremented
-    album.refresh_item()
-    assert album.item.get('rankCount', 0) == 2
+    assert post.item['gsiK3SortKey'] == 0
 
     # check calls to mocked out managers
     assert post.follower_manager.mock_calls == []
@@ -4,11 +4,17 @@ Tests for generating images from text.
 These tests aren't intended to ensure the output looks correct,
 they're more just intended to ensure the alogirthm doesn't crash.
 """
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import PIL.Image
 import pytest
 
-from app.models.post.text_image import generate_text_image, rectangle_wrap
+from app.models.post import text_image
+from app.models.post.text_image import generate_text_image, get_font, rectangle_wrap
 
 dims_4k = (3840, 2160)
+dims_1080p = (1920, 1080)
 dims_64p = (114, 64)
 
 
@@ -46,3 +52,66 @@ def test_rectangle_wrap():
     assert text == 'a b c\nd e'
     assert text_height == 22
     assert text_width == 48
+
+
+def test_rectangle_wrap_long_text_stays_in_aspect_ratio():
+    raw_tokens = [f'word{i % 37}' for i in range(2000)]
+    token_widths = [10 + i % 7 for i in range(2000)]
+    text, text_width, text_height = rectangle_wrap(raw_tokens, token_widths, 2, 2, 10, 16 / 9)
+    lines = text.split('\n')
+    assert text.split() == raw_tokens
+    assert text_height == len(lines) * 10 + (len(lines) - 1) * 2
+    assert text_width / text_height >= 16 / 9
+    # the aspect ratio is close to that desired, not a single wide line
+    assert text_width / text_height < 2 * 16 / 9
+
+
+def test_rectangle_wrap_token_wider_than_others():
+    text, text_width, text_height = rectangle_wrap(['a', 'bbbbbbbb', 'c'], [10, 80, 10], 2, 2, 10, 16 / 9)
+    assert text.split() == ['a', 'bbbbbbbb', 'c']
+    assert text_width >= 80
+
+
+def test_generate_text_image_fonts_loaded_once():
+    get_font.cache_clear()
+    generate_text_image('Fly higher', dims_4k)
+    generate_text_image('Fly even higher', dims_4k)
+    assert get_font.cache_info().currsize == get_font.cache_info().misses
+    assert get_font.cache_info().hits > 0
+
+
+def test_generate_text_image_memoized():
+    image = generate_text_image('Memoize me', dims_4k)
+    assert generate_text_image('Memoize me', dims_4k) is image
+    assert generate_text_image('Memoize me', dims_64p) is not image
+    assert generate_text_image('Memoize me, please', dims_4k) is not image
+
+    # least recently used images are dropped from the cache
+    for i in range(text_image.rendered_images_max_size):
+        generate_text_image(f'Filler {i}', dims_4k)
+    assert generate_text_image('Memoize me', dims_4k) is not image
+
+
+def test_generate_text_image_downscaled_from_render_dimensions():
+    rendered = generate_text_image('Downscale me', dims_4k)
+    with patch.object(text_image, 'render_text_image') as render_text_image_mock:
+        image = generate_text_image('Downscale me', dims_1080p, render_dimensions=dims_4k)
+    assert render_text_image_mock.mock_calls == []
+    assert image.size == dims_1080p
+    assert image.tobytes() == rendered.resize(dims_1080p, resample=PIL.Image.LANCZOS).tobytes()
+
+
+def test_generate_text_image_rendered_at_dimensions_if_render_dimensions_not_cached():
+    with patch.object(text_image, 'render_text_image', wraps=text_image.render_text_image) as render_mock:
+        image = generate_text_image('Render me small', dims_1080p, render_dimensions=dims_4k)
+    assert image.size == dims_1080p
+    assert [call.args[1] for call in render_mock.call_args_list] == [dims_1080p]
+
+
+def test_generate_text_image_concurrent():
+    # more distinct images than the cache holds, from many threads, verify the cache holds together
+    texts = [f'Thread safe {i % 7}' for i in range(200)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        images = list(executor.map(lambda text: generate_text_image(text, dims_64p), texts))
+    assert [image.size for image in images] == [dims_64p] * len(texts)
+    assert len(text_image.rendered_images) == text_image.rendered_images_max_size
@@ -190,6 +190,26 @@ def test_set_user_photo_post_id(user_dynamo):
     assert item['photoPostId'] == post_id
 
 
+def test_set_user_photo_post_id_with_variant_formats(user_dynamo):
+    user_id = 'my-user-id'
+    user_dynamo.add_user(user_id, 'name')
+
+    item = user_dynamo.set_user_photo_post_id(user_id, 'pid1', variant_formats=['WEBP'])
+    assert item['photoPostId'] == 'pid1'
+    assert item['photoVariantFormats'] == ['WEBP']
+
+    # changing to a photo without variants clears them
+    item = user_dynamo.set_user_photo_post_id(user_id, 'pid2')
+    assert item['photoPostId'] == 'pid2'
+    assert 'photoVariantFormats' not in item
+
+    # deleting the photo clears them
+    user_dynamo.set_user_photo_post_id(user_id, 'pid1', variant_formats=['WEBP'])
+    item = user_dynamo.set_user_photo_post_id(user_id, None)
+    assert 'photoPostId' not in item
+    assert 'photoVariantFormats' not in item
+
+
 def test_set_user_photo_path_delete_it(user_dynamo):
     user_id = 'my-user-id'
     username = 'name'
@@ -458,7 +478,7 @@ def test_set_user_gender(user_dynamo):
     # set gender to Female
     user_item = user_dynamo.set_user_gender(user_id, UserGender.FEMALE)
     assert user_item['gender'] == UserGender.FEMALE
-    
+
 
 @pytest.mark.parametrize(
     'incrementor_name, decrementor_name, attribute_name',
@@ -469,11 +489,6 @@ def test_set_user_gender(user_dynamo):
         ['increment_chat_messages_creation_count', None, 'chatMessagesCreationCount'],
         ['increment_chat_messages_deletion_count', None, 'chatMessagesDeletionCount'],
         ['increment_chat_messages_forced_deletion_count', None, 'chatMessagesForcedDeletionCount'],
-        [
-            'increment_chats_with_unviewed_messages_count',
-            'decrement_chats_with_unviewed_messages_count',
-            'chatsWithUnviewedMessagesCount',
-        ],
         ['increment_comment_count', 'decrement_comment_count', 'commentCount'],
         ['increment_comment_deleted_count', None, 'commentDeletedCount'],
         ['increment_comment_forced_deletion_count', None, 'commentForcedDeletionCount'],
@@ -7,6 +7,7 @@ from unittest import mock
 import pendulum
 import pytest
 
+from app.models.user.enums import UserStatus
 from app.models.user.exceptions import UserAlreadyExists, UserValidationException
 from app.utils import GqlNotificationType
 
@@ -438,6 +439,21 @@ def test_get_random_placeholder_photo_code(user_manager):
     assert code in ['black-white-cat', 'orange-person']
 
 
+def test_run_delete_cascade(user_manager, user1):
+    # a user that isn't deleting, verify no cascade
+    user_manager.run_delete_cascade(user1.id)
+    assert user1.refresh_item().status == UserStatus.ACTIVE
+
+    # mark the user as deleting, run the cascade and verify the user is gone
+    user1.delete()
+    assert user1.refresh_item().status == UserStatus.DELETING
+    user_manager.run_delete_cascade(user1.id)
+    assert user1.refresh_item().item is None
+
+    # a user that's already gone, verify a no-op
+    user_manager.run_delete_cascade(user1.id)
+
+
 def test_get_text_tags(user_manager, user1, user2):
     # no tags
     text = 'no tags here'
@@ -455,6 +471,44 @@ def test_get_text_tags(user_manager, user1, user2):
     )
 
 
+def test_resolve_usernames_caches(user_manager, user1, user2):
+    usernames = [user1.username, user2.username, 'nopenope']
+    expected = {user1.username: user1.id, user2.username: user2.id, 'nopenope': None}
+    dynamo = user_manager.dynamo
+    with mock.patch.object(dynamo, 'get_user_by_username', wraps=dynamo.get_user_by_username) as get_mock:
+        with mock.patch.object(dynamo, 'generate_users', wraps=dynamo.generate_users) as batch_get_mock:
+            # first resolution looks them all up
+            assert user_manager.resolve_usernames(usernames) == expected
+            assert sorted(c.args[0] for c in get_mock.call_args_list) == sorted(usernames)
+            assert batch_get_mock.call_count == 0
+
+            # resolved again, those that exist are confirmed in one batch get, the one that doesn't is looked up
+            get_mock.reset_mock()
+            assert user_manager.resolve_usernames(usernames) == expected
+            assert get_mock.call_args_list == [mock.call('nopenope')]
+            assert batch_get_mock.call_count == 1
+            assert sorted(batch_get_mock.call_args.args[0]) == sorted([user1.id, user2.id])
+
+            # a changed username doesn't resolve to its old user, and the new one resolves right away
+            get_mock.reset_mock()
+            user1.update_username('nopenope')
+            assert user_manager.resolve_usernames(usernames) == {
+                usernames[0]: None,
+                user2.username: user2.id,
+                'nopenope': user1.id,
+            }
+            assert sorted(c.args[0] for c in get_mock.call_args_list) == sorted([usernames[0], 'nopenope'])
+            assert usernames[0] not in user_manager._username_cache
+
+
+def test_resolve_usernames_evicts_least_recently_used(user_manager, user1, user2, user3):
+    user_manager.username_cache_max_size = 2
+    user_manager.resolve_usernames([user1.username, user2.username])
+    user_manager.resolve_usernames([user1.username])
+    user_manager.resolve_usernames([user3.username])
+    assert list(user_manager._username_cache) == [user1.username, user3.username]
+
+
 def test_username_tag_regex(user_manager):
     reg = user_manager.username_tag_regex
 
@@ -2,6 +2,7 @@ import logging
 from unittest.mock import call, patch
 from uuid import uuid4
 
+import pendulum
 import pytest
 
 from app.models.follower.enums import FollowStatus
@@ -112,66 +113,57 @@ def test_sync_pinpoint_user_status(user_manager, user):
     assert pinpoint_client_mock.mock_calls == [call.delete_user_endpoints(user.id)]
 
 
-def test_sync_chats_with_unviewed_messages_count_chat_member_added(user_manager, chat, user):
-    assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 0
-
-    # sync add of member with no unviewed message count, verify
-    new_item = chat.member_dynamo.get(chat.id, user.id)
-    assert 'messagesUnviewedCount' not in new_item
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item=new_item, old_item={})
-    assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 0
-
-    # synd add of member with some unviewed message count, verify
-    new_item = chat.member_dynamo.increment_messages_unviewed_count(chat.id, user.id)
-    assert new_item['messagesUnviewedCount'] == 1
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item=new_item, old_item={})
-
-
-def test_sync_chats_with_unviewed_messages_count_chat_member_edited(user_manager, chat, user):
-    assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 0
-
-    # sync edit of member from no unviewed message count to some, verify
-    item1 = chat.member_dynamo.get(chat.id, user.id)
-    assert 'messagesUnviewedCount' not in item1
-    item2 = chat.member_dynamo.increment_messages_unviewed_count(chat.id, user.id)
-    assert item2['messagesUnviewedCount'] == 1
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item=item2, old_item=item1)
-    assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 1
-
-    # sync edit of member from some unviewed message count some more, verify
-    item3 = chat.member_dynamo.increment_messages_unviewed_count(chat.id, user.id)
-    assert item3['messagesUnviewedCount'] == 2
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item=item3, old_item=item2)
-    assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 1
-
-    # sync edit of member from some unviewed message count to none, verify
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item=item1, old_item=item3)
+def test_resync_pinpoint_endpoints(user_manager):
+    user_items = [
+        {'userId': 'uid1', 'email': 'e@real.app'},
+        {'userId': 'uid2', 'phoneNumber': '+14155551212', 'userStatus': UserStatus.DISABLED},
+        {'userId': 'uid3', 'email': 'e3@real.app', 'userStatus': UserStatus.DELETING},
+    ]
+    with patch.object(user_manager, 'pinpoint_client') as pinpoint_client_mock:
+        pinpoint_client_mock.configure_mock(**{'resync_users_endpoints.return_value': 3})
+        assert user_manager.resync_pinpoint_endpoints(user_items) == 3
+    assert pinpoint_client_mock.mock_calls == [
+        call.delete_user_endpoints('uid3'),
+        call.resync_users_endpoints(
+            {'uid1': {'EMAIL': 'e@real.app', 'SMS': None}, 'uid2': {'EMAIL': None, 'SMS': '+14155551212'}},
+            inactive_user_ids=['uid2'],
+        ),
+    ]
+
+
+def test_sync_chats_with_unviewed_messages_count(user_manager, chat_manager, chat, user):
     assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 0
 
+    # sync creation of inbox summary with some unviewed messages, verify
+    chat_manager.inbox_dynamo.add_chat(user.id, chat.id, pendulum.now('utc'), messages_unviewed_count=1)
+    new_item = chat_manager.inbox_dynamo.get(user.id)
+    assert new_item['chatsWithUnviewedMessagesCount'] == 1
+    user_manager.sync_chats_with_unviewed_messages_count(user.id, new_item=new_item)
+    assert user.refresh_item().item['chatsWithUnviewedMessagesCount'] == 1
 
-def test_sync_chats_with_unviewed_messages_count_chat_member_deleted(user_manager, chat, user, caplog):
-    user.dynamo.increment_chats_with_unviewed_messages_count(user.id)
-    assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 1
+    # sync the same thing again, verify idempotent
+    user_manager.sync_chats_with_unviewed_messages_count(user.id, new_item=new_item)
+    assert user.refresh_item().item['chatsWithUnviewedMessagesCount'] == 1
 
-    # sync delete of member with no unviewed message count, verify
-    old_item = chat.member_dynamo.get(chat.id, user.id)
-    assert 'messagesUnviewedCount' not in old_item
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item={}, old_item=old_item)
-    assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 1
+    # sync edit of inbox summary back to no unviewed messages, verify
+    chat_manager.inbox_dynamo.clear_messages_unviewed_count(user.id, chat.id)
+    old_item, new_item = new_item, chat_manager.inbox_dynamo.get(user.id)
+    assert new_item['chatsWithUnviewedMessagesCount'] == 0
+    user_manager.sync_chats_with_unviewed_messages_count(user.id, new_item=new_item, old_item=old_item)
+    assert 'chatsWithUnviewedMessagesCount' not in user.refresh_item().item
 
-    # sync delete of member with some unviewed message count, verify
-    old_item = chat.member_dynamo.increment_messages_unviewed_count(chat.id, user.id)
-    assert old_item['messagesUnviewedCount'] == 1
-    user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item={}, old_item=old_item)
-    assert user.refresh_item().item.get('chatsWithUnviewedMessagesCount', 0) == 0
 
-    # sync delete of member with some unviewed message count, verify fails softly
+def test_sync_chats_with_unviewed_messages_count_user_dne(user_manager, caplog):
+    user_id = str(uuid4())
     with caplog.at_level(logging.WARNING):
-        user_manager.sync_chats_with_unviewed_messages_count(chat.id, new_item={}, old_item=old_item)
+        user_manager.sync_chats_with_unviewed_messages_count(
+            user_id, new_item={'chatsWithUnviewedMessagesCount': 1}
+        )
     assert len(caplog.records) == 1
-    assert 'Failed to decrement' in caplog.records[0].msg
+    assert 'Failed to set' in caplog.records[0].msg
     assert 'chatsWithUnviewedMessagesCount' in caplog.records[0].msg
-    assert user.id in caplog.records[0].msg
+    assert user_id in caplog.records[0].msg
+    assert user_manager.dynamo.get_user(user_id) is None
 
 
 def test_sync_follow_counts_due_to_follow_status_public_user_lifecycle(
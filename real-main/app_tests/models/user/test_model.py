@@ -461,7 +461,7 @@ def test_serailize_followed(user, user2, follower_manager):
 
 
 def test_serialize_deleting(user, user2):
-    user.delete()
+    user.delete().delete_cascade()
 
     resp = user.serialize(user.id)
     assert resp['userId'] == user.id
@@ -2,6 +2,7 @@ import logging
 import uuid
 from unittest import mock
 
+import pendulum
 import pytest
 
 from app.models.user.enums import UserStatus
@@ -30,34 +31,85 @@ def user2(user_manager, cognito_client):
     yield user_manager.create_cognito_only_user(user_id, username)
 
 
+def test_delete_user_marks_as_deleting_and_queues_cascade(user, sqs_delete_cascade_client, caplog):
+    now = pendulum.now('utc')
+    user.delete(now=now)
+    assert user.item['userStatus'] == UserStatus.DELETING
+    assert user.item['deletingAt'] == now.to_iso8601_string()
+    assert user.refresh_item().item['userStatus'] == UserStatus.DELETING
+    assert user.post_manager.mock_calls == []
+    assert user.comment_manager.mock_calls == []
+    queued = mock.call.send_message({'itemType': 'user', 'itemId': user.id})
+    assert sqs_delete_cascade_client.mock_calls == [queued]
+
+    # deleting it again queues the cascade again, the cognito entries being already gone is fine
+    now = pendulum.now('utc')
+    with caplog.at_level(logging.WARNING):
+        user.delete(now=now)
+    assert user.item['deletingAt'] == now.to_iso8601_string()
+    assert sqs_delete_cascade_client.mock_calls == [queued, queued]
+    assert len(caplog.records) == 1
+    assert 'No cognito user pool entry found' in caplog.records[0].msg
+
+
 def test_delete_user_removes_item_from_dynamo(user):
-    user.delete()
+    user.delete().delete_cascade()
     assert user.item['userId'] == user.id
     assert user.item['userStatus'] == UserStatus.DELETING
     assert user.refresh_item().item is None
 
 
-def test_delete_user_skip_cognito_releases_username(user, user2):
+def test_delete_cascade_marks_user_as_deleting(user):
+    # without going through delete(), as when resetting a user
+    with mock.patch.object(user.dynamo, 'delete_user'):
+        user.delete_cascade()
+    assert user.item['userStatus'] == UserStatus.DELETING
+    assert 'deletingAt' not in user.item
+    assert user.refresh_item().item['userStatus'] == UserStatus.DELETING
+
+
+def test_delete_cascade_resumes_from_checkpoint(user):
+    user.post_manager.delete_all_by_user.side_effect = Exception('timed out')
+    user.delete()
+
+    # one step fails, the others get done and are checkpointed
+    with pytest.raises(Exception, match='timed out'):
+        user.delete_cascade()
+    user.refresh_item()
+    assert user.item['userStatus'] == UserStatus.DELETING
+    assert 'posts' not in user.item['deleteCascadeSteps']
+    assert {'followeds', 'followers', 'likes', 'comments', 'chats', 'photos'} < user.item['deleteCascadeSteps']
+
+    # run it again, only the failed step is retried
+    user.post_manager.reset_mock(side_effect=True)
+    user.follower_manager.reset_mock()
+    user.delete_cascade()
+    assert user.post_manager.mock_calls == [mock.call.delete_all_by_user(user.id)]
+    assert user.follower_manager.mock_calls == []
+    assert user.refresh_item().item is None
+
+
+def test_delete_cascade_release_username(user, user2):
     # moto cognito has not yet implemented admin_delete_user_attributes
     user.cognito_client.user_pool_client.admin_delete_user_attributes = mock.Mock()
 
     # release our username by deleting our user
     username = user.item['username']
-    user.delete(skip_cognito=True)
+    user.delete_cascade(release_username=True)
 
     # verify the username is now available by adding it to another
     user2.update_username(username)
     assert user2.item['username'] == username
 
 
-def test_delete_user_skip_cognito_no_entry_in_user_pool(user, caplog):
+def test_delete_cascade_release_username_no_entry_in_user_pool(user, caplog):
     # configure the user pool to behave as if there is no entry for this user
     # note that moto cognito has not yet implemented admin_delete_user_attributes
     exception = user.cognito_client.user_pool_client.exceptions.UserNotFoundException({}, None)
     user.cognito_client.clear_user_attribute = mock.Mock(side_effect=exception)
 
     with caplog.at_level(logging.WARNING):
-        user.delete(skip_cognito=True)
+        user.delete_cascade(release_username=True)
 
     # verify the issue was logged
     assert len(caplog.records) == 1
@@ -77,6 +129,14 @@ def test_delete_user_clears_cognito(user, cognito_client):
         cognito_client.get_user_attributes(user.id)
 
 
+def test_delete_cascade_leaves_cognito(user, cognito_client):
+    # the cascade runs where there is no access to cognito, as when resetting a user
+    user.cognito_client = None
+    user.delete_cascade()
+    assert user.refresh_item().item is None
+    assert cognito_client.get_user_attributes(user.id)
+
+
 def test_delete_user_with_profile_pic(user):
     post_id = 'mid'
     photo_data = b'this is an image'
@@ -99,7 +159,7 @@ def test_delete_user_with_profile_pic(user):
     user.cognito_client.user_pool_client.admin_delete_user_attributes = mock.Mock()
 
     # delete the user
-    user.delete()
+    user.delete().delete_cascade()
 
     # verify the profile pic got removed from s3
     for path in paths:
@@ -116,20 +176,20 @@ def test_delete_user_managers_all_called(user):
     assert user.block_manager.mock_calls == []
     assert user.chat_manager.mock_calls == []
 
-    # delete user, check final state
-    user.delete()
-    assert user.follower_manager.mock_calls == [
-        mock.call.reset_followed_items(user.id),
-        mock.call.reset_follower_items(user.id),
-    ]
-    assert user.post_manager.mock_calls == [
-        mock.call.unflag_all_by_user(user.id),
-        mock.call.delete_all_by_user(user.id),
-    ]
-    assert user.comment_manager.mock_calls == [
-        mock.call.unflag_all_by_user(user.id),
-        mock.call.delete_all_by_user(user.id),
-    ]
+    # delete user, check final state. The steps run concurrently, so in any order
+    user.delete().delete_cascade()
+    assert len(user.follower_manager.mock_calls) == 2
+    user.follower_manager.assert_has_calls(
+        [mock.call.reset_followed_items(user.id), mock.call.reset_follower_items(user.id)], any_order=True
+    )
+    assert len(user.post_manager.mock_calls) == 2
+    user.post_manager.assert_has_calls(
+        [mock.call.unflag_all_by_user(user.id), mock.call.delete_all_by_user(user.id)], any_order=True
+    )
+    assert len(user.comment_manager.mock_calls) == 2
+    user.comment_manager.assert_has_calls(
+        [mock.call.unflag_all_by_user(user.id), mock.call.delete_all_by_user(user.id)], any_order=True
+    )
     assert user.like_manager.mock_calls == [
         mock.call.dislike_all_by_user(user.id),
     ]
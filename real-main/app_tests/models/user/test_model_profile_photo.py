@@ -154,6 +154,31 @@ def test_set_photo_multiple_times(user, uploaded_post, another_uploaded_post):
         assert user.s3_uploads_client.exists(path)
 
 
+def test_set_photo_with_variants(png_image_variants, user, uploaded_post, another_uploaded_post):
+    assert uploaded_post.image_item['variantFormats'] == ['PNG']
+
+    # set it, verify variants are copied over along with the jpegs
+    user.update_photo(uploaded_post.id)
+    assert user.item['photoVariantFormats'] == ['PNG']
+    for size in image_size.JPEGS + png_image_variants:
+        assert user.s3_uploads_client.exists(user.get_photo_path(size))
+
+    # set to a post without variants, verify
+    another_uploaded_post.image_dynamo.client.set_attributes(
+        another_uploaded_post.image_dynamo.pk(another_uploaded_post.id), variantFormats=[]
+    )
+    another_uploaded_post.refresh_image_item()
+    user.update_photo(another_uploaded_post.id)
+    assert 'photoVariantFormats' not in user.item
+
+    # set back, then remove the photo, verify
+    user.update_photo(uploaded_post.id)
+    assert user.item['photoVariantFormats'] == ['PNG']
+    user.update_photo(None)
+    assert 'photoPostId' not in user.item
+    assert 'photoVariantFormats' not in user.item
+
+
 def test_clear_photo_s3_objects(user, uploaded_post, another_uploaded_post):
     # set it
     user.update_photo(uploaded_post.id)
@@ -0,0 +1,200 @@
+from os import path
+from unittest import mock
+
+import PIL.Image
+import pytest
+
+from app.utils import image_size
+from app.utils.image import (
+    ImageMetrics,
+    can_encode,
+    derive_image_set,
+    dhash,
+    encode_image,
+    encode_jpeg,
+    fit_dimensions,
+    get_variants,
+    hash_distance,
+    open_image,
+    with_variants,
+)
+
+blank_path = path.join(path.dirname(__file__), '..', 'fixtures', 'big-blank.jpg')
+grant_rotated_path = path.join(path.dirname(__file__), '..', 'fixtures', 'grant-rotated.jpg')
+grant_path = path.join(path.dirname(__file__), '..', 'fixtures', 'grant.jpg')
+squirrel_path = path.join(path.dirname(__file__), '..', 'fixtures', 'squirrel.png')
+
+
+def test_fit_dimensions():
+    assert fit_dimensions((4000, 2000), (3840, 2160)) == (3840, 1920)
+    assert fit_dimensions((2000, 4000), (3840, 2160)) == (1080, 2160)
+    assert fit_dimensions((100, 50), (3840, 2160)) == (100, 50)
+    assert fit_dimensions((10000, 1), (114, 64)) == (114, 1)
+
+
+def test_open_image_full_scale():
+    image = open_image(open(blank_path, 'rb'))
+    assert image.size == (4000, 2000)
+    assert image.mode == 'RGB'
+
+
+def test_open_image_reduced_scale():
+    # jpeg decoding can only reduce by 1/2, 1/4 or 1/8, and never below what's needed
+    assert open_image(open(blank_path, 'rb'), max_dimensions=(3840, 2160)).size == (4000, 2000)
+    assert open_image(open(blank_path, 'rb'), max_dimensions=(1920, 1080)).size == (2000, 1000)
+    assert open_image(open(blank_path, 'rb'), max_dimensions=(854, 480)).size == (1000, 500)
+    assert open_image(open(blank_path, 'rb'), max_dimensions=(114, 64)).size == (500, 250)
+
+
+def test_open_image_not_jpeg():
+    image = open_image(open(squirrel_path, 'rb'), max_dimensions=(114, 64))
+    assert image.size == (800, 683)
+
+
+@pytest.mark.filterwarnings("ignore:Metadata Warning, tag .* had too many entries.*:UserWarning")
+@pytest.mark.filterwarnings("ignore:Corrupt EXIF data.  Expecting to read .* bytes but only got .*:UserWarning")
+def test_open_image_respects_exif_orientation():
+    # stored as 240x320, displayed as 320x240
+    assert open_image(open(grant_rotated_path, 'rb')).size == (320, 240)
+    assert open_image(open(grant_rotated_path, 'rb'), max_dimensions=(80, 60)).size == (80, 60)
+    assert open_image(open(grant_rotated_path, 'rb'), max_dimensions=(100, 75)).size == (160, 120)
+
+
+def test_derive_image_set():
+    source = open_image(open(blank_path, 'rb'))
+    metrics = ImageMetrics()
+    sizes = (image_size.NATIVE, *image_size.THUMBNAILS)
+    derived = [(size, PIL.Image.open(fh)) for size, fh in derive_image_set(source, sizes, metrics=metrics)]
+    assert [(size, image.size) for size, image in derived] == [
+        (image_size.NATIVE, (4000, 2000)),
+        (image_size.K4, (3840, 1920)),
+        (image_size.P1080, (1920, 960)),
+        (image_size.P480, (854, 427)),
+        (image_size.P64, (114, 57)),
+    ]
+    assert all(image.format == 'JPEG' for _, image in derived)
+    assert source.size == (4000, 2000)  # not modified
+
+    # thumbnails are generated in order, encoding completes in any order
+    stages = [stage['stage'] for stage in metrics.stages]
+    assert [stage for stage in stages if stage.startswith('thumbnail')] == [
+        'thumbnail 4K',
+        'thumbnail 1080p',
+        'thumbnail 480p',
+        'thumbnail 64p',
+    ]
+    assert sorted(stage for stage in stages if stage.startswith('encode')) == [
+        'encode 1080p.jpg',
+        'encode 480p.jpg',
+        'encode 4K.jpg',
+        'encode 64p.jpg',
+        'encode native.jpg',
+    ]
+    assert all(stage['seconds'] >= 0 for stage in metrics.stages)
+    assert all(stage['peakRssMB'] > 0 for stage in metrics.stages)
+
+
+def test_derive_image_set_lazily_opened_source():
+    source = PIL.Image.open(blank_path)  # not yet decoded
+    sizes = (image_size.NATIVE, *image_size.THUMBNAILS)
+    derived = [(size, PIL.Image.open(fh)) for size, fh in derive_image_set(source, sizes)]
+    assert [(size, image.size) for size, image in derived] == [
+        (image_size.NATIVE, (4000, 2000)),
+        (image_size.K4, (3840, 1920)),
+        (image_size.P1080, (1920, 960)),
+        (image_size.P480, (854, 427)),
+        (image_size.P64, (114, 57)),
+    ]
+
+
+def test_derive_image_set_variants():
+    source = PIL.Image.new('RGB', (400, 200), color='red')
+    p480_png = image_size._ImageSize('480p', (854, 480), 'image/png', 'png', 'PNG')
+    p64_png = image_size._ImageSize('64p', (114, 64), 'image/png', 'png', 'PNG')
+    sizes = (image_size.P480, p480_png, image_size.P64, p64_png)
+    derived = [(size, PIL.Image.open(fh)) for size, fh in derive_image_set(source, sizes)]
+    assert [(size, image.format, image.size) for size, image in derived] == [
+        (image_size.P480, 'JPEG', (400, 200)),
+        (p480_png, 'PNG', (400, 200)),
+        (image_size.P64, 'JPEG', (114, 57)),
+        (p64_png, 'PNG', (114, 57)),
+    ]
+
+
+def test_derive_image_set_encoding_error():
+    source = PIL.Image.new('RGBA', (100, 50))  # jpeg can't encode an alpha channel
+    with pytest.raises(OSError):
+        list(derive_image_set(source, image_size.THUMBNAILS))
+
+
+def test_with_variants():
+    with mock.patch('app.utils.image.can_encode', side_effect=lambda image_format: image_format == 'WEBP'):
+        assert with_variants((image_size.P480, image_size.P64)) == (
+            image_size.P480,
+            image_size.P480_WEBP,
+            image_size.P64,
+            image_size.P64_WEBP,
+        )
+    with mock.patch('app.utils.image.can_encode', return_value=False):
+        assert with_variants(image_size.THUMBNAILS) == image_size.THUMBNAILS
+
+
+def test_encode_jpeg():
+    image = PIL.Image.new('RGB', (100, 50), color='red')
+    fh = encode_jpeg(image)
+    decoded = PIL.Image.open(fh)
+    assert decoded.format == 'JPEG'
+    assert decoded.size == (100, 50)
+
+
+def test_dhash():
+    grant = open_image(open(grant_path, 'rb'))
+    grant_hash = dhash(grant)
+    assert len(grant_hash) == 16
+    assert dhash(grant) == grant_hash
+    assert hash_distance(grant_hash, grant_hash) == 0
+
+    # a resized and re-encoded copy is a near duplicate
+    grant_small = open_image(encode_jpeg(grant.resize((120, 160)), quality=70))
+    assert hash_distance(dhash(grant_small), grant_hash) <= 6
+
+    # a different image is not
+    squirrel_hash = dhash(open_image(open(squirrel_path, 'rb')))
+    assert hash_distance(squirrel_hash, grant_hash) > 10
+
+    assert len(dhash(grant, hash_size=16)) == 64
+
+
+def test_hash_distance():
+    assert hash_distance('0000', '0000') == 0
+    assert hash_distance('0000', '0001') == 1
+    assert hash_distance('00ff', 'ff00') == 16
+
+
+def test_can_encode():
+    assert can_encode('JPEG') is True
+    assert can_encode('PNG') is True
+    assert can_encode('NOT-A-FORMAT') is False
+
+
+def test_get_variants():
+    with mock.patch('app.utils.image.can_encode', side_effect=lambda image_format: image_format == 'WEBP'):
+        assert get_variants(image_size.P480) == (image_size.P480_WEBP,)
+        assert get_variants(image_size.NATIVE) == ()
+    with mock.patch('app.utils.image.can_encode', return_value=False):
+        assert get_variants(image_size.P480) == ()
+
+
+def test_encode_image():
+    image = PIL.Image.new('RGB', (100, 50), color='red')
+    decoded = PIL.Image.open(encode_image(image, image_format='PNG'))
+    assert decoded.format == 'PNG'
+    assert decoded.size == (100, 50)
+
+
+@pytest.mark.skipif(not can_encode('WEBP'), reason='pillow built without webp support')
+def test_encode_image_webp():
+    image = PIL.Image.new('RGB', (100, 50), color='red')
+    decoded = PIL.Image.open(encode_image(image, image_format='WEBP', quality=image_size.P480_WEBP.quality))
+    assert decoded.format == 'WEBP'
+    assert decoded.size == (100, 50)
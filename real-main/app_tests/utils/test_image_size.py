@@ -0,0 +1,27 @@
+from app.utils import image_size
+
+
+def test_variants():
+    for size in image_size.THUMBNAILS:
+        variants = image_size.VARIANTS[size]
+        assert [variant.image_format for variant in variants] == ['WEBP', 'AVIF']
+        assert all(variant.max_dimensions == size.max_dimensions for variant in variants)
+        assert all(variant.name == size.name for variant in variants)
+    assert image_size.K4_WEBP.filename == '4K.webp'
+    assert image_size.P64_AVIF.content_type == 'image/avif'
+
+
+def test_variant_urls():
+    def get_url(size):
+        return f'https://host/{size.filename}'
+
+    assert image_size.variant_urls(get_url, []) == {}
+    assert image_size.variant_urls(get_url, ['WEBP']) == {
+        'webp': {
+            'url4k': 'https://host/4K.webp',
+            'url1080p': 'https://host/1080p.webp',
+            'url480p': 'https://host/480p.webp',
+            'url64p': 'https://host/64p.webp',
+        }
+    }
+    assert list(image_size.variant_urls(get_url, ['WEBP', 'AVIF'])) == ['webp', 'avif']
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+Compare palette extraction from full-size images against extraction from their 480p thumbnails:
+time taken, and how far each thumbnail palette color is from the nearest full-size palette color.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import PIL.Image
+import pyheif
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.utils import image_size  # noqa E402
+from app.utils.image import get_palette, open_image  # noqa E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(SCRIPT_PATH)), 'app_tests', 'fixtures')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmark palette extraction on full-size vs thumbnail images')
+    parser.add_argument(
+        'paths', nargs='*', help='image files to benchmark, defaults to the test fixtures',
+    )
+    parser.add_argument('-n', dest='repeat', type=int, default=3, help='number of timing runs per image')
+    args = parser.parse_args()
+    paths = args.paths or [
+        # big-blank.jpg is all white, which has no palette
+        os.path.join(FIXTURES_DIR, name)
+        for name in sorted(os.listdir(FIXTURES_DIR))
+        if name != 'big-blank.jpg'
+    ]
+    return paths, args.repeat
+
+
+def load(path):
+    if path.lower().endswith('.heic'):
+        heif_file = pyheif.read(path)
+        return PIL.Image.frombytes(
+            heif_file.mode, heif_file.size, heif_file.data, 'raw', heif_file.mode, heif_file.stride
+        )
+    return open_image(open(path, 'rb'))
+
+
+def timed_palette(image, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        palette = get_palette(image)
+        seconds.append(time.perf_counter() - start)
+    return palette, min(seconds)
+
+
+def color_delta(palette, other):
+    "Mean euclidean distance in RGB space from each color in `palette` to the nearest color in `other`"
+    distances = [min(sum((a - b) ** 2 for a, b in zip(c1, c2)) ** 0.5 for c2 in other) for c1 in palette]
+    return sum(distances) / len(distances)
+
+
+def main():
+    paths, repeat = parse_args()
+    print(f'{"image":<24}{"size":>12}{"native":>10}{"480p":>10}{"speedup":>9}{"delta":>8}')
+    for path in paths:
+        image = load(path)
+        thumbnail = image.copy()
+        thumbnail.thumbnail(image_size.P480.max_dimensions, resample=PIL.Image.LANCZOS)
+        native_palette, native_seconds = timed_palette(image, repeat)
+        thumbnail_palette, thumbnail_seconds = timed_palette(thumbnail, repeat)
+        print(
+            f'{os.path.basename(path):<24}{"x".join(map(str, image.size)):>12}'
+            f'{native_seconds:>9.3f}s{thumbnail_seconds:>9.3f}s'
+            f'{native_seconds / thumbnail_seconds:>8.1f}x{color_delta(native_palette, thumbnail_palette):>8.1f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.clients import DynamoClient, ElasticSearchClient  # noqa E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Reindex all users from dynamo into elasticsearch, in bulk')
+    parser.add_argument(
+        '-s', dest='segments', type=int, default=8, help='number of dynamo scan segments to process in parallel',
+    )
+    parser.add_argument(
+        '-b', dest='batch_size', type=int, default=500, help='number of users to index per bulk request',
+    )
+    args = parser.parse_args()
+    return args.segments, args.batch_size
+
+
+def generate_user_items(dynamo_client, segment, total_segments):
+    scan_kwargs = {
+        'FilterExpression': 'begins_with(partitionKey, :pk_prefix) AND sortKey = :sk',
+        'ProjectionExpression': 'userId, username, fullName',
+        'ExpressionAttributeValues': {':pk_prefix': 'user/', ':sk': 'profile'},
+        'Segment': segment,
+        'TotalSegments': total_segments,
+    }
+    return dynamo_client.generate_all_scan(scan_kwargs)
+
+
+def reindex_segment(segment, total_segments, batch_size):
+    # boto3 resources are not thread safe, so each segment gets its own clients
+    dynamo_client = DynamoClient()
+    elasticsearch_client = ElasticSearchClient(buffered=True)
+    elasticsearch_client.bulk_batch_size = batch_size
+    cnt = 0
+    for item in generate_user_items(dynamo_client, segment, total_segments):
+        elasticsearch_client.put_user(item['userId'], item['username'], item.get('fullName'))
+        cnt += 1
+    elasticsearch_client.flush()
+    print(f'Segment {segment}: reindexed {cnt} users.')
+    return cnt
+
+
+def main():
+    segments, batch_size = parse_args()
+    print(f'Reindexing users in {segments} parallel segments...')
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        cnts = executor.map(lambda segment: reindex_segment(segment, segments, batch_size), range(segments))
+        total = sum(cnts)
+    print(f'done, reindexed {total} users.')
+
+
+if __name__ == '__main__':
+    main()
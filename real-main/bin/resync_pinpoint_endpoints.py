@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+import argparse
+import os
+import sys
+
+import dotenv
+
+dotenv.load_dotenv()
+
+# https://stackoverflow.com/questions/16981921
+SCRIPT_PATH = os.path.realpath(os.path.join(os.getcwd(), os.path.expanduser(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(SCRIPT_PATH)))
+from app.clients import DynamoClient, PinpointClient  # noqa E402
+from app.models import UserManager  # noqa E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Resync all users' email and phone endpoints in pinpoint")
+    parser.add_argument(
+        '-b', dest='batch_size', type=int, default=100, help='number of users to resync at once',
+    )
+    args = parser.parse_args()
+    return args.batch_size
+
+
+def generate_user_item_batches(dynamo_client, batch_size):
+    scan_kwargs = {
+        'FilterExpression': 'begins_with(partitionKey, :pk_prefix) AND sortKey = :sk',
+        'ExpressionAttributeValues': {':pk_prefix': 'user/', ':sk': 'profile'},
+    }
+    batch = []
+    for item in dynamo_client.generate_all_scan(scan_kwargs):
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def main():
+    batch_size = parse_args()
+    clients = {'dynamo': DynamoClient(), 'pinpoint': PinpointClient()}
+    user_manager = UserManager(clients)
+
+    user_cnt, endpoint_cnt = 0, 0
+    for user_items in generate_user_item_batches(clients['dynamo'], batch_size):
+        endpoint_cnt += user_manager.resync_pinpoint_endpoints(user_items)
+        user_cnt += len(user_items)
+        print(f'Resynced {user_cnt} users so far, {endpoint_cnt} endpoints changed.')
+    print('done.')
+
+
+if __name__ == '__main__':
+    main()
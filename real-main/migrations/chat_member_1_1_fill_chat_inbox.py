@@ -0,0 +1,112 @@
+import collections
+import logging
+import os
+import zlib
+
+import boto3
+from boto3.dynamodb.conditions import Key
+
+logger = logging.getLogger()
+
+DYNAMO_TABLE = os.environ.get('DYNAMO_TABLE')
+
+CHAT_INBOX_SHARD_COUNT = 8
+
+
+class Migration:
+    "Build each user's chat inbox from their chat member items"
+
+    def __init__(self, dynamo_client, dynamo_table):
+        self.dynamo_client = dynamo_client
+        self.dynamo_table = dynamo_table
+
+    def run(self):
+        chats_by_user_id = collections.defaultdict(dict)
+        for item in self.generate_chat_member_items():
+            user_id = item['sortKey'][len('member/') :]
+            chat_id = item['partitionKey'][len('chat/') :]
+            chats_by_user_id[user_id][chat_id] = {
+                'lastMessageActivityAt': item['gsiK2SortKey'][len('chat/') :],
+                'messagesUnviewedCount': item.get('messagesUnviewedCount', 0),
+            }
+        for user_id, chats in chats_by_user_id.items():
+            self.add_chat_inbox(user_id, chats)
+
+    def generate_chat_member_items(self):
+        scan_kwargs = {
+            'FilterExpression': 'begins_with(partitionKey, :pk_prefix) AND begins_with(sortKey, :sk_prefix)',
+            'ExpressionAttributeValues': {':pk_prefix': 'chat/', ':sk_prefix': 'member/'},
+        }
+        while True:
+            paginated = self.dynamo_table.scan(**scan_kwargs)
+            for item in paginated['Items']:
+                yield item
+            if 'LastEvaluatedKey' not in paginated:
+                break
+            scan_kwargs['ExclusiveStartKey'] = paginated['LastEvaluatedKey']
+
+    def add_chat_inbox(self, user_id, chats):
+        shards = collections.defaultdict(dict)
+        for chat_id, chat in chats.items():
+            shard = zlib.crc32(chat_id.encode()) % CHAT_INBOX_SHARD_COUNT
+            shards[f'chatInbox/{shard}'][chat_id] = chat
+        logger.warning(f'User `{user_id}`: writing chat inbox with `{len(chats)}` chats')
+        for sort_key, shard_chats in shards.items():
+            self.add_chat_inbox_shard(user_id, sort_key, shard_chats)
+        self.set_chats_with_unviewed_messages_count(user_id)
+
+    def add_chat_inbox_shard(self, user_id, sort_key, chats):
+        key = {'partitionKey': f'user/{user_id}', 'sortKey': sort_key}
+        kwargs = {
+            'Item': {**key, 'schemaVersion': 0, 'userId': user_id, 'chats': chats},
+            'ConditionExpression': 'attribute_not_exists(partitionKey)',
+        }
+        try:
+            self.dynamo_table.put_item(**kwargs)
+            return
+        except self.dynamo_client.exceptions.ConditionalCheckFailedException:
+            pass
+        # the live system has already started this shard, fill in what it's missing
+        for chat_id, chat in chats.items():
+            kwargs = {
+                'Key': key,
+                'UpdateExpression': 'SET chats.#chatId = :chat',
+                'ConditionExpression': 'attribute_not_exists(chats.#chatId)',
+                'ExpressionAttributeNames': {'#chatId': chat_id},
+                'ExpressionAttributeValues': {':chat': chat},
+            }
+            try:
+                self.dynamo_table.update_item(**kwargs)
+            except self.dynamo_client.exceptions.ConditionalCheckFailedException:
+                pass
+
+    def set_chats_with_unviewed_messages_count(self, user_id):
+        query_kwargs = {
+            'KeyConditionExpression': (
+                Key('partitionKey').eq(f'user/{user_id}') & Key('sortKey').begins_with('chatInbox/')
+            ),
+        }
+        count = 0
+        while True:
+            paginated = self.dynamo_table.query(**query_kwargs)
+            for item in paginated['Items']:
+                count += sum(1 for chat in item['chats'].values() if chat['messagesUnviewedCount'] > 0)
+            if 'LastEvaluatedKey' not in paginated:
+                break
+            query_kwargs['ExclusiveStartKey'] = paginated['LastEvaluatedKey']
+        kwargs = {
+            'Key': {'partitionKey': f'user/{user_id}', 'sortKey': 'chatInbox'},
+            'UpdateExpression': 'SET schemaVersion = :sv, userId = :uid, chatsWithUnviewedMessagesCount = :cnt',
+            'ExpressionAttributeValues': {':sv': 0, ':uid': user_id, ':cnt': count},
+        }
+        self.dynamo_table.update_item(**kwargs)
+
+
+if __name__ == '__main__':
+    assert DYNAMO_TABLE, 'Must set env variable DYNAMO_TABLE to dynamo table name'
+
+    dynamo_client = boto3.client('dynamodb')
+    dynamo_table = boto3.resource('dynamodb').Table(DYNAMO_TABLE)
+
+    migration = Migration(dynamo_client, dynamo_table)
+    migration.run()
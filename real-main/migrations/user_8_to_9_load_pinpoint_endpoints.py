@@ -22,9 +22,17 @@ class Migration:
         self.pinpoint_client = pinpoint_client
         self.pinpoint_app_id = pinpoint_app_id
 
+    batch_size = 100  # max number of endpoints pinpoint accepts in one batch update
+
     def run(self):
+        users = []
         for user in self.generate_all_users_to_migrate():
-            self.migrate_user(user)
+            users.append(user)
+            if len(users) == self.batch_size // 2:  # each user has up to two endpoints
+                self.migrate_users(users)
+                users = []
+        if users:
+            self.migrate_users(users)
 
     def generate_all_users_to_migrate(self):
         "Return a generator of all items in the table that pass the filter"
@@ -40,14 +48,19 @@ class Migration:
                 break
             scan_kwargs['ExclusiveStartKey'] = paginated['LastEvaluatedKey']
 
-    def migrate_user(self, user):
-        user_id = user['userId']
-        logger.warning(f'User `{user_id}`: starting migration')
-        if (email := user.get('email')) :
-            self.pinpoint_update_endpoint(user_id, 'EMAIL', email)
-        if (phone := user.get('phoneNumber')) :
-            self.pinpoint_update_endpoint(user_id, 'SMS', phone)
-        self.dynamo_update_user(user_id)
+    def migrate_users(self, users):
+        endpoint_items = []
+        for user in users:
+            user_id = user['userId']
+            logger.warning(f'User `{user_id}`: starting migration')
+            if (email := user.get('email')) :
+                endpoint_items.append(self.pinpoint_endpoint_item(user_id, 'EMAIL', email))
+            if (phone := user.get('phoneNumber')) :
+                endpoint_items.append(self.pinpoint_endpoint_item(user_id, 'SMS', phone))
+        if endpoint_items:
+            self.pinpoint_update_endpoints_batch(endpoint_items)
+        for user in users:
+            self.dynamo_update_user(user['userId'])
 
     def dynamo_update_user(self, user_id):
         logger.warning(f'User `{user_id}`: marking migrated')
@@ -59,17 +72,19 @@ class Migration:
         }
         self.dynamo_table.update_item(**kwargs)
 
-    def pinpoint_update_endpoint(self, user_id, channel_type, address):
+    def pinpoint_endpoint_item(self, user_id, channel_type, address):
         endpoint_id = str(uuid.uuid4())
         logger.warning(
             f'User `{user_id}`: updating pinpoint endpoint `{endpoint_id}` type `{channel_type}` with `{address}`',
         )
+        return {'Id': endpoint_id, 'Address': address, 'ChannelType': channel_type, 'User': {'UserId': user_id}}
+
+    def pinpoint_update_endpoints_batch(self, endpoint_items):
         kwargs = {
             'ApplicationId': self.pinpoint_app_id,
-            'EndpointId': endpoint_id,
-            'EndpointRequest': {'Address': address, 'ChannelType': channel_type, 'User': {'UserId': user_id}},
+            'EndpointBatchRequest': {'Item': endpoint_items},
         }
-        self.pinpoint_client.update_endpoint(**kwargs)
+        self.pinpoint_client.update_endpoints_batch(**kwargs)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,110 @@
+import logging
+import zlib
+from uuid import uuid4
+
+import pendulum
+import pytest
+
+from migrations.chat_member_1_1_fill_chat_inbox import Migration
+
+
+def add_chat_member(dynamo_table, chat_id, user_id, last_message_activity_at, messages_unviewed_count=None):
+    item = {
+        'partitionKey': f'chat/{chat_id}',
+        'sortKey': f'member/{user_id}',
+        'gsiK2PartitionKey': f'member/{user_id}',
+        'gsiK2SortKey': f'chat/{last_message_activity_at.to_iso8601_string()}',
+    }
+    if messages_unviewed_count is not None:
+        item['messagesUnviewedCount'] = messages_unviewed_count
+    dynamo_table.put_item(Item=item)
+    return item
+
+
+def get_inbox_chat(dynamo_table, user_id, chat_id):
+    key = {'partitionKey': f'user/{user_id}', 'sortKey': f'chatInbox/{zlib.crc32(chat_id.encode()) % 8}'}
+    return dynamo_table.get_item(Key=key)['Item']['chats'][chat_id]
+
+
+def get_inbox(dynamo_table, user_id):
+    return dynamo_table.get_item(Key={'partitionKey': f'user/{user_id}', 'sortKey': 'chatInbox'}).get('Item')
+
+
+@pytest.fixture
+def user_id():
+    yield str(uuid4())
+
+
+user_id2 = user_id
+
+
+def test_migrate_none(dynamo_client, dynamo_table, caplog):
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 0
+
+
+def test_migrate_multiple(dynamo_client, dynamo_table, caplog, user_id, user_id2):
+    chat_id1, chat_id2 = str(uuid4()), str(uuid4())
+    at1 = pendulum.now('utc')
+    at2 = at1.add(minutes=1)
+    add_chat_member(dynamo_table, chat_id1, user_id, at1, messages_unviewed_count=2)
+    add_chat_member(dynamo_table, chat_id2, user_id, at2)
+    add_chat_member(dynamo_table, chat_id2, user_id2, at2, messages_unviewed_count=1)
+
+    # migrate, check logging
+    migration = Migration(dynamo_client, dynamo_table)
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 2
+    assert sum(1 for rec in caplog.records if user_id in str(rec)) == 1
+    assert sum(1 for rec in caplog.records if user_id2 in str(rec)) == 1
+
+    # check state
+    assert get_inbox_chat(dynamo_table, user_id, chat_id1) == {
+        'lastMessageActivityAt': at1.to_iso8601_string(),
+        'messagesUnviewedCount': 2,
+    }
+    assert get_inbox_chat(dynamo_table, user_id, chat_id2) == {
+        'lastMessageActivityAt': at2.to_iso8601_string(),
+        'messagesUnviewedCount': 0,
+    }
+    assert get_inbox(dynamo_table, user_id) == {
+        'partitionKey': f'user/{user_id}',
+        'sortKey': 'chatInbox',
+        'schemaVersion': 0,
+        'userId': user_id,
+        'chatsWithUnviewedMessagesCount': 1,
+    }
+    assert get_inbox_chat(dynamo_table, user_id2, chat_id2) == {
+        'lastMessageActivityAt': at2.to_iso8601_string(),
+        'messagesUnviewedCount': 1,
+    }
+    assert get_inbox(dynamo_table, user_id2)['chatsWithUnviewedMessagesCount'] == 1
+
+
+def test_migrate_merges_with_existing_inbox(dynamo_client, dynamo_table, user_id):
+    chat_id1, chat_id2 = str(uuid4()), str(uuid4())
+    at1 = pendulum.now('utc')
+    at2 = at1.add(minutes=1)
+    at3 = at1.add(minutes=2)
+    add_chat_member(dynamo_table, chat_id1, user_id, at1, messages_unviewed_count=2)
+    add_chat_member(dynamo_table, chat_id2, user_id, at2)
+
+    # the live system has already started the shard of one chat, with more recent info on it
+    existing_chat = {'lastMessageActivityAt': at3.to_iso8601_string(), 'messagesUnviewedCount': 1}
+    shard_key = {'partitionKey': f'user/{user_id}', 'sortKey': f'chatInbox/{zlib.crc32(chat_id2.encode()) % 8}'}
+    dynamo_table.put_item(
+        Item={**shard_key, 'schemaVersion': 0, 'userId': user_id, 'chats': {chat_id2: existing_chat}}
+    )
+
+    # migrate, check state
+    migration = Migration(dynamo_client, dynamo_table)
+    migration.run()
+    assert get_inbox_chat(dynamo_table, user_id, chat_id2) == existing_chat
+    assert get_inbox_chat(dynamo_table, user_id, chat_id1) == {
+        'lastMessageActivityAt': at1.to_iso8601_string(),
+        'messagesUnviewedCount': 2,
+    }
+    assert get_inbox(dynamo_table, user_id)['chatsWithUnviewedMessagesCount'] == 2
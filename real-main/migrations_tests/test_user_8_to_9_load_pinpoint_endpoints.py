@@ -144,19 +144,21 @@ def test_migrate_user_with_email(dynamo_client, dynamo_table, pinpoint_client, c
     assert 'migrated' in caplog.records[2].msg
 
     # check final state
-    endpoint_id = pinpoint_client.update_endpoint.call_args.kwargs['EndpointId']
+    endpoint_id = pinpoint_client.update_endpoints_batch.call_args.kwargs['EndpointBatchRequest']['Item'][0]['Id']
     assert str(uuid.UUID(endpoint_id)) == endpoint_id
     assert pinpoint_client.mock_calls == [
-        mock.call.update_endpoint(
-            **{
-                'ApplicationId': 'pnt-app-id',
-                'EndpointId': endpoint_id,
-                'EndpointRequest': {
-                    'Address': user['email'],
-                    'ChannelType': 'EMAIL',
-                    'User': {'UserId': user['userId']},
-                },
-            }
+        mock.call.update_endpoints_batch(
+            ApplicationId='pnt-app-id',
+            EndpointBatchRequest={
+                'Item': [
+                    {
+                        'Id': endpoint_id,
+                        'Address': user['email'],
+                        'ChannelType': 'EMAIL',
+                        'User': {'UserId': user['userId']},
+                    }
+                ]
+            },
         )
     ]
     new_user = dynamo_table.get_item(Key=user_pk)['Item']
@@ -185,19 +187,21 @@ def test_migrate_user_with_phone(dynamo_client, dynamo_table, pinpoint_client, c
     assert 'migrated' in caplog.records[2].msg
 
     # check final state
-    endpoint_id = pinpoint_client.update_endpoint.call_args.kwargs['EndpointId']
+    endpoint_id = pinpoint_client.update_endpoints_batch.call_args.kwargs['EndpointBatchRequest']['Item'][0]['Id']
     assert str(uuid.UUID(endpoint_id)) == endpoint_id
     assert pinpoint_client.mock_calls == [
-        mock.call.update_endpoint(
-            **{
-                'ApplicationId': 'pnt-app-id',
-                'EndpointId': endpoint_id,
-                'EndpointRequest': {
-                    'Address': user['phoneNumber'],
-                    'ChannelType': 'SMS',
-                    'User': {'UserId': user['userId']},
-                },
-            }
+        mock.call.update_endpoints_batch(
+            ApplicationId='pnt-app-id',
+            EndpointBatchRequest={
+                'Item': [
+                    {
+                        'Id': endpoint_id,
+                        'Address': user['phoneNumber'],
+                        'ChannelType': 'SMS',
+                        'User': {'UserId': user['userId']},
+                    }
+                ]
+            },
         )
     ]
     new_user = dynamo_table.get_item(Key=user_pk)['Item']
@@ -230,33 +234,30 @@ def test_migrate_user_with_phone_and_email(
     assert 'migrated' in caplog.records[3].msg
 
     # check final state
-    endpoint_id_1 = pinpoint_client.update_endpoint.call_args_list[0].kwargs['EndpointId']
-    endpoint_id_2 = pinpoint_client.update_endpoint.call_args_list[1].kwargs['EndpointId']
+    endpoint_items = pinpoint_client.update_endpoints_batch.call_args.kwargs['EndpointBatchRequest']['Item']
+    endpoint_id_1, endpoint_id_2 = [item['Id'] for item in endpoint_items]
     assert str(uuid.UUID(endpoint_id_1)) == endpoint_id_1
     assert str(uuid.UUID(endpoint_id_2)) == endpoint_id_2
     assert pinpoint_client.mock_calls == [
-        mock.call.update_endpoint(
-            **{
-                'ApplicationId': 'pnt-app-id',
-                'EndpointId': endpoint_id_1,
-                'EndpointRequest': {
-                    'Address': user['email'],
-                    'ChannelType': 'EMAIL',
-                    'User': {'UserId': user['userId']},
-                },
-            }
-        ),
-        mock.call.update_endpoint(
-            **{
-                'ApplicationId': 'pnt-app-id',
-                'EndpointId': endpoint_id_2,
-                'EndpointRequest': {
-                    'Address': user['phoneNumber'],
-                    'ChannelType': 'SMS',
-                    'User': {'UserId': user['userId']},
-                },
-            }
-        ),
+        mock.call.update_endpoints_batch(
+            ApplicationId='pnt-app-id',
+            EndpointBatchRequest={
+                'Item': [
+                    {
+                        'Id': endpoint_id_1,
+                        'Address': user['email'],
+                        'ChannelType': 'EMAIL',
+                        'User': {'UserId': user['userId']},
+                    },
+                    {
+                        'Id': endpoint_id_2,
+                        'Address': user['phoneNumber'],
+                        'ChannelType': 'SMS',
+                        'User': {'UserId': user['userId']},
+                    },
+                ]
+            },
+        )
     ]
     new_user = dynamo_table.get_item(Key=user_pk)['Item']
     assert new_user.pop('schemaVersion') == 9
@@ -293,16 +294,49 @@ def test_migrate_multiple(
     assert sum(1 for rec in caplog.records if users[2]['userId'] in rec.msg) == 3
     assert sum(1 for rec in caplog.records if users[3]['userId'] in rec.msg) == 4
 
-    # check calls to pinpoint
-    call_args_list = pinpoint_client.update_endpoint.call_args_list
-    assert len(call_args_list) == 4
-    assert call_args_list[0].kwargs['EndpointRequest']['User']['UserId'] == users[1]['userId']
-    assert call_args_list[1].kwargs['EndpointRequest']['User']['UserId'] == users[2]['userId']
-    assert call_args_list[2].kwargs['EndpointRequest']['User']['UserId'] == users[3]['userId']
-    assert call_args_list[3].kwargs['EndpointRequest']['User']['UserId'] == users[3]['userId']
+    # check calls to pinpoint, all endpoints should be created in one batch
+    call_args_list = pinpoint_client.update_endpoints_batch.call_args_list
+    assert len(call_args_list) == 1
+    endpoint_items = call_args_list[0].kwargs['EndpointBatchRequest']['Item']
+    assert sorted(item['User']['UserId'] for item in endpoint_items) == sorted(
+        [users[1]['userId'], users[2]['userId'], users[3]['userId'], users[3]['userId']]
+    )
 
     # check final state in dynamo
     new_users = [dynamo_table.get_item(Key=user_pk)['Item'] for user_pk, user in user_keys_to_items]
     assert all(user.pop('schemaVersion') == 9 for user in new_users)
     assert all(user.pop('schemaVersion') == 8 for user in users)
     assert new_users == users
+
+
+def test_migrate_multiple_batches(dynamo_client, dynamo_table, pinpoint_client, caplog):
+    users = []
+    for i in range(5):
+        user_id = str(uuid.uuid4())
+        item = {
+            'partitionKey': f'user/{user_id}',
+            'sortKey': 'profile',
+            'schemaVersion': 8,
+            'userId': user_id,
+            'email': f'user-{i}@real.app',
+            'phoneNumber': f'+1212555121{i}',
+        }
+        dynamo_table.put_item(Item=item)
+        users.append(item)
+
+    # migrate with a small batch size, verify pinpoint endpoints are created in multiple batches
+    migration = Migration(dynamo_client, dynamo_table, pinpoint_client, 'pnt-app-id')
+    migration.batch_size = 4
+    with caplog.at_level(logging.WARNING):
+        migration.run()
+    assert len(caplog.records) == 5 * 4
+
+    call_args_list = pinpoint_client.update_endpoints_batch.call_args_list
+    assert [len(ca.kwargs['EndpointBatchRequest']['Item']) for ca in call_args_list] == [4, 4, 2]
+    endpoint_items = [item for ca in call_args_list for item in ca.kwargs['EndpointBatchRequest']['Item']]
+    assert sorted(item['Address'] for item in endpoint_items) == sorted(
+        [user['email'] for user in users] + [user['phoneNumber'] for user in users]
+    )
+    for user in users:
+        new_user = dynamo_table.get_item(Key={k: user[k] for k in ('partitionKey', 'sortKey')})['Item']
+        assert new_user['schemaVersion'] == 9